@@ -3,6 +3,8 @@ import logging
 import os
 import shutil
 import base64
+import threading
+import time
 import redis
 
 from datetime import datetime
@@ -25,6 +27,7 @@ from backend.env import (
     REDIS_KEY_PREFIX,
     REDIS_SENTINEL_HOSTS,
     REDIS_SENTINEL_PORT,
+    REDIS_CONFIG_CACHE_TTL,
     FRONTEND_BUILD_DIR,
     OFFLINE_MODE,
     OPEN_WEBUI_DIR,
@@ -223,18 +226,37 @@ class PersistentConfig(Generic[T]):
 
 
 class AppConfig:
+    """
+    Attribute access to the registered `PersistentConfig` values.
+
+    With Redis configured, reads are served from the local values and only
+    re-synced when the shared config version moves: `__setattr__` bumps the
+    version and publishes the changed key, the pub/sub listener invalidates
+    the local snapshot, and at most one version check per `cache_ttl` seconds
+    covers missed messages.
+    """
+
     _redis: Union[redis.Redis, redis.cluster.RedisCluster] = None
     _redis_key_prefix: str
 
     _state: dict[str, PersistentConfig]
 
+    _cache_ttl: float = REDIS_CONFIG_CACHE_TTL
+    # Empty until the first sync so values written by older instances, which
+    # don't bump the version, are still picked up once
+    _version: Optional[str] = ""
+    _checked_at: float = 0.0
+
     def __init__(
         self,
         redis_url: Optional[str] = None,
         redis_sentinels: Optional[list] = [],
         redis_cluster: Optional[bool] = False,
         redis_key_prefix: str = "open-webui",
+        cache_ttl: float = REDIS_CONFIG_CACHE_TTL,
     ):
+        super().__setattr__("_cache_ttl", cache_ttl)
+
         if redis_url:
             super().__setattr__("_redis_key_prefix", redis_key_prefix)
             super().__setattr__(
@@ -249,6 +271,18 @@ class AppConfig:
 
         super().__setattr__("_state", {})
 
+        if self._redis:
+            threading.Thread(target=self._listen_for_updates, daemon=True).start()
+
+    def _get_redis_key(self, key: str) -> str:
+        return f"{self._redis_key_prefix}:config:{key}"
+
+    def _get_redis_version_key(self) -> str:
+        return f"{self._redis_key_prefix}:config_version"
+
+    def _get_redis_channel(self) -> str:
+        return f"{self._redis_key_prefix}:config_updates"
+
     def __setattr__(self, key, value):
         if isinstance(value, PersistentConfig):
             self._state[key] = value
@@ -257,31 +291,72 @@ class AppConfig:
             self._state[key].save()
 
             if self._redis:
-                redis_key = f"{self._redis_key_prefix}:config:{key}"
-                self._redis.set(redis_key, json.dumps(self._state[key].value))
+                pipe = self._redis.pipeline()
+                pipe.set(self._get_redis_key(key), json.dumps(self._state[key].value))
+                pipe.incr(self._get_redis_version_key())
+                pipe.publish(self._get_redis_channel(), key)
+                _, version, _ = pipe.execute()
+
+                # Our own write is already applied locally
+                super().__setattr__("_version", str(version))
 
     def __getattr__(self, key):
         if key not in self._state:
             raise AttributeError(f"Config key '{key}' not found")
 
         # If Redis is available, check for an updated value
-        if self._redis:
-            redis_key = f"{self._redis_key_prefix}:config:{key}"
-            redis_value = self._redis.get(redis_key)
+        if self._redis and time.monotonic() - self._checked_at >= self._cache_ttl:
+            self._sync_from_redis()
 
-            if redis_value is not None:
-                try:
-                    decoded_value = json.loads(redis_value)
+        return self._state[key].value
 
-                    # Update the in-memory value if different
-                    if self._state[key].value != decoded_value:
-                        self._state[key].value = decoded_value
-                        log.info(f"Updated {key} from Redis: {decoded_value}")
+    def _sync_from_redis(self):
+        super().__setattr__("_checked_at", time.monotonic())
 
-                except json.JSONDecodeError:
-                    log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+        try:
+            version = self._redis.get(self._get_redis_version_key())
+            if version == self._version:
+                return
+
+            keys = list(self._state.keys())
+            pipe = self._redis.pipeline()
+            for key in keys:
+                pipe.get(self._get_redis_key(key))
+            redis_values = pipe.execute()
+        except Exception as e:
+            log.error(f"Failed to sync config from Redis: {e}")
+            return
 
-        return self._state[key].value
+        for key, redis_value in zip(keys, redis_values):
+            if redis_value is None:
+                continue
+
+            try:
+                decoded_value = json.loads(redis_value)
+
+                # Update the in-memory value if different
+                if self._state[key].value != decoded_value:
+                    self._state[key].value = decoded_value
+                    log.info(f"Updated {key} from Redis: {decoded_value}")
+
+            except json.JSONDecodeError:
+                log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+
+        super().__setattr__("_version", version)
+
+    def _listen_for_updates(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._get_redis_channel())
+
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        # Force a version check on the next read
+                        super().__setattr__("_checked_at", 0.0)
+            except Exception as e:
+                log.debug(f"Config update listener disconnected: {e}")
+                time.sleep(5)
 
 
 ####################################
@@ -915,6 +990,19 @@ AZURE_STORAGE_ENDPOINT = os.environ.get("AZURE_STORAGE_ENDPOINT", None)
 AZURE_STORAGE_CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME", None)
 AZURE_STORAGE_KEY = os.environ.get("AZURE_STORAGE_KEY", None)
 
+# Uploads are copied to disk in chunks of this size while being hashed
+STORAGE_UPLOAD_CHUNK_SIZE = int(
+    os.environ.get("STORAGE_UPLOAD_CHUNK_SIZE", str(1024 * 1024))
+)
+
+# Part size and parallel parts of multipart uploads to S3, GCS and Azure
+STORAGE_MULTIPART_CHUNK_SIZE = int(
+    os.environ.get("STORAGE_MULTIPART_CHUNK_SIZE", str(8 * 1024 * 1024))
+)
+STORAGE_MULTIPART_CONCURRENCY = int(
+    os.environ.get("STORAGE_MULTIPART_CONCURRENCY", "4")
+)
+
 ####################################
 # File Upload DIR
 ####################################
@@ -1703,6 +1791,35 @@ ENABLE_TITLE_GENERATION = PersistentConfig(
     os.environ.get("ENABLE_TITLE_GENERATION", "True").lower() == "true",
 )
 
+ENABLE_COMBINED_TASK_GENERATION = PersistentConfig(
+    "ENABLE_COMBINED_TASK_GENERATION",
+    "task.combined.enable",
+    os.environ.get("ENABLE_COMBINED_TASK_GENERATION", "False").lower() == "true",
+)
+
+COMBINED_TASK_GENERATION_PROMPT_TEMPLATE = PersistentConfig(
+    "COMBINED_TASK_GENERATION_PROMPT_TEMPLATE",
+    "task.combined.prompt_template",
+    os.environ.get("COMBINED_TASK_GENERATION_PROMPT_TEMPLATE", ""),
+)
+
+# {{TASKS}} is replaced by the guidelines of the enabled outputs (title, tags
+# and follow-ups) and {{OUTPUT}} by the JSON object expected for them
+DEFAULT_COMBINED_TASK_GENERATION_PROMPT_TEMPLATE = """### Task:
+Analyze the chat history and generate each of the outputs listed below.
+### Outputs:
+{{TASKS}}
+### Guidelines:
+- Use the chat's primary language; default to English if multilingual.
+- Prioritize accuracy over excessive creativity; keep it clear and simple.
+- Your entire response must consist solely of a single, raw JSON object, without any markdown code fences, introductory or concluding text.
+### Output:
+JSON format: {{OUTPUT}}
+### Chat History:
+<chat_history>
+{{MESSAGES:END:6}}
+</chat_history>"""
+
 
 ENABLE_SEARCH_QUERY_GENERATION = PersistentConfig(
     "ENABLE_SEARCH_QUERY_GENERATION",
@@ -2496,6 +2613,34 @@ ENABLE_RAG_HYBRID_SEARCH = PersistentConfig(
     os.environ.get("ENABLE_RAG_HYBRID_SEARCH", "").lower() == "true",
 )
 
+# Keep a persistent BM25 index of every collection in sync with the vector DB
+# writes, instead of rebuilding it from the whole collection on each query
+ENABLE_RAG_BM25_INDEX = (
+    os.environ.get("ENABLE_RAG_BM25_INDEX", "True").lower() == "true"
+)
+
+# Threads shared by the retrieval fan-out (vector/hybrid search per collection
+# and query) of all requests, and how many of them a single request may use
+RAG_RETRIEVAL_MAX_WORKERS = int(
+    os.environ.get("RAG_RETRIEVAL_MAX_WORKERS", "")
+    or min(32, (os.cpu_count() or 1) + 4)
+)
+
+RAG_RETRIEVAL_MAX_CONCURRENCY_PER_REQUEST = int(
+    os.environ.get("RAG_RETRIEVAL_MAX_CONCURRENCY_PER_REQUEST", "8")
+)
+
+# Threads per instance running the durable file and knowledge ingestion jobs,
+# 0 processes uploads in the request's background tasks instead
+RAG_INGESTION_WORKERS = int(os.environ.get("RAG_INGESTION_WORKERS", "2"))
+
+# Ingestion jobs a single user may have running across all instances
+RAG_INGESTION_MAX_JOBS_PER_USER = int(
+    os.environ.get("RAG_INGESTION_MAX_JOBS_PER_USER", "2")
+)
+
+RAG_INGESTION_MAX_ATTEMPTS = int(os.environ.get("RAG_INGESTION_MAX_ATTEMPTS", "3"))
+
 RAG_FULL_CONTEXT = PersistentConfig(
     "RAG_FULL_CONTEXT",
     "rag.full_context",
@@ -2598,6 +2743,39 @@ RAG_EMBEDDING_PREFIX_FIELD_NAME = os.environ.get(
     "RAG_EMBEDDING_PREFIX_FIELD_NAME", None
 )
 
+# Number of embedding batches sent to the OpenAI/Azure/Ollama engines at once
+RAG_EMBEDDING_CONCURRENT_REQUESTS = int(
+    os.environ.get("RAG_EMBEDDING_CONCURRENT_REQUESTS", "4")
+)
+
+# Retries of a batch rejected with 429 before it is given up
+RAG_EMBEDDING_MAX_RETRIES = int(os.environ.get("RAG_EMBEDDING_MAX_RETRIES", "5"))
+
+# Content-addressed cache of computed embeddings, shared by every embedding function
+ENABLE_RAG_EMBEDDING_CACHE = (
+    os.environ.get("ENABLE_RAG_EMBEDDING_CACHE", "True").lower() == "true"
+)
+
+RAG_EMBEDDING_CACHE_PATH = os.environ.get(
+    "RAG_EMBEDDING_CACHE_PATH", f"{CACHE_DIR}/embeddings/embeddings.db"
+)
+
+RAG_EMBEDDING_CACHE_MAX_SIZE_MB = int(
+    os.environ.get("RAG_EMBEDDING_CACHE_MAX_SIZE_MB", "1024")
+)
+
+RAG_EMBEDDING_CACHE_MEMORY_ENTRIES = int(
+    os.environ.get("RAG_EMBEDDING_CACHE_MEMORY_ENTRIES", "10000")
+)
+
+# In-memory cache of the extracted text of files used in full context mode,
+# keyed by content hash; 0 disables it
+RAG_FULL_CONTEXT_CACHE_TTL = int(os.environ.get("RAG_FULL_CONTEXT_CACHE_TTL", "300"))
+
+RAG_FULL_CONTEXT_CACHE_MAX_SIZE_MB = int(
+    os.environ.get("RAG_FULL_CONTEXT_CACHE_MAX_SIZE_MB", "256")
+)
+
 RAG_RERANKING_ENGINE = PersistentConfig(
     "RAG_RERANKING_ENGINE",
     "rag.reranking_engine",
@@ -408,6 +408,14 @@ REDIS_KEY_PREFIX = os.environ.get("REDIS_KEY_PREFIX", "open-webui")
 REDIS_SENTINEL_HOSTS = os.environ.get("REDIS_SENTINEL_HOSTS", "")
 REDIS_SENTINEL_PORT = os.environ.get("REDIS_SENTINEL_PORT", "26379")
 
+# Seconds a process-local config snapshot is trusted before checking the Redis
+# config version again; updates published over pub/sub invalidate it earlier
+REDIS_CONFIG_CACHE_TTL = os.environ.get("REDIS_CONFIG_CACHE_TTL", "1")
+try:
+    REDIS_CONFIG_CACHE_TTL = float(REDIS_CONFIG_CACHE_TTL)
+except ValueError:
+    REDIS_CONFIG_CACHE_TTL = 1.0
+
 # Maximum number of retries for Redis operations when using Sentinel fail-over
 REDIS_SENTINEL_MAX_RETRY_COUNT = os.environ.get("REDIS_SENTINEL_MAX_RETRY_COUNT", "2")
 try:
@@ -563,6 +571,88 @@ else:
     except Exception:
         MODELS_CACHE_TTL = 1
 
+# Seconds an expired model list is still served while it is refreshed in the
+# background; only older (or missing) lists make a request wait for the
+# upstream connections
+MODELS_CACHE_STALE_TTL = os.environ.get("MODELS_CACHE_STALE_TTL", "300")
+try:
+    MODELS_CACHE_STALE_TTL = int(MODELS_CACHE_STALE_TTL)
+except Exception:
+    MODELS_CACHE_STALE_TTL = 300
+
+# Seconds between background refreshes of recently requested model lists,
+# 0 disables the refresher
+MODELS_CACHE_REFRESH_INTERVAL = os.environ.get("MODELS_CACHE_REFRESH_INTERVAL", "60")
+try:
+    MODELS_CACHE_REFRESH_INTERVAL = int(MODELS_CACHE_REFRESH_INTERVAL)
+except Exception:
+    MODELS_CACHE_REFRESH_INTERVAL = 60
+
+
+####################################
+# FUNCTIONS
+####################################
+
+# Seconds a loaded function module and its valves are used before their
+# version is checked against the database again; changes published over
+# Redis pub/sub invalidate them earlier
+FUNCTION_MODULE_CACHE_TTL = os.environ.get("FUNCTION_MODULE_CACHE_TTL", "1")
+try:
+    FUNCTION_MODULE_CACHE_TTL = float(FUNCTION_MODULE_CACHE_TTL)
+except ValueError:
+    FUNCTION_MODULE_CACHE_TTL = 1.0
+
+####################################
+# GROUPS
+####################################
+
+# Seconds a worker reuses a user's resolved groups and permissions; changes
+# made through the same worker invalidate them immediately
+GROUP_MEMBERSHIP_CACHE_TTL = os.environ.get("GROUP_MEMBERSHIP_CACHE_TTL", "5")
+try:
+    GROUP_MEMBERSHIP_CACHE_TTL = float(GROUP_MEMBERSHIP_CACHE_TTL)
+except ValueError:
+    GROUP_MEMBERSHIP_CACHE_TTL = 5.0
+
+
+####################################
+# FILES
+####################################
+
+# Seconds a file processing status stream waits for a published status change
+# before reading the status from the database, in case it was missed
+FILE_PROCESSING_STATUS_POLL_INTERVAL = os.environ.get(
+    "FILE_PROCESSING_STATUS_POLL_INTERVAL", "5"
+)
+try:
+    FILE_PROCESSING_STATUS_POLL_INTERVAL = float(FILE_PROCESSING_STATUS_POLL_INTERVAL)
+except ValueError:
+    FILE_PROCESSING_STATUS_POLL_INTERVAL = 5.0
+
+
+####################################
+# RAG
+####################################
+
+# Processes splitting the documents of large ingestions into chunks, 0 or 1
+# splits in the calling thread. Set here rather than in config.py because the
+# worker processes import the splitter module on their own.
+RAG_SPLIT_MAX_WORKERS = os.environ.get(
+    "RAG_SPLIT_MAX_WORKERS", str(min(4, os.cpu_count() or 1))
+)
+try:
+    RAG_SPLIT_MAX_WORKERS = int(RAG_SPLIT_MAX_WORKERS)
+except ValueError:
+    RAG_SPLIT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# Characters of document text below which splitting stays in the calling
+# thread, where starting the worker processes would cost more than it saves
+RAG_SPLIT_PARALLEL_MIN_SIZE = os.environ.get("RAG_SPLIT_PARALLEL_MIN_SIZE", "1000000")
+try:
+    RAG_SPLIT_PARALLEL_MIN_SIZE = int(RAG_SPLIT_PARALLEL_MIN_SIZE)
+except ValueError:
+    RAG_SPLIT_PARALLEL_MIN_SIZE = 1000000
+
 
 ####################################
 # CHAT
@@ -596,6 +686,46 @@ else:
         CHAT_RESPONSE_MAX_TOOL_CALL_RETRIES = 30
 
 
+CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL = os.environ.get(
+    "CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL", "1"
+)
+
+if CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL == "":
+    CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL = 1.0
+else:
+    try:
+        CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL = float(
+            CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL
+        )
+    except Exception:
+        CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL = 1.0
+
+
+CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING = os.environ.get(
+    "CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING", "50"
+)
+
+if CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING == "":
+    CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING = 50
+else:
+    try:
+        CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING = int(
+            CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING
+        )
+    except Exception:
+        CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING = 50
+
+
+# Seconds the title, tags and follow-ups generated for a message are kept, so
+# running the background tasks of the same message again reuses them
+CHAT_TASK_RESULT_CACHE_TTL = os.environ.get("CHAT_TASK_RESULT_CACHE_TTL", "3600")
+
+try:
+    CHAT_TASK_RESULT_CACHE_TTL = int(CHAT_TASK_RESULT_CACHE_TTL)
+except Exception:
+    CHAT_TASK_RESULT_CACHE_TTL = 3600
+
+
 ####################################
 # WEBSOCKET SUPPORT
 ####################################
@@ -612,12 +742,13 @@ WEBSOCKET_REDIS_CLUSTER = (
     os.environ.get("WEBSOCKET_REDIS_CLUSTER", str(REDIS_CLUSTER)).lower() == "true"
 )
 
-websocket_redis_lock_timeout = os.environ.get("WEBSOCKET_REDIS_LOCK_TIMEOUT", "60")
-
+# Seconds a socket session is kept in the presence store after its instance
+# last refreshed it, so the sessions of a crashed instance expire on their own
+WEBSOCKET_PRESENCE_TTL = os.environ.get("WEBSOCKET_PRESENCE_TTL", "60")
 try:
-    WEBSOCKET_REDIS_LOCK_TIMEOUT = int(websocket_redis_lock_timeout)
+    WEBSOCKET_PRESENCE_TTL = max(int(WEBSOCKET_PRESENCE_TTL), 3)
 except ValueError:
-    WEBSOCKET_REDIS_LOCK_TIMEOUT = 60
+    WEBSOCKET_PRESENCE_TTL = 60
 
 WEBSOCKET_SENTINEL_HOSTS = os.environ.get("WEBSOCKET_SENTINEL_HOSTS", "")
 WEBSOCKET_SENTINEL_PORT = os.environ.get("WEBSOCKET_SENTINEL_PORT", "26379")
@@ -672,6 +803,46 @@ AIOHTTP_CLIENT_SESSION_TOOL_SERVER_SSL = (
 )
 
 
+# Connection pool shared by the OpenAI/Ollama proxy routers, 0 means unlimited
+AIOHTTP_CLIENT_POOL_LIMIT = os.environ.get("AIOHTTP_CLIENT_POOL_LIMIT", "100")
+
+try:
+    AIOHTTP_CLIENT_POOL_LIMIT = int(AIOHTTP_CLIENT_POOL_LIMIT)
+except ValueError:
+    AIOHTTP_CLIENT_POOL_LIMIT = 100
+
+AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = os.environ.get(
+    "AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST", "0"
+)
+
+try:
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = int(AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST)
+except ValueError:
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = 0
+
+AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = os.environ.get(
+    "AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT", "30"
+)
+
+try:
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = float(AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT)
+except ValueError:
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = 30.0
+
+AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = os.environ.get(
+    "AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL", "300"
+)
+
+if AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL == "":
+    # Cache DNS lookups for the lifetime of the pool
+    AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = None
+else:
+    try:
+        AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = int(AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL)
+    except ValueError:
+        AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = 300
+
+
 ####################################
 # SENTENCE TRANSFORMERS
 ####################################
@@ -31,6 +31,7 @@ from backend.models.functions import Functions
 from backend.models.models import Models
 
 from backend.utils.plugin import (
+    FUNCTION_MODULE_CACHE,
     load_function_module_by_id,
     get_function_module_from_cache,
 )
@@ -60,20 +61,7 @@ log.setLevel(SRC_LOG_LEVELS["MAIN"])
 def get_function_module_by_id(request: Request, pipe_id: str):
     function_module, _, _ = get_function_module_from_cache(request, pipe_id)
 
-    if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-        Valves = function_module.Valves
-        valves = Functions.get_function_valves_by_id(pipe_id)
-
-        if valves:
-            try:
-                function_module.valves = Valves(
-                    **{k: v for k, v in valves.items() if v is not None}
-                )
-            except Exception as e:
-                log.exception(f"Error loading valves for function {pipe_id}: {e}")
-                raise e
-        else:
-            function_module.valves = Valves()
+    FUNCTION_MODULE_CACHE.apply_valves(pipe_id, function_module)
 
     return function_module
 
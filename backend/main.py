@@ -62,7 +62,8 @@ from backend.utils.audit import AuditLevel, AuditLoggingMiddleware
 from backend.utils.logger import start_logger
 from backend.socket.main import (
     app as socket_app,
-    periodic_usage_pool_cleanup,
+    periodic_presence_refresh,
+    periodic_message_write_buffer_flush,
     get_event_emitter,
     get_models_in_use,
     get_active_user_ids,
@@ -111,6 +112,7 @@ from backend.models.functions import Functions
 from backend.models.models import Models
 from backend.models.users import UserModel, Users
 from backend.models.chats import Chats
+from backend.models.groups import GROUP_MEMBERSHIP_CACHE
 
 from backend.config import (
     # Ollama
@@ -407,6 +409,7 @@ from backend.config import (
     TASK_MODEL_EXTERNAL,
     ENABLE_TAGS_GENERATION,
     ENABLE_TITLE_GENERATION,
+    ENABLE_COMBINED_TASK_GENERATION,
     ENABLE_FOLLOW_UP_GENERATION,
     ENABLE_SEARCH_QUERY_GENERATION,
     ENABLE_RETRIEVAL_QUERY_GENERATION,
@@ -414,6 +417,7 @@ from backend.config import (
     TITLE_GENERATION_PROMPT_TEMPLATE,
     FOLLOW_UP_GENERATION_PROMPT_TEMPLATE,
     TAGS_GENERATION_PROMPT_TEMPLATE,
+    COMBINED_TASK_GENERATION_PROMPT_TEMPLATE,
     IMAGE_PROMPT_GENERATION_PROMPT_TEMPLATE,
     TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE,
     QUERY_GENERATION_PROMPT_TEMPLATE,
@@ -484,7 +488,11 @@ from backend.utils.auth import (
     get_admin_user,
     get_verified_user,
 )
-from backend.utils.plugin import install_tool_and_function_dependencies
+from backend.utils.file_status import FILE_STATUS_NOTIFIER
+from backend.utils.plugin import (
+    FUNCTION_MODULE_CACHE,
+    install_tool_and_function_dependencies,
+)
 from backend.utils.oauth import (
     OAuthManager,
     OAuthClientManager,
@@ -493,6 +501,11 @@ from backend.utils.oauth import (
 )
 from backend.utils.security_headers import SecurityHeadersMiddleware
 from backend.utils.redis import get_redis_connection
+from backend.utils.session_pool import get_session_pool, close_session_pool
+from backend.utils.model_list_cache import periodic_model_list_refresh
+from backend.retrieval.executor import RETRIEVAL_EXECUTOR
+from backend.retrieval.ingestion import INGESTION_QUEUE
+from backend.retrieval.splitter import DOCUMENT_SPLITTER
 
 from backend.tasks import (
     redis_task_command_listener,
@@ -704,7 +717,19 @@ async def lifespan(app: FastAPI):
         limiter = anyio.to_thread.current_default_thread_limiter()
         limiter.total_tokens = THREAD_POOL_SIZE
 
-    asyncio.create_task(periodic_usage_pool_cleanup())
+    # Upstream connections of the OpenAI/Ollama routers are reused across requests
+    app.state.client_session_pool = get_session_pool()
+
+    app.state.presence_refresher = asyncio.create_task(periodic_presence_refresh())
+    app.state.message_write_buffer_flusher = asyncio.create_task(
+        periodic_message_write_buffer_flush()
+    )
+    app.state.model_list_refresher = asyncio.create_task(
+        periodic_model_list_refresh([openai.MODEL_LIST_CACHE, ollama.MODEL_LIST_CACHE])
+    )
+
+    # Runs the file and knowledge processing jobs of every instance
+    INGESTION_QUEUE.start(app)
 
     if app.state.config.ENABLE_BASE_MODELS_CACHE:
         await get_all_models(
@@ -732,6 +757,25 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, "redis_task_command_listener"):
         app.state.redis_task_command_listener.cancel()
 
+    if hasattr(app.state, "model_list_refresher"):
+        app.state.model_list_refresher.cancel()
+
+    if hasattr(app.state, "presence_refresher"):
+        app.state.presence_refresher.cancel()
+
+    if hasattr(app.state, "message_write_buffer_flusher"):
+        # Cancelling the flusher writes any buffered message updates
+        app.state.message_write_buffer_flusher.cancel()
+        try:
+            await app.state.message_write_buffer_flusher
+        except asyncio.CancelledError:
+            pass
+
+    INGESTION_QUEUE.stop()
+    RETRIEVAL_EXECUTOR.shutdown()
+    DOCUMENT_SPLITTER.shutdown()
+    await close_session_pool()
+
 app = FastAPI(
     title="J.A.R.V.I.S. AI Server",
     docs_url="/docs" if ENV == "dev" else None,
@@ -760,6 +804,20 @@ app.state.config = AppConfig(
 )
 app.state.redis = None
 
+FUNCTION_MODULE_CACHE.connect(
+    redis_url=REDIS_URL,
+    redis_sentinels=get_sentinels_from_env(REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT),
+    redis_cluster=REDIS_CLUSTER,
+    redis_key_prefix=REDIS_KEY_PREFIX,
+)
+
+FILE_STATUS_NOTIFIER.connect(
+    redis_url=REDIS_URL,
+    redis_sentinels=get_sentinels_from_env(REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT),
+    redis_cluster=REDIS_CLUSTER,
+    redis_key_prefix=REDIS_KEY_PREFIX,
+)
+
 app.state.WEBUI_NAME = WEBUI_NAME
 app.state.LICENSE_METADATA = None
 
@@ -923,8 +981,7 @@ app.state.USER_COUNT = None
 app.state.TOOLS = {}
 app.state.TOOL_CONTENTS = {}
 
-app.state.FUNCTIONS = {}
-app.state.FUNCTION_CONTENTS = {}
+app.state.FUNCTIONS = FUNCTION_MODULE_CACHE.modules
 
 ########################################
 #
@@ -1275,6 +1332,7 @@ app.state.config.ENABLE_AUTOCOMPLETE_GENERATION = ENABLE_AUTOCOMPLETE_GENERATION
 app.state.config.ENABLE_TAGS_GENERATION = ENABLE_TAGS_GENERATION
 app.state.config.ENABLE_TITLE_GENERATION = ENABLE_TITLE_GENERATION
 app.state.config.ENABLE_FOLLOW_UP_GENERATION = ENABLE_FOLLOW_UP_GENERATION
+app.state.config.ENABLE_COMBINED_TASK_GENERATION = ENABLE_COMBINED_TASK_GENERATION
 
 
 app.state.config.TITLE_GENERATION_PROMPT_TEMPLATE = TITLE_GENERATION_PROMPT_TEMPLATE
@@ -1285,6 +1343,9 @@ app.state.config.IMAGE_PROMPT_GENERATION_PROMPT_TEMPLATE = (
 app.state.config.FOLLOW_UP_GENERATION_PROMPT_TEMPLATE = (
     FOLLOW_UP_GENERATION_PROMPT_TEMPLATE
 )
+app.state.config.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE = (
+    COMBINED_TASK_GENERATION_PROMPT_TEMPLATE
+)
 
 app.state.config.TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE = (
     TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE
@@ -1386,6 +1447,13 @@ async def check_url(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def group_membership_request_scope(request: Request, call_next):
+    # Resolve each user's groups and permissions at most once per request
+    with GROUP_MEMBERSHIP_CACHE.scope():
+        return await call_next(request)
+
+
 @app.middleware("http")
 async def inspect_websocket(request: Request, call_next):
     # Completely bypass all middleware processing for WebSocket paths
@@ -1535,10 +1603,11 @@ async def get_models(
             tags = [tag.get("name") for tag in model.get("tags", [])]
 
             tags = list(set(model_tags + tags))
-            model["tags"] = [{"name": tag} for tag in tags]
+            # Copied, the catalog's models are shared between requests
+            model = {**model, "tags": [{"name": tag} for tag in tags]}
         except Exception as e:
             log.debug(f"Error processing model tags: {e}")
-            model["tags"] = []
+            model = {**model, "tags": []}
             pass
 
         models.append(model)
@@ -2095,7 +2164,10 @@ async def get_current_usage(user=Depends(get_verified_user)):
     This is an experimental endpoint and subject to change.
     """
     try:
-        return {"model_ids": get_models_in_use(), "user_ids": get_active_user_ids()}
+        return {
+            "model_ids": await get_models_in_use(),
+            "user_ids": await get_active_user_ids(),
+        }
     except Exception as e:
         log.error(f"Error getting usage statistics: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -0,0 +1,195 @@
+"""Add chat_search table
+
+Revision ID: a9d4e2b7c1f8
+Revises: f2c7d8a1b5e6
+Create Date: 2025-11-21 14:27:35.902416
+
+"""
+
+from typing import Sequence, Union
+import time
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, select
+
+from backend.migrations.util import get_existing_tables
+
+# revision identifiers, used by Alembic.
+revision: str = "a9d4e2b7c1f8"
+down_revision: Union[str, None] = "f2c7d8a1b5e6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+MAX_CONTENT_LENGTH = 100_000
+
+chat_table = table(
+    "chat",
+    sa.Column("id", sa.String()),
+    sa.Column("user_id", sa.String()),
+    sa.Column("title", sa.Text()),
+)
+
+chat_message_table = table(
+    "chat_message",
+    sa.Column("id", sa.Text()),
+    sa.Column("chat_id", sa.Text()),
+    sa.Column("data", sa.JSON()),
+)
+
+chat_search_table = table(
+    "chat_search",
+    sa.Column("chat_id", sa.Text()),
+    sa.Column("message_id", sa.Text()),
+    sa.Column("title", sa.Text()),
+    sa.Column("content", sa.Text()),
+    sa.Column("updated_at", sa.BigInteger()),
+)
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE chat_search_fts USING fts5(
+        title, content,
+        content='chat_search', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Titles weigh ten times the message content
+    "INSERT INTO chat_search_fts(chat_search_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER chat_search_ai AFTER INSERT ON chat_search BEGIN
+        INSERT INTO chat_search_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_ad AFTER DELETE ON chat_search BEGIN
+        INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_au AFTER UPDATE ON chat_search BEGIN
+        INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO chat_search_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+POSTGRESQL_STATEMENTS = [
+    """
+    ALTER TABLE chat_search ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX chat_search_search_vector_idx ON chat_search USING GIN (search_vector)",
+]
+
+
+def get_message_text(message) -> str:
+    content = (message or {}).get("content")
+    if isinstance(content, list):
+        content = " ".join(
+            item["text"]
+            for item in content
+            if isinstance(item, dict) and isinstance(item.get("text"), str)
+        )
+    if not isinstance(content, str):
+        return ""
+
+    return content.replace("\x00", "")[:MAX_CONTENT_LENGTH]
+
+
+def upgrade() -> None:
+    if "chat_search" in get_existing_tables():
+        return
+
+    op.create_table(
+        "chat_search",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("chat_id", sa.Text(), nullable=False),
+        sa.Column("message_id", sa.Text(), nullable=False),
+        sa.Column("title", sa.Text(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+    )
+    op.create_index(
+        "chat_search_chat_id_message_id_idx",
+        "chat_search",
+        ["chat_id", "message_id"],
+        unique=True,
+    )
+
+    connection = op.get_bind()
+    dialect_name = connection.dialect.name
+    if dialect_name == "sqlite":
+        statements = SQLITE_STATEMENTS
+    elif dialect_name == "postgresql":
+        statements = POSTGRESQL_STATEMENTS
+    else:
+        statements = []
+
+    for statement in statements:
+        op.execute(statement)
+
+    # Backfill: index the titles and messages of every chat, shared copies
+    # are never searched
+    chats = connection.execute(
+        select(chat_table.c.id, chat_table.c.title).where(
+            sa.not_(chat_table.c.user_id.like("shared-%"))
+        )
+    ).fetchall()
+
+    now = int(time.time())
+    for idx in range(0, len(chats), BATCH_SIZE):
+        batch = chats[idx : idx + BATCH_SIZE]
+
+        rows = [
+            {
+                "chat_id": chat.id,
+                "message_id": "",
+                "title": chat.title.replace("\x00", ""),
+                "content": None,
+                "updated_at": now,
+            }
+            for chat in batch
+            if chat.title
+        ]
+
+        for message in connection.execute(
+            select(
+                chat_message_table.c.chat_id,
+                chat_message_table.c.id,
+                chat_message_table.c.data,
+            ).where(chat_message_table.c.chat_id.in_([chat.id for chat in batch]))
+        ).fetchall():
+            content = get_message_text(message.data)
+            if content:
+                rows.append(
+                    {
+                        "chat_id": message.chat_id,
+                        "message_id": message.id,
+                        "title": None,
+                        "content": content,
+                        "updated_at": now,
+                    }
+                )
+
+        if rows:
+            connection.execute(sa.insert(chat_search_table), rows)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS chat_search_au")
+        op.execute("DROP TRIGGER IF EXISTS chat_search_ad")
+        op.execute("DROP TRIGGER IF EXISTS chat_search_ai")
+        op.execute("DROP TABLE IF EXISTS chat_search_fts")
+
+    op.drop_index("chat_search_chat_id_message_id_idx", table_name="chat_search")
+    op.drop_table("chat_search")
@@ -0,0 +1,144 @@
+"""Add chat_message table
+
+Revision ID: b2f6c3d9e1a4
+Revises: 745007046e7b
+Create Date: 2025-11-10 10:12:41.518203
+
+"""
+
+from typing import Sequence, Union
+import time
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, select
+
+from backend.migrations.util import get_existing_tables
+
+# revision identifiers, used by Alembic.
+revision: str = "b2f6c3d9e1a4"
+down_revision: Union[str, None] = "745007046e7b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+chat_table = table(
+    "chat",
+    sa.Column("id", sa.String()),
+    sa.Column("chat", sa.JSON()),
+)
+
+chat_message_table = table(
+    "chat_message",
+    sa.Column("id", sa.Text()),
+    sa.Column("chat_id", sa.Text()),
+    sa.Column("parent_id", sa.Text()),
+    sa.Column("data", sa.JSON()),
+    sa.Column("created_at", sa.BigInteger()),
+    sa.Column("updated_at", sa.BigInteger()),
+)
+
+
+def upgrade() -> None:
+    if "chat_message" not in get_existing_tables():
+        op.create_table(
+            "chat_message",
+            sa.Column("id", sa.Text(), nullable=False),
+            sa.Column("chat_id", sa.Text(), nullable=False),
+            sa.Column("parent_id", sa.Text(), nullable=True),
+            sa.Column("data", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.BigInteger(), nullable=True),
+            sa.Column("updated_at", sa.BigInteger(), nullable=True),
+            sa.PrimaryKeyConstraint("chat_id", "id"),
+        )
+        op.create_index("chat_message_chat_id_idx", "chat_message", ["chat_id"])
+
+    # Backfill: move `history.messages` of every chat into chat_message rows
+    connection = op.get_bind()
+    chat_ids = [
+        row.id for row in connection.execute(select(chat_table.c.id)).fetchall()
+    ]
+
+    now = int(time.time())
+    for idx in range(0, len(chat_ids), BATCH_SIZE):
+        batch_ids = chat_ids[idx : idx + BATCH_SIZE]
+        results = connection.execute(
+            select(chat_table.c.id, chat_table.c.chat).where(
+                chat_table.c.id.in_(batch_ids)
+            )
+        ).fetchall()
+
+        for row in results:
+            chat = row.chat
+            if not isinstance(chat, dict):
+                continue
+
+            history = chat.get("history")
+            if not isinstance(history, dict) or not isinstance(
+                history.get("messages"), dict
+            ):
+                continue
+
+            messages = history.pop("messages")
+            if messages:
+                connection.execute(
+                    sa.insert(chat_message_table),
+                    [
+                        {
+                            "id": message_id,
+                            "chat_id": row.id,
+                            "parent_id": (message or {}).get("parentId"),
+                            "data": message or {},
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for message_id, message in messages.items()
+                    ],
+                )
+
+            connection.execute(
+                sa.update(chat_table)
+                .where(chat_table.c.id == row.id)
+                .values(chat={**chat, "history": history})
+            )
+
+
+def downgrade() -> None:
+    # Fold the chat_message rows back into `history.messages`
+    connection = op.get_bind()
+    chat_ids = [
+        row.chat_id
+        for row in connection.execute(
+            select(chat_message_table.c.chat_id).distinct()
+        ).fetchall()
+    ]
+
+    for chat_id in chat_ids:
+        messages = {
+            row.id: row.data or {}
+            for row in connection.execute(
+                select(chat_message_table.c.id, chat_message_table.c.data).where(
+                    chat_message_table.c.chat_id == chat_id
+                )
+            ).fetchall()
+        }
+
+        chat_row = connection.execute(
+            select(chat_table.c.chat).where(chat_table.c.id == chat_id)
+        ).first()
+        if chat_row is None or not isinstance(chat_row.chat, dict):
+            continue
+
+        chat = chat_row.chat
+        history = chat.get("history") or {}
+        history["messages"] = {**(history.get("messages") or {}), **messages}
+
+        connection.execute(
+            sa.update(chat_table)
+            .where(chat_table.c.id == chat_id)
+            .values(chat={**chat, "history": history})
+        )
+
+    op.drop_index("chat_message_chat_id_idx", table_name="chat_message")
+    op.drop_table("chat_message")
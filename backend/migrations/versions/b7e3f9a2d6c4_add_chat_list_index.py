@@ -0,0 +1,34 @@
+"""Add chat list index
+
+Revision ID: b7e3f9a2d6c4
+Revises: a9d4e2b7c1f8
+Create Date: 2025-11-24 10:52:18.374190
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3f9a2d6c4"
+down_revision: Union[str, None] = "a9d4e2b7c1f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pagination of the chat lists: the pages of a user are read in
+    # index order, without sorting all of their chats
+    existing_indexes = {
+        index["name"] for index in sa.inspect(op.get_bind()).get_indexes("chat")
+    }
+    if "user_id_updated_at_id_idx" not in existing_indexes:
+        op.create_index(
+            "user_id_updated_at_id_idx", "chat", ["user_id", "updated_at", "id"]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("user_id_updated_at_id_idx", table_name="chat")
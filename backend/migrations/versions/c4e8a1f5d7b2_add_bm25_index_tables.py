@@ -0,0 +1,68 @@
+"""Add BM25 index tables
+
+Revision ID: c4e8a1f5d7b2
+Revises: b2f6c3d9e1a4
+Create Date: 2025-11-12 09:41:07.208113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend.migrations.util import get_existing_tables
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e8a1f5d7b2"
+down_revision: Union[str, None] = "b2f6c3d9e1a4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The indexes are built lazily from the vector DB on first use
+    existing_tables = get_existing_tables()
+
+    if "bm25_collection" not in existing_tables:
+        op.create_table(
+            "bm25_collection",
+            sa.Column("name", sa.Text(), nullable=False, primary_key=True),
+            sa.Column("document_count", sa.BigInteger(), nullable=False),
+            sa.Column("total_length", sa.BigInteger(), nullable=False),
+            sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        )
+
+    if "bm25_document" not in existing_tables:
+        op.create_table(
+            "bm25_document",
+            sa.Column("collection_name", sa.Text(), nullable=False),
+            sa.Column("id", sa.Text(), nullable=False),
+            sa.Column("text", sa.Text(), nullable=True),
+            sa.Column("metadata", sa.JSON(), nullable=True),
+            sa.Column("length", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("collection_name", "id"),
+        )
+
+    if "bm25_posting" not in existing_tables:
+        op.create_table(
+            "bm25_posting",
+            sa.Column("collection_name", sa.Text(), nullable=False),
+            sa.Column("term", sa.Text(), nullable=False),
+            sa.Column("document_id", sa.Text(), nullable=False),
+            sa.Column("tf", sa.Integer(), nullable=False),
+            sa.Column("document_length", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("collection_name", "term", "document_id"),
+        )
+        op.create_index(
+            "bm25_posting_document_idx",
+            "bm25_posting",
+            ["collection_name", "document_id"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("bm25_posting_document_idx", table_name="bm25_posting")
+    op.drop_table("bm25_posting")
+    op.drop_table("bm25_document")
+    op.drop_table("bm25_collection")
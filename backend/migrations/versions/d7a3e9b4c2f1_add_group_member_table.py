@@ -0,0 +1,71 @@
+"""Add group member table
+
+Revision ID: d7a3e9b4c2f1
+Revises: c4e8a1f5d7b2
+Create Date: 2025-11-14 10:12:43.518204
+
+"""
+
+import json
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, column, select
+
+from backend.migrations.util import get_existing_tables
+
+# revision identifiers, used by Alembic.
+revision: str = "d7a3e9b4c2f1"
+down_revision: Union[str, None] = "c4e8a1f5d7b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing_tables = get_existing_tables()
+
+    if "group_member" in existing_tables:
+        return
+
+    group_member_table = op.create_table(
+        "group_member",
+        sa.Column("group_id", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("group_id", "user_id"),
+    )
+    op.create_index("group_member_user_id_idx", "group_member", ["user_id"])
+
+    # Backfill from the user_ids JSON column, which stays the source for reads
+    # of a group's member list
+    group_table = table(
+        "group",
+        column("id", sa.Text()),
+        column("user_ids", sa.JSON()),
+    )
+
+    now = int(time.time())
+    rows = []
+    for group in op.get_bind().execute(
+        select(group_table.c.id, group_table.c.user_ids)
+    ):
+        user_ids = group.user_ids
+        if isinstance(user_ids, str):
+            user_ids = json.loads(user_ids)
+        if not isinstance(user_ids, list):
+            continue
+
+        rows.extend(
+            {"group_id": group.id, "user_id": user_id, "created_at": now}
+            for user_id in dict.fromkeys(user_ids)
+        )
+
+    if rows:
+        op.bulk_insert(group_member_table, rows)
+
+
+def downgrade() -> None:
+    op.drop_index("group_member_user_id_idx", table_name="group_member")
+    op.drop_table("group_member")
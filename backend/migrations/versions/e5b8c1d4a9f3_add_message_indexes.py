@@ -0,0 +1,51 @@
+"""Add message indexes
+
+Revision ID: e5b8c1d4a9f3
+Revises: d7a3e9b4c2f1
+Create Date: 2025-11-17 15:27:09.840362
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b8c1d4a9f3"
+down_revision: Union[str, None] = "d7a3e9b4c2f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "message": {
+        "message_channel_id_parent_id_created_at_idx": [
+            "channel_id",
+            "parent_id",
+            "created_at",
+            "id",
+        ],
+        "message_parent_id_idx": ["parent_id"],
+    },
+    "message_reaction": {
+        "message_reaction_message_id_idx": ["message_id"],
+    },
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for table_name, indexes in INDEXES.items():
+        existing_indexes = {
+            index["name"] for index in inspector.get_indexes(table_name)
+        }
+        for index_name, columns in indexes.items():
+            if index_name not in existing_indexes:
+                op.create_index(index_name, table_name, columns)
+
+
+def downgrade() -> None:
+    for table_name, indexes in INDEXES.items():
+        for index_name in indexes:
+            op.drop_index(index_name, table_name=table_name)
@@ -0,0 +1,60 @@
+"""Add ingestion job table
+
+Revision ID: f2c7d8a1b5e6
+Revises: e5b8c1d4a9f3
+Create Date: 2025-11-19 11:03:52.615027
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend.migrations.util import get_existing_tables
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c7d8a1b5e6"
+down_revision: Union[str, None] = "e5b8c1d4a9f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing_tables = get_existing_tables()
+
+    if "ingestion_job" in existing_tables:
+        return
+
+    op.create_table(
+        "ingestion_job",
+        sa.Column("id", sa.Text(), nullable=False, primary_key=True),
+        sa.Column("user_id", sa.Text(), nullable=False),
+        sa.Column("type", sa.Text(), nullable=False),
+        sa.Column("key", sa.Text(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("status", sa.Text(), nullable=False),
+        sa.Column("progress", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.BigInteger(), nullable=False),
+        sa.Column("worker_id", sa.Text(), nullable=True),
+        sa.Column("heartbeat_at", sa.BigInteger(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+    )
+    op.create_index(
+        "ingestion_job_status_run_at_idx", "ingestion_job", ["status", "run_at"]
+    )
+    op.create_index(
+        "ingestion_job_user_id_status_idx", "ingestion_job", ["user_id", "status"]
+    )
+    op.create_index("ingestion_job_key_idx", "ingestion_job", ["key"])
+
+
+def downgrade() -> None:
+    op.drop_index("ingestion_job_key_idx", table_name="ingestion_job")
+    op.drop_index("ingestion_job_user_id_status_idx", table_name="ingestion_job")
+    op.drop_index("ingestion_job_status_run_at_idx", table_name="ingestion_job")
+    op.drop_table("ingestion_job")
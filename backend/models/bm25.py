@@ -0,0 +1,399 @@
+import heapq
+import logging
+import math
+import re
+import time
+from collections import Counter
+from typing import Optional
+
+from backend.internal.db import Base, get_db
+from backend.env import SRC_LOG_LEVELS
+
+from pydantic import BaseModel
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    Text,
+    JSON,
+    Index,
+    PrimaryKeyConstraint,
+    func,
+)
+
+####################
+# BM25 Index DB Schema
+####################
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Okapi BM25 parameters, same as the defaults of rank_bm25 used by langchain
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Longer tokens (hashes, base64 blobs, ...) are never searched for and would
+# bloat the term index
+MAX_TERM_LENGTH = 64
+
+# Postings read per query term. Longer lists (terms in most documents, which
+# barely affect the ranking) only contribute their highest term frequencies
+MAX_TERM_POSTINGS = 10000
+
+_BATCH_SIZE = 500
+
+
+class BM25Collection(Base):
+    """Corpus statistics of the BM25 index of one vector DB collection."""
+
+    __tablename__ = "bm25_collection"
+
+    name = Column(Text, primary_key=True)
+    document_count = Column(BigInteger, nullable=False, default=0)
+    total_length = Column(BigInteger, nullable=False, default=0)
+
+    updated_at = Column(BigInteger)
+
+
+class BM25Document(Base):
+    __tablename__ = "bm25_document"
+
+    collection_name = Column(Text, nullable=False)
+    id = Column(Text, nullable=False)
+
+    text = Column(Text)
+    meta = Column("metadata", JSON)
+    length = Column(Integer, nullable=False)
+
+    __table_args__ = (PrimaryKeyConstraint("collection_name", "id"),)
+
+
+class BM25Posting(Base):
+    __tablename__ = "bm25_posting"
+
+    collection_name = Column(Text, nullable=False)
+    term = Column(Text, nullable=False)
+    document_id = Column(Text, nullable=False)
+
+    tf = Column(Integer, nullable=False)
+    # Denormalized so scoring never has to join bm25_document
+    document_length = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # WHERE collection_name = ... AND term IN (...)
+        PrimaryKeyConstraint("collection_name", "term", "document_id"),
+        Index("bm25_posting_document_idx", "collection_name", "document_id"),
+    )
+
+
+class BM25SearchResult(BaseModel):
+    id: str
+    text: str
+    metadata: dict = {}
+    score: float
+
+
+####################
+# Helpers
+####################
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    return [
+        token
+        for token in re.findall(r"\w+", (text or "").lower())
+        if len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def _chunks(items: list, size: int = _BATCH_SIZE):
+    for idx in range(0, len(items), size):
+        yield items[idx : idx + size]
+
+
+class BM25IndexTable:
+    """
+    Incrementally maintained BM25 index per vector DB collection.
+
+    Documents are added and removed alongside the vector DB writes, so a
+    hybrid search only reads the postings of the query terms instead of
+    rebuilding a BM25 retriever from the whole collection on every query.
+    """
+
+    def has_collection(self, collection_name: str) -> bool:
+        with get_db() as db:
+            return db.get(BM25Collection, collection_name) is not None
+
+    def _delete_documents(self, db, collection_name: str, ids: list[str]):
+        for batch in _chunks(list(dict.fromkeys(ids))):
+            rows = (
+                db.query(BM25Document.length)
+                .filter(
+                    BM25Document.collection_name == collection_name,
+                    BM25Document.id.in_(batch),
+                )
+                .all()
+            )
+            if not rows:
+                continue
+
+            db.query(BM25Posting).filter(
+                BM25Posting.collection_name == collection_name,
+                BM25Posting.document_id.in_(batch),
+            ).delete(synchronize_session=False)
+            db.query(BM25Document).filter(
+                BM25Document.collection_name == collection_name,
+                BM25Document.id.in_(batch),
+            ).delete(synchronize_session=False)
+
+            db.query(BM25Collection).filter_by(name=collection_name).update(
+                {
+                    BM25Collection.document_count: BM25Collection.document_count
+                    - len(rows),
+                    BM25Collection.total_length: BM25Collection.total_length
+                    - sum(row.length for row in rows),
+                },
+                synchronize_session=False,
+            )
+
+    def add_documents(self, collection_name: str, documents: list[dict]) -> bool:
+        """
+        Index `documents` ({"id", "text", "metadata"}) into the collection,
+        replacing documents with the same id.
+        """
+        try:
+            with get_db() as db:
+                if db.get(BM25Collection, collection_name) is None:
+                    db.add(
+                        BM25Collection(
+                            name=collection_name,
+                            document_count=0,
+                            total_length=0,
+                            updated_at=int(time.time()),
+                        )
+                    )
+                    db.flush()
+
+                self._delete_documents(
+                    db, collection_name, [document["id"] for document in documents]
+                )
+
+                documents = list(
+                    {document["id"]: document for document in documents}.values()
+                )
+                total_length = 0
+                for batch in _chunks(documents):
+                    document_rows, posting_rows = [], []
+                    for document in batch:
+                        text = (document.get("text") or "").replace("\x00", "")
+                        tokens = tokenize(text)
+                        total_length += len(tokens)
+
+                        document_rows.append(
+                            {
+                                "collection_name": collection_name,
+                                "id": document["id"],
+                                "text": text,
+                                "meta": document.get("metadata") or {},
+                                "length": len(tokens),
+                            }
+                        )
+                        posting_rows.extend(
+                            {
+                                "collection_name": collection_name,
+                                "term": term,
+                                "document_id": document["id"],
+                                "tf": tf,
+                                "document_length": len(tokens),
+                            }
+                            for term, tf in Counter(tokens).items()
+                        )
+
+                    db.bulk_insert_mappings(BM25Document, document_rows)
+                    if posting_rows:
+                        db.bulk_insert_mappings(BM25Posting, posting_rows)
+
+                db.query(BM25Collection).filter_by(name=collection_name).update(
+                    {
+                        BM25Collection.document_count: BM25Collection.document_count
+                        + len(documents),
+                        BM25Collection.total_length: BM25Collection.total_length
+                        + total_length,
+                        BM25Collection.updated_at: int(time.time()),
+                    },
+                    synchronize_session=False,
+                )
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error indexing documents of {collection_name}: {e}")
+            return False
+
+    def delete_documents(self, collection_name: str, ids: list[str]) -> bool:
+        try:
+            with get_db() as db:
+                self._delete_documents(db, collection_name, ids)
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error deleting documents of {collection_name}: {e}")
+            return False
+
+    def delete_documents_by_filter(self, collection_name: str, filter: dict) -> bool:
+        """Remove the documents whose metadata matches every key of `filter`"""
+        conditions = []
+        for key, value in filter.items():
+            # bool first, it is also an int
+            if isinstance(value, bool):
+                conditions.append(BM25Document.meta[key].as_boolean() == value)
+            elif isinstance(value, int):
+                conditions.append(BM25Document.meta[key].as_integer() == value)
+            elif isinstance(value, float):
+                conditions.append(BM25Document.meta[key].as_float() == value)
+            elif isinstance(value, str):
+                conditions.append(BM25Document.meta[key].as_string() == value)
+            else:
+                # Operator and other filters are not evaluated here, rebuild
+                # the index lazily
+                return self.delete_collection(collection_name)
+
+        try:
+            with get_db() as db:
+                ids = [
+                    row.id
+                    for row in db.query(BM25Document.id).filter(
+                        BM25Document.collection_name == collection_name,
+                        *conditions,
+                    )
+                ]
+        except Exception as e:
+            log.exception(f"Error filtering documents of {collection_name}: {e}")
+            return False
+
+        return self.delete_documents(collection_name, ids)
+
+    def delete_collection(self, collection_name: str) -> bool:
+        try:
+            with get_db() as db:
+                db.query(BM25Posting).filter_by(
+                    collection_name=collection_name
+                ).delete()
+                db.query(BM25Document).filter_by(
+                    collection_name=collection_name
+                ).delete()
+                db.query(BM25Collection).filter_by(name=collection_name).delete()
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error deleting BM25 index of {collection_name}: {e}")
+            return False
+
+    def reset(self) -> bool:
+        try:
+            with get_db() as db:
+                db.query(BM25Posting).delete()
+                db.query(BM25Document).delete()
+                db.query(BM25Collection).delete()
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error resetting BM25 indexes: {e}")
+            return False
+
+    def search(
+        self, collection_name: str, query: str, k: int
+    ) -> list[BM25SearchResult]:
+        query_terms = Counter(tokenize(query))
+        if not query_terms:
+            return []
+
+        with get_db() as db:
+            collection = db.get(BM25Collection, collection_name)
+            if collection is None or not collection.document_count:
+                return []
+
+            document_count = collection.document_count
+            average_length = (collection.total_length / document_count) or 1
+
+            # Counted on the primary key index, without reading the postings
+            document_frequencies = dict(
+                db.query(BM25Posting.term, func.count())
+                .filter(
+                    BM25Posting.collection_name == collection_name,
+                    BM25Posting.term.in_(list(query_terms)),
+                )
+                .group_by(BM25Posting.term)
+                .all()
+            )
+
+            postings_query = db.query(
+                BM25Posting.term,
+                BM25Posting.document_id,
+                BM25Posting.tf,
+                BM25Posting.document_length,
+            ).filter(BM25Posting.collection_name == collection_name)
+
+            terms = [
+                term
+                for term, df in document_frequencies.items()
+                if df <= MAX_TERM_POSTINGS
+            ]
+            postings = (
+                postings_query.filter(BM25Posting.term.in_(terms)).all()
+                if terms
+                else []
+            )
+            for term, df in document_frequencies.items():
+                if df > MAX_TERM_POSTINGS:
+                    postings.extend(
+                        postings_query.filter(BM25Posting.term == term)
+                        .order_by(BM25Posting.tf.desc(), BM25Posting.document_length)
+                        .limit(MAX_TERM_POSTINGS)
+                        .all()
+                    )
+
+            idfs = {
+                term: math.log((document_count - df + 0.5) / (df + 0.5) + 1)
+                for term, df in document_frequencies.items()
+            }
+
+            scores = Counter()
+            for posting in postings:
+                norm = BM25_K1 * (
+                    1 - BM25_B + BM25_B * posting.document_length / average_length
+                )
+                scores[posting.document_id] += (
+                    query_terms[posting.term]
+                    * idfs[posting.term]
+                    * posting.tf
+                    * (BM25_K1 + 1)
+                    / (posting.tf + norm)
+                )
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            if not top:
+                return []
+
+            documents = {
+                document.id: document
+                for document in db.query(BM25Document)
+                .filter(
+                    BM25Document.collection_name == collection_name,
+                    BM25Document.id.in_([document_id for document_id, _ in top]),
+                )
+                .all()
+            }
+
+            return [
+                BM25SearchResult(
+                    id=document_id,
+                    text=documents[document_id].text or "",
+                    metadata=documents[document_id].meta or {},
+                    score=score,
+                )
+                for document_id, score in top
+                if document_id in documents
+            ]
+
+
+BM25Indexes = BM25IndexTable()
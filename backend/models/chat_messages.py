@@ -0,0 +1,267 @@
+import logging
+import time
+from typing import Optional
+
+from backend.internal.db import Base, get_db
+from backend.env import SRC_LOG_LEVELS
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, Text, JSON, Index, PrimaryKeyConstraint
+
+####################
+# ChatMessage DB Schema
+####################
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+class ChatMessage(Base):
+    """
+    One row per message of a chat's `history.messages` map.
+
+    The `chat` JSON column no longer carries `history.messages`; the messages
+    are stored here and materialized back into the chat document on read, so
+    streaming saves only touch the row of the message being written.
+    """
+
+    __tablename__ = "chat_message"
+
+    id = Column(Text, nullable=False)
+    chat_id = Column(Text, nullable=False)
+
+    parent_id = Column(Text, nullable=True)
+    data = Column(JSON)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("chat_id", "id"),
+        # WHERE chat_id = ...
+        Index("chat_message_chat_id_idx", "chat_id"),
+    )
+
+
+class ChatMessageModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    chat_id: str
+
+    parent_id: Optional[str] = None
+    data: dict = {}
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+
+####################
+# Helpers
+####################
+
+
+def sanitize_message(message: dict) -> dict:
+    # Null characters are rejected by PostgreSQL text/json columns
+    if isinstance(message.get("content"), str):
+        message["content"] = message["content"].replace("\x00", "")
+    return message
+
+
+def split_chat_history(chat: dict) -> tuple[dict, Optional[dict]]:
+    """
+    Split a chat document into the document stored in `chat.chat` and the
+    `history.messages` map stored in `chat_message`.
+
+    Returns `None` for the messages when the document does not carry a
+    `history.messages` map, meaning the stored messages must be left untouched.
+    """
+    history = chat.get("history")
+    if not isinstance(history, dict) or not isinstance(history.get("messages"), dict):
+        return chat, None
+
+    history = {**history}
+    messages = history.pop("messages")
+    return {**chat, "history": history}, messages
+
+
+def merge_chat_history(chat: Optional[dict], messages: dict) -> dict:
+    """
+    Materialize `history.messages` back into a stored chat document.
+
+    Messages still embedded in the document (rows written before the
+    `chat_message` table existed) are kept, with table rows taking precedence.
+    """
+    chat = {**(chat or {})}
+    history = chat.get("history")
+
+    if not isinstance(history, dict):
+        if not messages:
+            return chat
+        history = {}
+
+    embedded_messages = history.get("messages")
+    if isinstance(embedded_messages, dict):
+        messages = {**embedded_messages, **messages}
+    elif embedded_messages is not None and not messages:
+        return chat
+
+    chat["history"] = {**history, "messages": messages}
+    return chat
+
+
+class ChatMessageTable:
+    def get_messages_map_by_chat_id(self, chat_id: str) -> dict:
+        with get_db() as db:
+            rows = (
+                db.query(ChatMessage.id, ChatMessage.data)
+                .filter_by(chat_id=chat_id)
+                .all()
+            )
+            return {row.id: row.data or {} for row in rows}
+
+    def get_messages_maps_by_chat_ids(self, chat_ids: list[str]) -> dict[str, dict]:
+        if not chat_ids:
+            return {}
+
+        with get_db() as db:
+            rows = (
+                db.query(ChatMessage.chat_id, ChatMessage.id, ChatMessage.data)
+                .filter(ChatMessage.chat_id.in_(chat_ids))
+                .all()
+            )
+
+            messages_maps = {}
+            for row in rows:
+                messages_maps.setdefault(row.chat_id, {})[row.id] = row.data or {}
+            return messages_maps
+
+    def get_message_by_chat_id_and_message_id(
+        self, chat_id: str, message_id: str
+    ) -> Optional[dict]:
+        with get_db() as db:
+            row = db.get(ChatMessage, (chat_id, message_id))
+            return row.data if row else None
+
+    def upsert_message(
+        self, chat_id: str, message_id: str, message: dict
+    ) -> Optional[dict]:
+        try:
+            with get_db() as db:
+                message = sanitize_message(message)
+                now = int(time.time())
+
+                row = db.get(ChatMessage, (chat_id, message_id))
+                if row:
+                    row.data = {**(row.data or {}), **message}
+                    row.parent_id = row.data.get("parentId")
+                    row.updated_at = now
+                else:
+                    row = ChatMessage(
+                        id=message_id,
+                        chat_id=chat_id,
+                        parent_id=message.get("parentId"),
+                        data=message,
+                        created_at=now,
+                        updated_at=now,
+                    )
+                    db.add(row)
+
+                db.commit()
+                return row.data
+        except Exception as e:
+            log.exception(f"Error upserting message {message_id}: {e}")
+            return None
+
+    def add_message_status(
+        self, chat_id: str, message_id: str, status: dict
+    ) -> Optional[dict]:
+        try:
+            with get_db() as db:
+                row = db.get(ChatMessage, (chat_id, message_id))
+                if row is None:
+                    return None
+
+                data = {**(row.data or {})}
+                data["statusHistory"] = [*data.get("statusHistory", []), status]
+
+                row.data = data
+                row.updated_at = int(time.time())
+                db.commit()
+                return row.data
+        except Exception as e:
+            log.exception(f"Error adding status to message {message_id}: {e}")
+            return None
+
+    def replace_messages_by_chat_id(self, chat_id: str, messages: dict) -> bool:
+        """
+        Sync the rows of a chat with a full `history.messages` map, writing
+        only the messages that were added, changed or removed.
+        """
+        try:
+            with get_db() as db:
+                now = int(time.time())
+                rows = {
+                    row.id: row
+                    for row in db.query(ChatMessage).filter_by(chat_id=chat_id).all()
+                }
+
+                for message_id, message in messages.items():
+                    message = sanitize_message({**(message or {})})
+                    row = rows.pop(message_id, None)
+
+                    if row is None:
+                        db.add(
+                            ChatMessage(
+                                id=message_id,
+                                chat_id=chat_id,
+                                parent_id=message.get("parentId"),
+                                data=message,
+                                created_at=now,
+                                updated_at=now,
+                            )
+                        )
+                    elif row.data != message:
+                        row.data = message
+                        row.parent_id = message.get("parentId")
+                        row.updated_at = now
+
+                for row in rows.values():
+                    db.delete(row)
+
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error replacing messages of chat {chat_id}: {e}")
+            return False
+
+    def copy_messages_by_chat_id(self, chat_id: str, new_chat_id: str) -> bool:
+        return self.replace_messages_by_chat_id(
+            new_chat_id, self.get_messages_map_by_chat_id(chat_id)
+        )
+
+    def delete_messages_by_chat_id(self, chat_id: str) -> bool:
+        try:
+            with get_db() as db:
+                db.query(ChatMessage).filter_by(chat_id=chat_id).delete()
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+    def delete_messages_by_chat_ids(self, chat_ids: list[str]) -> bool:
+        if not chat_ids:
+            return True
+
+        try:
+            with get_db() as db:
+                db.query(ChatMessage).filter(ChatMessage.chat_id.in_(chat_ids)).delete(
+                    synchronize_session=False
+                )
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+
+ChatMessages = ChatMessageTable()
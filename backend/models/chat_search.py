@@ -0,0 +1,298 @@
+import logging
+import re
+import time
+from typing import Optional
+
+from backend.internal.db import Base, get_db
+from backend.env import SRC_LOG_LEVELS
+
+from sqlalchemy import BigInteger, Column, Float, Integer, Text, Index, text
+from sqlalchemy.sql.expression import bindparam
+
+####################
+# Chat Search Index DB Schema
+####################
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+# Longer message contents are truncated before being indexed, PostgreSQL
+# rejects tsvectors over 1MB
+MAX_CONTENT_LENGTH = 100_000
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+
+
+class ChatSearchEntry(Base):
+    """
+    One row per chat title (with an empty `message_id`) and per message of a
+    chat, indexed for full-text search.
+
+    The index itself depends on the dialect and is created by the migration:
+    an external content FTS5 table (`chat_search_fts`) kept in sync by
+    triggers on SQLite, a generated `search_vector` column with a GIN index on
+    PostgreSQL. Rows are written per message, so saving a message only
+    re-indexes that message.
+    """
+
+    __tablename__ = "chat_search"
+
+    # Integer so it is the rowid referenced by the FTS5 table on SQLite
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(Text, nullable=False)
+    message_id = Column(Text, nullable=False)
+
+    title = Column(Text, nullable=True)
+    content = Column(Text, nullable=True)
+
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (
+        # WHERE chat_id = ... AND message_id = ...
+        Index(
+            "chat_search_chat_id_message_id_idx",
+            "chat_id",
+            "message_id",
+            unique=True,
+        ),
+    )
+
+
+####################
+# Helpers
+####################
+
+
+def get_search_terms(search_text: str) -> list[str]:
+    # Both the FTS5 unicode61 tokenizer and the "simple" text search
+    # configuration split words on anything but letters and digits
+    return re.findall(r"[^\W_]+", search_text.lower())
+
+
+def get_match_query(terms: list[str], dialect_name: str) -> str:
+    """All terms have to match, the last word of each term as a prefix."""
+    if dialect_name == "sqlite":
+        return " ".join(f'"{term}"*' for term in terms)
+    elif dialect_name == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    else:
+        raise NotImplementedError(f"Unsupported dialect: {dialect_name}")
+
+
+def get_message_text(message: Optional[dict]) -> str:
+    content = (message or {}).get("content")
+    if isinstance(content, list):
+        content = " ".join(
+            item["text"]
+            for item in content
+            if isinstance(item, dict) and isinstance(item.get("text"), str)
+        )
+    if not isinstance(content, str):
+        return ""
+
+    return content.replace("\x00", "")[:MAX_CONTENT_LENGTH]
+
+
+class ChatSearchTable:
+    def _get_entries(
+        self, title: Optional[str], messages: Optional[dict]
+    ) -> dict[str, tuple[Optional[str], Optional[str]]]:
+        entries = {}
+        if title:
+            entries[""] = (title.replace("\x00", ""), None)
+        for message_id, message in (messages or {}).items():
+            content = get_message_text(message)
+            if content:
+                entries[message_id] = (None, content)
+        return entries
+
+    def index_chat(
+        self, chat_id: str, title: Optional[str], messages: Optional[dict] = None
+    ) -> bool:
+        """
+        Sync the index of a chat with its title and, unless `messages` is
+        None, its full `history.messages` map, writing only the entries that
+        were added, changed or removed.
+        """
+        try:
+            with get_db() as db:
+                now = int(time.time())
+                entries = self._get_entries(title, messages)
+
+                query = db.query(ChatSearchEntry).filter_by(chat_id=chat_id)
+                if messages is None:
+                    query = query.filter_by(message_id="")
+                rows = {row.message_id: row for row in query.all()}
+
+                for message_id, (entry_title, content) in entries.items():
+                    row = rows.pop(message_id, None)
+                    if row is None:
+                        db.add(
+                            ChatSearchEntry(
+                                chat_id=chat_id,
+                                message_id=message_id,
+                                title=entry_title,
+                                content=content,
+                                updated_at=now,
+                            )
+                        )
+                    elif row.title != entry_title or row.content != content:
+                        row.title = entry_title
+                        row.content = content
+                        row.updated_at = now
+
+                for row in rows.values():
+                    db.delete(row)
+
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error indexing chat {chat_id}: {e}")
+            return False
+
+    def index_message(
+        self, chat_id: str, message_id: str, message: Optional[dict]
+    ) -> bool:
+        try:
+            with get_db() as db:
+                content = get_message_text(message)
+                row = (
+                    db.query(ChatSearchEntry)
+                    .filter_by(chat_id=chat_id, message_id=message_id)
+                    .first()
+                )
+
+                if row is None:
+                    if not content:
+                        return True
+                    db.add(
+                        ChatSearchEntry(
+                            chat_id=chat_id,
+                            message_id=message_id,
+                            content=content,
+                            updated_at=int(time.time()),
+                        )
+                    )
+                elif not content:
+                    db.delete(row)
+                elif row.content != content:
+                    row.content = content
+                    row.updated_at = int(time.time())
+                else:
+                    # Status and usage updates leave the content untouched
+                    return True
+
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error indexing message {message_id}: {e}")
+            return False
+
+    def delete_entries_by_chat_ids(self, chat_ids: list[str]) -> bool:
+        if not chat_ids:
+            return True
+
+        try:
+            with get_db() as db:
+                db.query(ChatSearchEntry).filter(
+                    ChatSearchEntry.chat_id.in_(chat_ids)
+                ).delete(synchronize_session=False)
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+    def get_search_subquery(self, db, user_id: str, terms: list[str]):
+        """
+        Subquery of the chats of `user_id` matching all `terms`, with their
+        best matching entry (`entry_id`) and its `rank`, higher is better.
+        """
+        dialect_name = db.bind.dialect.name
+        match_query = get_match_query(terms, dialect_name)
+
+        if dialect_name == "sqlite":
+            # The title column weighs ten times the message content
+            # (configured as the FTS5 rank function); MIN() picks the
+            # bare columns from the best matching row
+            sql = """
+                SELECT chat_search.chat_id AS chat_id,
+                       chat_search.id AS entry_id,
+                       -MIN(chat_search_fts.rank) AS rank
+                FROM chat_search_fts
+                JOIN chat_search ON chat_search.id = chat_search_fts.rowid
+                WHERE chat_search_fts MATCH :search_query
+                  AND chat_search.chat_id IN (
+                      SELECT id FROM chat WHERE user_id = :search_user_id
+                  )
+                GROUP BY chat_search.chat_id
+            """
+        else:
+            sql = """
+                SELECT DISTINCT ON (chat_search.chat_id)
+                       chat_search.chat_id AS chat_id,
+                       chat_search.id AS entry_id,
+                       ts_rank(chat_search.search_vector, query) AS rank
+                FROM chat_search, to_tsquery('simple', :search_query) AS query
+                WHERE chat_search.search_vector @@ query
+                  AND chat_search.chat_id IN (
+                      SELECT id FROM chat WHERE user_id = :search_user_id
+                  )
+                ORDER BY chat_search.chat_id, rank DESC
+            """
+
+        return (
+            text(sql)
+            .bindparams(search_query=match_query, search_user_id=user_id)
+            .columns(chat_id=Text, entry_id=Integer, rank=Float)
+            .subquery("chat_search_match")
+        )
+
+    def get_snippets_by_entry_ids(
+        self, db, terms: list[str], entry_ids: list[int]
+    ) -> dict[int, str]:
+        """Highlighted excerpts of the given entries around the `terms`."""
+        if not entry_ids:
+            return {}
+
+        dialect_name = db.bind.dialect.name
+        match_query = get_match_query(terms, dialect_name)
+
+        if dialect_name == "sqlite":
+            sql = text(
+                """
+                SELECT rowid AS id,
+                       snippet(chat_search_fts, -1, :start, :end, '…', 16) AS snippet
+                FROM chat_search_fts
+                WHERE chat_search_fts MATCH :search_query AND rowid IN :entry_ids
+                """
+            )
+        else:
+            sql = text(
+                """
+                SELECT id,
+                       ts_headline(
+                           'simple',
+                           coalesce(content, title, ''),
+                           to_tsquery('simple', :search_query),
+                           'StartSel=' || :start || ', StopSel=' || :end
+                           || ', MaxWords=24, MinWords=8, MaxFragments=1'
+                       ) AS snippet
+                FROM chat_search
+                WHERE id IN :entry_ids
+                """
+            )
+
+        rows = db.execute(
+            sql.bindparams(bindparam("entry_ids", expanding=True)),
+            {
+                "search_query": match_query,
+                "entry_ids": entry_ids,
+                "start": SNIPPET_START,
+                "end": SNIPPET_END,
+            },
+        ).fetchall()
+        return {row.id: row.snippet for row in rows}
+
+
+ChatSearch = ChatSearchTable()
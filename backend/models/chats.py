@@ -7,13 +7,18 @@ from typing import Optional
 from backend.internal.db import Base, get_db
 from backend.models.tags import TagModel, Tag, Tags
 from backend.models.folders import Folders
+from backend.models.chat_messages import (
+    ChatMessages,
+    split_chat_history,
+    merge_chat_history,
+)
+from backend.models.chat_search import ChatSearch, get_search_terms
 from backend.env import SRC_LOG_LEVELS
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Index
 from sqlalchemy import or_, func, select, and_, text
 from sqlalchemy.sql import exists
-from sqlalchemy.sql.expression import bindparam
 
 ####################
 # Chat DB Schema
@@ -51,6 +56,8 @@ class Chat(Base):
         Index("user_id_archived_idx", "user_id", "archived"),
         # WHERE user_id = ... ORDER BY updated_at DESC
         Index("updated_at_user_id_idx", "updated_at", "user_id"),
+        # WHERE user_id = ... AND (updated_at, id) < ... ORDER BY updated_at DESC, id DESC
+        Index("user_id_updated_at_id_idx", "user_id", "updated_at", "id"),
         # WHERE folder_id = ... AND user_id = ...
         Index("folder_id_user_id_idx", "folder_id", "user_id"),
     )
@@ -122,80 +129,158 @@ class ChatTitleIdResponse(BaseModel):
     created_at: int
 
 
+class ChatSearchResponse(ChatTitleIdResponse):
+    # Set when the search text matched the title or a message of the chat
+    rank: Optional[float] = None
+    snippet: Optional[str] = None
+
+
 class ChatTable:
-    def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
-        with get_db() as db:
-            id = str(uuid.uuid4())
-            chat = ChatModel(
-                **{
-                    "id": id,
-                    "user_id": user_id,
-                    "title": (
-                        form_data.chat["title"]
-                        if "title" in form_data.chat
-                        else "New Chat"
-                    ),
-                    "chat": form_data.chat,
-                    "folder_id": form_data.folder_id,
-                    "created_at": int(time.time()),
-                    "updated_at": int(time.time()),
-                }
+    def _to_chat_model(self, chat: Chat) -> ChatModel:
+        chat_model = ChatModel.model_validate(chat)
+        chat_model.chat = merge_chat_history(
+            chat_model.chat, ChatMessages.get_messages_map_by_chat_id(chat_model.id)
+        )
+        return chat_model
+
+    def _to_chat_models(self, chats: list[Chat]) -> list[ChatModel]:
+        chat_models = [ChatModel.model_validate(chat) for chat in chats]
+        messages_maps = ChatMessages.get_messages_maps_by_chat_ids(
+            [chat.id for chat in chat_models]
+        )
+        for chat_model in chat_models:
+            chat_model.chat = merge_chat_history(
+                chat_model.chat, messages_maps.get(chat_model.id, {})
             )
+        return chat_models
+
+    def _get_chat_list(
+        self,
+        query,
+        filter: Optional[dict] = None,
+        skip: Optional[int] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[tuple[int, str]] = None,
+    ) -> list[ChatTitleIdResponse]:
+        """
+        Page through the chats of `query`, only loading the columns of the
+        chat list, never the chat documents and their messages.
+
+        Chats are ordered by `filter["order_by"]` and `filter["direction"]`
+        when given, otherwise most recently updated first, in which case
+        `cursor` (the `updated_at` and `id` of the last chat of the previous
+        page) starts the page right after that chat. A cursor cannot be
+        combined with another order.
+        """
+        query = query.with_entities(
+            Chat.id, Chat.title, Chat.updated_at, Chat.created_at
+        )
+
+        order_by = (filter or {}).get("order_by")
+        direction = (filter or {}).get("direction")
+
+        if cursor and (order_by or direction):
+            raise ValueError("A cursor only applies to the default order")
 
-            result = Chat(**chat.model_dump())
+        if order_by and direction and getattr(Chat, order_by):
+            if direction.lower() == "asc":
+                query = query.order_by(getattr(Chat, order_by).asc())
+            elif direction.lower() == "desc":
+                query = query.order_by(getattr(Chat, order_by).desc())
+            else:
+                raise ValueError("Invalid direction for ordering")
+        else:
+            if cursor:
+                updated_at, id = cursor
+                query = query.filter(
+                    or_(
+                        Chat.updated_at < updated_at,
+                        and_(Chat.updated_at == updated_at, Chat.id < id),
+                    )
+                )
+            query = query.order_by(Chat.updated_at.desc(), Chat.id.desc())
+
+        if skip:
+            query = query.offset(skip)
+        if limit:
+            query = query.limit(limit)
+
+        return [ChatTitleIdResponse.model_validate(chat._mapping) for chat in query]
+
+    def _insert_chat(self, chat: ChatModel) -> Optional[ChatModel]:
+        stored_chat, messages = split_chat_history(chat.chat)
+
+        with get_db() as db:
+            result = Chat(**{**chat.model_dump(), "chat": stored_chat})
             db.add(result)
             db.commit()
             db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+
+        if result and messages:
+            ChatMessages.replace_messages_by_chat_id(chat.id, messages)
+        if result:
+            ChatSearch.index_chat(chat.id, chat.title, messages or {})
+        return chat if result else None
+
+    def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
+        id = str(uuid.uuid4())
+        chat = ChatModel(
+            **{
+                "id": id,
+                "user_id": user_id,
+                "title": (
+                    form_data.chat["title"] if "title" in form_data.chat else "New Chat"
+                ),
+                "chat": form_data.chat,
+                "folder_id": form_data.folder_id,
+                "created_at": int(time.time()),
+                "updated_at": int(time.time()),
+            }
+        )
+        return self._insert_chat(chat)
 
     def import_chat(
         self, user_id: str, form_data: ChatImportForm
     ) -> Optional[ChatModel]:
-        with get_db() as db:
-            id = str(uuid.uuid4())
-            chat = ChatModel(
-                **{
-                    "id": id,
-                    "user_id": user_id,
-                    "title": (
-                        form_data.chat["title"]
-                        if "title" in form_data.chat
-                        else "New Chat"
-                    ),
-                    "chat": form_data.chat,
-                    "meta": form_data.meta,
-                    "pinned": form_data.pinned,
-                    "folder_id": form_data.folder_id,
-                    "created_at": (
-                        form_data.created_at
-                        if form_data.created_at
-                        else int(time.time())
-                    ),
-                    "updated_at": (
-                        form_data.updated_at
-                        if form_data.updated_at
-                        else int(time.time())
-                    ),
-                }
-            )
-
-            result = Chat(**chat.model_dump())
-            db.add(result)
-            db.commit()
-            db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+        id = str(uuid.uuid4())
+        chat = ChatModel(
+            **{
+                "id": id,
+                "user_id": user_id,
+                "title": (
+                    form_data.chat["title"] if "title" in form_data.chat else "New Chat"
+                ),
+                "chat": form_data.chat,
+                "meta": form_data.meta,
+                "pinned": form_data.pinned,
+                "folder_id": form_data.folder_id,
+                "created_at": (
+                    form_data.created_at if form_data.created_at else int(time.time())
+                ),
+                "updated_at": (
+                    form_data.updated_at if form_data.updated_at else int(time.time())
+                ),
+            }
+        )
+        return self._insert_chat(chat)
 
     def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
         try:
+            stored_chat, messages = split_chat_history(chat)
+
             with get_db() as db:
                 chat_item = db.get(Chat, id)
-                chat_item.chat = chat
+                chat_item.chat = stored_chat
                 chat_item.title = chat["title"] if "title" in chat else "New Chat"
                 chat_item.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat_item)
 
-                return ChatModel.model_validate(chat_item)
+            if messages is not None:
+                ChatMessages.replace_messages_by_chat_id(id, messages)
+            ChatSearch.index_chat(id, chat_item.title, messages)
+
+            return self._to_chat_model(chat_item)
         except Exception:
             return None
 
@@ -204,7 +289,8 @@ class ChatTable:
         if chat is None:
             return None
 
-        chat = chat.chat
+        # Messages are left out so only the chat document is rewritten
+        chat, _ = split_chat_history(chat.chat)
         chat["title"] = title
 
         return self.update_chat_by_id(id, chat)
@@ -246,56 +332,58 @@ class ChatTable:
     def get_message_by_id_and_message_id(
         self, id: str, message_id: str
     ) -> Optional[dict]:
+        message = ChatMessages.get_message_by_chat_id_and_message_id(id, message_id)
+        if message is not None:
+            return message
+
+        # Fall back to messages still embedded in the chat document
         chat = self.get_chat_by_id(id)
         if chat is None:
             return None
 
         return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
 
+    def _set_current_message_id(self, id: str, message_id: str) -> bool:
+        with get_db() as db:
+            chat_item = db.get(Chat, id)
+            if chat_item is None:
+                return False
+
+            # Move messages still embedded in the chat document to their rows
+            stored_chat, messages = split_chat_history(chat_item.chat or {})
+            if messages is not None:
+                ChatMessages.replace_messages_by_chat_id(
+                    id, {**messages, **ChatMessages.get_messages_map_by_chat_id(id)}
+                )
+                chat_item.chat = stored_chat
+
+            # Only rewrite the chat document when the current message changes,
+            # repeated saves of the same message just bump the timestamp
+            history = (chat_item.chat or {}).get("history", {})
+            if history.get("currentId") != message_id:
+                chat_item.chat = {
+                    **chat_item.chat,
+                    "history": {**history, "currentId": message_id},
+                }
+            chat_item.updated_at = int(time.time())
+            db.commit()
+            return True
+
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+    ) -> Optional[dict]:
+        if not self._set_current_message_id(id, message_id):
             return None
 
-        # Sanitize message content for null characters before upserting
-        if isinstance(message.get("content"), str):
-            message["content"] = message["content"].replace("\x00", "")
-
-        chat = chat.chat
-        history = chat.get("history", {})
-
-        if message_id in history.get("messages", {}):
-            history["messages"][message_id] = {
-                **history["messages"][message_id],
-                **message,
-            }
-        else:
-            history["messages"][message_id] = message
-
-        history["currentId"] = message_id
-
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+        message = ChatMessages.upsert_message(id, message_id, message)
+        if message is not None:
+            ChatSearch.index_message(id, message_id, message)
+        return message
 
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
-        chat = chat.chat
-        history = chat.get("history", {})
-
-        if message_id in history.get("messages", {}):
-            status_history = history["messages"][message_id].get("statusHistory", [])
-            status_history.append(status)
-            history["messages"][message_id]["statusHistory"] = status_history
-
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+    ) -> Optional[dict]:
+        return ChatMessages.add_message_status(id, message_id, status)
 
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         with get_db() as db:
@@ -322,6 +410,7 @@ class ChatTable:
             db.add(shared_result)
             db.commit()
             db.refresh(shared_result)
+            ChatMessages.copy_messages_by_chat_id(chat_id, shared_chat.id)
 
             # Update the original chat with the share_id
             result = (
@@ -330,7 +419,9 @@ class ChatTable:
                 .update({"share_id": shared_chat.id})
             )
             db.commit()
-            return shared_chat if (shared_result and result) else None
+            if shared_result and result:
+                return self.get_chat_by_id(shared_chat.id)
+            return None
 
     def update_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         try:
@@ -351,14 +442,21 @@ class ChatTable:
                 shared_chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(shared_chat)
+                ChatMessages.copy_messages_by_chat_id(chat_id, shared_chat.id)
 
-                return ChatModel.model_validate(shared_chat)
+                return self._to_chat_model(shared_chat)
         except Exception:
             return None
 
     def delete_shared_chat_by_chat_id(self, chat_id: str) -> bool:
         try:
             with get_db() as db:
+                shared_chat_ids = [
+                    chat.id
+                    for chat in db.query(Chat.id).filter_by(user_id=f"shared-{chat_id}")
+                ]
+                ChatMessages.delete_messages_by_chat_ids(shared_chat_ids)
+
                 db.query(Chat).filter_by(user_id=f"shared-{chat_id}").delete()
                 db.commit()
 
@@ -384,7 +482,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(chat)
         except Exception:
             return None
 
@@ -396,7 +494,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(chat)
         except Exception:
             return None
 
@@ -408,7 +506,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(chat)
         except Exception:
             return None
 
@@ -427,36 +525,16 @@ class ChatTable:
         filter: Optional[dict] = None,
         skip: int = 0,
         limit: int = 50,
-    ) -> list[ChatModel]:
-
+        cursor: Optional[tuple[int, str]] = None,
+    ) -> list[ChatTitleIdResponse]:
         with get_db() as db:
             query = db.query(Chat).filter_by(user_id=user_id, archived=True)
 
-            if filter:
-                query_key = filter.get("query")
-                if query_key:
-                    query = query.filter(Chat.title.ilike(f"%{query_key}%"))
-
-                order_by = filter.get("order_by")
-                direction = filter.get("direction")
-
-                if order_by and direction and getattr(Chat, order_by):
-                    if direction.lower() == "asc":
-                        query = query.order_by(getattr(Chat, order_by).asc())
-                    elif direction.lower() == "desc":
-                        query = query.order_by(getattr(Chat, order_by).desc())
-                    else:
-                        raise ValueError("Invalid direction for ordering")
-            else:
-                query = query.order_by(Chat.updated_at.desc())
-
-            if skip:
-                query = query.offset(skip)
-            if limit:
-                query = query.limit(limit)
+            query_key = (filter or {}).get("query")
+            if query_key:
+                query = query.filter(Chat.title.ilike(f"%{query_key}%"))
 
-            all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_list(query, filter, skip, limit, cursor)
 
     def get_chat_list_by_user_id(
         self,
@@ -465,37 +543,18 @@ class ChatTable:
         filter: Optional[dict] = None,
         skip: int = 0,
         limit: int = 50,
-    ) -> list[ChatModel]:
+        cursor: Optional[tuple[int, str]] = None,
+    ) -> list[ChatTitleIdResponse]:
         with get_db() as db:
             query = db.query(Chat).filter_by(user_id=user_id)
             if not include_archived:
                 query = query.filter_by(archived=False)
 
-            if filter:
-                query_key = filter.get("query")
-                if query_key:
-                    query = query.filter(Chat.title.ilike(f"%{query_key}%"))
-
-                order_by = filter.get("order_by")
-                direction = filter.get("direction")
-
-                if order_by and direction and getattr(Chat, order_by):
-                    if direction.lower() == "asc":
-                        query = query.order_by(getattr(Chat, order_by).asc())
-                    elif direction.lower() == "desc":
-                        query = query.order_by(getattr(Chat, order_by).desc())
-                    else:
-                        raise ValueError("Invalid direction for ordering")
-            else:
-                query = query.order_by(Chat.updated_at.desc())
-
-            if skip:
-                query = query.offset(skip)
-            if limit:
-                query = query.limit(limit)
+            query_key = (filter or {}).get("query")
+            if query_key:
+                query = query.filter(Chat.title.ilike(f"%{query_key}%"))
 
-            all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_list(query, filter, skip, limit, cursor)
 
     def get_chat_title_id_list_by_user_id(
         self,
@@ -505,6 +564,7 @@ class ChatTable:
         include_pinned: bool = False,
         skip: Optional[int] = None,
         limit: Optional[int] = None,
+        cursor: Optional[tuple[int, str]] = None,
     ) -> list[ChatTitleIdResponse]:
         with get_db() as db:
             query = db.query(Chat).filter_by(user_id=user_id)
@@ -518,29 +578,7 @@ class ChatTable:
             if not include_archived:
                 query = query.filter_by(archived=False)
 
-            query = query.order_by(Chat.updated_at.desc()).with_entities(
-                Chat.id, Chat.title, Chat.updated_at, Chat.created_at
-            )
-
-            if skip:
-                query = query.offset(skip)
-            if limit:
-                query = query.limit(limit)
-
-            all_chats = query.all()
-
-            # result has to be destructured from sqlalchemy `row` and mapped to a dict since the `ChatModel`is not the returned dataclass.
-            return [
-                ChatTitleIdResponse.model_validate(
-                    {
-                        "id": chat[0],
-                        "title": chat[1],
-                        "updated_at": chat[2],
-                        "created_at": chat[3],
-                    }
-                )
-                for chat in all_chats
-            ]
+            return self._get_chat_list(query, skip=skip, limit=limit, cursor=cursor)
 
     def get_chat_list_by_chat_ids(
         self, chat_ids: list[str], skip: int = 0, limit: int = 50
@@ -553,13 +591,13 @@ class ChatTable:
                 .order_by(Chat.updated_at.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(all_chats)
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
                 chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(chat)
         except Exception:
             return None
 
@@ -581,7 +619,7 @@ class ChatTable:
         try:
             with get_db() as db:
                 chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(chat)
         except Exception:
             return None
 
@@ -592,7 +630,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(all_chats)
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -601,7 +639,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(all_chats)
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -610,7 +648,16 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(all_chats)
+
+    def get_pinned_chat_list_by_user_id(
+        self, user_id: str, cursor: Optional[tuple[int, str]] = None
+    ) -> list[ChatTitleIdResponse]:
+        with get_db() as db:
+            query = db.query(Chat).filter_by(
+                user_id=user_id, pinned=True, archived=False
+            )
+            return self._get_chat_list(query, cursor=cursor)
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -619,7 +666,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(all_chats)
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -628,16 +675,21 @@ class ChatTable:
         include_archived: bool = False,
         skip: int = 0,
         limit: int = 60,
-    ) -> list[ChatModel]:
+    ) -> list[ChatSearchResponse]:
         """
-        Filters chats based on a search query using Python, allowing pagination using skip and limit.
+        Search the chats of a user by title and message content with the
+        full-text index, best matches first. `tag:`, `folder:`, `pinned:`,
+        `archived:` and `shared:` words filter the chats instead.
         """
         search_text = search_text.replace("\u0000", "").lower().strip()
 
         if not search_text:
-            return self.get_chat_list_by_user_id(
-                user_id, include_archived, filter={}, skip=skip, limit=limit
-            )
+            return [
+                ChatSearchResponse(**chat.model_dump())
+                for chat in self.get_chat_list_by_user_id(
+                    user_id, include_archived, filter={}, skip=skip, limit=limit
+                )
+            ]
 
         search_text_words = search_text.split(" ")
 
@@ -689,10 +741,16 @@ class ChatTable:
             )
         ]
 
-        search_text = " ".join(search_text_words)
+        search_text = " ".join(search_text_words).strip()
+        terms = get_search_terms(search_text)
+        if search_text and not terms:
+            # Nothing but punctuation, no chat can match
+            return []
 
         with get_db() as db:
-            query = db.query(Chat).filter(Chat.user_id == user_id)
+            query = db.query(
+                Chat.id, Chat.title, Chat.updated_at, Chat.created_at
+            ).filter(Chat.user_id == user_id)
 
             if is_archived is not None:
                 query = query.filter(Chat.archived == is_archived)
@@ -711,26 +769,9 @@ class ChatTable:
             if folder_ids:
                 query = query.filter(Chat.folder_id.in_(folder_ids))
 
-            query = query.order_by(Chat.updated_at.desc())
-
             # Check if the database dialect is either 'sqlite' or 'postgresql'
             dialect_name = db.bind.dialect.name
             if dialect_name == "sqlite":
-                # SQLite case: using JSON1 extension for JSON searching
-                sqlite_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_each(Chat.chat, '$.messages') AS message "
-                    "    WHERE LOWER(message.value->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
-                )
-                sqlite_content_clause = text(sqlite_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")), sqlite_content_clause
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
-
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
                     query = query.filter(
@@ -762,22 +803,6 @@ class ChatTable:
                     )
 
             elif dialect_name == "postgresql":
-                # PostgreSQL relies on proper JSON query for search
-                postgres_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_array_elements(Chat.chat->'messages') AS message "
-                    "    WHERE LOWER(message->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
-                )
-                postgres_content_clause = text(postgres_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")),
-                        postgres_content_clause,
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
-
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
                     query = query.filter(
@@ -812,13 +837,35 @@ class ChatTable:
                     f"Unsupported dialect: {db.bind.dialect.name}"
                 )
 
+            if terms:
+                search = ChatSearch.get_search_subquery(db, user_id, terms)
+                query = (
+                    query.join(search, search.c.chat_id == Chat.id)
+                    .add_columns(search.c.entry_id, search.c.rank)
+                    .order_by(search.c.rank.desc(), Chat.updated_at.desc())
+                )
+            else:
+                query = query.order_by(Chat.updated_at.desc())
+
             # Perform pagination at the SQL level
             all_chats = query.offset(skip).limit(limit).all()
 
             log.info(f"The number of chats: {len(all_chats)}")
 
-            # Validate and return chats
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            if not terms:
+                return [
+                    ChatSearchResponse.model_validate(chat._mapping)
+                    for chat in all_chats
+                ]
+
+            # Only highlight the page of results
+            snippets = ChatSearch.get_snippets_by_entry_ids(
+                db, terms, [chat.entry_id for chat in all_chats]
+            )
+            return [
+                ChatSearchResponse(**chat._mapping, snippet=snippets.get(chat.entry_id))
+                for chat in all_chats
+            ]
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str, skip: int = 0, limit: int = 60
@@ -836,7 +883,22 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(all_chats)
+
+    def get_chat_list_by_folder_id_and_user_id(
+        self,
+        folder_id: str,
+        user_id: str,
+        skip: int = 0,
+        limit: int = 60,
+        cursor: Optional[tuple[int, str]] = None,
+    ) -> list[ChatTitleIdResponse]:
+        with get_db() as db:
+            query = db.query(Chat).filter_by(folder_id=folder_id, user_id=user_id)
+            query = query.filter(or_(Chat.pinned == False, Chat.pinned == None))
+            query = query.filter_by(archived=False)
+
+            return self._get_chat_list(query, skip=skip, limit=limit, cursor=cursor)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -851,7 +913,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(all_chats)
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -864,7 +926,7 @@ class ChatTable:
                 chat.pinned = False
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(chat)
         except Exception:
             return None
 
@@ -876,7 +938,7 @@ class ChatTable:
 
     def get_chat_list_by_user_id_and_tag_name(
         self, user_id: str, tag_name: str, skip: int = 0, limit: int = 50
-    ) -> list[ChatModel]:
+    ) -> list[ChatTitleIdResponse]:
         with get_db() as db:
             query = db.query(Chat).filter_by(user_id=user_id)
             tag_id = tag_name.replace(" ", "_").lower()
@@ -901,9 +963,8 @@ class ChatTable:
                     f"Unsupported dialect: {db.bind.dialect.name}"
                 )
 
-            all_chats = query.all()
-            log.debug(f"all_chats: {all_chats}")
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            # Every chat with the tag, the router deletes tags without chats
+            return self._get_chat_list(query)
 
     def add_chat_tag_by_id_and_user_id_and_tag_name(
         self, id: str, user_id: str, tag_name: str
@@ -924,7 +985,7 @@ class ChatTable:
 
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(chat)
         except Exception:
             return None
 
@@ -1010,6 +1071,8 @@ class ChatTable:
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                ChatMessages.delete_messages_by_chat_id(id)
+                ChatSearch.delete_entries_by_chat_ids([id])
                 db.query(Chat).filter_by(id=id).delete()
                 db.commit()
 
@@ -1020,6 +1083,9 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
+                if db.query(Chat.id).filter_by(id=id, user_id=user_id).first():
+                    ChatMessages.delete_messages_by_chat_id(id)
+                    ChatSearch.delete_entries_by_chat_ids([id])
                 db.query(Chat).filter_by(id=id, user_id=user_id).delete()
                 db.commit()
 
@@ -1032,6 +1098,11 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
+                chat_ids = [
+                    chat.id for chat in db.query(Chat.id).filter_by(user_id=user_id)
+                ]
+                ChatMessages.delete_messages_by_chat_ids(chat_ids)
+                ChatSearch.delete_entries_by_chat_ids(chat_ids)
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -1044,6 +1115,14 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
+                chat_ids = [
+                    chat.id
+                    for chat in db.query(Chat.id).filter_by(
+                        user_id=user_id, folder_id=folder_id
+                    )
+                ]
+                ChatMessages.delete_messages_by_chat_ids(chat_ids)
+                ChatSearch.delete_entries_by_chat_ids(chat_ids)
                 db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
                 db.commit()
 
@@ -1054,9 +1133,17 @@ class ChatTable:
     def delete_shared_chats_by_user_id(self, user_id: str) -> bool:
         try:
             with get_db() as db:
-                chats_by_user = db.query(Chat).filter_by(user_id=user_id).all()
+                chats_by_user = db.query(Chat.id).filter_by(user_id=user_id).all()
                 shared_chat_ids = [f"shared-{chat.id}" for chat in chats_by_user]
 
+                ChatMessages.delete_messages_by_chat_ids(
+                    [
+                        chat.id
+                        for chat in db.query(Chat.id).filter(
+                            Chat.user_id.in_(shared_chat_ids)
+                        )
+                    ]
+                )
                 db.query(Chat).filter(Chat.user_id.in_(shared_chat_ids)).delete()
                 db.commit()
 
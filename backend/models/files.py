@@ -4,12 +4,16 @@ from typing import Optional
 
 from backend.internal.db import Base, JSONField, get_db
 from backend.env import SRC_LOG_LEVELS
+from backend.utils.file_status import FILE_STATUS_NOTIFIER
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Column, String, Text, JSON, select
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
+# Ids per IN (...) clause, SQLite caps the number of bound parameters
+FILE_ID_BATCH_SIZE = 500
+
 ####################
 # Files DB Schema
 ####################
@@ -88,6 +92,13 @@ class FileMetadataResponse(BaseModel):
     updated_at: int  # timestamp in epoch
 
 
+class FileContentModel(BaseModel):
+    id: str
+    hash: Optional[str] = None
+    filename: str
+    content: Optional[str] = None
+
+
 class FileForm(BaseModel):
     id: str
     hash: Optional[str] = None
@@ -142,6 +153,27 @@ class FilesTable:
             except Exception:
                 return None
 
+    def get_file_status_by_id(self, id: str) -> Optional[dict]:
+        """
+        Processing status and error of a file, read without loading its data
+        (which holds the extracted content). None if the file does not exist.
+        """
+        with get_db() as db:
+            try:
+                row = db.execute(
+                    select(
+                        File.data["status"].as_string(),
+                        File.data["error"].as_string(),
+                    ).where(File.id == id)
+                ).first()
+                if row is None:
+                    return None
+
+                status, error = row
+                return {"status": status, "error": error}
+            except Exception:
+                return None
+
     def get_file_metadata_by_id(self, id: str) -> Optional[FileMetadataResponse]:
         with get_db() as db:
             try:
@@ -179,6 +211,43 @@ class FilesTable:
                 .all()
             ]
 
+    def _get_file_contents_by_ids(
+        self, ids: list[str], with_content: bool
+    ) -> list[FileContentModel]:
+        columns = [File.id, File.hash, File.filename]
+        if with_content:
+            columns.append(File.data["content"].as_string())
+
+        files = []
+        with get_db() as db:
+            ids = list(dict.fromkeys(ids))
+            for idx in range(0, len(ids), FILE_ID_BATCH_SIZE):
+                for row in db.execute(
+                    select(*columns).where(
+                        File.id.in_(ids[idx : idx + FILE_ID_BATCH_SIZE])
+                    )
+                ).all():
+                    files.append(
+                        FileContentModel(
+                            id=row[0],
+                            hash=row[1],
+                            filename=row[2],
+                            content=row[3] if with_content else None,
+                        )
+                    )
+        return files
+
+    def get_file_contents_by_ids(self, ids: list[str]) -> list[FileContentModel]:
+        """
+        Name, hash and extracted content of the given files, reading only the
+        content out of their data.
+        """
+        return self._get_file_contents_by_ids(ids, with_content=True)
+
+    def get_file_hashes_by_ids(self, ids: list[str]) -> list[FileContentModel]:
+        """Name and hash of the given files, without their content."""
+        return self._get_file_contents_by_ids(ids, with_content=False)
+
     def get_file_metadatas_by_ids(self, ids: list[str]) -> list[FileMetadataResponse]:
         with get_db() as db:
             return [
@@ -221,6 +290,9 @@ class FilesTable:
                 file = db.query(File).filter_by(id=id).first()
                 file.data = {**(file.data if file.data else {}), **data}
                 db.commit()
+
+                if "status" in data:
+                    FILE_STATUS_NOTIFIER.publish(id, data["status"], data.get("error"))
                 return FileModel.model_validate(file)
             except Exception as e:
 
@@ -6,7 +6,7 @@ from backend.internal.db import Base, JSONField, get_db
 from backend.models.users import Users, UserModel
 from backend.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, Index
+from sqlalchemy import BigInteger, Boolean, Column, String, Text, Index, func
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -139,41 +139,41 @@ class FunctionsTable:
             with get_db() as db:
                 # Get existing functions
                 existing_functions = db.query(Function).all()
-                existing_ids = {func.id for func in existing_functions}
+                existing_ids = {function.id for function in existing_functions}
 
                 # Prepare a set of new function IDs
-                new_function_ids = {func.id for func in functions}
+                new_function_ids = {function.id for function in functions}
 
                 # Update or insert functions
-                for func in functions:
-                    if func.id in existing_ids:
-                        db.query(Function).filter_by(id=func.id).update(
+                for function in functions:
+                    if function.id in existing_ids:
+                        db.query(Function).filter_by(id=function.id).update(
                             {
-                                **func.model_dump(),
+                                **function.model_dump(),
                                 "user_id": user_id,
                                 "updated_at": int(time.time()),
                             }
                         )
                     else:
-                        new_func = Function(
+                        new_function = Function(
                             **{
-                                **func.model_dump(),
+                                **function.model_dump(),
                                 "user_id": user_id,
                                 "updated_at": int(time.time()),
                             }
                         )
-                        db.add(new_func)
+                        db.add(new_function)
 
                 # Remove functions that are no longer present
-                for func in existing_functions:
-                    if func.id not in new_function_ids:
-                        db.delete(func)
+                for function in existing_functions:
+                    if function.id not in new_function_ids:
+                        db.delete(function)
 
                 db.commit()
 
                 return [
-                    FunctionModel.model_validate(func)
-                    for func in db.query(Function).all()
+                    FunctionModel.model_validate(function)
+                    for function in db.query(Function).all()
                 ]
         except Exception as e:
             log.exception(f"Error syncing functions for user {user_id}: {e}")
@@ -187,6 +187,48 @@ class FunctionsTable:
         except Exception:
             return None
 
+    def get_functions_by_ids(
+        self, ids: list[str], include_valves=False
+    ) -> list[FunctionModel | FunctionWithValvesModel]:
+        """The functions of `ids` that exist, in the order of `ids`"""
+        if not ids:
+            return []
+
+        with get_db() as db:
+            functions = {
+                function.id: function
+                for function in db.query(Function).filter(Function.id.in_(ids)).all()
+            }
+
+            model = FunctionWithValvesModel if include_valves else FunctionModel
+            return [
+                model.model_validate(functions[id])
+                for id in dict.fromkeys(ids)
+                if id in functions
+            ]
+
+    def get_function_versions_by_ids(self, ids: list[str]) -> dict[str, int]:
+        """updated_at of each existing function, without loading its content"""
+        if not ids:
+            return {}
+
+        with get_db() as db:
+            return {
+                id: updated_at
+                for id, updated_at in db.query(Function.id, Function.updated_at)
+                .filter(Function.id.in_(ids))
+                .all()
+            }
+
+    def get_functions_version(self, types: list[str]) -> tuple:
+        """Changes whenever a function of `types` is added, removed or updated"""
+        with get_db() as db:
+            return tuple(
+                db.query(func.count(Function.id), func.max(Function.updated_at))
+                .filter(Function.type.in_(types))
+                .one()
+            )
+
     def get_functions(
         self, active_only=False, include_valves=False
     ) -> list[FunctionModel | FunctionWithValvesModel]:
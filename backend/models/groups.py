@@ -1,17 +1,20 @@
 import json
 import logging
+import threading
 import time
-from typing import Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Hashable, Optional
 import uuid
 
 from backend.internal.db import Base, get_db
-from backend.env import SRC_LOG_LEVELS
+from backend.env import GROUP_MEMBERSHIP_CACHE_TTL, SRC_LOG_LEVELS
 
 from backend.models.files import FileMetadataResponse
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON, func
+from sqlalchemy import BigInteger, Column, Text, JSON, Index, PrimaryKeyConstraint
 
 
 log = logging.getLogger(__name__)
@@ -41,6 +44,22 @@ class Group(Base):
     updated_at = Column(BigInteger)
 
 
+class GroupMember(Base):
+    """Indexed copy of Group.user_ids, kept in sync on every membership change."""
+
+    __tablename__ = "group_member"
+
+    group_id = Column(Text, nullable=False)
+    user_id = Column(Text, nullable=False)
+
+    created_at = Column(BigInteger)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("group_id", "user_id"),
+        Index("group_member_user_id_idx", "user_id"),
+    )
+
+
 class GroupModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: str
@@ -91,7 +110,115 @@ class GroupUpdateForm(GroupForm, UserIdsForm):
     pass
 
 
+####################
+# Membership Cache
+####################
+
+# Entries resolved during the current request, see GroupMembershipCache.scope
+_REQUEST_CACHE: ContextVar[Optional[dict]] = ContextVar(
+    "group_membership_request_cache", default=None
+)
+
+
+class GroupMembershipCache:
+    """
+    Short-TTL process cache of per-user group lookups (resolved groups,
+    merged permissions), with a per-request layer so a request resolves each
+    user at most once even when the TTL is 0.
+
+    Any group or membership change clears the whole cache, as a permission
+    change affects every member. Other workers see the change after at most
+    GROUP_MEMBERSHIP_CACHE_TTL seconds.
+    """
+
+    def __init__(self, ttl: float = GROUP_MEMBERSHIP_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        # Bumped on invalidation so lookups racing a change are not stored
+        self._generation = 0
+
+    @contextmanager
+    def scope(self):
+        token = _REQUEST_CACHE.set({})
+        try:
+            yield
+        finally:
+            _REQUEST_CACHE.reset(token)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        request_cache = _REQUEST_CACHE.get()
+        if request_cache is not None and key in request_cache:
+            return request_cache[key]
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation
+
+        if entry is not None and entry[0] > now:
+            value = entry[1]
+        else:
+            value = loader()
+            if self.ttl > 0:
+                with self._lock:
+                    if generation == self._generation:
+                        self._entries[key] = (now + self.ttl, value)
+
+        if request_cache is not None:
+            request_cache[key] = value
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+        request_cache = _REQUEST_CACHE.get()
+        if request_cache is not None:
+            request_cache.clear()
+
+
+GROUP_MEMBERSHIP_CACHE = GroupMembershipCache()
+
+
 class GroupTable:
+    def _sync_group_members(self, db, group_id: str, user_ids: Optional[list]):
+        """Make the group_member rows of a group match its user_ids."""
+        user_ids = set(user_ids if isinstance(user_ids, list) else [])
+        existing_user_ids = {
+            row.user_id
+            for row in db.query(GroupMember.user_id).filter_by(group_id=group_id)
+        }
+
+        removed_user_ids = existing_user_ids - user_ids
+        if removed_user_ids:
+            db.query(GroupMember).filter(
+                GroupMember.group_id == group_id,
+                GroupMember.user_id.in_(removed_user_ids),
+            ).delete(synchronize_session=False)
+
+        added_user_ids = user_ids - existing_user_ids
+        if added_user_ids:
+            now = int(time.time())
+            db.bulk_insert_mappings(
+                GroupMember,
+                [
+                    {"group_id": group_id, "user_id": user_id, "created_at": now}
+                    for user_id in added_user_ids
+                ],
+            )
+
+    def _get_groups_by_member_id(self, db, user_id: str) -> list[GroupModel]:
+        return [
+            GroupModel.model_validate(group)
+            for group in db.query(Group)
+            .join(GroupMember, GroupMember.group_id == Group.id)
+            .filter(GroupMember.user_id == user_id)
+            .order_by(Group.updated_at.desc())
+            .all()
+        ]
+
     def insert_new_group(
         self, user_id: str, form_data: GroupForm
     ) -> Optional[GroupModel]:
@@ -109,8 +236,10 @@ class GroupTable:
             try:
                 result = Group(**group.model_dump())
                 db.add(result)
+                self._sync_group_members(db, result.id, group.user_ids)
                 db.commit()
                 db.refresh(result)
+                GROUP_MEMBERSHIP_CACHE.invalidate()
                 if result:
                     return GroupModel.model_validate(result)
                 else:
@@ -126,20 +255,22 @@ class GroupTable:
                 for group in db.query(Group).order_by(Group.updated_at.desc()).all()
             ]
 
-    def get_groups_by_member_id(self, user_id: str) -> list[GroupModel]:
-        with get_db() as db:
-            return [
-                GroupModel.model_validate(group)
-                for group in db.query(Group)
-                .filter(
-                    func.json_array_length(Group.user_ids) > 0
-                )  # Ensure array exists
-                .filter(
-                    Group.user_ids.cast(String).like(f'%"{user_id}"%')
-                )  # String-based check
-                .order_by(Group.updated_at.desc())
-                .all()
-            ]
+    def get_groups_by_member_id(
+        self, user_id: str, cached: bool = True
+    ) -> list[GroupModel]:
+        """
+        The groups of a user, cached by default. The cached models are shared
+        and may be stale, so callers writing a group back should pass
+        `cached=False`.
+        """
+
+        def load():
+            with get_db() as db:
+                return self._get_groups_by_member_id(db, user_id)
+
+        if not cached:
+            return load()
+        return list(GROUP_MEMBERSHIP_CACHE.get(("groups", user_id), load))
 
     def get_group_by_id(self, id: str) -> Optional[GroupModel]:
         try:
@@ -167,7 +298,10 @@ class GroupTable:
                         "updated_at": int(time.time()),
                     }
                 )
+                if form_data.user_ids is not None:
+                    self._sync_group_members(db, id, form_data.user_ids)
                 db.commit()
+                GROUP_MEMBERSHIP_CACHE.invalidate()
                 return self.get_group_by_id(id=id)
         except Exception as e:
             log.exception(e)
@@ -176,8 +310,10 @@ class GroupTable:
     def delete_group_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                db.query(GroupMember).filter_by(group_id=id).delete()
                 db.query(Group).filter_by(id=id).delete()
                 db.commit()
+                GROUP_MEMBERSHIP_CACHE.invalidate()
                 return True
         except Exception:
             return False
@@ -185,8 +321,10 @@ class GroupTable:
     def delete_all_groups(self) -> bool:
         with get_db() as db:
             try:
+                db.query(GroupMember).delete()
                 db.query(Group).delete()
                 db.commit()
+                GROUP_MEMBERSHIP_CACHE.invalidate()
 
                 return True
             except Exception:
@@ -195,17 +333,20 @@ class GroupTable:
     def remove_user_from_all_groups(self, user_id: str) -> bool:
         with get_db() as db:
             try:
-                groups = self.get_groups_by_member_id(user_id)
+                groups = self._get_groups_by_member_id(db, user_id)
 
                 for group in groups:
-                    group.user_ids.remove(user_id)
+                    if user_id in group.user_ids:
+                        group.user_ids.remove(user_id)
                     db.query(Group).filter_by(id=group.id).update(
                         {
                             "user_ids": group.user_ids,
                             "updated_at": int(time.time()),
                         }
                     )
-                    db.commit()
+                db.query(GroupMember).filter_by(user_id=user_id).delete()
+                db.commit()
+                GROUP_MEMBERSHIP_CACHE.invalidate()
 
                 return True
             except Exception:
@@ -238,6 +379,7 @@ class GroupTable:
                         db.commit()
                         db.refresh(result)
                         new_groups.append(GroupModel.model_validate(result))
+                        GROUP_MEMBERSHIP_CACHE.invalidate()
                     except Exception as e:
                         log.exception(e)
                         continue
@@ -250,30 +392,35 @@ class GroupTable:
                 group_ids = [group.id for group in groups]
 
                 # Remove user from groups not in the new list
-                existing_groups = self.get_groups_by_member_id(user_id)
+                existing_groups = self._get_groups_by_member_id(db, user_id)
 
                 for group in existing_groups:
                     if group.id not in group_ids:
-                        group.user_ids.remove(user_id)
+                        if user_id in group.user_ids:
+                            group.user_ids.remove(user_id)
                         db.query(Group).filter_by(id=group.id).update(
                             {
                                 "user_ids": group.user_ids,
                                 "updated_at": int(time.time()),
                             }
                         )
+                        self._sync_group_members(db, group.id, group.user_ids)
 
                 # Add user to new groups
                 for group in groups:
-                    if user_id not in group.user_ids:
-                        group.user_ids.append(user_id)
+                    group_user_ids = list(group.user_ids or [])
+                    if user_id not in group_user_ids:
+                        group_user_ids.append(user_id)
                         db.query(Group).filter_by(id=group.id).update(
                             {
-                                "user_ids": group.user_ids,
+                                "user_ids": group_user_ids,
                                 "updated_at": int(time.time()),
                             }
                         )
+                        self._sync_group_members(db, group.id, group_user_ids)
 
                 db.commit()
+                GROUP_MEMBERSHIP_CACHE.invalidate()
                 return True
             except Exception as e:
                 log.exception(e)
@@ -300,8 +447,10 @@ class GroupTable:
 
                 group.user_ids = group_user_ids
                 group.updated_at = int(time.time())
+                self._sync_group_members(db, id, group_user_ids)
                 db.commit()
                 db.refresh(group)
+                GROUP_MEMBERSHIP_CACHE.invalidate()
                 return GroupModel.model_validate(group)
         except Exception as e:
             log.exception(e)
@@ -329,9 +478,11 @@ class GroupTable:
 
                 group.user_ids = group_user_ids
                 group.updated_at = int(time.time())
+                self._sync_group_members(db, id, group_user_ids)
 
                 db.commit()
                 db.refresh(group)
+                GROUP_MEMBERSHIP_CACHE.invalidate()
                 return GroupModel.model_validate(group)
         except Exception as e:
             log.exception(e)
@@ -0,0 +1,350 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from backend.internal.db import Base, get_db
+from backend.env import SRC_LOG_LEVELS
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    Text,
+    JSON,
+    Index,
+    and_,
+    func,
+    or_,
+    select,
+    update,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+####################
+# Ingestion Job DB Schema
+####################
+
+
+class IngestionJob(Base):
+    """
+    A file or knowledge processing job, run by the ingestion workers of any
+    instance. Jobs survive restarts: a running job whose worker stops sending
+    heartbeats is claimed again by another worker.
+    """
+
+    __tablename__ = "ingestion_job"
+
+    id = Column(Text, primary_key=True)
+    user_id = Column(Text, nullable=False)
+
+    type = Column(Text, nullable=False)
+    # Jobs with the same key (e.g. a file and its content hash) are enqueued once
+    key = Column(Text, nullable=True)
+    data = Column(JSON, nullable=True)
+
+    # pending, running, completed or failed
+    status = Column(Text, nullable=False)
+    progress = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+    # Pending jobs are not claimed before run_at (retry backoff)
+    run_at = Column(BigInteger, nullable=False)
+
+    worker_id = Column(Text, nullable=True)
+    heartbeat_at = Column(BigInteger, nullable=True)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (
+        Index("ingestion_job_status_run_at_idx", "status", "run_at"),
+        Index("ingestion_job_user_id_status_idx", "user_id", "status"),
+        Index("ingestion_job_key_idx", "key"),
+    )
+
+
+class IngestionJobModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+
+    type: str
+    key: Optional[str] = None
+    data: Optional[dict] = None
+
+    status: str
+    progress: Optional[dict] = None
+    error: Optional[str] = None
+
+    attempts: int = 0
+    max_attempts: int = 1
+    run_at: int
+
+    worker_id: Optional[str] = None
+    heartbeat_at: Optional[int] = None
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+
+####################
+# Forms
+####################
+
+
+class IngestionJobResponse(BaseModel):
+    id: str
+    type: str
+    status: str
+    progress: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: int
+    updated_at: int
+
+
+class IngestionJobsTable:
+    def insert_new_job(
+        self,
+        user_id: str,
+        type: str,
+        data: dict,
+        key: Optional[str] = None,
+        max_attempts: int = 1,
+    ) -> IngestionJobModel:
+        """
+        Enqueue a job. If a job with the same `key` is pending, running or
+        completed, that job is returned instead.
+        """
+        with get_db() as db:
+            if key is not None:
+                job = (
+                    db.query(IngestionJob)
+                    .filter(
+                        IngestionJob.key == key,
+                        IngestionJob.status.in_(["pending", "running", "completed"]),
+                    )
+                    .order_by(IngestionJob.created_at.desc())
+                    .first()
+                )
+                if job:
+                    return IngestionJobModel.model_validate(job)
+
+            now = int(time.time())
+            job = IngestionJob(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                type=type,
+                key=key,
+                data=data,
+                status="pending",
+                progress={},
+                attempts=0,
+                max_attempts=max(max_attempts, 1),
+                run_at=now,
+                created_at=now,
+                updated_at=now,
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            return IngestionJobModel.model_validate(job)
+
+    def get_job_by_id(self, id: str) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = db.get(IngestionJob, id)
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def get_jobs_by_user_id(
+        self, user_id: str, limit: int = 50
+    ) -> list[IngestionJobModel]:
+        with get_db() as db:
+            return [
+                IngestionJobModel.model_validate(job)
+                for job in db.query(IngestionJob)
+                .filter_by(user_id=user_id)
+                .order_by(IngestionJob.created_at.desc())
+                .limit(limit)
+                .all()
+            ]
+
+    def claim_next_job(
+        self,
+        worker_id: str,
+        types: list[str],
+        lease_timeout: int,
+        max_running_per_user: int,
+    ) -> Optional[IngestionJobModel]:
+        """
+        Claim the oldest runnable job: a pending job due to run, or a running
+        job whose worker stopped sending heartbeats. Users already running
+        `max_running_per_user` jobs are skipped. Claims are made with a
+        conditional update, so two workers never claim the same job.
+
+        Stale jobs without attempts left are failed instead of claimed, so a
+        job that keeps killing its worker is not retried forever.
+        """
+        now = int(time.time())
+        stale_before = now - lease_timeout
+
+        with get_db() as db:
+            db.execute(
+                update(IngestionJob)
+                .where(
+                    IngestionJob.type.in_(types),
+                    IngestionJob.status == "running",
+                    IngestionJob.heartbeat_at < stale_before,
+                    IngestionJob.attempts >= IngestionJob.max_attempts,
+                )
+                .values(
+                    status="failed",
+                    error="The worker running this job stopped",
+                    updated_at=now,
+                )
+            )
+            db.commit()
+
+            running = and_(
+                IngestionJob.status == "running",
+                IngestionJob.heartbeat_at >= stale_before,
+            )
+            busy_user_ids = (
+                select(IngestionJob.user_id)
+                .where(running)
+                .group_by(IngestionJob.user_id)
+                .having(func.count() >= max_running_per_user)
+            )
+
+            candidates = (
+                db.query(IngestionJob.id, IngestionJob.status, IngestionJob.worker_id)
+                .filter(
+                    IngestionJob.type.in_(types),
+                    or_(
+                        and_(
+                            IngestionJob.status == "pending",
+                            IngestionJob.run_at <= now,
+                        ),
+                        and_(
+                            IngestionJob.status == "running",
+                            IngestionJob.heartbeat_at < stale_before,
+                            IngestionJob.attempts < IngestionJob.max_attempts,
+                        ),
+                    ),
+                    IngestionJob.user_id.not_in(busy_user_ids),
+                )
+                .order_by(IngestionJob.run_at, IngestionJob.created_at)
+                .limit(10)
+                .all()
+            )
+
+            for id, status, previous_worker_id in candidates:
+                result = db.execute(
+                    update(IngestionJob)
+                    .where(
+                        IngestionJob.id == id,
+                        IngestionJob.status == status,
+                        # Re-checked, another worker may have claimed a job of
+                        # the same user since the candidates were read
+                        IngestionJob.user_id.not_in(busy_user_ids),
+                        (
+                            IngestionJob.worker_id == previous_worker_id
+                            if previous_worker_id is not None
+                            else IngestionJob.worker_id.is_(None)
+                        ),
+                    )
+                    .values(
+                        status="running",
+                        worker_id=worker_id,
+                        heartbeat_at=now,
+                        attempts=IngestionJob.attempts + 1,
+                        updated_at=now,
+                    )
+                )
+                db.commit()
+
+                if result.rowcount == 1:
+                    return IngestionJobModel.model_validate(db.get(IngestionJob, id))
+
+            return None
+
+    def update_job_heartbeat_by_ids(self, ids: list[str], worker_id: str):
+        if not ids:
+            return
+
+        with get_db() as db:
+            db.execute(
+                update(IngestionJob)
+                .where(
+                    IngestionJob.id.in_(ids),
+                    IngestionJob.worker_id == worker_id,
+                    IngestionJob.status == "running",
+                )
+                .values(heartbeat_at=int(time.time()))
+            )
+            db.commit()
+
+    def update_job_progress_by_id(
+        self, id: str, worker_id: str, progress: dict
+    ) -> bool:
+        """False if the job was claimed by another worker in the meantime."""
+        now = int(time.time())
+        with get_db() as db:
+            result = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == id, IngestionJob.worker_id == worker_id)
+                .values(progress=progress, heartbeat_at=now, updated_at=now)
+            )
+            db.commit()
+            return result.rowcount == 1
+
+    def finish_job_by_id(
+        self,
+        id: str,
+        worker_id: str,
+        status: str,
+        error: Optional[str] = None,
+        run_at: Optional[int] = None,
+    ):
+        """
+        Set the final `status` of a job, or put it back to "pending" until
+        `run_at` to retry it.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == id, IngestionJob.worker_id == worker_id)
+                .values(
+                    status=status,
+                    error=error,
+                    run_at=run_at if run_at is not None else now,
+                    worker_id=None,
+                    heartbeat_at=None,
+                    updated_at=now,
+                )
+            )
+            db.commit()
+
+    def delete_jobs_by_updated_at(self, before: int) -> int:
+        """Delete completed and failed jobs last updated before `before`."""
+        with get_db() as db:
+            count = (
+                db.query(IngestionJob)
+                .filter(
+                    IngestionJob.status.in_(["completed", "failed"]),
+                    IngestionJob.updated_at < before,
+                )
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return count
+
+
+IngestionJobs = IngestionJobsTable()
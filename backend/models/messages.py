@@ -9,7 +9,7 @@ from backend.models.users import Users, UserNameResponse
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Index
 from sqlalchemy import or_, func, select, and_, text
 from sqlalchemy.sql import exists
 
@@ -26,6 +26,8 @@ class MessageReaction(Base):
     name = Column(Text)
     created_at = Column(BigInteger)
 
+    __table_args__ = (Index("message_reaction_message_id_idx", "message_id"),)
+
 
 class MessageReactionModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -54,6 +56,19 @@ class Message(Base):
     created_at = Column(BigInteger)  # time_ns
     updated_at = Column(BigInteger)  # time_ns
 
+    __table_args__ = (
+        # Keyset pagination of channel messages and thread replies
+        Index(
+            "message_channel_id_parent_id_created_at_idx",
+            "channel_id",
+            "parent_id",
+            "created_at",
+            "id",
+        ),
+        # Reply counts of a page of messages
+        Index("message_parent_id_idx", "parent_id"),
+    )
+
 
 class MessageModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -106,6 +121,16 @@ class MessageResponse(MessageReplyToResponse):
     reactions: list[Reactions]
 
 
+def encode_message_cursor(message: MessageModel) -> str:
+    return f"{message.created_at}:{message.id}"
+
+
+def decode_message_cursor(cursor: str) -> tuple[int, str]:
+    """Raises ValueError on a malformed cursor"""
+    created_at, id = cursor.split(":", 1)
+    return int(created_at), id
+
+
 class MessageTable:
     def insert_new_message(
         self, form_data: MessageForm, channel_id: str, user_id: str
@@ -135,66 +160,126 @@ class MessageTable:
             db.refresh(result)
             return MessageModel.model_validate(result) if result else None
 
+    def _get_users_by_ids(self, user_ids: set[str]) -> dict[str, UserNameResponse]:
+        if not user_ids:
+            return {}
+        return {
+            user.id: UserNameResponse(**user.model_dump())
+            for user in Users.get_users_by_user_ids(list(user_ids))
+        }
+
+    def _get_thread_stats_by_message_ids(
+        self, db, ids: list[str]
+    ) -> dict[str, tuple[int, int]]:
+        """Reply count and latest reply timestamp of each thread, in one query"""
+        if not ids:
+            return {}
+        return {
+            parent_id: (reply_count, latest_reply_at)
+            for parent_id, reply_count, latest_reply_at in db.query(
+                Message.parent_id,
+                func.count(Message.id),
+                func.max(Message.created_at),
+            )
+            .filter(Message.parent_id.in_(ids))
+            .group_by(Message.parent_id)
+            .all()
+        }
+
+    def _get_message_responses(
+        self, db, messages: list[Message], thread_stats: bool = True
+    ) -> list[MessageResponse]:
+        """
+        Attach users, reply-to messages, reactions and (optionally) thread
+        statistics to `messages` with a constant number of grouped queries.
+        """
+        reply_to_ids = {
+            message.reply_to_id for message in messages if message.reply_to_id
+        }
+        reply_to_messages = (
+            {
+                message.id: message
+                for message in db.query(Message)
+                .filter(Message.id.in_(reply_to_ids))
+                .all()
+            }
+            if reply_to_ids
+            else {}
+        )
+
+        users = self._get_users_by_ids(
+            {message.user_id for message in messages}
+            | {message.user_id for message in reply_to_messages.values()}
+        )
+
+        ids = [message.id for message in messages]
+        reactions = self.get_reactions_by_message_ids(ids)
+        stats = self._get_thread_stats_by_message_ids(db, ids) if thread_stats else {}
+
+        responses = []
+        for message in messages:
+            reply_to_message = reply_to_messages.get(message.reply_to_id)
+            reply_count, latest_reply_at = stats.get(message.id, (0, None))
+
+            responses.append(
+                MessageResponse.model_validate(
+                    {
+                        **MessageModel.model_validate(message).model_dump(),
+                        "user": users.get(message.user_id),
+                        "reply_to_message": (
+                            {
+                                **MessageModel.model_validate(
+                                    reply_to_message
+                                ).model_dump(),
+                                "user": users.get(reply_to_message.user_id),
+                            }
+                            if reply_to_message
+                            else None
+                        ),
+                        "latest_reply_at": latest_reply_at,
+                        "reply_count": reply_count,
+                        "reactions": reactions.get(message.id, []),
+                    }
+                )
+            )
+        return responses
+
+    def _paginate(self, query, skip: int, limit: int, cursor: Optional[str]):
+        """Newest first, keyset paginated on (created_at, id) when a cursor is given"""
+        if cursor:
+            created_at, id = decode_message_cursor(cursor)
+            query = query.filter(
+                or_(
+                    Message.created_at < created_at,
+                    and_(Message.created_at == created_at, Message.id < id),
+                )
+            )
+        elif skip:
+            query = query.offset(skip)
+
+        return (
+            query.order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(limit)
+            .all()
+        )
+
     def get_message_by_id(self, id: str) -> Optional[MessageResponse]:
         with get_db() as db:
             message = db.get(Message, id)
             if not message:
                 return None
 
-            reply_to_message = (
-                self.get_message_by_id(message.reply_to_id)
-                if message.reply_to_id
-                else None
-            )
-
-            reactions = self.get_reactions_by_message_id(id)
-            thread_replies = self.get_thread_replies_by_message_id(id)
-
-            user = Users.get_user_by_id(message.user_id)
-            return MessageResponse.model_validate(
-                {
-                    **MessageModel.model_validate(message).model_dump(),
-                    "user": user.model_dump() if user else None,
-                    "reply_to_message": (
-                        reply_to_message.model_dump() if reply_to_message else None
-                    ),
-                    "latest_reply_at": (
-                        thread_replies[0].created_at if thread_replies else None
-                    ),
-                    "reply_count": len(thread_replies),
-                    "reactions": reactions,
-                }
-            )
+            return self._get_message_responses(db, [message])[0]
 
-    def get_thread_replies_by_message_id(self, id: str) -> list[MessageReplyToResponse]:
+    def get_thread_replies_by_message_id(self, id: str) -> list[MessageResponse]:
         with get_db() as db:
             all_messages = (
                 db.query(Message)
                 .filter_by(parent_id=id)
-                .order_by(Message.created_at.desc())
+                .order_by(Message.created_at.desc(), Message.id.desc())
                 .all()
             )
-
-            messages = []
-            for message in all_messages:
-                reply_to_message = (
-                    self.get_message_by_id(message.reply_to_id)
-                    if message.reply_to_id
-                    else None
-                )
-                messages.append(
-                    MessageReplyToResponse.model_validate(
-                        {
-                            **MessageModel.model_validate(message).model_dump(),
-                            "reply_to_message": (
-                                reply_to_message.model_dump()
-                                if reply_to_message
-                                else None
-                            ),
-                        }
-                    )
-                )
-            return messages
+            return self._get_message_responses(db, all_messages, thread_stats=False)
 
     def get_reply_user_ids_by_message_id(self, id: str) -> list[str]:
         with get_db() as db:
@@ -204,81 +289,47 @@ class MessageTable:
             ]
 
     def get_messages_by_channel_id(
-        self, channel_id: str, skip: int = 0, limit: int = 50
-    ) -> list[MessageReplyToResponse]:
+        self,
+        channel_id: str,
+        skip: int = 0,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> list[MessageResponse]:
         with get_db() as db:
-            all_messages = (
-                db.query(Message)
-                .filter_by(channel_id=channel_id, parent_id=None)
-                .order_by(Message.created_at.desc())
-                .offset(skip)
-                .limit(limit)
-                .all()
+            all_messages = self._paginate(
+                db.query(Message).filter_by(channel_id=channel_id, parent_id=None),
+                skip,
+                limit,
+                cursor,
             )
-
-            messages = []
-            for message in all_messages:
-                reply_to_message = (
-                    self.get_message_by_id(message.reply_to_id)
-                    if message.reply_to_id
-                    else None
-                )
-                messages.append(
-                    MessageReplyToResponse.model_validate(
-                        {
-                            **MessageModel.model_validate(message).model_dump(),
-                            "reply_to_message": (
-                                reply_to_message.model_dump()
-                                if reply_to_message
-                                else None
-                            ),
-                        }
-                    )
-                )
-            return messages
+            return self._get_message_responses(db, all_messages)
 
     def get_messages_by_parent_id(
-        self, channel_id: str, parent_id: str, skip: int = 0, limit: int = 50
-    ) -> list[MessageReplyToResponse]:
+        self,
+        channel_id: str,
+        parent_id: str,
+        skip: int = 0,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> list[MessageResponse]:
         with get_db() as db:
             message = db.get(Message, parent_id)
 
             if not message:
                 return []
 
-            all_messages = (
-                db.query(Message)
-                .filter_by(channel_id=channel_id, parent_id=parent_id)
-                .order_by(Message.created_at.desc())
-                .offset(skip)
-                .limit(limit)
-                .all()
+            all_messages = self._paginate(
+                db.query(Message).filter_by(channel_id=channel_id, parent_id=parent_id),
+                skip,
+                limit,
+                cursor,
             )
 
             # If length of all_messages is less than limit, then add the parent message
             if len(all_messages) < limit:
                 all_messages.append(message)
 
-            messages = []
-            for message in all_messages:
-                reply_to_message = (
-                    self.get_message_by_id(message.reply_to_id)
-                    if message.reply_to_id
-                    else None
-                )
-                messages.append(
-                    MessageReplyToResponse.model_validate(
-                        {
-                            **MessageModel.model_validate(message).model_dump(),
-                            "reply_to_message": (
-                                reply_to_message.model_dump()
-                                if reply_to_message
-                                else None
-                            ),
-                        }
-                    )
-                )
-            return messages
+            return self._get_message_responses(db, all_messages, thread_stats=False)
 
     def update_message_by_id(
         self, id: str, form_data: MessageForm
@@ -318,21 +369,40 @@ class MessageTable:
             return MessageReactionModel.model_validate(result) if result else None
 
     def get_reactions_by_message_id(self, id: str) -> list[Reactions]:
+        return self.get_reactions_by_message_ids([id]).get(id, [])
+
+    def get_reactions_by_message_ids(
+        self, ids: list[str]
+    ) -> dict[str, list[Reactions]]:
+        if not ids:
+            return {}
+
         with get_db() as db:
-            all_reactions = db.query(MessageReaction).filter_by(message_id=id).all()
+            all_reactions = (
+                db.query(MessageReaction)
+                .filter(MessageReaction.message_id.in_(ids))
+                .order_by(MessageReaction.created_at)
+                .all()
+            )
 
             reactions = {}
             for reaction in all_reactions:
-                if reaction.name not in reactions:
-                    reactions[reaction.name] = {
+                message_reactions = reactions.setdefault(reaction.message_id, {})
+                if reaction.name not in message_reactions:
+                    message_reactions[reaction.name] = {
                         "name": reaction.name,
                         "user_ids": [],
                         "count": 0,
                     }
-                reactions[reaction.name]["user_ids"].append(reaction.user_id)
-                reactions[reaction.name]["count"] += 1
-
-            return [Reactions(**reaction) for reaction in reactions.values()]
+                message_reactions[reaction.name]["user_ids"].append(reaction.user_id)
+                message_reactions[reaction.name]["count"] += 1
+
+            return {
+                message_id: [
+                    Reactions(**reaction) for reaction in message_reactions.values()
+                ]
+                for message_id, message_reactions in reactions.items()
+            }
 
     def remove_reaction_by_id_and_user_id_and_name(
         self, id: str, user_id: str, name: str
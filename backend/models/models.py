@@ -215,6 +215,13 @@ class ModelsTable:
             or has_access(user_id, permission, model.access_control, user_group_ids)
         ]
 
+    def get_models_version(self) -> tuple:
+        """Changes whenever a model is added, removed or updated"""
+        with get_db() as db:
+            return tuple(
+                db.query(func.count(Model.id), func.max(Model.updated_at)).one()
+            )
+
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
         try:
             with get_db() as db:
@@ -247,7 +254,12 @@ class ModelsTable:
                 result = (
                     db.query(Model)
                     .filter_by(id=id)
-                    .update(model.model_dump(exclude={"id"}))
+                    .update(
+                        {
+                            **model.model_dump(exclude={"id"}),
+                            "updated_at": int(time.time()),
+                        }
+                    )
                 )
                 db.commit()
 
@@ -0,0 +1,310 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from backend.config import (
+    RAG_EMBEDDING_CACHE_PATH,
+    RAG_EMBEDDING_CACHE_MAX_SIZE_MB,
+    RAG_EMBEDDING_CACHE_MEMORY_ENTRIES,
+)
+from backend.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# SQLite caps the number of bound parameters per statement
+_QUERY_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (engine, model, prefix,
+    sha256(text)).
+
+    Vectors live in a SQLite file as float32 blobs, fronted by an in-memory
+    LRU tier. The file is bounded by size: once it grows past `max_size_mb`
+    the least recently used vectors are evicted down to 90% of the limit.
+    """
+
+    def __init__(
+        self,
+        path: str = RAG_EMBEDDING_CACHE_PATH,
+        max_size_mb: int = RAG_EMBEDDING_CACHE_MAX_SIZE_MB,
+        memory_entries: int = RAG_EMBEDDING_CACHE_MEMORY_ENTRIES,
+    ):
+        self.path = path
+        self.max_size = max_size_mb * 1024 * 1024
+        self.memory_entries = memory_entries
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[tuple, list[float]] = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._size = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def get_text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embedding (
+                    engine TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prefix TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    PRIMARY KEY (engine, model, prefix, text_hash)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS embedding_last_used_idx ON embedding (last_used)"
+            )
+            conn.commit()
+
+            self._size = conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embedding"
+            ).fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: tuple, vector: list[float]):
+        if self.memory_entries <= 0:
+            return
+
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(
+        self, engine: str, model: str, prefix: Optional[str], text_hashes: list[str]
+    ) -> dict[str, list[float]]:
+        prefix = prefix or ""
+        found = {}
+
+        with self._lock:
+            missing = []
+            for text_hash in dict.fromkeys(text_hashes):
+                key = (engine, model, prefix, text_hash)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[text_hash] = vector
+                else:
+                    missing.append(text_hash)
+
+            self.hits_memory += len(found)
+
+            try:
+                conn = self._get_conn()
+                now = int(time.time())
+
+                for idx in range(0, len(missing), _QUERY_BATCH_SIZE):
+                    batch = missing[idx : idx + _QUERY_BATCH_SIZE]
+                    rows = conn.execute(
+                        "SELECT text_hash, vector FROM embedding "
+                        "WHERE engine = ? AND model = ? AND prefix = ? "
+                        f"AND text_hash IN ({','.join('?' * len(batch))})",
+                        (engine, model, prefix, *batch),
+                    ).fetchall()
+
+                    for text_hash, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                        found[text_hash] = vector
+                        self._remember((engine, model, prefix, text_hash), vector)
+
+                    if rows:
+                        self.hits_disk += len(rows)
+                        conn.executemany(
+                            "UPDATE embedding SET last_used = ? "
+                            "WHERE engine = ? AND model = ? AND prefix = ? AND text_hash = ?",
+                            [(now, engine, model, prefix, row[0]) for row in rows],
+                        )
+                conn.commit()
+            except Exception as e:
+                log.exception(f"Error reading embedding cache: {e}")
+
+            self.misses += len(text_hashes) - len(
+                [text_hash for text_hash in text_hashes if text_hash in found]
+            )
+
+        return found
+
+    def set_many(
+        self,
+        engine: str,
+        model: str,
+        prefix: Optional[str],
+        vectors: dict[str, list[float]],
+    ):
+        prefix = prefix or ""
+
+        with self._lock:
+            for text_hash, vector in vectors.items():
+                self._remember((engine, model, prefix, text_hash), vector)
+
+            try:
+                conn = self._get_conn()
+                now = int(time.time())
+
+                rows = [
+                    (
+                        engine,
+                        model,
+                        prefix,
+                        text_hash,
+                        np.asarray(vector, dtype=np.float32).tobytes(),
+                        now,
+                    )
+                    for text_hash, vector in vectors.items()
+                ]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embedding "
+                    "(engine, model, prefix, text_hash, vector, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._size += sum(len(row[4]) for row in rows)
+
+                if self._size > self.max_size:
+                    self._evict(conn)
+                conn.commit()
+            except Exception as e:
+                log.exception(f"Error writing embedding cache: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        # Recount first, replaced rows were added to the running size twice
+        self._size = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embedding"
+        ).fetchone()[0]
+
+        target = int(self.max_size * 0.9)
+        if self._size <= target:
+            return
+
+        evicted = 0
+        while self._size > target:
+            rows = conn.execute(
+                "SELECT rowid, LENGTH(vector) FROM embedding ORDER BY last_used LIMIT ?",
+                (_QUERY_BATCH_SIZE,),
+            ).fetchall()
+            if not rows:
+                break
+
+            rowids = []
+            for rowid, size in rows:
+                if self._size <= target:
+                    break
+                rowids.append((rowid,))
+                self._size -= size
+
+            conn.executemany("DELETE FROM embedding WHERE rowid = ?", rowids)
+            evicted += len(rowids)
+
+        self.evictions += evicted
+        log.debug(f"Evicted {evicted} embeddings from the embedding cache")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._get_conn()
+                conn.execute("DELETE FROM embedding")
+                conn.commit()
+                self._size = 0
+            except Exception as e:
+                log.exception(f"Error clearing embedding cache: {e}")
+
+    def get_stats(self) -> dict:
+        requests = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.hits_memory + self.hits_disk) / requests if requests else 0.0
+            ),
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "disk_size_bytes": self._size,
+        }
+
+    def wrap(self, func: Callable, engine: str, model: str) -> Callable:
+        """
+        Wrap an embedding function returned by `get_embedding_function` so
+        only the texts missing from the cache are embedded.
+        """
+
+        def embedding_function(query, prefix=None, user=None):
+            texts = query if isinstance(query, list) else [query]
+            text_hashes = [self.get_text_hash(text) for text in texts]
+
+            vectors = self.get_many(engine, model, prefix, text_hashes)
+            missing = list(
+                dict.fromkeys(
+                    text_hash for text_hash in text_hashes if text_hash not in vectors
+                )
+            )
+
+            if missing:
+                texts_by_hash = dict(zip(text_hashes, texts))
+                embeddings = func(
+                    [texts_by_hash[text_hash] for text_hash in missing],
+                    prefix=prefix,
+                    user=user,
+                )
+
+                if isinstance(embeddings, list) and len(embeddings) == len(missing):
+                    new_vectors = dict(zip(missing, embeddings))
+                else:
+                    # The engine dropped some batches. Don't cache a
+                    # misaligned result: embed the misses again one by one
+                    log.warning("Embedding engine returned an incomplete result")
+                    new_vectors = {}
+                    for text_hash in missing:
+                        embedding = func(
+                            [texts_by_hash[text_hash]], prefix=prefix, user=user
+                        )
+                        if isinstance(embedding, list) and len(embedding) == 1:
+                            new_vectors[text_hash] = embedding[0]
+
+                self.set_many(engine, model, prefix, new_vectors)
+                vectors.update(new_vectors)
+
+            # Texts that still failed are left out, as the engine does
+            embeddings = [
+                vectors[text_hash] for text_hash in text_hashes if text_hash in vectors
+            ]
+            if isinstance(query, list):
+                return embeddings
+            return embeddings[0] if embeddings else None
+
+        return embedding_function
+
+
+EMBEDDING_CACHE = EmbeddingCache()
+
+
+def get_embedding_cache_stats() -> dict:
+    return EMBEDDING_CACHE.get_stats()
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from backend.config import (
+    RAG_RETRIEVAL_MAX_WORKERS,
+    RAG_RETRIEVAL_MAX_CONCURRENCY_PER_REQUEST,
+)
+from backend.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Set for the thread running a request's retrieval, see run_retrieval
+RETRIEVAL_CANCEL_EVENT: ContextVar[Optional[threading.Event]] = ContextVar(
+    "retrieval_cancel_event", default=None
+)
+
+
+class RetrievalCancelledError(Exception):
+    pass
+
+
+class RetrievalExecutor:
+    """
+    Application-wide bounded thread pool for the retrieval fan-out.
+
+    Each request submits at most `max_concurrency_per_request` tasks at a
+    time, so concurrent chats share `max_workers` threads instead of each
+    spawning its own pool. Tasks must not submit to the executor themselves.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = RAG_RETRIEVAL_MAX_WORKERS,
+        max_concurrency_per_request: int = RAG_RETRIEVAL_MAX_CONCURRENCY_PER_REQUEST,
+    ):
+        self.max_workers = max(max_workers, 1)
+        self.max_concurrency_per_request = max(max_concurrency_per_request, 1)
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self._queue_time_last = 0.0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="retrieval"
+                )
+            return self._executor
+
+    def _run(self, submitted_at: float, fn: Callable, args: tuple) -> Any:
+        queue_time = time.perf_counter() - submitted_at
+        with self._lock:
+            self.started += 1
+            self._queue_time_last = queue_time
+            self._queue_time_total += queue_time
+            self._queue_time_max = max(self._queue_time_max, queue_time)
+
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.completed += 1
+
+    def map(self, fn: Callable, args_list: list[tuple], limit: Optional[int] = None):
+        """
+        Run `fn(*args)` for every entry of `args_list` on the shared pool and
+        return the results in order, with at most `limit` in flight.
+
+        Raises RetrievalCancelledError once the request's cancel event is set;
+        tasks not started yet are dropped.
+        """
+        executor = self._get_executor()
+        cancel_event = RETRIEVAL_CANCEL_EVENT.get()
+        limit = limit or self.max_concurrency_per_request
+
+        results = [None] * len(args_list)
+        pending = {}
+        next_idx = 0
+
+        try:
+            while next_idx < len(args_list) or pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RetrievalCancelledError()
+
+                while next_idx < len(args_list) and len(pending) < limit:
+                    future = executor.submit(
+                        self._run, time.perf_counter(), fn, args_list[next_idx]
+                    )
+                    pending[future] = next_idx
+                    next_idx += 1
+                    with self._lock:
+                        self.submitted += 1
+
+                done, _ = wait(
+                    pending,
+                    timeout=0.1 if cancel_event is not None else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+        finally:
+            cancelled = sum(future.cancel() for future in pending)
+            if cancelled:
+                with self._lock:
+                    self.cancelled += cancelled
+                    self.submitted -= cancelled
+
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self.submitted - self.started,
+                "active": self.started - self.completed,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "queue_time_last_ms": self._queue_time_last * 1000,
+                "queue_time_avg_ms": (
+                    self._queue_time_total / self.started * 1000
+                    if self.started
+                    else 0.0
+                ),
+                "queue_time_max_ms": self._queue_time_max * 1000,
+            }
+
+
+RETRIEVAL_EXECUTOR = RetrievalExecutor()
+
+
+def get_retrieval_executor_stats() -> dict:
+    return RETRIEVAL_EXECUTOR.get_stats()
+
+
+async def run_retrieval(func: Callable, request: Optional[Request] = None):
+    """
+    Run the blocking retrieval `func` off the event loop with a cancel event
+    its fan-out honors. The event is set when the awaiting task is cancelled
+    (chat stopped) or, if `request` is given, when its client disconnects.
+    """
+    cancel_event = threading.Event()
+
+    def run():
+        RETRIEVAL_CANCEL_EVENT.set(cancel_event)
+        return func()
+
+    future = asyncio.ensure_future(run_in_threadpool(run))
+    try:
+        while not future.done():
+            await asyncio.wait({future}, timeout=0.5)
+            if (
+                not future.done()
+                and request is not None
+                and await request.is_disconnected()
+            ):
+                log.info("Client disconnected, cancelling retrieval")
+                cancel_event.set()
+                break
+        return await future
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
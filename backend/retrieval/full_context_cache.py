@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from backend.config import (
+    RAG_FULL_CONTEXT_CACHE_MAX_SIZE_MB,
+    RAG_FULL_CONTEXT_CACHE_TTL,
+)
+from backend.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class FullContextCache:
+    """
+    Short-lived in-memory cache of the extracted text of files, keyed by the
+    file hash (the sha256 of that text), so a knowledge base used in full
+    context mode is not read from the database again on every chat turn.
+
+    Entries expire `ttl` seconds after they were stored; once the cached text
+    grows past `max_size_mb` the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        ttl: int = RAG_FULL_CONTEXT_CACHE_TTL,
+        max_size_mb: int = RAG_FULL_CONTEXT_CACHE_MAX_SIZE_MB,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size_mb * 1024 * 1024
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._size = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def get_many(self, hashes: list[Optional[str]]) -> dict[str, str]:
+        found = {}
+        if not self.enabled:
+            return found
+
+        now = time.time()
+        with self._lock:
+            for file_hash in hashes:
+                entry = self._entries.get(file_hash) if file_hash else None
+                if entry is None:
+                    continue
+
+                content, expires_at = entry
+                if expires_at <= now:
+                    self._pop(file_hash)
+                    continue
+
+                self._entries.move_to_end(file_hash)
+                found[file_hash] = content
+        return found
+
+    def set_many(self, contents: dict[str, str]):
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for file_hash, content in contents.items():
+                if not file_hash or content is None or len(content) > self.max_size:
+                    continue
+
+                self._pop(file_hash)
+                self._entries[file_hash] = (content, expires_at)
+                self._size += len(content)
+
+            while self._size > self.max_size and self._entries:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, file_hash: str):
+        entry = self._entries.pop(file_hash, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+FULL_CONTEXT_CACHE = FullContextCache()
@@ -0,0 +1,229 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from fastapi import FastAPI
+from starlette.datastructures import Headers
+from starlette.requests import Request
+
+from backend.config import (
+    RAG_INGESTION_MAX_ATTEMPTS,
+    RAG_INGESTION_MAX_JOBS_PER_USER,
+    RAG_INGESTION_WORKERS,
+)
+from backend.env import SRC_LOG_LEVELS
+from backend.models.ingestion_jobs import IngestionJobModel, IngestionJobs
+from backend.models.users import UserModel, Users
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Seconds without a heartbeat after which a running job is claimed again
+JOB_LEASE_TIMEOUT = 120
+# Seconds before the first retry of a failed job, doubled on each attempt
+JOB_RETRY_DELAY = 10
+# Seconds finished jobs are kept for status and progress queries
+JOB_RETENTION = 7 * 24 * 3600
+
+# Called with the request, the claimed job, its user and a progress callback.
+# The callback stores the job's progress and returns False once the job was
+# claimed by another worker, in which case the handler should stop.
+IngestionJobHandler = Callable[
+    [Request, IngestionJobModel, UserModel, Callable[[dict], bool]], None
+]
+
+
+class IngestionQueue:
+    """
+    Durable queue of file and knowledge processing jobs, stored in the
+    ingestion_job table and run by `workers` threads on every instance.
+
+    Jobs are claimed from the database, so they are shared by all instances
+    and survive restarts: the workers send heartbeats for their jobs, and a
+    job whose heartbeats stop is claimed again. A failed job is retried with
+    a growing delay up to its `max_attempts`. At most `max_jobs_per_user` jobs
+    of a user run at a time, so one large upload cannot hold every worker.
+
+    Handlers are registered per job type by the routers implementing them.
+    """
+
+    def __init__(
+        self,
+        workers: int = RAG_INGESTION_WORKERS,
+        max_jobs_per_user: int = RAG_INGESTION_MAX_JOBS_PER_USER,
+        max_attempts: int = RAG_INGESTION_MAX_ATTEMPTS,
+        poll_interval: float = 2.0,
+    ):
+        self.workers = workers
+        self.max_jobs_per_user = max(max_jobs_per_user, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.poll_interval = poll_interval
+
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handlers: dict[str, IngestionJobHandler] = {}
+
+        self._app: Optional[FastAPI] = None
+        self._threads: list[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+        self._lock = threading.Lock()
+        self._running_job_ids: set[str] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def register(self, type: str, handler: IngestionJobHandler):
+        self.handlers[type] = handler
+
+    def enqueue(
+        self, user_id: str, type: str, data: dict, key: Optional[str] = None
+    ) -> IngestionJobModel:
+        """
+        Store a job for the workers. A job with the same `key` that is not
+        failed is returned instead of enqueueing the work twice.
+        """
+        job = IngestionJobs.insert_new_job(
+            user_id, type, data, key=key, max_attempts=self.max_attempts
+        )
+        self._wake.set()
+        return job
+
+    def start(self, app: FastAPI):
+        if not self.enabled or self._threads:
+            return
+
+        self._app = app
+        self._stop.clear()
+
+        for idx in range(self.workers):
+            self._threads.append(
+                threading.Thread(
+                    target=self._work, name=f"ingestion-{idx}", daemon=True
+                )
+            )
+        self._threads.append(
+            threading.Thread(
+                target=self._maintain, name="ingestion-heartbeat", daemon=True
+            )
+        )
+
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop claiming jobs. Running jobs are left to finish or, if the process
+        exits first, to be claimed again once their lease expires.
+        """
+        self._stop.set()
+        self._wake.set()
+        self._threads = []
+
+    def _get_request(self) -> Request:
+        # The processing stages only read the app state from the request
+        return Request(
+            {
+                "type": "http",
+                "asgi.version": "3.0",
+                "asgi.spec_version": "2.0",
+                "method": "POST",
+                "path": "/internal/ingestion",
+                "query_string": b"",
+                "headers": Headers({}).raw,
+                "client": ("127.0.0.1", 12345),
+                "server": ("127.0.0.1", 80),
+                "scheme": "http",
+                "app": self._app,
+            }
+        )
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = IngestionJobs.claim_next_job(
+                    self.worker_id,
+                    list(self.handlers),
+                    JOB_LEASE_TIMEOUT,
+                    self.max_jobs_per_user,
+                )
+            except Exception as e:
+                log.error(f"Error claiming an ingestion job: {e}")
+                job = None
+
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            self._run(job)
+
+    def _run(self, job: IngestionJobModel):
+        with self._lock:
+            self._running_job_ids.add(job.id)
+
+        log.info(f"Running ingestion job {job.id} ({job.type}, attempt {job.attempts})")
+        try:
+            user = Users.get_user_by_id(job.user_id)
+            if user is None:
+                IngestionJobs.finish_job_by_id(
+                    job.id, self.worker_id, "failed", error="User not found"
+                )
+                return
+
+            self.handlers[job.type](
+                self._get_request(),
+                job,
+                user,
+                lambda progress: IngestionJobs.update_job_progress_by_id(
+                    job.id, self.worker_id, progress
+                ),
+            )
+            IngestionJobs.finish_job_by_id(job.id, self.worker_id, "completed")
+        except Exception as e:
+            error = str(e.detail) if hasattr(e, "detail") else str(e)
+
+            if job.attempts < job.max_attempts:
+                delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+                log.warning(
+                    f"Ingestion job {job.id} failed, retrying in {delay}s: {error}"
+                )
+                IngestionJobs.finish_job_by_id(
+                    job.id,
+                    self.worker_id,
+                    "pending",
+                    error=error,
+                    run_at=int(time.time()) + delay,
+                )
+            else:
+                log.error(f"Ingestion job {job.id} failed: {error}")
+                IngestionJobs.finish_job_by_id(
+                    job.id, self.worker_id, "failed", error=error
+                )
+        finally:
+            with self._lock:
+                self._running_job_ids.discard(job.id)
+
+    def _maintain(self):
+        cleaned_at = 0.0
+        while not self._stop.wait(JOB_LEASE_TIMEOUT / 4):
+            try:
+                with self._lock:
+                    job_ids = list(self._running_job_ids)
+                IngestionJobs.update_job_heartbeat_by_ids(job_ids, self.worker_id)
+
+                if time.time() - cleaned_at > 3600:
+                    cleaned_at = time.time()
+                    IngestionJobs.delete_jobs_by_updated_at(
+                        int(cleaned_at) - JOB_RETENTION
+                    )
+            except Exception as e:
+                log.error(f"Error updating the ingestion jobs: {e}")
+
+
+INGESTION_QUEUE = IngestionQueue()
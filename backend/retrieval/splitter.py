@@ -0,0 +1,209 @@
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import Iterator, Optional
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSplitter
+from langchain_text_splitters import MarkdownHeaderTextSplitter
+from langchain_core.documents import Document
+
+from backend.constants import ERROR_MESSAGES
+from backend.env import (
+    RAG_SPLIT_MAX_WORKERS,
+    RAG_SPLIT_PARALLEL_MIN_SIZE,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Headers to split on - covering most common markdown header levels
+MARKDOWN_HEADERS_TO_SPLIT_ON = [
+    ("#", "Header 1"),
+    ("##", "Header 2"),
+    ("###", "Header 3"),
+    ("####", "Header 4"),
+    ("#####", "Header 5"),
+    ("######", "Header 6"),
+]
+
+
+@lru_cache(maxsize=8)
+def get_text_splitter(
+    text_splitter: str, chunk_size: int, chunk_overlap: int, encoding_name: str
+):
+    """
+    The splitter for the TEXT_SPLITTER setting, shared by all calls (and kept
+    by each worker process) so the tiktoken encoding is only loaded once.
+    For "markdown_header" this is the splitter applied to each section.
+    """
+    if text_splitter in ["", "character", "markdown_header"]:
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,
+        )
+    elif text_splitter == "token":
+        return TokenTextSplitter(
+            encoding_name=encoding_name,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,
+        )
+    else:
+        raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
+
+
+@lru_cache(maxsize=1)
+def get_markdown_header_splitter() -> MarkdownHeaderTextSplitter:
+    return MarkdownHeaderTextSplitter(
+        headers_to_split_on=MARKDOWN_HEADERS_TO_SPLIT_ON,
+        strip_headers=False,  # Keep headers in content for context
+    )
+
+
+def split_documents(
+    docs: list[Document],
+    text_splitter: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    encoding_name: str,
+) -> list[Document]:
+    splitter = get_text_splitter(
+        text_splitter, chunk_size, chunk_overlap, encoding_name
+    )
+
+    if text_splitter != "markdown_header":
+        return splitter.split_documents(docs)
+
+    md_split_docs = []
+    for doc in docs:
+        md_header_splits = get_markdown_header_splitter().split_text(doc.page_content)
+        md_header_splits = splitter.split_documents(md_header_splits)
+
+        # Convert back to Document objects, preserving original metadata
+        for split_chunk in md_header_splits:
+            headings_list = []
+            # Extract header values in order based on MARKDOWN_HEADERS_TO_SPLIT_ON
+            for _, header_meta_key_name in MARKDOWN_HEADERS_TO_SPLIT_ON:
+                if header_meta_key_name in split_chunk.metadata:
+                    headings_list.append(split_chunk.metadata[header_meta_key_name])
+
+            md_split_docs.append(
+                Document(
+                    page_content=split_chunk.page_content,
+                    metadata={**doc.metadata, "headings": headings_list},
+                )
+            )
+
+    return md_split_docs
+
+
+class DocumentSplitter:
+    """
+    Splits the documents of an ingestion into chunks on a pool of worker
+    processes, the step being CPU bound.
+
+    Documents are grouped into batches that are split concurrently, and the
+    chunks are yielded batch by batch in document order, so the caller can
+    embed the first chunks while the others are still being split. Smaller
+    ingestions (under `parallel_min_size` characters) are split in the
+    calling thread. A document is never split across batches, so a single
+    large document is split by one process.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = RAG_SPLIT_MAX_WORKERS,
+        parallel_min_size: int = RAG_SPLIT_PARALLEL_MIN_SIZE,
+    ):
+        self.max_workers = max_workers
+        self.parallel_min_size = parallel_min_size
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Not forked, the server process runs many threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=get_context("spawn")
+                )
+            return self._executor
+
+    def _get_batches(self, docs: list[Document], size: int) -> list[list[Document]]:
+        # A few batches per worker, so a slow batch does not idle the others
+        batch_size = max(size // (self.max_workers * 4), self.parallel_min_size // 4)
+
+        batches, batch, batch_length = [], [], 0
+        for doc in docs:
+            batch.append(doc)
+            batch_length += len(doc.page_content)
+            if batch_length >= batch_size:
+                batches.append(batch)
+                batch, batch_length = [], 0
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+    def iter_split_documents(
+        self,
+        docs: list[Document],
+        text_splitter: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        encoding_name: str,
+    ) -> Iterator[list[Document]]:
+        """
+        Yield the chunks of `docs` batch by batch. Batches not consumed when
+        the generator is closed are cancelled.
+        """
+        args = (text_splitter, chunk_size, chunk_overlap, encoding_name)
+        # Fails early on an invalid setting, and loads the encoding once in
+        # this process before the workers do
+        get_text_splitter(*args)
+
+        size = sum(len(doc.page_content) for doc in docs)
+        if self.max_workers <= 1 or size < self.parallel_min_size:
+            yield split_documents(docs, *args)
+            return
+
+        batches = self._get_batches(docs, size)
+        try:
+            futures = [
+                self._get_executor().submit(split_documents, batch, *args)
+                for batch in batches
+            ]
+        except BrokenProcessPool:
+            self.shutdown()
+            futures = []
+
+        try:
+            for idx, batch in enumerate(batches):
+                try:
+                    if idx < len(futures):
+                        yield futures[idx].result()
+                        continue
+                except BrokenProcessPool as e:
+                    log.warning(f"Document splitting pool failed, splitting here: {e}")
+                    self.shutdown()
+                    futures = futures[:idx]
+
+                yield split_documents(batch, *args)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+DOCUMENT_SPLITTER = DocumentSplitter()
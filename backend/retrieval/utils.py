@@ -2,13 +2,16 @@ import logging
 import os
 from typing import Optional, Union
 
-import requests
-import hashlib
-from concurrent.futures import ThreadPoolExecutor
 import time
 import re
+import random
+import asyncio
+import threading
 
-from urllib.parse import quote
+import aiohttp
+import numpy as np
+
+from urllib.parse import quote, urlparse
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
@@ -19,15 +22,20 @@ from backend.retrieval.vector.factory import VECTOR_DB_CLIENT
 
 
 from backend.models.users import UserModel
-from backend.models.files import Files
+from backend.models.files import FileContentModel, Files
 from backend.models.knowledge import Knowledges
 
 from backend.models.chats import Chats
 from backend.models.notes import Notes
 
 from backend.retrieval.vector.main import GetResult
+from backend.retrieval.embedding_cache import EMBEDDING_CACHE
+from backend.retrieval.full_context_cache import FULL_CONTEXT_CACHE
+from backend.retrieval.executor import RETRIEVAL_EXECUTOR, RetrievalCancelledError
+from backend.models.bm25 import BM25Indexes
 from backend.utils.access_control import has_access
 from backend.utils.misc import get_message_list
+from backend.utils.session_pool import ClientSessionPool
 
 from backend.retrieval.web.utils import get_web_loader
 from backend.retrieval.loaders.youtube import YoutubeLoader
@@ -35,6 +43,7 @@ from backend.retrieval.loaders.youtube import YoutubeLoader
 
 from backend.env import (
     PROXIES,
+    AIOHTTP_CLIENT_TIMEOUT,
     SRC_LOG_LEVELS,
     OFFLINE_MODE,
     ENABLE_FORWARD_USER_INFO_HEADERS,
@@ -43,6 +52,10 @@ from backend.config import (
     RAG_EMBEDDING_QUERY_PREFIX,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_PREFIX_FIELD_NAME,
+    RAG_EMBEDDING_CONCURRENT_REQUESTS,
+    RAG_EMBEDDING_MAX_RETRIES,
+    ENABLE_RAG_EMBEDDING_CACHE,
+    ENABLE_RAG_BM25_INDEX,
 )
 
 log = logging.getLogger(__name__)
@@ -114,6 +127,22 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25IndexRetriever(BaseRetriever):
+    collection_name: Any
+    top_k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        return [
+            Document(metadata=result.metadata, page_content=result.text)
+            for result in BM25Indexes.search(self.collection_name, query, self.top_k)
+        ]
+
+
 def query_doc(
     collection_name: str, query_embedding: list[float], k: int, user: UserModel = None
 ):
@@ -150,7 +179,7 @@ def get_doc(collection_name: str, user: UserModel = None):
 
 def query_doc_with_hybrid_search(
     collection_name: str,
-    collection_result: GetResult,
+    collection_result: Optional[GetResult],
     query: str,
     embedding_function,
     k: int,
@@ -158,25 +187,46 @@ def query_doc_with_hybrid_search(
     k_reranker: int,
     r: float,
     hybrid_bm25_weight: float,
+    user: UserModel = None,
+    indexed: bool = False,
 ) -> dict:
+    """
+    `indexed` tells the collection's BM25 index was already ensured by the
+    caller, e.g. once for all the queries of a collection.
+    """
     try:
-        if (
-            not collection_result
-            or not hasattr(collection_result, "documents")
-            or not collection_result.documents
-            or len(collection_result.documents) == 0
-            or not collection_result.documents[0]
-        ):
+        if ENABLE_RAG_BM25_INDEX:
+            # The persistent index only reads the postings of the query terms
+            has_docs = indexed or VECTOR_DB_CLIENT.ensure_index(collection_name)
+        else:
+            if collection_result is None:
+                collection_result = VECTOR_DB_CLIENT.get(
+                    collection_name=collection_name
+                )
+            has_docs = (
+                collection_result
+                and hasattr(collection_result, "documents")
+                and collection_result.documents
+                and len(collection_result.documents) > 0
+                and collection_result.documents[0]
+            )
+
+        if not has_docs:
             log.warning(f"query_doc_with_hybrid_search:no_docs {collection_name}")
             return {"documents": [], "metadatas": [], "distances": []}
 
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
 
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
-        )
-        bm25_retriever.k = k
+        if ENABLE_RAG_BM25_INDEX:
+            bm25_retriever = BM25IndexRetriever(
+                collection_name=collection_name, top_k=k
+            )
+        else:
+            bm25_retriever = BM25Retriever.from_texts(
+                texts=collection_result.documents[0],
+                metadatas=collection_result.metadatas[0],
+            )
+            bm25_retriever.k = k
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
@@ -264,9 +314,23 @@ def merge_get_results(get_results: list[dict]) -> dict:
     return result
 
 
+def get_chunk_key(id: Optional[str], document: str, metadata: Optional[dict]):
+    """
+    Identity of a retrieved chunk: its file's hash and position, which a
+    copy stored under another id (e.g. a file and its knowledge base) shares,
+    otherwise its id, and only for results with neither its text.
+    """
+    metadata = metadata or {}
+    if metadata.get("hash") is not None and metadata.get("start_index") is not None:
+        return ("chunk", metadata["hash"], metadata["start_index"], len(document))
+    if id is not None:
+        return ("id", id)
+    return ("document", document)
+
+
 def merge_and_sort_query_results(query_results: list[dict], k: int) -> dict:
-    # Initialize lists to store combined data
-    combined = dict()  # To store documents with unique document hashes
+    # Flatten the results of every collection/query into parallel lists
+    all_keys, all_distances, all_documents, all_metadatas = [], [], [], []
 
     for data in query_results:
         if (
@@ -276,38 +340,61 @@ def merge_and_sort_query_results(query_results: list[dict], k: int) -> dict:
         ):
             continue
 
-        distances = data["distances"][0]
         documents = data["documents"][0]
-        metadatas = data["metadatas"][0]
+        ids = (data.get("ids") or [None])[0] or [None] * len(documents)
 
-        for distance, document, metadata in zip(distances, documents, metadatas):
+        for id, distance, document, metadata in zip(
+            ids, data["distances"][0], documents, data["metadatas"][0]
+        ):
             if isinstance(document, str):
-                doc_hash = hashlib.sha256(
-                    document.encode()
-                ).hexdigest()  # Compute a hash for uniqueness
+                all_keys.append(get_chunk_key(id, document, metadata))
+                all_distances.append(distance)
+                all_documents.append(document)
+                all_metadatas.append(metadata)
 
-                if doc_hash not in combined.keys():
-                    combined[doc_hash] = (distance, document, metadata)
-                    continue  # if doc is new, no further comparison is needed
+    sorted_distances, sorted_documents, sorted_metadatas = [], [], []
 
-                # if doc is alredy in, but new distance is better, update
-                if distance > combined[doc_hash][0]:
-                    combined[doc_hash] = (distance, document, metadata)
+    if all_documents:
+        distances = np.array(
+            [-np.inf if distance is None else distance for distance in all_distances],
+            dtype=np.float64,
+        )
 
-    combined = list(combined.values())
-    # Sort the list based on distances
-    combined.sort(key=lambda x: x[0], reverse=True)
+        # Only the best candidates are sorted; widen the partition when
+        # duplicates leave fewer than k unique chunks in it
+        selected = []
+        size = min(k, len(distances))
+        while size > 0:
+            if size < len(distances):
+                candidates = np.argpartition(-distances, size - 1)[:size]
+            else:
+                candidates = np.arange(len(distances))
+            candidates = candidates[np.argsort(-distances[candidates], kind="stable")]
 
-    # Slice to keep only the top k elements
-    sorted_distances, sorted_documents, sorted_metadatas = (
-        zip(*combined[:k]) if combined else ([], [], [])
-    )
+            seen_keys = set()
+            selected = []
+            for idx in candidates.tolist():
+                if all_keys[idx] in seen_keys:
+                    continue
+
+                seen_keys.add(all_keys[idx])
+                selected.append(idx)
+                if len(selected) == k:
+                    break
+
+            if len(selected) == k or size == len(distances):
+                break
+            size = min(size * 2, len(distances))
+
+        sorted_distances = [all_distances[idx] for idx in selected]
+        sorted_documents = [all_documents[idx] for idx in selected]
+        sorted_metadatas = [all_metadatas[idx] for idx in selected]
 
     # Create and return the output dictionary
     return {
-        "distances": [list(sorted_distances)],
-        "documents": [list(sorted_documents)],
-        "metadatas": [list(sorted_metadatas)],
+        "distances": [sorted_distances],
+        "documents": [sorted_documents],
+        "metadatas": [sorted_metadatas],
     }
 
 
@@ -358,15 +445,14 @@ def query_collection(
         f"query_collection: processing {len(queries)} queries across {len(collection_names)} collections"
     )
 
-    with ThreadPoolExecutor() as executor:
-        future_results = []
-        for query_embedding in query_embeddings:
-            for collection_name in collection_names:
-                result = executor.submit(
-                    process_query_collection, collection_name, query_embedding
-                )
-                future_results.append(result)
-        task_results = [future.result() for future in future_results]
+    task_results = RETRIEVAL_EXECUTOR.map(
+        process_query_collection,
+        [
+            (collection_name, query_embedding)
+            for query_embedding in query_embeddings
+            for collection_name in collection_names
+        ],
+    )
 
     for result, err in task_results:
         if err is not None:
@@ -397,6 +483,13 @@ def query_collection_with_hybrid_search(
     collection_results = {}
     for collection_name in collection_names:
         try:
+            if ENABLE_RAG_BM25_INDEX:
+                # Only unindexed collections are read, once, to build their index
+                collection_results[collection_name] = (
+                    VECTOR_DB_CLIENT.ensure_index(collection_name) or None
+                )
+                continue
+
             log.debug(
                 f"query_collection_with_hybrid_search:VECTOR_DB_CLIENT.get:collection {collection_name}"
             )
@@ -415,7 +508,11 @@ def query_collection_with_hybrid_search(
         try:
             result = query_doc_with_hybrid_search(
                 collection_name=collection_name,
-                collection_result=collection_results[collection_name],
+                collection_result=(
+                    None
+                    if ENABLE_RAG_BM25_INDEX
+                    else collection_results[collection_name]
+                ),
                 query=query,
                 embedding_function=embedding_function,
                 k=k,
@@ -423,6 +520,8 @@ def query_collection_with_hybrid_search(
                 k_reranker=k_reranker,
                 r=r,
                 hybrid_bm25_weight=hybrid_bm25_weight,
+                # Ensured above, only collections with documents are queried
+                indexed=ENABLE_RAG_BM25_INDEX,
             )
             return result, None
         except Exception as e:
@@ -438,9 +537,7 @@ def query_collection_with_hybrid_search(
         for q in queries
     ]
 
-    with ThreadPoolExecutor() as executor:
-        future_results = [executor.submit(process_query, cn, q) for cn, q in tasks]
-        task_results = [future.result() for future in future_results]
+    task_results = RETRIEVAL_EXECUTOR.map(process_query, tasks)
 
     for result, err in task_results:
         if err is not None:
@@ -466,11 +563,11 @@ def get_embedding_function(
     azure_api_version=None,
 ):
     if embedding_engine == "":
-        return lambda query, prefix=None, user=None: embedding_function.encode(
+        func = lambda query, prefix=None, user=None: embedding_function.encode(
             query, **({"prompt": prefix} if prefix else {})
         ).tolist()
     elif embedding_engine in ["ollama", "openai", "azure_openai"]:
-        func = lambda query, prefix=None, user=None: generate_embeddings(
+        afunc = lambda query, prefix=None, user=None: agenerate_embeddings(
             engine=embedding_engine,
             model=embedding_model,
             text=query,
@@ -481,28 +578,39 @@ def get_embedding_function(
             azure_api_version=azure_api_version,
         )
 
-        def generate_multiple(query, prefix, user, func):
+        async def generate_multiple(query, prefix, user, func):
             if isinstance(query, list):
-                embeddings = []
-                for i in range(0, len(query), embedding_batch_size):
-                    batch_embeddings = func(
-                        query[i : i + embedding_batch_size],
-                        prefix=prefix,
-                        user=user,
-                    )
+                # Batches are dispatched concurrently and reassembled in order
+                batches = await EMBEDDING_CLIENT.gather(
+                    [
+                        func(
+                            query[i : i + embedding_batch_size],
+                            prefix=prefix,
+                            user=user,
+                        )
+                        for i in range(0, len(query), embedding_batch_size)
+                    ]
+                )
 
+                embeddings = []
+                for batch_embeddings in batches:
                     if isinstance(batch_embeddings, list):
                         embeddings.extend(batch_embeddings)
                 return embeddings
             else:
-                return func(query, prefix, user)
+                return await func(query, prefix, user)
 
-        return lambda query, prefix=None, user=None: generate_multiple(
-            query, prefix, user, func
+        func = lambda query, prefix=None, user=None: EMBEDDING_CLIENT.run(
+            generate_multiple(query, prefix, user, afunc)
         )
     else:
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
 
+    if ENABLE_RAG_EMBEDDING_CACHE:
+        # Only texts never embedded with this engine/model/prefix hit the engine
+        return EMBEDDING_CACHE.wrap(func, embedding_engine, embedding_model)
+    return func
+
 
 def get_reranking_function(reranking_engine, reranking_model, reranking_function):
     if reranking_function is None:
@@ -515,6 +623,39 @@ def get_reranking_function(reranking_engine, reranking_model, reranking_function
         return lambda sentences, user=None: reranking_function.predict(sentences)
 
 
+def load_full_context_files(file_ids: list[str], files: dict[str, FileContentModel]):
+    """
+    Add the files of `file_ids` missing from `files` to it, with their
+    extracted content: the contents still cached by hash are only looked up,
+    the others are read in bulk.
+    """
+    missing_ids = [
+        file_id for file_id in dict.fromkeys(file_ids) if file_id not in files
+    ]
+    if not missing_ids:
+        return
+
+    if FULL_CONTEXT_CACHE.enabled:
+        file_hashes = Files.get_file_hashes_by_ids(missing_ids)
+        contents = FULL_CONTEXT_CACHE.get_many([file.hash for file in file_hashes])
+
+        missing_ids = []
+        for file in file_hashes:
+            if file.hash in contents:
+                files[file.id] = file.model_copy(
+                    update={"content": contents[file.hash]}
+                )
+            else:
+                missing_ids.append(file.id)
+
+    if missing_ids:
+        loaded_files = Files.get_file_contents_by_ids(missing_ids)
+        FULL_CONTEXT_CACHE.set_many(
+            {file.hash: file.content for file in loaded_files if file.hash}
+        )
+        files.update({file.id: file for file in loaded_files})
+
+
 def get_sources_from_items(
     request,
     items,
@@ -536,6 +677,30 @@ def get_sources_from_items(
     extracted_collections = []
     query_results = []
 
+    # Files read in full for this request, and the ones already in a source:
+    # a file attached twice, or also part of an attached knowledge base, is
+    # only added once
+    full_context_files = {}
+    extracted_file_ids = set()
+
+    def is_full_context(item) -> bool:
+        return (
+            item.get("context") == "full"
+            or request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL
+        )
+
+    load_full_context_files(
+        [
+            item["id"]
+            for item in items
+            if item.get("type") == "file"
+            and item.get("id")
+            and is_full_context(item)
+            and not item.get("file", {}).get("data", {}).get("content", "")
+        ],
+        full_context_files,
+    )
+
     for item in items:
         query_result = None
         collection_names = []
@@ -623,10 +788,7 @@ def get_sources_from_items(
                     "metadatas": [[{"url": item.get("url"), "name": item.get("url")}]],
                 }
         elif item.get("type") == "file":
-            if (
-                item.get("context") == "full"
-                or request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL
-            ):
+            if is_full_context(item):
                 if item.get("file", {}).get("data", {}).get("content", ""):
                     # Manual Full Mode Toggle
                     # Used from chat file modal, we can assume that the file content will be available from item.get("file").get("data", {}).get("content")
@@ -647,10 +809,16 @@ def get_sources_from_items(
                         ],
                     }
                 elif item.get("id"):
-                    file_object = Files.get_file_by_id(item.get("id"))
+                    if item["id"] in extracted_file_ids:
+                        log.debug(f"skipping {item} as it has already been extracted")
+                        continue
+
+                    load_full_context_files([item["id"]], full_context_files)
+                    file_object = full_context_files.get(item["id"])
                     if file_object:
+                        extracted_file_ids.add(item["id"])
                         query_result = {
-                            "documents": [[file_object.data.get("content", "")]],
+                            "documents": [[file_object.content or ""]],
                             "metadatas": [
                                 [
                                     {
@@ -669,10 +837,7 @@ def get_sources_from_items(
                     collection_names.append(f"file-{item['id']}")
 
         elif item.get("type") == "collection":
-            if (
-                item.get("context") == "full"
-                or request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL
-            ):
+            if is_full_context(item):
                 # Manual Full Mode Toggle for Collection
                 knowledge_base = Knowledges.get_knowledge_by_id(item.get("id"))
 
@@ -683,14 +848,25 @@ def get_sources_from_items(
                 ):
 
                     file_ids = knowledge_base.data.get("file_ids", [])
+                    new_file_ids = [
+                        file_id
+                        for file_id in dict.fromkeys(file_ids)
+                        if file_id not in extracted_file_ids
+                    ]
+                    if file_ids and not new_file_ids:
+                        log.debug(f"skipping {item} as it has already been extracted")
+                        continue
+
+                    load_full_context_files(new_file_ids, full_context_files)
 
                     documents = []
                     metadatas = []
-                    for file_id in file_ids:
-                        file_object = Files.get_file_by_id(file_id)
+                    for file_id in new_file_ids:
+                        file_object = full_context_files.get(file_id)
 
                         if file_object:
-                            documents.append(file_object.data.get("content", ""))
+                            extracted_file_ids.add(file_id)
+                            documents.append(file_object.content or "")
                             metadatas.append(
                                 {
                                     "file_id": file_id,
@@ -748,6 +924,8 @@ def get_sources_from_items(
                                 r=r,
                                 hybrid_bm25_weight=hybrid_bm25_weight,
                             )
+                        except RetrievalCancelledError:
+                            raise
                         except Exception as e:
                             log.debug(
                                 "Error when using hybrid search, using non hybrid search as fallback."
@@ -761,6 +939,8 @@ def get_sources_from_items(
                             embedding_function=embedding_function,
                             k=k,
                         )
+            except RetrievalCancelledError:
+                raise
             except Exception as e:
                 log.exception(e)
 
@@ -831,7 +1011,132 @@ def get_model_path(model: str, update_model: bool = False):
         return model
 
 
-def generate_openai_batch_embeddings(
+class EmbeddingClient:
+    """
+    Async HTTP client shared by the OpenAI, Azure OpenAI and Ollama embedding
+    engines.
+
+    Requests run on a dedicated event loop thread with pooled keep-alive
+    sessions, so synchronous callers such as `save_docs_to_vector_db` can
+    dispatch several batches concurrently whether or not they are themselves
+    running inside an event loop. A 429 from an upstream pauses every batch
+    sent to that upstream until its Retry-After (or exponential backoff) has
+    passed, instead of each batch retrying on its own.
+    """
+
+    def __init__(
+        self,
+        concurrent_requests: int = RAG_EMBEDDING_CONCURRENT_REQUESTS,
+        max_retries: int = RAG_EMBEDDING_MAX_RETRIES,
+    ):
+        self.concurrent_requests = max(concurrent_requests, 1)
+        self.max_retries = max(max_retries, 0)
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session_pool: Optional[ClientSessionPool] = None
+        self._backoff_until: dict[str, float] = {}
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="embedding-client", daemon=True
+                ).start()
+
+                self._loop = loop
+                self._session_pool = ClientSessionPool()
+                self._backoff_until = {}
+            return self._loop
+
+    def run(self, coro):
+        """Synchronous facade: run `coro` on the client loop and wait for it"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    async def _wait_for_backoff(self, origin: str):
+        delay = self._backoff_until.get(origin, 0) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _get_retry_delay(self, retry_after: Optional[str], attempt: int) -> float:
+        try:
+            return max(float(retry_after), 0)
+        except (TypeError, ValueError):
+            return min(2**attempt, 60) * (0.5 + random.random() / 2)
+
+    async def post(self, url: str, headers: dict, json_data: dict) -> dict:
+        if self._session_pool is None:
+            self._get_loop()
+
+        origin = ClientSessionPool.get_origin(url)
+        proxy = (PROXIES or {}).get(urlparse(url).scheme)
+        if not (proxy or "").startswith(("http://", "https://")):
+            # aiohttp only speaks HTTP proxies, env proxies are still honored
+            proxy = None
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_backoff(origin)
+
+            session = self._session_pool.get_session(url)
+            async with session.post(
+                url,
+                headers=headers,
+                json=json_data,
+                proxy=proxy,
+                timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
+            ) as r:
+                if r.status == 429 and attempt < self.max_retries:
+                    delay = self._get_retry_delay(r.headers.get("Retry-After"), attempt)
+                    log.warning(
+                        f"Embedding request to {origin} rate limited, retrying in {delay:.1f}s"
+                    )
+                    self._backoff_until[origin] = max(
+                        self._backoff_until.get(origin, 0), time.monotonic() + delay
+                    )
+                    continue
+
+                r.raise_for_status()
+                return await r.json()
+
+    async def gather(self, coros: list) -> list:
+        """Run the coroutines with at most `concurrent_requests` in flight"""
+        semaphore = asyncio.Semaphore(self.concurrent_requests)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(bounded(coro) for coro in coros))
+
+
+EMBEDDING_CLIENT = EmbeddingClient()
+
+
+def get_embedding_headers(
+    key: str = "", user: UserModel = None, auth_header: str = "Authorization"
+) -> dict:
+    return {
+        "Content-Type": "application/json",
+        **(
+            {"api-key": key}
+            if auth_header == "api-key"
+            else {"Authorization": f"Bearer {key}"}
+        ),
+        **(
+            {
+                "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                "X-OpenWebUI-User-Id": user.id,
+                "X-OpenWebUI-User-Email": user.email,
+                "X-OpenWebUI-User-Role": user.role,
+            }
+            if ENABLE_FORWARD_USER_INFO_HEADERS and user
+            else {}
+        ),
+    }
+
+
+async def agenerate_openai_batch_embeddings(
     model: str,
     texts: list[str],
     url: str = "https://api.openai.com/v1",
@@ -841,43 +1146,25 @@ def generate_openai_batch_embeddings(
 ) -> Optional[list[list[float]]]:
     try:
         log.debug(
-            f"generate_openai_batch_embeddings:model {model} batch size: {len(texts)}"
+            f"agenerate_openai_batch_embeddings:model {model} batch size: {len(texts)}"
         )
         json_data = {"input": texts, "model": model}
         if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
             json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
 
-        r = requests.post(
-            f"{url}/embeddings",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            proxies=PROXIES,
-            json=json_data,
+        data = await EMBEDDING_CLIENT.post(
+            f"{url}/embeddings", get_embedding_headers(key, user), json_data
         )
-        r.raise_for_status()
-        data = r.json()
-        if "data" in data:
+        if data and "data" in data:
             return [elem["embedding"] for elem in data["data"]]
         else:
-            raise "Something went wrong :/"
+            raise Exception("Something went wrong :/")
     except Exception as e:
         log.exception(f"Error generating openai batch embeddings: {e}")
         return None
 
 
-def generate_azure_openai_batch_embeddings(
+async def agenerate_azure_openai_batch_embeddings(
     model: str,
     texts: list[str],
     url: str,
@@ -888,7 +1175,7 @@ def generate_azure_openai_batch_embeddings(
 ) -> Optional[list[list[float]]]:
     try:
         log.debug(
-            f"generate_azure_openai_batch_embeddings:deployment {model} batch size: {len(texts)}"
+            f"agenerate_azure_openai_batch_embeddings:deployment {model} batch size: {len(texts)}"
         )
         json_data = {"input": texts}
         if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
@@ -896,43 +1183,19 @@ def generate_azure_openai_batch_embeddings(
 
         url = f"{url}/openai/deployments/{model}/embeddings?api-version={version}"
 
-        for _ in range(5):
-            r = requests.post(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    "api-key": key,
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                json=json_data,
-                proxies=PROXIES
-            )
-            if r.status_code == 429:
-                retry = float(r.headers.get("Retry-After", "1"))
-                time.sleep(retry)
-                continue
-            r.raise_for_status()
-            data = r.json()
-            if "data" in data:
-                return [elem["embedding"] for elem in data["data"]]
-            else:
-                raise Exception("Something went wrong :/")
-        return None
+        data = await EMBEDDING_CLIENT.post(
+            url, get_embedding_headers(key, user, auth_header="api-key"), json_data
+        )
+        if data and "data" in data:
+            return [elem["embedding"] for elem in data["data"]]
+        else:
+            raise Exception("Something went wrong :/")
     except Exception as e:
         log.exception(f"Error generating azure openai batch embeddings: {e}")
         return None
 
 
-def generate_ollama_batch_embeddings(
+async def agenerate_ollama_batch_embeddings(
     model: str,
     texts: list[str],
     url: str,
@@ -942,44 +1205,67 @@ def generate_ollama_batch_embeddings(
 ) -> Optional[list[list[float]]]:
     try:
         log.debug(
-            f"generate_ollama_batch_embeddings:model {model} batch size: {len(texts)}"
+            f"agenerate_ollama_batch_embeddings:model {model} batch size: {len(texts)}"
         )
         json_data = {"input": texts, "model": model}
         if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
             json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
 
-        r = requests.post(
-            f"{url}/api/embed",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS
-                    else {}
-                ),
-            },
-            json=json_data,
-            proxies=PROXIES
+        data = await EMBEDDING_CLIENT.post(
+            f"{url}/api/embed", get_embedding_headers(key, user), json_data
         )
-        r.raise_for_status()
-        data = r.json()
-
-        if "embeddings" in data:
+        if data and "embeddings" in data:
             return data["embeddings"]
         else:
-            raise "Something went wrong :/"
+            raise Exception("Something went wrong :/")
     except Exception as e:
         log.exception(f"Error generating ollama batch embeddings: {e}")
         return None
 
 
-def generate_embeddings(
+def generate_openai_batch_embeddings(
+    model: str,
+    texts: list[str],
+    url: str = "https://api.openai.com/v1",
+    key: str = "",
+    prefix: str = None,
+    user: UserModel = None,
+) -> Optional[list[list[float]]]:
+    return EMBEDDING_CLIENT.run(
+        agenerate_openai_batch_embeddings(model, texts, url, key, prefix, user)
+    )
+
+
+def generate_azure_openai_batch_embeddings(
+    model: str,
+    texts: list[str],
+    url: str,
+    key: str = "",
+    version: str = "",
+    prefix: str = None,
+    user: UserModel = None,
+) -> Optional[list[list[float]]]:
+    return EMBEDDING_CLIENT.run(
+        agenerate_azure_openai_batch_embeddings(
+            model, texts, url, key, version, prefix, user
+        )
+    )
+
+
+def generate_ollama_batch_embeddings(
+    model: str,
+    texts: list[str],
+    url: str,
+    key: str = "",
+    prefix: str = None,
+    user: UserModel = None,
+) -> Optional[list[list[float]]]:
+    return EMBEDDING_CLIENT.run(
+        agenerate_ollama_batch_embeddings(model, texts, url, key, prefix, user)
+    )
+
+
+async def agenerate_embeddings(
     engine: str,
     model: str,
     text: Union[str, list[str]],
@@ -996,35 +1282,37 @@ def generate_embeddings(
         else:
             text = f"{prefix}{text}"
 
+    texts = text if isinstance(text, list) else [text]
+
     if engine == "ollama":
-        embeddings = generate_ollama_batch_embeddings(
-            **{
-                "model": model,
-                "texts": text if isinstance(text, list) else [text],
-                "url": url,
-                "key": key,
-                "prefix": prefix,
-                "user": user,
-            }
+        embeddings = await agenerate_ollama_batch_embeddings(
+            model, texts, url, key, prefix, user
         )
-        return embeddings[0] if isinstance(text, str) else embeddings
     elif engine == "openai":
-        embeddings = generate_openai_batch_embeddings(
-            model, text if isinstance(text, list) else [text], url, key, prefix, user
+        embeddings = await agenerate_openai_batch_embeddings(
+            model, texts, url, key, prefix, user
         )
-        return embeddings[0] if isinstance(text, str) else embeddings
     elif engine == "azure_openai":
         azure_api_version = kwargs.get("azure_api_version", "")
-        embeddings = generate_azure_openai_batch_embeddings(
-            model,
-            text if isinstance(text, list) else [text],
-            url,
-            key,
-            azure_api_version,
-            prefix,
-            user,
+        embeddings = await agenerate_azure_openai_batch_embeddings(
+            model, texts, url, key, azure_api_version, prefix, user
         )
-        return embeddings[0] if isinstance(text, str) else embeddings
+    else:
+        return None
+
+    return embeddings[0] if isinstance(text, str) and embeddings else embeddings
+
+
+def generate_embeddings(
+    engine: str,
+    model: str,
+    text: Union[str, list[str]],
+    prefix: Union[str, None] = None,
+    **kwargs,
+):
+    return EMBEDDING_CLIENT.run(
+        agenerate_embeddings(engine, model, text, prefix, **kwargs)
+    )
 
 
 import operator
@@ -1052,19 +1340,36 @@ class RerankCompressor(BaseDocumentCompressor):
     ) -> Sequence[Document]:
         reranking = self.reranking_function is not None
 
+        if not documents:
+            return []
+
         scores = None
         if reranking:
             scores = self.reranking_function(
                 [(query, doc.page_content) for doc in documents]
             )
         else:
-            from sentence_transformers import util
+            # Embedded exactly as in save_docs_to_vector_db, so the vectors
+            # stored at ingestion are served by the embedding cache instead of
+            # re-embedding every candidate on each query
+            query_embedding = np.asarray(
+                self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX),
+                dtype=np.float32,
+            )
+            document_embeddings = np.asarray(
+                self.embedding_function(
+                    [doc.page_content.replace("\n", " ") for doc in documents],
+                    RAG_EMBEDDING_CONTENT_PREFIX,
+                ),
+                dtype=np.float32,
+            )
 
-            query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents], RAG_EMBEDDING_CONTENT_PREFIX
+            norms = np.linalg.norm(document_embeddings, axis=1) * np.linalg.norm(
+                query_embedding
+            )
+            scores = (document_embeddings @ query_embedding) / np.where(
+                norms == 0, 1, norms
             )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
 
         if scores is not None:
             docs_with_scores = list(
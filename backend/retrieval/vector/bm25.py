@@ -0,0 +1,125 @@
+import logging
+from typing import Dict, List, Optional, Union
+
+from backend.models.bm25 import BM25Indexes
+from backend.retrieval.vector.main import (
+    VectorDBBase,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
+from backend.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class BM25IndexedVectorDB(VectorDBBase):
+    """
+    Vector DB client wrapper keeping the BM25 index of each collection in sync
+    with every insert, upsert and delete, whichever router issues them.
+
+    Collections created before the index existed are indexed lazily, on their
+    first write or hybrid search.
+    """
+
+    def __init__(self, client: VectorDBBase):
+        self.client = client
+
+    def __getattr__(self, item):
+        # Backend specific helpers are passed through untouched
+        return getattr(self.client, item)
+
+    def ensure_index(self, collection_name: str) -> bool:
+        if BM25Indexes.has_collection(collection_name):
+            return True
+
+        result = self.client.get(collection_name=collection_name)
+        if not result or not result.ids or not result.ids[0]:
+            return False
+
+        log.info(f"Building BM25 index of {collection_name}")
+        return BM25Indexes.add_documents(
+            collection_name,
+            [
+                {"id": id, "text": text, "metadata": metadata}
+                for id, text, metadata in zip(
+                    result.ids[0], result.documents[0], result.metadatas[0]
+                )
+            ],
+        )
+
+    def _index_items(
+        self, collection_name: str, items: List[VectorItem], existed: bool
+    ):
+        try:
+            if existed and not BM25Indexes.has_collection(collection_name):
+                # The collection predates the index, index all of it at once
+                self.ensure_index(collection_name)
+                return
+
+            BM25Indexes.add_documents(
+                collection_name,
+                [
+                    {
+                        "id": item["id"],
+                        "text": item["text"],
+                        "metadata": item.get("metadata"),
+                    }
+                    for item in items
+                ],
+            )
+        except Exception as e:
+            # A stale BM25 index must never fail the vector DB write
+            log.exception(f"Error updating BM25 index of {collection_name}: {e}")
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.client.has_collection(collection_name)
+
+    def delete_collection(self, collection_name: str) -> None:
+        result = self.client.delete_collection(collection_name)
+        BM25Indexes.delete_collection(collection_name)
+        return result
+
+    def insert(self, collection_name: str, items: List[VectorItem]) -> None:
+        existed = self.client.has_collection(collection_name)
+        result = self.client.insert(collection_name, items)
+        self._index_items(collection_name, items, existed)
+        return result
+
+    def upsert(self, collection_name: str, items: List[VectorItem]) -> None:
+        existed = self.client.has_collection(collection_name)
+        result = self.client.upsert(collection_name, items)
+        self._index_items(collection_name, items, existed)
+        return result
+
+    def search(
+        self, collection_name: str, vectors: List[List[Union[float, int]]], limit: int
+    ) -> Optional[SearchResult]:
+        return self.client.search(collection_name, vectors, limit)
+
+    def query(
+        self, collection_name: str, filter: Dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        return self.client.query(collection_name, filter, limit)
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        return self.client.get(collection_name)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[List[str]] = None,
+        filter: Optional[Dict] = None,
+    ) -> None:
+        result = self.client.delete(collection_name, ids=ids, filter=filter)
+        if ids:
+            BM25Indexes.delete_documents(collection_name, ids)
+        elif filter:
+            BM25Indexes.delete_documents_by_filter(collection_name, filter)
+        return result
+
+    def reset(self) -> None:
+        result = self.client.reset()
+        BM25Indexes.reset()
+        return result
@@ -4,6 +4,7 @@ from backend.config import (
     VECTOR_DB,
     ENABLE_QDRANT_MULTITENANCY_MODE,
     ENABLE_MILVUS_MULTITENANCY_MODE,
+    ENABLE_RAG_BM25_INDEX,
 )
 
 
@@ -72,3 +73,8 @@ class Vector:
 
 
 VECTOR_DB_CLIENT = Vector.get_vector(VECTOR_DB)
+
+if ENABLE_RAG_BM25_INDEX:
+    from backend.retrieval.vector.bm25 import BM25IndexedVectorDB
+
+    VECTOR_DB_CLIENT = BM25IndexedVectorDB(VECTOR_DB_CLIENT)
@@ -4,11 +4,13 @@ from typing import Optional
 
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 
 from backend.socket.main import sio, get_user_ids_from_room
-from backend.models.users import Users, UserNameResponse
+from backend.models.users import UserNameResponse
 
 from backend.models.groups import Groups
 from backend.models.channels import (
@@ -22,6 +24,7 @@ from backend.models.messages import (
     MessageModel,
     MessageResponse,
     MessageForm,
+    encode_message_cursor,
 )
 
 
@@ -170,10 +173,27 @@ class MessageUserResponse(MessageResponse):
     pass
 
 
+def paginated_response(messages: list[MessageResponse], has_more: bool) -> JSONResponse:
+    headers = {}
+    if messages and has_more:
+        headers["X-Next-Cursor"] = encode_message_cursor(messages[-1])
+
+    return JSONResponse(content=jsonable_encoder(messages), headers=headers)
+
+
 @router.get("/{id}/messages", response_model=list[MessageUserResponse])
 async def get_channel_messages(
-    id: str, skip: int = 0, limit: int = 50, user=Depends(get_verified_user)
+    id: str,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
 ):
+    """
+    Newest messages first. Pass the `cursor` ("<created_at>:<id>" of the last
+    message received, also returned in the X-Next-Cursor header) to get the
+    next page; `skip` is kept for older clients.
+    """
     channel = Channels.get_channel_by_id(id)
     if not channel:
         raise HTTPException(
@@ -187,33 +207,15 @@ async def get_channel_messages(
             status_code=status.HTTP_403_FORBIDDEN, detail=ERROR_MESSAGES.DEFAULT()
         )
 
-    message_list = Messages.get_messages_by_channel_id(id, skip, limit)
-    users = {}
-
-    messages = []
-    for message in message_list:
-        if message.user_id not in users:
-            user = Users.get_user_by_id(message.user_id)
-            users[message.user_id] = user
-
-        thread_replies = Messages.get_thread_replies_by_message_id(message.id)
-        latest_thread_reply_at = (
-            thread_replies[0].created_at if thread_replies else None
-        )
-
-        messages.append(
-            MessageUserResponse(
-                **{
-                    **message.model_dump(),
-                    "reply_count": len(thread_replies),
-                    "latest_reply_at": latest_thread_reply_at,
-                    "reactions": Messages.get_reactions_by_message_id(message.id),
-                    "user": UserNameResponse(**users[message.user_id].model_dump()),
-                }
-            )
+    try:
+        messages = Messages.get_messages_by_channel_id(id, skip, limit, cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT("Invalid cursor"),
         )
 
-    return messages
+    return paginated_response(messages, has_more=len(messages) >= limit)
 
 
 ############################
@@ -307,15 +309,9 @@ async def model_response_handler(request, channel, message, user):
 
                 thread_history = []
                 images = []
-                message_users = {}
 
                 for thread_message in thread_messages:
-                    message_user = None
-                    if thread_message.user_id not in message_users:
-                        message_user = Users.get_user_by_id(thread_message.user_id)
-                        message_users[thread_message.user_id] = message_user
-                    else:
-                        message_user = message_users[thread_message.user_id]
+                    message_user = thread_message.user
 
                     if thread_message.meta and thread_message.meta.get(
                         "model_id", None
@@ -497,7 +493,7 @@ async def post_new_message(
 
     try:
         message, channel = await new_message_handler(request, id, form_data, user)
-        active_user_ids = get_user_ids_from_room(f"channel:{channel.id}")
+        active_user_ids = await get_user_ids_from_room(f"channel:{channel.id}")
 
         async def background_handler():
             await model_response_handler(request, channel, message, user)
@@ -555,14 +551,7 @@ async def get_channel_message(
             status_code=status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT()
         )
 
-    return MessageUserResponse(
-        **{
-            **message.model_dump(),
-            "user": UserNameResponse(
-                **Users.get_user_by_id(message.user_id).model_dump()
-            ),
-        }
-    )
+    return MessageUserResponse(**message.model_dump())
 
 
 ############################
@@ -578,6 +567,7 @@ async def get_channel_thread_messages(
     message_id: str,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     user=Depends(get_verified_user),
 ):
     channel = Channels.get_channel_by_id(id)
@@ -593,28 +583,21 @@ async def get_channel_thread_messages(
             status_code=status.HTTP_403_FORBIDDEN, detail=ERROR_MESSAGES.DEFAULT()
         )
 
-    message_list = Messages.get_messages_by_parent_id(id, message_id, skip, limit)
-    users = {}
-
-    messages = []
-    for message in message_list:
-        if message.user_id not in users:
-            user = Users.get_user_by_id(message.user_id)
-            users[message.user_id] = user
-
-        messages.append(
-            MessageUserResponse(
-                **{
-                    **message.model_dump(),
-                    "reply_count": 0,
-                    "latest_reply_at": None,
-                    "reactions": Messages.get_reactions_by_message_id(message.id),
-                    "user": UserNameResponse(**users[message.user_id].model_dump()),
-                }
-            )
+    try:
+        messages = Messages.get_messages_by_parent_id(
+            id, message_id, skip, limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT("Invalid cursor"),
         )
 
-    return messages
+    # The thread's parent message is appended to its last page
+    return paginated_response(
+        messages,
+        has_more=len(messages) >= limit and messages[-1].id != message_id,
+    )
 
 
 ############################
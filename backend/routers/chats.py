@@ -3,12 +3,13 @@ import logging
 from typing import Optional
 
 
-from backend.socket.main import get_event_emitter
+from backend.socket.main import get_event_emitter, flush_message_writes
 from backend.models.chats import (
     ChatForm,
     ChatImportForm,
     ChatResponse,
     Chats,
+    ChatSearchResponse,
     ChatTitleIdResponse,
 )
 from backend.models.tags import TagModel, Tags
@@ -29,6 +30,37 @@ log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
 router = APIRouter()
 
+
+def get_chat_list_cursor(
+    cursor: Optional[str], filter: Optional[dict] = None
+) -> Optional[tuple[int, str]]:
+    """
+    Parse the `cursor` of the chat list endpoints: "<updated_at>:<id>" of
+    the last chat of the previous page. Unlike `page`, a cursor keeps
+    working when chats are updated between two page loads. It only applies
+    to the default order, most recently updated first.
+    """
+    if not cursor:
+        return None
+
+    if filter and (filter.get("order_by") or filter.get("direction")):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(
+                "A cursor cannot be combined with order_by or direction"
+            ),
+        )
+
+    try:
+        updated_at, id = cursor.split(":", 1)
+        return int(updated_at), id
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT("Invalid cursor"),
+        )
+
+
 ############################
 # GetChatList
 ############################
@@ -39,13 +71,16 @@ router = APIRouter()
 def get_session_user_chat_list(
     user=Depends(get_verified_user),
     page: Optional[int] = None,
+    cursor: Optional[str] = None,
     include_pinned: Optional[bool] = False,
     include_folders: Optional[bool] = False,
 ):
+    cursor = get_chat_list_cursor(cursor)
+
     try:
-        if page is not None:
+        if page is not None or cursor is not None:
             limit = 60
-            skip = (page - 1) * limit
+            skip = (page - 1) * limit if page is not None and cursor is None else 0
 
             return Chats.get_chat_title_id_list_by_user_id(
                 user.id,
@@ -53,6 +88,7 @@ def get_session_user_chat_list(
                 include_pinned=include_pinned,
                 skip=skip,
                 limit=limit,
+                cursor=cursor,
             )
         else:
             return Chats.get_chat_title_id_list_by_user_id(
@@ -94,6 +130,7 @@ async def delete_all_user_chats(request: Request, user=Depends(get_verified_user
 async def get_user_chat_list_by_user_id(
     user_id: str,
     page: Optional[int] = None,
+    cursor: Optional[str] = None,
     query: Optional[str] = None,
     order_by: Optional[str] = None,
     direction: Optional[str] = None,
@@ -119,8 +156,17 @@ async def get_user_chat_list_by_user_id(
     if direction:
         filter["direction"] = direction
 
+    cursor = get_chat_list_cursor(cursor, filter)
+    if cursor is not None:
+        skip = 0
+
     return Chats.get_chat_list_by_user_id(
-        user_id, include_archived=True, filter=filter, skip=skip, limit=limit
+        user_id,
+        include_archived=True,
+        filter=filter,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
     )
 
 
@@ -174,7 +220,7 @@ async def import_chat(form_data: ChatImportForm, user=Depends(get_verified_user)
 ############################
 
 
-@router.get("/search", response_model=list[ChatTitleIdResponse])
+@router.get("/search", response_model=list[ChatSearchResponse])
 def search_user_chats(
     text: str, page: Optional[int] = None, user=Depends(get_verified_user)
 ):
@@ -184,12 +230,9 @@ def search_user_chats(
     limit = 60
     skip = (page - 1) * limit
 
-    chat_list = [
-        ChatTitleIdResponse(**chat.model_dump())
-        for chat in Chats.get_chats_by_user_id_and_search_text(
-            user.id, text, skip=skip, limit=limit
-        )
-    ]
+    chat_list = Chats.get_chats_by_user_id_and_search_text(
+        user.id, text, skip=skip, limit=limit
+    )
 
     # Delete tag if no chat is found
     words = text.strip().split(" ")
@@ -223,20 +266,22 @@ async def get_chats_by_folder_id(folder_id: str, user=Depends(get_verified_user)
     ]
 
 
-@router.get("/folder/{folder_id}/list")
+@router.get("/folder/{folder_id}/list", response_model=list[ChatTitleIdResponse])
 async def get_chat_list_by_folder_id(
-    folder_id: str, page: Optional[int] = 1, user=Depends(get_verified_user)
+    folder_id: str,
+    page: Optional[int] = 1,
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
 ):
+    cursor = get_chat_list_cursor(cursor)
+
     try:
         limit = 60
-        skip = (page - 1) * limit
+        skip = (page - 1) * limit if cursor is None else 0
 
-        return [
-            {"title": chat.title, "id": chat.id, "updated_at": chat.updated_at}
-            for chat in Chats.get_chats_by_folder_id_and_user_id(
-                folder_id, user.id, skip=skip, limit=limit
-            )
-        ]
+        return Chats.get_chat_list_by_folder_id_and_user_id(
+            folder_id, user.id, skip=skip, limit=limit, cursor=cursor
+        )
 
     except Exception as e:
         log.exception(e)
@@ -252,10 +297,7 @@ async def get_chat_list_by_folder_id(
 
 @router.get("/pinned", response_model=list[ChatTitleIdResponse])
 async def get_user_pinned_chats(user=Depends(get_verified_user)):
-    return [
-        ChatTitleIdResponse(**chat.model_dump())
-        for chat in Chats.get_pinned_chats_by_user_id(user.id)
-    ]
+    return Chats.get_pinned_chat_list_by_user_id(user.id)
 
 
 ############################
@@ -324,6 +366,7 @@ async def get_all_user_chats_in_db(user=Depends(get_admin_user)):
 @router.get("/archived", response_model=list[ChatTitleIdResponse])
 async def get_archived_session_user_chat_list(
     page: Optional[int] = None,
+    cursor: Optional[str] = None,
     query: Optional[str] = None,
     order_by: Optional[str] = None,
     direction: Optional[str] = None,
@@ -343,17 +386,17 @@ async def get_archived_session_user_chat_list(
     if direction:
         filter["direction"] = direction
 
-    chat_list = [
-        ChatTitleIdResponse(**chat.model_dump())
-        for chat in Chats.get_archived_chat_list_by_user_id(
-            user.id,
-            filter=filter,
-            skip=skip,
-            limit=limit,
-        )
-    ]
+    cursor = get_chat_list_cursor(cursor, filter)
+    if cursor is not None:
+        skip = 0
 
-    return chat_list
+    return Chats.get_archived_chat_list_by_user_id(
+        user.id,
+        filter=filter,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+    )
 
 
 ############################
@@ -493,7 +536,8 @@ async def update_chat_message_by_id(
             detail=ERROR_MESSAGES.ACCESS_PROHIBITED,
         )
 
-    chat = Chats.upsert_message_to_chat_by_id_and_message_id(
+    await flush_message_writes(id, message_id)
+    Chats.upsert_message_to_chat_by_id_and_message_id(
         id,
         message_id,
         {
@@ -522,6 +566,7 @@ async def update_chat_message_by_id(
             }
         )
 
+    chat = Chats.get_chat_by_id(id)
     return ChatResponse(**chat.model_dump())
 
 
@@ -7,6 +7,7 @@ from pathlib import Path
 from typing import Optional
 from urllib.parse import quote
 import asyncio
+import time
 
 from fastapi import (
     BackgroundTasks,
@@ -23,7 +24,7 @@ from fastapi import (
 
 from fastapi.responses import FileResponse, StreamingResponse
 from backend.constants import ERROR_MESSAGES
-from backend.env import SRC_LOG_LEVELS
+from backend.env import FILE_PROCESSING_STATUS_POLL_INTERVAL, SRC_LOG_LEVELS
 from backend.retrieval.vector.factory import VECTOR_DB_CLIENT
 
 from backend.models.users import Users
@@ -36,10 +37,16 @@ from backend.models.files import (
 from backend.models.knowledge import Knowledges
 
 from backend.routers.knowledge import get_knowledge, get_knowledge_list
-from backend.routers.retrieval import ProcessFileForm, process_file
+from backend.routers.retrieval import (
+    ProcessFileForm,
+    process_file,
+    process_file_item,
+)
 from backend.routers.audio import transcribe
+from backend.retrieval.ingestion import INGESTION_QUEUE
 from backend.storage.provider import Storage
 from backend.utils.auth import get_admin_user, get_verified_user
+from backend.utils.file_status import FILE_STATUS_NOTIFIER
 from pydantic import BaseModel
 
 log = logging.getLogger(__name__)
@@ -85,41 +92,55 @@ def has_access_to_file(
 ############################
 
 
-def process_uploaded_file(request, file, file_path, file_item, file_metadata, user):
-    try:
-        if file.content_type:
-            stt_supported_content_types = getattr(
-                request.app.state.config, "STT_SUPPORTED_CONTENT_TYPES", []
-            )
+def process_file_by_content_type(
+    request, content_type, file_path, file_id, file_metadata, user, final_attempt=True
+):
+    if content_type:
+        stt_supported_content_types = getattr(
+            request.app.state.config, "STT_SUPPORTED_CONTENT_TYPES", []
+        )
 
-            if any(
-                fnmatch(file.content_type, content_type)
-                for content_type in (
-                    stt_supported_content_types
-                    if stt_supported_content_types
-                    and any(t.strip() for t in stt_supported_content_types)
-                    else ["audio/*", "video/webm"]
-                )
-            ):
-                file_path = Storage.get_file(file_path)
-                result = transcribe(request, file_path, file_metadata)
+        if any(
+            fnmatch(content_type, supported_content_type)
+            for supported_content_type in (
+                stt_supported_content_types
+                if stt_supported_content_types
+                and any(t.strip() for t in stt_supported_content_types)
+                else ["audio/*", "video/webm"]
+            )
+        ):
+            file_path = Storage.get_file(file_path)
+            result = transcribe(request, file_path, file_metadata)
 
-                process_file(
-                    request,
-                    ProcessFileForm(
-                        file_id=file_item.id, content=result.get("text", "")
-                    ),
-                    user=user,
-                )
-            elif (not file.content_type.startswith(("image/", "video/"))) or (
-                request.app.state.config.CONTENT_EXTRACTION_ENGINE == "external"
-            ):
-                process_file(request, ProcessFileForm(file_id=file_item.id), user=user)
-        else:
-            log.info(
-                f"File type {file.content_type} is not provided, but trying to process anyway"
+            process_file_item(
+                request,
+                ProcessFileForm(file_id=file_id, content=result.get("text", "")),
+                user,
+                final_attempt=final_attempt,
+            )
+        elif (not content_type.startswith(("image/", "video/"))) or (
+            request.app.state.config.CONTENT_EXTRACTION_ENGINE == "external"
+        ):
+            process_file_item(
+                request,
+                ProcessFileForm(file_id=file_id),
+                user,
+                final_attempt=final_attempt,
             )
-            process_file(request, ProcessFileForm(file_id=file_item.id), user=user)
+    else:
+        log.info(
+            f"File type {content_type} is not provided, but trying to process anyway"
+        )
+        process_file_item(
+            request, ProcessFileForm(file_id=file_id), user, final_attempt=final_attempt
+        )
+
+
+def process_uploaded_file(request, file, file_path, file_item, file_metadata, user):
+    try:
+        process_file_by_content_type(
+            request, file.content_type, file_path, file_item.id, file_metadata, user
+        )
     except Exception as e:
         log.error(f"Error processing file: {file_item.id}")
         Files.update_file_data_by_id(
@@ -131,6 +152,63 @@ def process_uploaded_file(request, file, file_path, file_item, file_metadata, us
         )
 
 
+def process_uploaded_file_job(request, job, user, set_progress):
+    """Ingestion job handler of the files uploaded with process_in_background"""
+    file_id = job.data["file_id"]
+    file_item = Files.get_file_metadata_by_id(file_id)
+    if not file_item:
+        # Deleted before it was processed
+        return
+
+    final_attempt = job.attempts >= job.max_attempts
+
+    try:
+        source_file = (
+            Files.get_file_by_id(job.data["source_file_id"])
+            if job.data.get("source_file_id")
+            else None
+        )
+        if (
+            source_file
+            and (source_file.data or {}).get("status") == "completed"
+            and (source_file.data or {}).get("content")
+        ):
+            # The same upload was already extracted for another file: only
+            # split and embed its text, mostly from the embedding cache
+            process_file_item(
+                request,
+                ProcessFileForm(file_id=file_id, content=source_file.data["content"]),
+                user,
+                final_attempt=final_attempt,
+            )
+        else:
+            process_file_by_content_type(
+                request,
+                job.data.get("content_type"),
+                job.data["file_path"],
+                file_id,
+                job.data.get("metadata") or {},
+                user,
+                final_attempt=final_attempt,
+            )
+    except Exception as e:
+        log.error(f"Error processing file: {file_id} (attempt {job.attempts})")
+        if final_attempt:
+            Files.update_file_data_by_id(
+                file_id,
+                {
+                    "status": "failed",
+                    "error": str(e.detail) if hasattr(e, "detail") else str(e),
+                },
+            )
+        raise
+
+    set_progress({"total": 1, "completed": 1})
+
+
+INGESTION_QUEUE.register("file", process_uploaded_file_job)
+
+
 @router.post("/", response_model=FileModelResponse)
 def upload_file(
     request: Request,
@@ -198,7 +276,7 @@ def upload_file_handler(
         id = str(uuid.uuid4())
         name = filename
         filename = f"{id}_{filename}"
-        contents, file_path = Storage.upload_file(
+        size, file_hash, file_path = Storage.upload_file(
             file.file,
             filename,
             {
@@ -222,7 +300,8 @@ def upload_file_handler(
                     "meta": {
                         "name": name,
                         "content_type": file.content_type,
-                        "size": len(contents),
+                        "size": size,
+                        "sha256": file_hash,
                         "data": file_metadata,
                     },
                 }
@@ -230,7 +309,27 @@ def upload_file_handler(
         )
 
         if process:
-            if background_tasks and process_in_background:
+            if process_in_background and INGESTION_QUEUE.enabled:
+                # Durable, survives restarts and is retried on failure
+                job_data = {
+                    "file_id": file_item.id,
+                    "file_path": file_path,
+                    "content_type": file.content_type,
+                    "metadata": file_metadata,
+                }
+                # Uploads with the same content share one extraction
+                job = INGESTION_QUEUE.enqueue(
+                    user.id, "file", job_data, key=f"file:{file_hash}"
+                )
+                if job.data.get("file_id") != file_item.id:
+                    # Its text is reused once that job completed
+                    job = INGESTION_QUEUE.enqueue(
+                        user.id,
+                        "file",
+                        {**job_data, "source_file_id": job.data.get("file_id")},
+                    )
+                return {"status": True, "job_id": job.id, **file_item.model_dump()}
+            elif background_tasks and process_in_background:
                 background_tasks.add_task(
                     process_uploaded_file,
                     request,
@@ -407,16 +506,18 @@ async def get_file_process_status(
 
             async def event_stream(file_item):
                 if file_item:
-                    for _ in range(MAX_FILE_PROCESSING_DURATION):
-                        file_item = Files.get_file_by_id(file_item.id)
-                        if file_item:
-                            data = file_item.model_dump().get("data", {})
-                            status = data.get("status")
+                    # Subscribed before the first read so no change is missed
+                    with FILE_STATUS_NOTIFIER.subscribe(file_item.id) as queue:
+                        deadline = time.monotonic() + MAX_FILE_PROCESSING_DURATION
+                        file_status = Files.get_file_status_by_id(file_item.id)
+
+                        while file_status:
+                            status = file_status.get("status")
 
                             if status:
                                 event = {"status": status}
                                 if status == "failed":
-                                    event["error"] = data.get("error")
+                                    event["error"] = file_status.get("error")
 
                                 yield f"data: {json.dumps(event)}\n\n"
                                 if status in ("completed", "failed"):
@@ -425,7 +526,18 @@ async def get_file_process_status(
                                 # Legacy
                                 break
 
-                        await asyncio.sleep(0.5)
+                            timeout = deadline - time.monotonic()
+                            if timeout <= 0:
+                                break
+
+                            try:
+                                file_status = await asyncio.wait_for(
+                                    queue.get(),
+                                    min(timeout, FILE_PROCESSING_STATUS_POLL_INTERVAL),
+                                )
+                            except asyncio.TimeoutError:
+                                # Fallback for a missed or unpublished change
+                                file_status = Files.get_file_status_by_id(file_item.id)
                 else:
                     yield f"data: {json.dumps({'status': 'not_found'})}\n\n"
 
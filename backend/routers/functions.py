@@ -15,6 +15,7 @@ from backend.models.functions import (
     Functions,
 )
 from backend.utils.plugin import (
+    FUNCTION_MODULE_CACHE,
     load_function_module_by_id,
     replace_imports,
     get_function_module_from_cache,
@@ -166,7 +167,9 @@ async def sync_functions(
                     )
                     raise e
 
-        return Functions.sync_functions(user.id, form_data.functions)
+        functions = Functions.sync_functions(user.id, form_data.functions)
+        FUNCTION_MODULE_CACHE.invalidate()
+        return functions
     except Exception as e:
         log.exception(f"Failed to load a function: {e}")
         raise HTTPException(
@@ -202,10 +205,8 @@ async def create_new_function(
             )
             form_data.meta.manifest = frontmatter
 
-            FUNCTIONS = request.app.state.FUNCTIONS
-            FUNCTIONS[form_data.id] = function_module
-
             function = Functions.insert_new_function(user.id, function_type, form_data)
+            FUNCTION_MODULE_CACHE.invalidate(form_data.id)
 
             function_cache_dir = CACHE_DIR / "functions" / form_data.id
             function_cache_dir.mkdir(parents=True, exist_ok=True)
@@ -263,6 +264,7 @@ async def toggle_function_by_id(id: str, user=Depends(get_admin_user)):
         function = Functions.update_function_by_id(
             id, {"is_active": not function.is_active}
         )
+        FUNCTION_MODULE_CACHE.invalidate(id)
 
         if function:
             return function
@@ -290,6 +292,7 @@ async def toggle_global_by_id(id: str, user=Depends(get_admin_user)):
         function = Functions.update_function_by_id(
             id, {"is_global": not function.is_global}
         )
+        FUNCTION_MODULE_CACHE.invalidate(id)
 
         if function:
             return function
@@ -321,13 +324,11 @@ async def update_function_by_id(
         )
         form_data.meta.manifest = frontmatter
 
-        FUNCTIONS = request.app.state.FUNCTIONS
-        FUNCTIONS[id] = function_module
-
         updated = {**form_data.model_dump(exclude={"id"}), "type": function_type}
         log.debug(updated)
 
         function = Functions.update_function_by_id(id, updated)
+        FUNCTION_MODULE_CACHE.invalidate(id)
 
         if function_type == "filter" and getattr(function_module, "toggle", None):
             Functions.update_function_metadata_by_id(id, {"toggle": True})
@@ -359,9 +360,7 @@ async def delete_function_by_id(
     result = Functions.delete_function_by_id(id)
 
     if result:
-        FUNCTIONS = request.app.state.FUNCTIONS
-        if id in FUNCTIONS:
-            del FUNCTIONS[id]
+        FUNCTION_MODULE_CACHE.remove(id)
 
     return result
 
@@ -440,6 +439,7 @@ async def update_function_valves_by_id(
 
                 valves_dict = valves.model_dump(exclude_unset=True)
                 Functions.update_function_valves_by_id(id, valves_dict)
+                FUNCTION_MODULE_CACHE.invalidate(id)
                 return valves_dict
             except Exception as e:
                 log.exception(f"Error updating function values by id {id}: {e}")
@@ -17,11 +17,13 @@ from backend.routers.retrieval import (
     process_files_batch,
     BatchProcessFilesForm,
 )
+from backend.retrieval.ingestion import INGESTION_QUEUE
 from backend.storage.provider import Storage
 
 from backend.constants import ERROR_MESSAGES
 from backend.utils.auth import get_verified_user
 from backend.utils.access_control import has_access, has_permission
+from backend.utils.misc import calculate_sha256_string
 
 
 from backend.env import SRC_LOG_LEVELS
@@ -262,6 +264,8 @@ async def reindex_knowledge_files(request: Request, user=Depends(get_verified_us
 
 class KnowledgeFilesResponse(KnowledgeResponse):
     files: list[FileMetadataResponse]
+    # Set when the files are processed by a background ingestion job
+    job_id: Optional[str] = None
 
 
 @router.get("/{id}", response_model=Optional[KnowledgeFilesResponse])
@@ -705,11 +709,91 @@ async def reset_knowledge_by_id(id: str, user=Depends(get_verified_user)):
 ############################
 
 
+# Files processed and added to the knowledge base at once by a background job
+KNOWLEDGE_FILES_JOB_BATCH_SIZE = 16
+
+
+def add_file_ids_to_knowledge(id: str, file_ids: list[str]):
+    knowledge = Knowledges.get_knowledge_by_id(id=id)
+    if not knowledge:
+        return None
+
+    data = knowledge.data or {}
+    existing_file_ids = data.get("file_ids", [])
+    for file_id in file_ids:
+        if file_id not in existing_file_ids:
+            existing_file_ids.append(file_id)
+
+    data["file_ids"] = existing_file_ids
+    return Knowledges.update_knowledge_data_by_id(id=id, data=data)
+
+
+def add_files_to_knowledge_job(request, job, user, set_progress):
+    """
+    Ingestion job handler of add_files_to_knowledge_batch. Files are processed
+    in batches, and each batch is added to the knowledge base as soon as it
+    is embedded. The content hash of every added file is kept in the job's
+    progress, so an interrupted or retried job skips the files it already
+    added unless their content changed.
+    """
+    knowledge_id = job.data["knowledge_id"]
+    file_ids = job.data["file_ids"]
+
+    progress = {"files": {}, "errors": {}, **(job.progress or {})}
+    progress["total"] = len(file_ids)
+
+    for idx in range(0, len(file_ids), KNOWLEDGE_FILES_JOB_BATCH_SIZE):
+        if not Knowledges.get_knowledge_by_id(id=knowledge_id):
+            # Deleted while its files were processed
+            return
+
+        hashes = {}
+        files = []
+        for file in Files.get_files_by_ids(
+            file_ids[idx : idx + KNOWLEDGE_FILES_JOB_BATCH_SIZE]
+        ):
+            hashes[file.id] = calculate_sha256_string(
+                (file.data or {}).get("content", "")
+            )
+            if progress["files"].get(file.id) != hashes[file.id]:
+                files.append(file)
+
+        if files:
+            result = process_files_batch(
+                request=request,
+                form_data=BatchProcessFilesForm(
+                    files=files, collection_name=knowledge_id
+                ),
+                user=user,
+            )
+
+            completed_file_ids = [
+                r.file_id for r in result.results if r.status == "completed"
+            ]
+            add_file_ids_to_knowledge(knowledge_id, completed_file_ids)
+
+            for file_id in completed_file_ids:
+                progress["files"][file_id] = hashes[file_id]
+                progress["errors"].pop(file_id, None)
+            for err in result.errors:
+                progress["errors"][err.file_id] = err.error
+
+        progress["completed"] = len(progress["files"])
+        progress["failed"] = len(progress["errors"])
+        if not set_progress(progress):
+            # Claimed by another worker after this one stopped sending heartbeats
+            return
+
+
+INGESTION_QUEUE.register("knowledge_files", add_files_to_knowledge_job)
+
+
 @router.post("/{id}/files/batch/add", response_model=Optional[KnowledgeFilesResponse])
 def add_files_to_knowledge_batch(
     request: Request,
     id: str,
     form_data: list[KnowledgeFileIdForm],
+    process_in_background: bool = Query(False),
     user=Depends(get_verified_user),
 ):
     """
@@ -744,6 +828,30 @@ def add_files_to_knowledge_batch(
             )
         files.append(file)
 
+    if process_in_background and INGESTION_QUEUE.enabled:
+        # The same files added again to an unchanged knowledge base share a job
+        files_hash = calculate_sha256_string(
+            ",".join(
+                sorted(
+                    file.hash or (file.meta or {}).get("sha256") or file.id
+                    for file in files
+                )
+            )
+        )
+        job = INGESTION_QUEUE.enqueue(
+            user.id,
+            "knowledge_files",
+            {"knowledge_id": id, "file_ids": [file.id for file in files]},
+            key=f"knowledge:{id}:{knowledge.updated_at}:{files_hash}",
+        )
+        return KnowledgeFilesResponse(
+            **knowledge.model_dump(),
+            files=Files.get_file_metadatas_by_ids(
+                (knowledge.data or {}).get("file_ids", [])
+            ),
+            job_id=job.id,
+        )
+
     # Process files
     try:
         result = process_files_batch(
@@ -757,18 +865,10 @@ def add_files_to_knowledge_batch(
         )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Add successful files to knowledge base
-    data = knowledge.data or {}
-    existing_file_ids = data.get("file_ids", [])
-
     # Only add files that were successfully processed
     successful_file_ids = [r.file_id for r in result.results if r.status == "completed"]
-    for file_id in successful_file_ids:
-        if file_id not in existing_file_ids:
-            existing_file_ids.append(file_id)
-
-    data["file_ids"] = existing_file_ids
-    knowledge = Knowledges.update_knowledge_data_by_id(id=id, data=data)
+    knowledge = add_file_ids_to_knowledge(id, successful_file_ids)
+    existing_file_ids = knowledge.data.get("file_ids", [])
 
     # If there were any errors, include them in the response
     if result.errors:
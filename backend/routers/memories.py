@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import logging
 from typing import Optional
@@ -82,17 +83,22 @@ class QueryMemoryForm(BaseModel):
 async def query_memory(
     request: Request, form_data: QueryMemoryForm, user=Depends(get_verified_user)
 ):
-    memories = Memories.get_memories_by_user_id(user.id)
-    if not memories:
-        raise HTTPException(status_code=404, detail="No memories found for user")
+    def search_memories():
+        memories = Memories.get_memories_by_user_id(user.id)
+        if not memories:
+            raise HTTPException(status_code=404, detail="No memories found for user")
 
-    results = VECTOR_DB_CLIENT.search(
-        collection_name=f"user-memory-{user.id}",
-        vectors=[request.app.state.EMBEDDING_FUNCTION(form_data.content, user=user)],
-        limit=form_data.k,
-    )
+        return VECTOR_DB_CLIENT.search(
+            collection_name=f"user-memory-{user.id}",
+            vectors=[
+                request.app.state.EMBEDDING_FUNCTION(form_data.content, user=user)
+            ],
+            limit=form_data.k,
+        )
 
-    return results
+    # Embedding the query blocks, keep it off the event loop so it runs
+    # alongside the other stages of a chat completion
+    return await run_in_threadpool(search_memories)
 
 
 ############################
@@ -28,6 +28,7 @@ from fastapi.responses import FileResponse, StreamingResponse
 
 from backend.utils.auth import get_admin_user, get_verified_user
 from backend.utils.access_control import has_access, has_permission
+from backend.utils.models import MODEL_CATALOG
 from backend.config import BYPASS_ADMIN_ACCESS_CONTROL, STATIC_DIR
 
 log = logging.getLogger(__name__)
@@ -96,6 +97,7 @@ async def create_new_model(
 
     else:
         model = Models.insert_new_model(form_data, user.id)
+        MODEL_CATALOG.invalidate()
         if model:
             return model
         else:
@@ -152,6 +154,7 @@ async def import_models(
                         model_data["params"] = model_data.get("params", {})
                         new_model = ModelForm(**model_data)
                         Models.insert_new_model(user_id=user.id, form_data=new_model)
+            MODEL_CATALOG.invalidate()
             return True
         else:
             raise HTTPException(status_code=400, detail="Invalid JSON format")
@@ -173,7 +176,9 @@ class SyncModelsForm(BaseModel):
 async def sync_models(
     request: Request, form_data: SyncModelsForm, user=Depends(get_admin_user)
 ):
-    return Models.sync_models(user.id, form_data.models)
+    models = Models.sync_models(user.id, form_data.models)
+    MODEL_CATALOG.invalidate()
+    return models
 
 
 ###########################
@@ -247,6 +252,7 @@ async def toggle_model_by_id(id: str, user=Depends(get_verified_user)):
             or has_access(user.id, "write", model.access_control)
         ):
             model = Models.toggle_model_by_id(id)
+            MODEL_CATALOG.invalidate()
 
             if model:
                 return model
@@ -297,6 +303,7 @@ async def update_model_by_id(
         )
 
     model = Models.update_model_by_id(id, form_data)
+    MODEL_CATALOG.invalidate()
     return model
 
 
@@ -325,10 +332,12 @@ async def delete_model_by_id(id: str, user=Depends(get_verified_user)):
         )
 
     result = Models.delete_model_by_id(id)
+    MODEL_CATALOG.invalidate()
     return result
 
 
 @router.delete("/delete/all", response_model=bool)
 async def delete_all_models(user=Depends(get_admin_user)):
     result = Models.delete_all_models()
+    MODEL_CATALOG.invalidate()
     return result
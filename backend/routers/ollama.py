@@ -14,7 +14,6 @@ from datetime import datetime
 from typing import Optional, Union
 from urllib.parse import urlparse
 import aiohttp
-from aiocache import cached
 import requests
 from urllib.parse import quote
 
@@ -52,6 +51,8 @@ from backend.utils.payload import (
 )
 from backend.utils.auth import get_admin_user, get_verified_user
 from backend.utils.access_control import has_access
+from backend.utils.model_list_cache import ModelListCache
+from backend.utils.session_pool import get_client_session
 
 
 from backend.config import (
@@ -60,7 +61,6 @@ from backend.config import (
 from backend.env import (
     ENV,
     SRC_LOG_LEVELS,
-    MODELS_CACHE_TTL,
     AIOHTTP_CLIENT_SESSION_SSL,
     AIOHTTP_CLIENT_TIMEOUT,
     AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
@@ -82,26 +82,27 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        session = get_client_session(url)
+        async with session.get(
+            url,
+            headers={
+                "Content-Type": "application/json",
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
@@ -110,10 +111,12 @@ async def send_get_request(url, key=None, user: UserModel = None):
 
 async def cleanup_response(
     response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+    session: Optional[aiohttp.ClientSession] = None,
 ):
     if response:
-        response.close()
+        # Hands the connection back to the pool once the body was fully read,
+        # otherwise the connection is closed
+        response.release()
     if session:
         await session.close()
 
@@ -128,11 +131,9 @@ async def send_post_request(
     metadata: Optional[dict] = None,
 ):
     r = None
+    streaming = False
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
-
+        session = get_client_session(url)
         r = await session.post(
             url,
             data=payload,
@@ -156,12 +157,13 @@ async def send_post_request(
                 ),
             },
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
 
         if r.ok is False:
             try:
                 res = await r.json()
-                await cleanup_response(r, session)
+                await cleanup_response(r)
                 if "error" in res:
                     raise HTTPException(status_code=r.status, detail=res["error"])
             except HTTPException as e:
@@ -180,13 +182,12 @@ async def send_post_request(
             if content_type:
                 response_headers["Content-Type"] = content_type
 
+            streaming = True
             return StreamingResponse(
                 r.content,
                 status_code=r.status,
                 headers=response_headers,
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             res = await r.json()
@@ -202,8 +203,9 @@ async def send_post_request(
             detail=detail if e else "Open WebUI: Server Connection Error",
         )
     finally:
-        if not stream:
-            await cleanup_response(r, session)
+        # Error responses of streamed requests also go back to the pool here
+        if not streaming:
+            await cleanup_response(r)
 
 
 def get_api_key(idx, url, configs):
@@ -285,6 +287,16 @@ async def verify_connection(
             raise HTTPException(status_code=500, detail=error_detail)
 
 
+@router.get("/config/health")
+async def get_connections_health(request: Request, user=Depends(get_admin_user)):
+    """Model list health of each configured connection, by connection index"""
+    health = await MODEL_LIST_CACHE.get_health(request)
+    return {
+        str(idx): health.get(str(idx), {"url": url, "status": "unknown"})
+        for idx, url in enumerate(request.app.state.config.OLLAMA_BASE_URLS)
+    }
+
+
 @router.get("/config")
 async def get_config(request: Request, user=Depends(get_admin_user)):
     return {
@@ -341,11 +353,7 @@ def merge_ollama_models_lists(model_lists):
     return list(merged_models.values())
 
 
-@cached(
-    ttl=MODELS_CACHE_TTL,
-    key=lambda _, user: f"ollama_all_models_{user.id}" if user else "ollama_all_models",
-)
-async def get_all_models(request: Request, user: UserModel = None):
+async def fetch_all_models(request: Request, user: UserModel = None):
     log.info("get_all_models()")
     if request.app.state.config.ENABLE_OLLAMA_API:
         request_tasks = []
@@ -353,7 +361,14 @@ async def get_all_models(request: Request, user: UserModel = None):
             if (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
                 url not in request.app.state.config.OLLAMA_API_CONFIGS  # Legacy support
             ):
-                request_tasks.append(send_get_request(f"{url}/api/tags", user=user))
+                request_tasks.append(
+                    MODEL_LIST_CACHE.track(
+                        idx,
+                        url,
+                        send_get_request(f"{url}/api/tags", user=user),
+                        user=user,
+                    )
+                )
             else:
                 api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
                     str(idx),
@@ -367,7 +382,14 @@ async def get_all_models(request: Request, user: UserModel = None):
 
                 if enable:
                     request_tasks.append(
-                        send_get_request(f"{str(url).rstrip('/')}/api/tags", key, user=user)
+                        MODEL_LIST_CACHE.track(
+                            idx,
+                            url,
+                            send_get_request(
+                                f"{str(url).rstrip('/')}/api/tags", key, user=user
+                            ),
+                            user=user,
+                        )
                     )
                 else:
                     request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
@@ -436,6 +458,19 @@ async def get_all_models(request: Request, user: UserModel = None):
     else:
         models = {"models": []}
 
+    return models
+
+
+MODEL_LIST_CACHE = ModelListCache(
+    "ollama",
+    fetch_all_models,
+    ["ENABLE_OLLAMA_API", "OLLAMA_BASE_URLS", "OLLAMA_API_CONFIGS"],
+)
+
+
+async def get_all_models(request: Request, user: UserModel = None):
+    models = await MODEL_LIST_CACHE.get(request, user)
+
     request.app.state.OLLAMA_MODELS = {
         model["model"]: model for model in models["models"]
     }
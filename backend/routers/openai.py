@@ -5,7 +5,6 @@ import logging
 from typing import Optional
 
 import aiohttp
-from aiocache import cached
 import requests
 from urllib.parse import quote
 
@@ -26,7 +25,6 @@ from backend.config import (
     CACHE_DIR,
 )
 from backend.env import (
-    MODELS_CACHE_TTL,
     AIOHTTP_CLIENT_SESSION_SSL,
     AIOHTTP_CLIENT_TIMEOUT,
     AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
@@ -50,6 +48,8 @@ from backend.utils.misc import (
 
 from backend.utils.auth import get_admin_user, get_verified_user
 from backend.utils.access_control import has_access
+from backend.utils.model_list_cache import ModelListCache
+from backend.utils.session_pool import get_client_session
 
 
 log = logging.getLogger(__name__)
@@ -66,25 +66,26 @@ log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True,proxy=PROXIES) as session:
-            async with session.get(
-                url,
-                headers={
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        session = get_client_session(url, proxy=PROXIES)
+        async with session.get(
+            url,
+            headers={
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
@@ -93,10 +94,12 @@ async def send_get_request(url, key=None, user: UserModel = None):
 
 async def cleanup_response(
     response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+    session: Optional[aiohttp.ClientSession] = None,
 ):
     if response:
-        response.close()
+        # Hands the connection back to the pool once the body was fully read,
+        # otherwise the connection is closed
+        response.release()
     if session:
         await session.close()
 
@@ -221,6 +224,16 @@ def get_microsoft_entra_id_access_token():
 router = APIRouter()
 
 
+@router.get("/config/health")
+async def get_connections_health(request: Request, user=Depends(get_admin_user)):
+    """Model list health of each configured connection, by connection index"""
+    health = await MODEL_LIST_CACHE.get_health(request)
+    return {
+        str(idx): health.get(str(idx), {"url": url, "status": "unknown"})
+        for idx, url in enumerate(request.app.state.config.OPENAI_API_BASE_URLS)
+    }
+
+
 @router.get("/config")
 async def get_config(request: Request, user=Depends(get_admin_user)):
     return {
@@ -380,9 +393,14 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
             url not in request.app.state.config.OPENAI_API_CONFIGS  # Legacy support
         ):
             request_tasks.append(
-                send_get_request(
-                    f"{url}/models",
-                    request.app.state.config.OPENAI_API_KEYS[idx],
+                MODEL_LIST_CACHE.track(
+                    idx,
+                    url,
+                    send_get_request(
+                        f"{url}/models",
+                        request.app.state.config.OPENAI_API_KEYS[idx],
+                        user=user,
+                    ),
                     user=user,
                 )
             )
@@ -400,9 +418,14 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
             if enable:
                 if len(model_ids) == 0:
                     request_tasks.append(
-                        send_get_request(
-                            f"{url}/models",
-                            request.app.state.config.OPENAI_API_KEYS[idx],
+                        MODEL_LIST_CACHE.track(
+                            idx,
+                            url,
+                            send_get_request(
+                                f"{url}/models",
+                                request.app.state.config.OPENAI_API_KEYS[idx],
+                                user=user,
+                            ),
                             user=user,
                         )
                     )
@@ -483,11 +506,7 @@ async def get_filtered_models(models, user):
     return filtered_models
 
 
-@cached(
-    ttl=MODELS_CACHE_TTL,
-    key=lambda _, user: f"openai_all_models_{user.id}" if user else "openai_all_models",
-)
-async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
+async def fetch_all_models(request: Request, user: UserModel) -> dict[str, list]:
     log.info("get_all_models()")
 
     if not request.app.state.config.ENABLE_OPENAI_API:
@@ -543,6 +562,23 @@ async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
 
     models = {"data": merge_models_lists(map(extract_data, responses))}
     log.debug(f"models: {models}")
+    return models
+
+
+MODEL_LIST_CACHE = ModelListCache(
+    "openai",
+    fetch_all_models,
+    [
+        "ENABLE_OPENAI_API",
+        "OPENAI_API_BASE_URLS",
+        "OPENAI_API_KEYS",
+        "OPENAI_API_CONFIGS",
+    ],
+)
+
+
+async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
+    models = await MODEL_LIST_CACHE.get(request, user)
 
     request.app.state.OPENAI_MODELS = {model["id"]: model for model in models["data"]}
     return models
@@ -569,68 +605,67 @@ async def get_models(
         )
 
         r = None
-        async with aiohttp.ClientSession(
-            trust_env=True,
-            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST),
-            proxy=PROXIES
-        ) as session:
-            try:
-                headers, cookies = await get_headers_and_cookies(
-                    request, url, key, api_config, user=user
-                )
-
-                if api_config.get("azure", False):
-                    models = {
-                        "data": api_config.get("model_ids", []) or [],
-                        "object": "list",
-                    }
-                else:
-                    async with session.get(
-                        f"{url}/models",
-                        headers=headers,
-                        cookies=cookies,
-                        ssl=AIOHTTP_CLIENT_SESSION_SSL,
-                    ) as r:
-                        if r.status != 200:
-                            # Extract response error details if available
-                            error_detail = f"HTTP Error: {r.status}"
-                            res = await r.json()
-                            if "error" in res:
-                                error_detail = f"External Error: {res['error']}"
-                            raise Exception(error_detail)
+        session = get_client_session(url, proxy=PROXIES)
+        try:
+            headers, cookies = await get_headers_and_cookies(
+                request, url, key, api_config, user=user
+            )
 
-                        response_data = await r.json()
+            if api_config.get("azure", False):
+                models = {
+                    "data": api_config.get("model_ids", []) or [],
+                    "object": "list",
+                }
+            else:
+                async with session.get(
+                    f"{url}/models",
+                    headers=headers,
+                    cookies=cookies,
+                    ssl=AIOHTTP_CLIENT_SESSION_SSL,
+                    timeout=aiohttp.ClientTimeout(
+                        total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST
+                    ),
+                ) as r:
+                    if r.status != 200:
+                        # Extract response error details if available
+                        error_detail = f"HTTP Error: {r.status}"
+                        res = await r.json()
+                        if "error" in res:
+                            error_detail = f"External Error: {res['error']}"
+                        raise Exception(error_detail)
+
+                    response_data = await r.json()
+
+                    # Check if we're calling OpenAI API based on the URL
+                    if "api.openai.com" in url:
+                        # Filter models according to the specified conditions
+                        response_data["data"] = [
+                            model
+                            for model in response_data.get("data", [])
+                            if not any(
+                                name in model["id"]
+                                for name in [
+                                    "babbage",
+                                    "dall-e",
+                                    "davinci",
+                                    "embedding",
+                                    "tts",
+                                    "whisper",
+                                ]
+                            )
+                        ]
 
-                        # Check if we're calling OpenAI API based on the URL
-                        if "api.openai.com" in url:
-                            # Filter models according to the specified conditions
-                            response_data["data"] = [
-                                model
-                                for model in response_data.get("data", [])
-                                if not any(
-                                    name in model["id"]
-                                    for name in [
-                                        "babbage",
-                                        "dall-e",
-                                        "davinci",
-                                        "embedding",
-                                        "tts",
-                                        "whisper",
-                                    ]
-                                )
-                            ]
-
-                        models = response_data
-            except aiohttp.ClientError as e:
-                # ClientError covers all aiohttp requests issues
-                log.exception(f"Client error: {str(e)}")
-                raise HTTPException(
-                    status_code=500, detail="Open WebUI: Server Connection Error"
-                )
-            except Exception as e:
-                log.exception(f"Unexpected error: {e}")
-                error_detail = f"Unexpected error: {str(e)}"
-                raise HTTPException(status_code=500, detail=error_detail)
+                    models = response_data
+        except aiohttp.ClientError as e:
+            # ClientError covers all aiohttp requests issues
+            log.exception(f"Client error: {str(e)}")
+            raise HTTPException(
+                status_code=500, detail="Open WebUI: Server Connection Error"
+            )
+        except Exception as e:
+            log.exception(f"Unexpected error: {e}")
+            error_detail = f"Unexpected error: {str(e)}"
+            raise HTTPException(status_code=500, detail=error_detail)
 
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
         models["data"] = await get_filtered_models(models, user)
@@ -928,16 +963,11 @@ async def generate_chat_completion(
     payload = json.dumps(payload)
 
     r = None
-    session = None
     streaming = False
     response = None
 
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
-            proxy=PROXIES
-        )
-
+        session = get_client_session(request_url, proxy=PROXIES)
         r = await session.request(
             method="POST",
             url=request_url,
@@ -945,6 +975,7 @@ async def generate_chat_completion(
             headers=headers,
             cookies=cookies,
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
 
         # Check if response is SSE
@@ -954,9 +985,7 @@ async def generate_chat_completion(
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             try:
@@ -981,7 +1010,7 @@ async def generate_chat_completion(
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r)
 
 
 async def embeddings(request: Request, form_data: dict, user):
@@ -1014,14 +1043,13 @@ async def embeddings(request: Request, form_data: dict, user):
     )
 
     r = None
-    session = None
     streaming = False
 
     headers, cookies = await get_headers_and_cookies(
         request, url, key, api_config, user=user
     )
     try:
-        session = aiohttp.ClientSession(trust_env=True, proxy=PROXIES)
+        session = get_client_session(url, proxy=PROXIES)
         r = await session.request(
             method="POST",
             url=f"{url}/embeddings",
@@ -1036,9 +1064,7 @@ async def embeddings(request: Request, form_data: dict, user):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             try:
@@ -1063,7 +1089,7 @@ async def embeddings(request: Request, form_data: dict, user):
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r)
 
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
@@ -1085,7 +1111,6 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
     )
 
     r = None
-    session = None
     streaming = False
 
     try:
@@ -1111,7 +1136,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
         else:
             request_url = f"{url}/{path}"
 
-        session = aiohttp.ClientSession(trust_env=True)
+        session = get_client_session(request_url)
         r = await session.request(
             method=request.method,
             url=request_url,
@@ -1128,9 +1153,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             try:
@@ -1156,4 +1179,4 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r)
@@ -6,6 +6,7 @@ import shutil
 import asyncio
 
 import re
+import time
 import uuid
 from datetime import datetime
 from pathlib import Path
@@ -25,15 +26,14 @@ from fastapi import (
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import tiktoken
 
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSplitter
-from langchain_text_splitters import MarkdownHeaderTextSplitter
 from langchain_core.documents import Document
 
 from backend.models.files import FileModel, Files
+from backend.models.ingestion_jobs import IngestionJobResponse, IngestionJobs
 from backend.models.knowledge import Knowledges
+from backend.models.users import UserModel
 from backend.storage.provider import Storage
 
 
@@ -81,6 +81,8 @@ from backend.retrieval.utils import (
     query_doc_with_hybrid_search,
 )
 from backend.retrieval.vector.utils import filter_metadata
+from backend.retrieval.embedding_cache import EMBEDDING_CACHE, get_embedding_cache_stats
+from backend.retrieval.splitter import DOCUMENT_SPLITTER
 from backend.utils.misc import (
     calculate_sha256_string,
 )
@@ -96,6 +98,7 @@ from backend.config import (
     DEFAULT_LOCALE,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_QUERY_PREFIX,
+    ENABLE_RAG_EMBEDDING_CACHE,
 )
 from backend.env import (
     SRC_LOG_LEVELS,
@@ -273,6 +276,21 @@ async def get_embedding_config(request: Request, user=Depends(get_admin_user)):
     }
 
 
+@router.get("/embedding/cache")
+async def get_embedding_cache(user=Depends(get_admin_user)):
+    return {
+        "status": True,
+        "enabled": ENABLE_RAG_EMBEDDING_CACHE,
+        **get_embedding_cache_stats(),
+    }
+
+
+@router.post("/embedding/cache/reset")
+async def reset_embedding_cache(user=Depends(get_admin_user)):
+    await run_in_threadpool(EMBEDDING_CACHE.clear)
+    return {"status": True}
+
+
 class OpenAIConfigForm(BaseModel):
     url: str
     key: str
@@ -1315,92 +1333,35 @@ def save_docs_to_vector_db(
                 raise ValueError(ERROR_MESSAGES.DUPLICATE_CONTENT)
 
     if split:
-        if request.app.state.config.TEXT_SPLITTER in ["", "character"]:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-            docs = text_splitter.split_documents(docs)
-        elif request.app.state.config.TEXT_SPLITTER == "token":
+        if request.app.state.config.TEXT_SPLITTER == "token":
             log.info(
                 f"Using token text splitter: {request.app.state.config.TIKTOKEN_ENCODING_NAME}"
             )
-
-            tiktoken.get_encoding(str(request.app.state.config.TIKTOKEN_ENCODING_NAME))
-            text_splitter = TokenTextSplitter(
-                encoding_name=str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-            docs = text_splitter.split_documents(docs)
         elif request.app.state.config.TEXT_SPLITTER == "markdown_header":
             log.info("Using markdown header text splitter")
 
-            # Define headers to split on - covering most common markdown header levels
-            headers_to_split_on = [
-                ("#", "Header 1"),
-                ("##", "Header 2"),
-                ("###", "Header 3"),
-                ("####", "Header 4"),
-                ("#####", "Header 5"),
-                ("######", "Header 6"),
-            ]
+        chunk_batches = DOCUMENT_SPLITTER.iter_split_documents(
+            docs,
+            request.app.state.config.TEXT_SPLITTER,
+            request.app.state.config.CHUNK_SIZE,
+            request.app.state.config.CHUNK_OVERLAP,
+            str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
+        )
+    else:
+        chunk_batches = (batch for batch in [docs])
 
-            markdown_splitter = MarkdownHeaderTextSplitter(
-                headers_to_split_on=headers_to_split_on,
-                strip_headers=False,  # Keep headers in content for context
-            )
+    # Seconds spent waiting for the chunks, embedding them and inserting them
+    timings = {"split": 0.0, "embed": 0.0, "insert": 0.0}
 
-            md_split_docs = []
-            for doc in docs:
-                md_header_splits = markdown_splitter.split_text(doc.page_content)
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=request.app.state.config.CHUNK_SIZE,
-                    chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                    add_start_index=True,
-                )
-                md_header_splits = text_splitter.split_documents(md_header_splits)
-
-                # Convert back to Document objects, preserving original metadata
-                for split_chunk in md_header_splits:
-                    headings_list = []
-                    # Extract header values in order based on headers_to_split_on
-                    for _, header_meta_key_name in headers_to_split_on:
-                        if header_meta_key_name in split_chunk.metadata:
-                            headings_list.append(
-                                split_chunk.metadata[header_meta_key_name]
-                            )
-
-                    md_split_docs.append(
-                        Document(
-                            page_content=split_chunk.page_content,
-                            metadata={**doc.metadata, "headings": headings_list},
-                        )
-                    )
+    try:
+        start = time.perf_counter()
+        # The remaining batches keep being split while the first is embedded
+        chunks = next((batch for batch in chunk_batches if batch), None)
+        timings["split"] += time.perf_counter() - start
 
-            docs = md_split_docs
-        else:
-            raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
-
-    if len(docs) == 0:
-        raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
-
-    texts = [doc.page_content for doc in docs]
-    metadatas = [
-        {
-            **doc.metadata,
-            **(metadata if metadata else {}),
-            "embedding_config": {
-                "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
-                "model": request.app.state.config.RAG_EMBEDDING_MODEL,
-            },
-        }
-        for doc in docs
-    ]
+        if chunks is None:
+            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
-    try:
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
             log.info(f"collection {collection_name} already exists")
 
@@ -1444,34 +1405,61 @@ def save_docs_to_vector_db(
             ),
         )
 
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts)),
-            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
-            user=user,
-        )
-        log.info(f"embeddings generated {len(embeddings)} for {len(texts)} items")
-
-        items = [
-            {
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "vector": embeddings[idx],
-                "metadata": metadatas[idx],
-            }
-            for idx, text in enumerate(texts)
-        ]
+        items = []
+        while chunks is not None:
+            if chunks:
+                texts = [doc.page_content for doc in chunks]
+
+                start = time.perf_counter()
+                embeddings = embedding_function(
+                    list(map(lambda x: x.replace("\n", " "), texts)),
+                    prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+                    user=user,
+                )
+                timings["embed"] += time.perf_counter() - start
+
+                items.extend(
+                    {
+                        "id": str(uuid.uuid4()),
+                        "text": text,
+                        "vector": embeddings[idx],
+                        "metadata": {
+                            **chunks[idx].metadata,
+                            **(metadata if metadata else {}),
+                            "embedding_config": {
+                                "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+                                "model": request.app.state.config.RAG_EMBEDDING_MODEL,
+                            },
+                        },
+                    }
+                    for idx, text in enumerate(texts)
+                )
+
+            start = time.perf_counter()
+            chunks = next(chunk_batches, None)
+            timings["split"] += time.perf_counter() - start
+
+        log.info(f"embeddings generated for {len(items)} items")
 
         log.info(f"adding to collection {collection_name}")
+        start = time.perf_counter()
         VECTOR_DB_CLIENT.insert(
             collection_name=collection_name,
             items=items,
         )
+        timings["insert"] += time.perf_counter() - start
 
-        log.info(f"added {len(items)} items to collection {collection_name}")
+        log.info(
+            f"added {len(items)} items to collection {collection_name} "
+            f"(split {timings['split']:.2f}s, embed {timings['embed']:.2f}s, "
+            f"insert {timings['insert']:.2f}s)"
+        )
         return True
     except Exception as e:
         log.exception(e)
         raise e
+    finally:
+        chunk_batches.close()
 
 
 class ProcessFileForm(BaseModel):
@@ -1486,6 +1474,20 @@ def process_file(
     form_data: ProcessFileForm,
     user=Depends(get_verified_user),
 ):
+    return process_file_item(request, form_data, user)
+
+
+def process_file_item(
+    request: Request,
+    form_data: ProcessFileForm,
+    user: UserModel,
+    final_attempt: bool = True,
+):
+    """
+    Extract, split and embed a file. A failure marks the file "failed" only on
+    its `final_attempt`: ingestion jobs that will be retried leave it pending,
+    as status streams end on the first "failed".
+    """
     if user.role == "admin":
         file = Files.get_file_by_id(form_data.file_id)
     else:
@@ -1693,22 +1695,24 @@ def process_file(
 
         except Exception as e:
             log.exception(e)
-            Files.update_file_data_by_id(
-                file.id,
-                {"status": "failed"},
-            )
 
             if "No pandoc was found" in str(e):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=ERROR_MESSAGES.PANDOC_NOT_INSTALLED,
-                )
+                error = ERROR_MESSAGES.PANDOC_NOT_INSTALLED
             else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=str(e),
+                error = str(e)
+
+            if final_attempt:
+                # Stored with the error, status streams end on the first "failed"
+                Files.update_file_data_by_id(
+                    file.id,
+                    {"status": "failed", "error": error},
                 )
 
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=error,
+            )
+
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=ERROR_MESSAGES.NOT_FOUND
@@ -2500,3 +2504,21 @@ def process_files_batch(
                 )
 
     return BatchProcessFilesResponse(results=results, errors=errors)
+
+
+@router.get("/process/jobs", response_model=list[IngestionJobResponse])
+async def get_ingestion_jobs(user=Depends(get_verified_user)):
+    return IngestionJobs.get_jobs_by_user_id(user.id)
+
+
+@router.get("/process/jobs/{id}", response_model=IngestionJobResponse)
+async def get_ingestion_job_by_id(id: str, user=Depends(get_verified_user)):
+    job = IngestionJobs.get_job_by_id(id)
+
+    if not job or (job.user_id != user.id and user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    return job
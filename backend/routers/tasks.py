@@ -14,6 +14,8 @@ from backend.utils.task import (
     image_prompt_generation_template,
     autocomplete_generation_template,
     tags_generation_template,
+    combined_task_generation_template,
+    COMBINED_TASK_OUTPUTS,
     emoji_generation_template,
     moa_response_generation_template,
 )
@@ -28,6 +30,7 @@ from backend.config import (
     DEFAULT_TITLE_GENERATION_PROMPT_TEMPLATE,
     DEFAULT_FOLLOW_UP_GENERATION_PROMPT_TEMPLATE,
     DEFAULT_TAGS_GENERATION_PROMPT_TEMPLATE,
+    DEFAULT_COMBINED_TASK_GENERATION_PROMPT_TEMPLATE,
     DEFAULT_IMAGE_PROMPT_GENERATION_PROMPT_TEMPLATE,
     DEFAULT_QUERY_GENERATION_PROMPT_TEMPLATE,
     DEFAULT_AUTOCOMPLETE_GENERATION_PROMPT_TEMPLATE,
@@ -64,6 +67,8 @@ async def get_task_config(request: Request, user=Depends(get_verified_user)):
         "ENABLE_FOLLOW_UP_GENERATION": request.app.state.config.ENABLE_FOLLOW_UP_GENERATION,
         "ENABLE_TAGS_GENERATION": request.app.state.config.ENABLE_TAGS_GENERATION,
         "ENABLE_TITLE_GENERATION": request.app.state.config.ENABLE_TITLE_GENERATION,
+        "ENABLE_COMBINED_TASK_GENERATION": request.app.state.config.ENABLE_COMBINED_TASK_GENERATION,
+        "COMBINED_TASK_GENERATION_PROMPT_TEMPLATE": request.app.state.config.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE,
         "ENABLE_SEARCH_QUERY_GENERATION": request.app.state.config.ENABLE_SEARCH_QUERY_GENERATION,
         "ENABLE_RETRIEVAL_QUERY_GENERATION": request.app.state.config.ENABLE_RETRIEVAL_QUERY_GENERATION,
         "QUERY_GENERATION_PROMPT_TEMPLATE": request.app.state.config.QUERY_GENERATION_PROMPT_TEMPLATE,
@@ -87,6 +92,8 @@ class TaskConfigForm(BaseModel):
     ENABLE_RETRIEVAL_QUERY_GENERATION: bool
     QUERY_GENERATION_PROMPT_TEMPLATE: str
     TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE: str
+    ENABLE_COMBINED_TASK_GENERATION: Optional[bool] = None
+    COMBINED_TASK_GENERATION_PROMPT_TEMPLATE: Optional[str] = None
 
 
 @router.post("/config/update")
@@ -136,6 +143,15 @@ async def update_task_config(
         form_data.TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE
     )
 
+    if form_data.ENABLE_COMBINED_TASK_GENERATION is not None:
+        request.app.state.config.ENABLE_COMBINED_TASK_GENERATION = (
+            form_data.ENABLE_COMBINED_TASK_GENERATION
+        )
+    if form_data.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE is not None:
+        request.app.state.config.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE = (
+            form_data.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE
+        )
+
     return {
         "TASK_MODEL": request.app.state.config.TASK_MODEL,
         "TASK_MODEL_EXTERNAL": request.app.state.config.TASK_MODEL_EXTERNAL,
@@ -152,6 +168,8 @@ async def update_task_config(
         "ENABLE_RETRIEVAL_QUERY_GENERATION": request.app.state.config.ENABLE_RETRIEVAL_QUERY_GENERATION,
         "QUERY_GENERATION_PROMPT_TEMPLATE": request.app.state.config.QUERY_GENERATION_PROMPT_TEMPLATE,
         "TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE": request.app.state.config.TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE,
+        "ENABLE_COMBINED_TASK_GENERATION": request.app.state.config.ENABLE_COMBINED_TASK_GENERATION,
+        "COMBINED_TASK_GENERATION_PROMPT_TEMPLATE": request.app.state.config.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE,
     }
 
 
@@ -385,6 +403,93 @@ async def generate_chat_tags(
         )
 
 
+@router.post("/combined/completions")
+async def generate_combined_tasks(
+    request: Request, form_data: dict, user=Depends(get_verified_user)
+):
+    """
+    Generate several of the chat title, tags and follow-ups, as listed in
+    `form_data["outputs"]`, with a single task model completion returning a
+    JSON object keyed by output.
+    """
+
+    if not request.app.state.config.ENABLE_COMBINED_TASK_GENERATION:
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"detail": "Combined task generation is disabled"},
+        )
+
+    outputs = form_data.get("outputs", [])
+    if not outputs or any(output not in COMBINED_TASK_OUTPUTS for output in outputs):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Outputs must be some of: {', '.join(COMBINED_TASK_OUTPUTS)}",
+        )
+
+    if getattr(request.state, "direct", False) and hasattr(request.state, "model"):
+        models = {
+            request.state.model["id"]: request.state.model,
+        }
+    else:
+        models = request.app.state.MODELS
+
+    model_id = form_data["model"]
+    if model_id not in models:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Model not found",
+        )
+
+    # Check if the user has a custom task model
+    # If the user has a custom task model, use that model
+    task_model_id = get_task_model_id(
+        model_id,
+        request.app.state.config.TASK_MODEL,
+        request.app.state.config.TASK_MODEL_EXTERNAL,
+        models,
+    )
+
+    log.debug(
+        f"generating chat {', '.join(outputs)} using model {task_model_id} for user {user.email} "
+    )
+
+    if request.app.state.config.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE != "":
+        template = request.app.state.config.COMBINED_TASK_GENERATION_PROMPT_TEMPLATE
+    else:
+        template = DEFAULT_COMBINED_TASK_GENERATION_PROMPT_TEMPLATE
+
+    content = combined_task_generation_template(
+        template, form_data["messages"], outputs, user
+    )
+
+    payload = {
+        "model": task_model_id,
+        "messages": [{"role": "user", "content": content}],
+        "stream": False,
+        "metadata": {
+            **(request.state.metadata if hasattr(request.state, "metadata") else {}),
+            "task": str(TASKS.COMBINED_GENERATION),
+            "task_body": form_data,
+            "chat_id": form_data.get("chat_id", None),
+        },
+    }
+
+    # Process the payload through the pipeline
+    try:
+        payload = await process_pipeline_inlet_filter(request, payload, user, models)
+    except Exception as e:
+        raise e
+
+    try:
+        return await generate_chat_completion(request, form_data=payload, user=user)
+    except Exception as e:
+        log.error(f"Error generating chat completion: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"detail": "An internal error has occurred."},
+        )
+
+
 @router.post("/image_prompt/completions")
 async def generate_image_prompt(
     request: Request, form_data: dict, user=Depends(get_verified_user)
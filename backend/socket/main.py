@@ -1,5 +1,4 @@
 import asyncio
-import random
 
 import socketio
 import logging
@@ -23,13 +22,20 @@ from backend.env import (
     WEBSOCKET_MANAGER,
     WEBSOCKET_REDIS_URL,
     WEBSOCKET_REDIS_CLUSTER,
-    WEBSOCKET_REDIS_LOCK_TIMEOUT,
+    WEBSOCKET_PRESENCE_TTL,
     WEBSOCKET_SENTINEL_PORT,
     WEBSOCKET_SENTINEL_HOSTS,
     REDIS_KEY_PREFIX,
+    CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL,
+    CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING,
 )
 from backend.utils.auth import decode_token
-from backend.socket.utils import RedisDict, RedisLock, YdocManager
+from backend.socket.utils import (
+    PresenceStore,
+    YdocManager,
+    MessageWriteBuffer,
+    apply_message_ops,
+)
 from backend.tasks import create_task, stop_item_tasks
 from backend.utils.redis import get_redis_connection
 from backend.utils.access_control import has_access, get_users_with_access
@@ -95,8 +101,6 @@ else:
 # Timeout duration in seconds
 TIMEOUT_DURATION = 3
 
-# Dictionary to maintain the user pool
-
 if WEBSOCKET_MANAGER == "redis":
     log.debug("Using Redis to manage websockets.")
     REDIS = get_redis_connection(
@@ -108,45 +112,15 @@ if WEBSOCKET_MANAGER == "redis":
         async_mode=True,
     )
 
-    redis_sentinels = get_sentinels_from_env(
-        WEBSOCKET_SENTINEL_HOSTS, WEBSOCKET_SENTINEL_PORT
-    )
-    SESSION_POOL = RedisDict(
-        f"{REDIS_KEY_PREFIX}:session_pool",
-        redis_url=WEBSOCKET_REDIS_URL,
-        redis_sentinels=redis_sentinels,
-        redis_cluster=WEBSOCKET_REDIS_CLUSTER,
-    )
-    USER_POOL = RedisDict(
-        f"{REDIS_KEY_PREFIX}:user_pool",
-        redis_url=WEBSOCKET_REDIS_URL,
-        redis_sentinels=redis_sentinels,
-        redis_cluster=WEBSOCKET_REDIS_CLUSTER,
-    )
-    USAGE_POOL = RedisDict(
-        f"{REDIS_KEY_PREFIX}:usage_pool",
-        redis_url=WEBSOCKET_REDIS_URL,
-        redis_sentinels=redis_sentinels,
-        redis_cluster=WEBSOCKET_REDIS_CLUSTER,
-    )
-
-    clean_up_lock = RedisLock(
-        redis_url=WEBSOCKET_REDIS_URL,
-        lock_name=f"{REDIS_KEY_PREFIX}:usage_cleanup_lock",
-        timeout_secs=WEBSOCKET_REDIS_LOCK_TIMEOUT,
-        redis_sentinels=redis_sentinels,
-        redis_cluster=WEBSOCKET_REDIS_CLUSTER,
-    )
-    aquire_func = clean_up_lock.aquire_lock
-    renew_func = clean_up_lock.renew_lock
-    release_func = clean_up_lock.release_lock
-else:
-    SESSION_POOL = {}
-    USER_POOL = {}
-    USAGE_POOL = {}
-
-    aquire_func = release_func = renew_func = lambda: True
 
+# Sessions, online users and models in use, see PresenceStore
+PRESENCE = PresenceStore(
+    redis=REDIS,
+    # A hash tag, the keys of a script share a Redis Cluster slot
+    redis_key_prefix=f"{{{REDIS_KEY_PREFIX}:presence}}",
+    ttl=WEBSOCKET_PRESENCE_TTL,
+    usage_ttl=TIMEOUT_DURATION,
+)
 
 YDOC_MANAGER = YdocManager(
     redis=REDIS,
@@ -154,56 +128,46 @@ YDOC_MANAGER = YdocManager(
 )
 
 
-async def periodic_usage_pool_cleanup():
-    max_retries = 2
-    retry_delay = random.uniform(
-        WEBSOCKET_REDIS_LOCK_TIMEOUT / 2, WEBSOCKET_REDIS_LOCK_TIMEOUT
-    )
-    for attempt in range(max_retries + 1):
-        if aquire_func():
-            break
-        else:
-            if attempt < max_retries:
-                log.debug(
-                    f"Cleanup lock already exists. Retry {attempt + 1} after {retry_delay}s..."
-                )
-                await asyncio.sleep(retry_delay)
-            else:
-                log.warning(
-                    "Failed to acquire cleanup lock after retries. Skipping cleanup."
-                )
-                return
+def write_buffered_message_ops(chat_id: str, message_id: str, ops: list[dict]):
+    message = Chats.get_message_by_id_and_message_id(chat_id, message_id)
 
-    log.debug("Running periodic_cleanup")
+    # Appends only apply to messages that already exist, as status, content
+    # and source events did before they were buffered
+    if not message and not any(op.get("type") == "set" for op in ops):
+        return
+
+    update = apply_message_ops(message or {}, ops)
+    if update:
+        Chats.upsert_message_to_chat_by_id_and_message_id(chat_id, message_id, update)
+
+
+MESSAGE_WRITE_BUFFER = MessageWriteBuffer(
+    write_message=write_buffered_message_ops,
+    redis=REDIS,
+    redis_key_prefix=f"{REDIS_KEY_PREFIX}:message_write_buffer",
+    flush_interval=CHAT_MESSAGE_WRITE_BUFFER_FLUSH_INTERVAL,
+    max_pending=CHAT_MESSAGE_WRITE_BUFFER_MAX_PENDING,
+)
+
+
+async def periodic_message_write_buffer_flush():
     try:
-        while True:
-            if not renew_func():
-                log.error(f"Unable to renew cleanup lock. Exiting usage pool cleanup.")
-                raise Exception("Unable to renew usage pool cleanup lock.")
-
-            now = int(time.time())
-            send_usage = False
-            for model_id, connections in list(USAGE_POOL.items()):
-                # Creating a list of sids to remove if they have timed out
-                expired_sids = [
-                    sid
-                    for sid, details in connections.items()
-                    if now - details["updated_at"] > TIMEOUT_DURATION
-                ]
-
-                for sid in expired_sids:
-                    del connections[sid]
-
-                if not connections:
-                    log.debug(f"Cleaning up model {model_id} from usage pool")
-                    del USAGE_POOL[model_id]
-                else:
-                    USAGE_POOL[model_id] = connections
-
-                send_usage = True
-            await asyncio.sleep(TIMEOUT_DURATION)
+        await MESSAGE_WRITE_BUFFER.run()
     finally:
-        release_func()
+        await MESSAGE_WRITE_BUFFER.flush_all()
+
+
+async def flush_message_writes(chat_id: str, message_id: str):
+    """Write all buffered updates of a message, e.g. before saving its final state."""
+    await MESSAGE_WRITE_BUFFER.flush(chat_id, message_id, done=True)
+
+
+def get_message_write_buffer_stats():
+    return MESSAGE_WRITE_BUFFER.get_stats()
+
+
+async def periodic_presence_refresh():
+    await PRESENCE.run()
 
 
 # Create Socket.IO ASGI app
@@ -213,24 +177,28 @@ app = socketio.ASGIApp(
 )
 
 
-def get_models_in_use():
+async def get_models_in_use():
     # List models that are currently in use
-    models_in_use = list(USAGE_POOL.keys())
-    return models_in_use
+    return await PRESENCE.get_models_in_use()
 
 
-def get_active_user_ids():
+async def get_active_user_ids():
     """Get the list of active user IDs."""
-    return list(USER_POOL.keys())
+    return await PRESENCE.get_active_user_ids()
 
 
-def get_user_active_status(user_id):
+def get_active_user_count():
+    """Get the number of active users, for synchronous callers."""
+    return PRESENCE.get_active_user_count()
+
+
+async def get_user_active_status(user_id):
     """Check if a user is currently active."""
-    return user_id in USER_POOL
+    return await PRESENCE.is_user_active(user_id)
 
 
 def get_user_id_from_session_pool(sid):
-    user = SESSION_POOL.get(sid)
+    user = PRESENCE.get_session(sid)
     if user:
         return user["id"]
     return None
@@ -245,33 +213,22 @@ def get_session_ids_from_room(room):
     return [session_id[0] for session_id in active_session_ids]
 
 
-def get_user_ids_from_room(room):
+async def get_user_ids_from_room(room):
     active_session_ids = get_session_ids_from_room(room)
 
-    active_user_ids = list(
-        set([SESSION_POOL.get(session_id)["id"] for session_id in active_session_ids])
-    )
+    sessions = await PRESENCE.get_sessions(active_session_ids)
+    active_user_ids = list(set([user["id"] for user in sessions.values()]))
     return active_user_ids
 
 
-def get_active_status_by_user_id(user_id):
-    if user_id in USER_POOL:
-        return True
-    return False
+async def get_active_status_by_user_id(user_id):
+    return await PRESENCE.is_user_active(user_id)
 
 
 @sio.on("usage")
 async def usage(sid, data):
-    if sid in SESSION_POOL:
-        model_id = data["model"]
-        # Record the timestamp for the last update
-        current_time = int(time.time())
-
-        # Store the new usage data and task
-        USAGE_POOL[model_id] = {
-            **(USAGE_POOL[model_id] if model_id in USAGE_POOL else {}),
-            sid: {"updated_at": current_time},
-        }
+    if PRESENCE.get_session(sid):
+        await PRESENCE.record_usage(data["model"])
 
 
 @sio.event
@@ -284,13 +241,9 @@ async def connect(sid, environ, auth):
             user = Users.get_user_by_id(data["id"])
 
         if user:
-            SESSION_POOL[sid] = user.model_dump(
-                exclude=["date_of_birth", "bio", "gender"]
+            await PRESENCE.add_session(
+                sid, user.model_dump(exclude=["date_of_birth", "bio", "gender"])
             )
-            if user.id in USER_POOL:
-                USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-            else:
-                USER_POOL[user.id] = [sid]
 
 
 @sio.on("user-join")
@@ -308,11 +261,9 @@ async def user_join(sid, data):
     if not user:
         return
 
-    SESSION_POOL[sid] = user.model_dump(exclude=["date_of_birth", "bio", "gender"])
-    if user.id in USER_POOL:
-        USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-    else:
-        USER_POOL[user.id] = [sid]
+    await PRESENCE.add_session(
+        sid, user.model_dump(exclude=["date_of_birth", "bio", "gender"])
+    )
 
     # Join all the channels
     channels = Channels.get_channels_by_user_id(user.id)
@@ -396,7 +347,7 @@ async def channel_events(sid, data):
                 "channel_id": data["channel_id"],
                 "message_id": data.get("message_id", None),
                 "data": event_data,
-                "user": UserNameResponse(**SESSION_POOL[sid]).model_dump(),
+                "user": UserNameResponse(**PRESENCE.get_session(sid)).model_dump(),
             },
             room=room,
         )
@@ -405,7 +356,7 @@ async def channel_events(sid, data):
 @sio.on("ydoc:document:join")
 async def ydoc_document_join(sid, data):
     """Handle user joining a document"""
-    user = SESSION_POOL.get(sid)
+    user = PRESENCE.get_session(sid)
 
     try:
         document_id = data["document_id"]
@@ -575,7 +526,7 @@ async def yjs_document_update(sid, data):
         async def debounced_save():
             await asyncio.sleep(0.5)
             await document_save_handler(
-                document_id, data.get("data", {}), SESSION_POOL.get(sid)
+                document_id, data.get("data", {}), PRESENCE.get_session(sid)
             )
 
         if data.get("data"):
@@ -643,7 +594,7 @@ async def get_location(sid, data):
     log.info(f"get_location: {data}")
     
     # Get the user from the session
-    user = SESSION_POOL.get(sid)
+    user = PRESENCE.get_session(sid)
     if not user:
         log.error(f"No user found for session {sid}")
         return
@@ -705,7 +656,7 @@ async def create_state(sid, data):
     log.info(f"Creating state: {data}")
     
     # Get the user from the session
-    user = SESSION_POOL.get(sid)
+    user = PRESENCE.get_session(sid)
     if not user:
         log.error(f"No user found for session {sid}")
         await sio.emit("states:create:response", {
@@ -792,7 +743,7 @@ async def get_state(sid, data):
     log.info(f"Getting state: {data}")
     
     # Get the user from the session
-    user = SESSION_POOL.get(sid)
+    user = PRESENCE.get_session(sid)
     if not user:
         log.error(f"No user found for session {sid}")
         await sio.emit("states:get:response", {
@@ -861,7 +812,7 @@ async def update_state(sid, data):
     log.info(f"Updating state: {data}")
     
     # Get the user from the session
-    user = SESSION_POOL.get(sid)
+    user = PRESENCE.get_session(sid)
     if not user:
         log.error(f"No user found for session {sid}")
         await sio.emit("states:update:response", {
@@ -945,7 +896,7 @@ async def delete_state(sid, data):
     log.info(f"Deleting state: {data}")
     
     # Get the user from the session
-    user = SESSION_POOL.get(sid)
+    user = PRESENCE.get_session(sid)
     if not user:
         log.error(f"No user found for session {sid}")
         await sio.emit("states:delete:response", {
@@ -994,16 +945,8 @@ async def delete_state(sid, data):
 
 @sio.event
 async def disconnect(sid):
-    if sid in SESSION_POOL:
-        user = SESSION_POOL[sid]
-        del SESSION_POOL[sid]
-
-        user_id = user["id"]
-        USER_POOL[user_id] = [_sid for _sid in USER_POOL[user_id] if _sid != sid]
-
-        if len(USER_POOL[user_id]) == 0:
-            del USER_POOL[user_id]
-
+    user = await PRESENCE.remove_session(sid)
+    if user:
         await YDOC_MANAGER.remove_user_from_all_documents(sid)
     else:
         pass
@@ -1016,7 +959,7 @@ def get_event_emitter(request_info, update_db=True):
 
         session_ids = list(
             set(
-                USER_POOL.get(user_id, [])
+                await PRESENCE.get_user_session_ids(user_id)
                 + (
                     [request_info.get("session_id")]
                     if request_info.get("session_id")
@@ -1047,92 +990,62 @@ def get_event_emitter(request_info, update_db=True):
             and message_id
             and not request_info.get("chat_id", "").startswith("local:")
         ):
-            if "type" in event_data and event_data["type"] == "status":
-                Chats.add_message_status_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                    event_data.get("data", {}),
-                )
-
-            if "type" in event_data and event_data["type"] == "message":
-                message = Chats.get_message_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                )
-
-                if message:
-                    content = message.get("content", "")
-                    content += event_data.get("data", {}).get("content", "")
+            event_type = event_data.get("type")
 
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
-                        request_info["chat_id"],
-                        request_info["message_id"],
-                        {
-                            "content": content,
-                        },
-                    )
-
-            if "type" in event_data and event_data["type"] == "replace":
-                content = event_data.get("data", {}).get("content", "")
-
-                Chats.upsert_message_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
+            if event_type == "status":
+                await MESSAGE_WRITE_BUFFER.push(
+                    chat_id,
+                    message_id,
                     {
-                        "content": content,
+                        "type": "append",
+                        "field": "statusHistory",
+                        "items": [event_data.get("data", {})],
                     },
                 )
 
-            if "type" in event_data and event_data["type"] == "embeds":
-                message = Chats.get_message_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                )
-
-                embeds = event_data.get("data", {}).get("embeds", [])
-                embeds.extend(message.get("embeds", []))
-
-                Chats.upsert_message_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
+            if event_type == "message":
+                await MESSAGE_WRITE_BUFFER.push(
+                    chat_id,
+                    message_id,
                     {
-                        "embeds": embeds,
+                        "type": "append_content",
+                        "content": event_data.get("data", {}).get("content", ""),
                     },
                 )
 
-            if "type" in event_data and event_data["type"] == "files":
-                message = Chats.get_message_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
+            if event_type == "replace":
+                await MESSAGE_WRITE_BUFFER.push(
+                    chat_id,
+                    message_id,
+                    {
+                        "type": "set",
+                        "data": {
+                            "content": event_data.get("data", {}).get("content", ""),
+                        },
+                    },
                 )
 
-                files = event_data.get("data", {}).get("files", [])
-                files.extend(message.get("files", []))
-
-                Chats.upsert_message_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
+            if event_type in ["embeds", "files"]:
+                await MESSAGE_WRITE_BUFFER.push(
+                    chat_id,
+                    message_id,
                     {
-                        "files": files,
+                        "type": "prepend",
+                        "field": event_type,
+                        "items": event_data.get("data", {}).get(event_type, []),
                     },
                 )
 
-            if event_data.get("type") in ["source", "citation"]:
+            if event_type in ["source", "citation"]:
                 data = event_data.get("data", {})
                 if data.get("type") == None:
-                    message = Chats.get_message_by_id_and_message_id(
-                        request_info["chat_id"],
-                        request_info["message_id"],
-                    )
-
-                    sources = message.get("sources", [])
-                    sources.append(data)
-
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
-                        request_info["chat_id"],
-                        request_info["message_id"],
+                    await MESSAGE_WRITE_BUFFER.push(
+                        chat_id,
+                        message_id,
                         {
-                            "sources": sources,
+                            "type": "append",
+                            "field": "sources",
+                            "items": [data],
                         },
                     )
 
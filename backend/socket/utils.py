@@ -1,111 +1,234 @@
+import asyncio
 import json
-import uuid
-from backend.utils.redis import get_redis_connection
-from backend.env import REDIS_KEY_PREFIX
-from typing import Optional, List, Tuple
+import logging
+import time
+from backend.env import REDIS_KEY_PREFIX, SRC_LOG_LEVELS
+from typing import Callable, Optional, List, Tuple
 import pycrdt as Y
 
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["SOCKET"])
+
+
+# Removes a session from its user's sessions and, when no live session is
+# left, the user from the online users, atomically so that a session added
+# meanwhile by another instance is never undone.
+# KEYS: session, user sessions, online users; ARGV: sid, now, user id
+PRESENCE_REMOVE_SESSION_SCRIPT = """
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if redis.call('ZCOUNT', KEYS[2], ARGV[2], '+inf') == 0 then
+    redis.call('ZREM', KEYS[3], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class PresenceStore:
+    """
+    Socket sessions, online users and models in use, shared by all instances
+    through Redis when a connection is given, in memory otherwise.
+
+    Sessions are kept by the instance holding their connection, so the
+    session of an incoming event is read locally. Redis holds:
+    - `{prefix}:session:{sid}`: the session's user, expiring after `ttl`
+    - `{prefix}:user:{user_id}`: the user's session ids, scored by expiry
+    - `{prefix}:users`: online user ids, scored by their latest expiry
+    - `{prefix}:models`: model ids in use, scored by their usage expiry
+
+    Every change is a single pipelined round trip, removing a session a
+    single script, and reads skip expired scores, so there is no cleanup
+    loop: each instance refreshes its own sessions every `ttl / 3` seconds
+    (see `run`), and the sessions of an instance that stopped expire on their
+    own. On Redis Cluster, the prefix must be a `{hash tag}` so the keys of
+    the script share a slot.
+    """
 
-class RedisLock:
     def __init__(
         self,
-        redis_url,
-        lock_name,
-        timeout_secs,
-        redis_sentinels=[],
-        redis_cluster=False,
+        redis=None,
+        redis_key_prefix: str = f"{{{REDIS_KEY_PREFIX}:presence}}",
+        ttl: int = 60,
+        usage_ttl: int = 3,
     ):
+        self._redis = redis
+        self._redis_key_prefix = redis_key_prefix
+        if redis:
+            self._remove_session_script = redis.register_script(
+                PRESENCE_REMOVE_SESSION_SCRIPT
+            )
+        self.ttl = ttl
+        self.usage_ttl = usage_ttl
 
-        self.lock_name = lock_name
-        self.lock_id = str(uuid.uuid4())
-        self.timeout_secs = timeout_secs
-        self.lock_obtained = False
-        self.redis = get_redis_connection(
-            redis_url,
-            redis_sentinels,
-            redis_cluster=redis_cluster,
-            decode_responses=True,
-        )
-
-    def aquire_lock(self):
-        # nx=True will only set this key if it _hasn't_ already been set
-        self.lock_obtained = self.redis.set(
-            self.lock_name, self.lock_id, nx=True, ex=self.timeout_secs
-        )
-        return self.lock_obtained
-
-    def renew_lock(self):
-        # xx=True will only set this key if it _has_ already been set
-        return self.redis.set(
-            self.lock_name, self.lock_id, xx=True, ex=self.timeout_secs
-        )
-
-    def release_lock(self):
-        lock_value = self.redis.get(self.lock_name)
-        if lock_value and lock_value == self.lock_id:
-            self.redis.delete(self.lock_name)
-
-
-class RedisDict:
-    def __init__(self, name, redis_url, redis_sentinels=[], redis_cluster=False):
-        self.name = name
-        self.redis = get_redis_connection(
-            redis_url,
-            redis_sentinels,
-            redis_cluster=redis_cluster,
-            decode_responses=True,
-        )
+        # Sessions connected to this instance
+        self._sessions: dict[str, dict] = {}
 
-    def __setitem__(self, key, value):
-        serialized_value = json.dumps(value)
-        self.redis.hset(self.name, key, serialized_value)
+        # In-memory stand-ins of the Redis keys
+        self._user_sessions: dict[str, set] = {}
+        self._models: dict[str, float] = {}
 
-    def __getitem__(self, key):
-        value = self.redis.hget(self.name, key)
-        if value is None:
-            raise KeyError(key)
-        return json.loads(value)
+        self._active_user_count = 0
 
-    def __delitem__(self, key):
-        result = self.redis.hdel(self.name, key)
-        if result == 0:
-            raise KeyError(key)
+    def _get_redis_key(self, *parts: str) -> str:
+        return ":".join([self._redis_key_prefix, *parts])
 
-    def __contains__(self, key):
-        return self.redis.hexists(self.name, key)
+    async def add_session(self, sid: str, user: dict):
+        self._sessions[sid] = user
+        user_id = user["id"]
 
-    def __len__(self):
-        return self.redis.hlen(self.name)
+        if self._redis:
+            expires_at = time.time() + self.ttl
+            user_key = self._get_redis_key("user", user_id)
+
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.set(
+                    self._get_redis_key("session", sid), json.dumps(user), ex=self.ttl
+                )
+                pipe.zadd(user_key, {sid: expires_at})
+                pipe.expire(user_key, self.ttl)
+                pipe.zadd(self._get_redis_key("users"), {user_id: expires_at})
+                await pipe.execute()
+        else:
+            self._user_sessions.setdefault(user_id, set()).add(sid)
 
-    def keys(self):
-        return self.redis.hkeys(self.name)
+    async def remove_session(self, sid: str) -> Optional[dict]:
+        user = self._sessions.pop(sid, None)
+        if user is None:
+            return None
+        user_id = user["id"]
 
-    def values(self):
-        return [json.loads(v) for v in self.redis.hvals(self.name)]
+        if self._redis:
+            await self._remove_session_script(
+                keys=[
+                    self._get_redis_key("session", sid),
+                    self._get_redis_key("user", user_id),
+                    self._get_redis_key("users"),
+                ],
+                args=[sid, time.time(), user_id],
+            )
+        else:
+            sids = self._user_sessions.get(user_id, set())
+            sids.discard(sid)
+            if not sids:
+                self._user_sessions.pop(user_id, None)
+
+        return user
+
+    def get_session(self, sid: str) -> Optional[dict]:
+        """User of a session connected to this instance"""
+        return self._sessions.get(sid)
+
+    async def get_sessions(self, sids: list[str]) -> dict[str, dict]:
+        """Users of the given sessions, on any instance, in one round trip"""
+        sessions = {sid: self._sessions[sid] for sid in sids if sid in self._sessions}
+
+        missing_sids = [sid for sid in sids if sid not in sessions]
+        if self._redis and missing_sids:
+            # Pipelined GETs rather than MGET, whose keys may span Redis
+            # Cluster slots
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for sid in missing_sids:
+                    pipe.get(self._get_redis_key("session", sid))
+                values = await pipe.execute()
+            for sid, value in zip(missing_sids, values):
+                if value is not None:
+                    sessions[sid] = json.loads(value)
+
+        return sessions
+
+    async def get_user_session_ids(self, user_id: str) -> list[str]:
+        if self._redis:
+            return await self._redis.zrangebyscore(
+                self._get_redis_key("user", user_id), time.time(), "+inf"
+            )
+        return list(self._user_sessions.get(user_id, []))
 
-    def items(self):
-        return [(k, json.loads(v)) for k, v in self.redis.hgetall(self.name).items()]
+    async def is_user_active(self, user_id: str) -> bool:
+        if self._redis:
+            score = await self._redis.zscore(self._get_redis_key("users"), user_id)
+            return score is not None and score > time.time()
+        return user_id in self._user_sessions
 
-    def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
+    async def get_active_user_ids(self) -> list[str]:
+        if self._redis:
+            user_ids = await self._redis.zrangebyscore(
+                self._get_redis_key("users"), time.time(), "+inf"
+            )
+            self._active_user_count = len(user_ids)
+            return user_ids
+        return list(self._user_sessions.keys())
+
+    def get_active_user_count(self) -> int:
+        """
+        Number of online users for synchronous callers. With Redis, as of the
+        last refresh or read of the active users.
+        """
+        if self._redis:
+            return self._active_user_count
+        return len(self._user_sessions)
 
-    def clear(self):
-        self.redis.delete(self.name)
+    async def record_usage(self, model_id: str):
+        expires_at = time.time() + self.usage_ttl
 
-    def update(self, other=None, **kwargs):
-        if other is not None:
-            for k, v in other.items() if hasattr(other, "items") else other:
-                self[k] = v
-        for k, v in kwargs.items():
-            self[k] = v
+        if self._redis:
+            await self._redis.zadd(
+                self._get_redis_key("models"), {model_id: expires_at}
+            )
+        else:
+            self._models[model_id] = expires_at
 
-    def setdefault(self, key, default=None):
-        if key not in self:
-            self[key] = default
-        return self[key]
+    async def get_models_in_use(self) -> list[str]:
+        if self._redis:
+            return await self._redis.zrangebyscore(
+                self._get_redis_key("models"), time.time(), "+inf"
+            )
+
+        now = time.time()
+        for model_id, expires_at in list(self._models.items()):
+            if expires_at <= now:
+                del self._models[model_id]
+        return list(self._models.keys())
+
+    async def refresh(self):
+        """Extend the expiry of this instance's sessions and drop expired ids"""
+        if not self._redis:
+            return
+
+        now = time.time()
+        expires_at = now + self.ttl
+
+        sids_by_user = {}
+        for sid, user in list(self._sessions.items()):
+            sids_by_user.setdefault(user["id"], {})[sid] = expires_at
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, sids in sids_by_user.items():
+                user_key = self._get_redis_key("user", user_id)
+                for sid in sids:
+                    pipe.expire(self._get_redis_key("session", sid), self.ttl)
+                pipe.zadd(user_key, sids)
+                pipe.zremrangebyscore(user_key, "-inf", now)
+                pipe.expire(user_key, self.ttl)
+            if sids_by_user:
+                pipe.zadd(
+                    self._get_redis_key("users"),
+                    {user_id: expires_at for user_id in sids_by_user},
+                )
+            pipe.zremrangebyscore(self._get_redis_key("users"), "-inf", now)
+            pipe.zremrangebyscore(self._get_redis_key("models"), "-inf", now)
+            pipe.zcard(self._get_redis_key("users"))
+            results = await pipe.execute()
+
+        self._active_user_count = results[-1]
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(max(self.ttl / 3, 1))
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.error(f"Error refreshing socket sessions: {e}")
 
 
 class YdocManager:
@@ -118,6 +241,10 @@ class YdocManager:
         self._users = {}
         self._redis = redis
         self._redis_key_prefix = redis_key_prefix
+        if redis:
+            self._remove_session_script = redis.register_script(
+                PRESENCE_REMOVE_SESSION_SCRIPT
+            )
 
     async def append_to_updates(self, document_id: str, update: bytes):
         document_id = document_id.replace(":", "_")
@@ -212,3 +339,200 @@ class YdocManager:
                 del self._updates[document_id]
             if document_id in self._users:
                 del self._users[document_id]
+
+
+def apply_message_ops(message: dict, ops: List[dict]) -> dict:
+    """
+    Coalesce buffered message operations into a single update for `message`.
+
+    Operations are applied in the order they were pushed:
+    - `set`: overwrite the given fields
+    - `append_content`: append text to `content`
+    - `prepend` / `append`: add items before / after a list field
+    """
+    update = {}
+
+    def current(field, default):
+        return update[field] if field in update else message.get(field, default)
+
+    for op in ops:
+        op_type = op.get("type")
+        if op_type == "set":
+            update.update(op.get("data", {}))
+        elif op_type == "append_content":
+            update["content"] = (current("content", "") or "") + op.get("content", "")
+        elif op_type == "prepend":
+            field = op["field"]
+            update[field] = [*op.get("items", []), *(current(field, []) or [])]
+        elif op_type == "append":
+            field = op["field"]
+            update[field] = [*(current(field, []) or []), *op.get("items", [])]
+
+    return update
+
+
+class MessageWriteBuffer:
+    """
+    Coalescing write-behind buffer for streamed chat message updates.
+
+    Operations are queued per (chat_id, message_id) in memory, or in Redis when
+    a connection is given, and written with a single read and a single upsert
+    when the flush interval elapses, when a message reaches `max_pending`
+    operations, or when `flush` is called explicitly (e.g. on completion).
+
+    In Redis, each message's operations are a list expiring after `ttl`, and
+    `{prefix}:pending` holds the messages with buffered operations, scored by
+    their latest push. Every instance flushes every pending message, so the
+    operations of an instance that stopped are still written. Only the
+    single-key list read and delete is a transaction, which works on Redis
+    Cluster.
+    """
+
+    def __init__(
+        self,
+        write_message: Callable[[str, str, List[dict]], None],
+        redis=None,
+        redis_key_prefix: str = f"{REDIS_KEY_PREFIX}:message_write_buffer",
+        flush_interval: float = 1.0,
+        max_pending: int = 50,
+        ttl: int = 3600,
+    ):
+        self._write_message = write_message
+        self._redis = redis
+        self._redis_key_prefix = redis_key_prefix
+        if redis:
+            self._remove_session_script = redis.register_script(
+                PRESENCE_REMOVE_SESSION_SCRIPT
+            )
+
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.ttl = ttl
+
+        self._ops = {}
+        self._keys = set()
+        self._locks = {}
+        self._pending_ops = 0
+
+        self._flush_count = 0
+        self._flush_latency_total = 0.0
+        self._flush_latency_last = 0.0
+        self._flush_latency_max = 0.0
+
+    def _get_redis_key(self, key: Tuple[str, str]) -> str:
+        return f"{self._redis_key_prefix}:{key[0]}:{key[1]}"
+
+    def _get_pending_redis_key(self) -> str:
+        return f"{self._redis_key_prefix}:pending"
+
+    async def _push_op(self, key: Tuple[str, str], op: dict) -> int:
+        if self._redis:
+            redis_key = self._get_redis_key(key)
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.rpush(redis_key, json.dumps(op))
+                pipe.expire(redis_key, self.ttl)
+                pipe.zadd(self._get_pending_redis_key(), {json.dumps(key): time.time()})
+                pipe.expire(self._get_pending_redis_key(), self.ttl)
+                pending, *_ = await pipe.execute()
+            return pending
+
+        ops = self._ops.setdefault(key, [])
+        ops.append(op)
+        return len(ops)
+
+    async def _pop_ops(self, key: Tuple[str, str]) -> List[dict]:
+        if self._redis:
+            # Before the read: an operation pushed meanwhile marks it pending
+            # again
+            await self._redis.zrem(self._get_pending_redis_key(), json.dumps(key))
+
+            redis_key = self._get_redis_key(key)
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.lrange(redis_key, 0, -1)
+                pipe.delete(redis_key)
+                ops, _ = await pipe.execute()
+            return [json.loads(op) for op in ops]
+
+        return self._ops.pop(key, [])
+
+    async def push(self, chat_id: str, message_id: str, op: dict):
+        key = (chat_id, message_id)
+        pending = await self._push_op(key, op)
+        self._keys.add(key)
+        self._pending_ops += 1
+
+        if self.flush_interval <= 0 or pending >= self.max_pending:
+            await self.flush(chat_id, message_id)
+
+    async def flush(self, chat_id: str, message_id: str, done: bool = False):
+        key = (chat_id, message_id)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            self._keys.discard(key)
+            ops = await self._pop_ops(key)
+            self._pending_ops = max(self._pending_ops - len(ops), 0)
+
+            if ops:
+                start = time.perf_counter()
+                try:
+                    await asyncio.to_thread(
+                        self._write_message, chat_id, message_id, ops
+                    )
+                except Exception as e:
+                    log.exception(f"Error flushing message {message_id}: {e}")
+                finally:
+                    self._record_flush(time.perf_counter() - start)
+
+        if done and key not in self._keys:
+            self._locks.pop(key, None)
+
+    async def _get_pending_keys(self) -> set:
+        keys = set(self._keys)
+        if self._redis:
+            pending_key = self._get_pending_redis_key()
+            # The operations of these messages expired with their lists
+            await self._redis.zremrangebyscore(
+                pending_key, "-inf", time.time() - self.ttl
+            )
+            keys.update(
+                tuple(json.loads(member))
+                for member in await self._redis.zrange(pending_key, 0, -1)
+            )
+        return keys
+
+    async def flush_all(self):
+        await asyncio.gather(
+            *[
+                # Messages pushed by other instances keep no lock here
+                self.flush(
+                    chat_id, message_id, done=(chat_id, message_id) not in self._keys
+                )
+                for chat_id, message_id in await self._get_pending_keys()
+            ]
+        )
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(max(self.flush_interval, 0.1))
+            await self.flush_all()
+
+    def _record_flush(self, latency: float):
+        self._flush_count += 1
+        self._flush_latency_total += latency
+        self._flush_latency_last = latency
+        self._flush_latency_max = max(self._flush_latency_max, latency)
+
+    def get_stats(self) -> dict:
+        return {
+            "pending_messages": len(self._keys),
+            "pending_ops": self._pending_ops,
+            "flush_count": self._flush_count,
+            "flush_latency_last_ms": self._flush_latency_last * 1000.0,
+            "flush_latency_max_ms": self._flush_latency_max * 1000.0,
+            "flush_latency_avg_ms": (
+                self._flush_latency_total / self._flush_count * 1000.0
+                if self._flush_count
+                else 0.0
+            ),
+        }
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import shutil
 import json
@@ -7,6 +8,7 @@ from abc import ABC, abstractmethod
 from typing import BinaryIO, Tuple, Dict
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from backend.config import (
@@ -25,6 +27,9 @@ from backend.config import (
     AZURE_STORAGE_CONTAINER_NAME,
     AZURE_STORAGE_KEY,
     STORAGE_PROVIDER,
+    STORAGE_UPLOAD_CHUNK_SIZE,
+    STORAGE_MULTIPART_CHUNK_SIZE,
+    STORAGE_MULTIPART_CONCURRENCY,
     UPLOAD_DIR,
 )
 from google.cloud import storage
@@ -40,6 +45,14 @@ log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
 
+def has_local_copy(local_file_path: str, size: int) -> bool:
+    # Uploaded objects are never rewritten under the same name, a local file of
+    # the same size is the copy kept at upload time
+    return (
+        os.path.isfile(local_file_path) and os.path.getsize(local_file_path) == size
+    )
+
+
 class StorageProvider(ABC):
     @abstractmethod
     def get_file(self, file_path: str) -> str:
@@ -48,7 +61,8 @@ class StorageProvider(ABC):
     @abstractmethod
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
+        """Stores the file, returns its size, sha256 hex digest and path."""
         pass
 
     @abstractmethod
@@ -64,14 +78,24 @@ class LocalStorageProvider(StorageProvider):
     @staticmethod
     def upload_file(
         file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
-        contents = file.read()
-        if not contents:
-            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+    ) -> Tuple[int, str, str]:
+        """Copies the file to local storage in chunks, hashing it on the way."""
         file_path = f"{UPLOAD_DIR}/{filename}"
-        with open(file_path, "wb") as f:
-            f.write(contents)
-        return contents, file_path
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with open(file_path, "wb") as f:
+                while chunk := file.read(STORAGE_UPLOAD_CHUNK_SIZE):
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            if not size:
+                raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+        except BaseException:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+            raise
+        return size, sha256.hexdigest(), file_path
 
     @staticmethod
     def get_file(file_path: str) -> str:
@@ -140,6 +164,13 @@ class S3StorageProvider(StorageProvider):
         self.bucket_name = S3_BUCKET_NAME
         self.key_prefix = S3_KEY_PREFIX if S3_KEY_PREFIX else ""
 
+        # Files above one part are sent as multipart uploads, parts in parallel
+        self.transfer_config = TransferConfig(
+            multipart_threshold=STORAGE_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=STORAGE_MULTIPART_CHUNK_SIZE,
+            max_concurrency=STORAGE_MULTIPART_CONCURRENCY,
+        )
+
     @staticmethod
     def sanitize_tag_value(s: str) -> str:
         """Only include S3 allowed characters."""
@@ -147,12 +178,16 @@ class S3StorageProvider(StorageProvider):
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to S3 storage."""
-        _, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        size, sha256, file_path = LocalStorageProvider.upload_file(
+            file, filename, tags
+        )
         s3_key = os.path.join(self.key_prefix, filename)
         try:
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key)
+            self.s3_client.upload_file(
+                file_path, self.bucket_name, s3_key, Config=self.transfer_config
+            )
             if S3_ENABLE_TAGGING and tags:
                 sanitized_tags = {
                     self.sanitize_tag_value(k): self.sanitize_tag_value(v)
@@ -168,10 +203,7 @@ class S3StorageProvider(StorageProvider):
                     Key=s3_key,
                     Tagging=tagging,
                 )
-            return (
-                open(file_path, "rb").read(),
-                f"s3://{self.bucket_name}/{s3_key}",
-            )
+            return size, sha256, f"s3://{self.bucket_name}/{s3_key}"
         except ClientError as e:
             raise RuntimeError(f"Error uploading file to S3: {e}")
 
@@ -180,7 +212,16 @@ class S3StorageProvider(StorageProvider):
         try:
             s3_key = self._extract_s3_key(file_path)
             local_file_path = self._get_local_file_path(s3_key)
-            self.s3_client.download_file(self.bucket_name, s3_key, local_file_path)
+            size = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)[
+                "ContentLength"
+            ]
+            if not has_local_copy(local_file_path, size):
+                self.s3_client.download_file(
+                    self.bucket_name,
+                    s3_key,
+                    local_file_path,
+                    Config=self.transfer_config,
+                )
             return local_file_path
         except ClientError as e:
             raise RuntimeError(f"Error downloading file from S3: {e}")
@@ -238,15 +279,23 @@ class GCSStorageProvider(StorageProvider):
             self.gcs_client = storage.Client()
         self.bucket = self.gcs_client.bucket(GCS_BUCKET_NAME)
 
+        # GCS requires chunk sizes in multiples of 256 KB
+        self.chunk_size = max(STORAGE_MULTIPART_CHUNK_SIZE // (256 * 1024), 1) * (
+            256 * 1024
+        )
+
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to GCS storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        size, sha256, file_path = LocalStorageProvider.upload_file(
+            file, filename, tags
+        )
         try:
-            blob = self.bucket.blob(filename)
+            # A chunk size makes it a resumable upload sent part by part
+            blob = self.bucket.blob(filename, chunk_size=self.chunk_size)
             blob.upload_from_filename(file_path)
-            return contents, "gs://" + self.bucket_name + "/" + filename
+            return size, sha256, "gs://" + self.bucket_name + "/" + filename
         except GoogleCloudError as e:
             raise RuntimeError(f"Error uploading file to GCS: {e}")
 
@@ -256,7 +305,8 @@ class GCSStorageProvider(StorageProvider):
             filename = file_path.removeprefix("gs://").split("/")[1]
             local_file_path = f"{UPLOAD_DIR}/{filename}"
             blob = self.bucket.get_blob(filename)
-            blob.download_to_filename(local_file_path)
+            if not has_local_copy(local_file_path, blob.size):
+                blob.download_to_filename(local_file_path)
 
             return local_file_path
         except NotFound as e:
@@ -298,13 +348,19 @@ class AzureStorageProvider(StorageProvider):
         if storage_key:
             # Configure using the Azure Storage Account Endpoint and Key
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=storage_key
+                account_url=self.endpoint,
+                credential=storage_key,
+                max_single_put_size=STORAGE_MULTIPART_CHUNK_SIZE,
+                max_block_size=STORAGE_MULTIPART_CHUNK_SIZE,
             )
         else:
             # Configure using the Azure Storage Account Endpoint and DefaultAzureCredential
             # If the key is not configured, then the DefaultAzureCredential will be used to support Managed Identity authentication
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=DefaultAzureCredential()
+                account_url=self.endpoint,
+                credential=DefaultAzureCredential(),
+                max_single_put_size=STORAGE_MULTIPART_CHUNK_SIZE,
+                max_block_size=STORAGE_MULTIPART_CHUNK_SIZE,
             )
         self.container_client = self.blob_service_client.get_container_client(
             self.container_name
@@ -312,13 +368,22 @@ class AzureStorageProvider(StorageProvider):
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to Azure Blob Storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        size, sha256, file_path = LocalStorageProvider.upload_file(
+            file, filename, tags
+        )
         try:
             blob_client = self.container_client.get_blob_client(filename)
-            blob_client.upload_blob(contents, overwrite=True)
-            return contents, f"{self.endpoint}/{self.container_name}/{filename}"
+            # Streamed from disk as staged blocks above max_single_put_size
+            with open(file_path, "rb") as f:
+                blob_client.upload_blob(
+                    f,
+                    length=size,
+                    overwrite=True,
+                    max_concurrency=STORAGE_MULTIPART_CONCURRENCY,
+                )
+            return size, sha256, f"{self.endpoint}/{self.container_name}/{filename}"
         except Exception as e:
             raise RuntimeError(f"Error uploading file to Azure Blob Storage: {e}")
 
@@ -328,8 +393,12 @@ class AzureStorageProvider(StorageProvider):
             filename = file_path.split("/")[-1]
             local_file_path = f"{UPLOAD_DIR}/{filename}"
             blob_client = self.container_client.get_blob_client(filename)
-            with open(local_file_path, "wb") as download_file:
-                download_file.write(blob_client.download_blob().readall())
+            size = blob_client.get_blob_properties().size
+            if not has_local_copy(local_file_path, size):
+                with open(local_file_path, "wb") as download_file:
+                    blob_client.download_blob(
+                        max_concurrency=STORAGE_MULTIPART_CONCURRENCY
+                    ).readinto(download_file)
             return local_file_path
         except ResourceNotFoundError as e:
             raise RuntimeError(f"Error downloading file from Azure Blob Storage: {e}")
@@ -109,6 +109,29 @@ class TestChats(AbstractPostgresTest):
     def test_get_archived_session_user_chat_list(self):
         self.test_get_user_archived_chats()
 
+    def test_chat_list_cursor_rejects_custom_order(self):
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(
+                self.create_url(
+                    "/archived",
+                    {"cursor": "1:id", "order_by": "title", "direction": "asc"},
+                )
+            )
+        assert response.status_code == 400
+
+    def test_get_user_chat_list_by_tag_name(self):
+        from backend.models.tags import Tags
+
+        chat_id = self.chats.get_chats()[0].id
+        self.chats.add_chat_tag_by_id_and_user_id_and_tag_name(chat_id, "2", "tag1")
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.post(
+                self.create_url("/tags"), json={"name": "tag1", "skip": 100}
+            )
+        assert response.status_code == 200
+        assert [chat["id"] for chat in response.json()] == [chat_id]
+        assert Tags.get_tag_by_name_and_user_id("tag1", "2") is not None
+
     def test_archive_all_chats(self):
         with mock_webui_user(id="2"):
             response = self.fast_api_client.post(self.create_url("/archive/all"))
@@ -178,6 +201,26 @@ class TestChats(AbstractPostgresTest):
         assert data["title"] == "Just another title"
         assert data["user_id"] == "2"
 
+    def test_upsert_message_to_chat_by_id_and_message_id(self):
+        chat_id = self.chats.get_chats()[0].id
+        self.chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, "2", {"id": "2", "role": "user", "content": "hello"}
+        )
+        self.chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, "2", {"content": "hello world"}
+        )
+
+        chat = self.chats.get_chat_by_id(chat_id)
+        assert chat.chat["history"]["currentId"] == "2"
+        assert chat.chat["history"]["messages"] == {
+            "2": {"id": "2", "role": "user", "content": "hello world"}
+        }
+        assert self.chats.get_message_by_id_and_message_id(chat_id, "2") == {
+            "id": "2",
+            "role": "user",
+            "content": "hello world",
+        }
+
     def test_delete_chat_by_id(self):
         chat_id = self.chats.get_chats()[0].id
         with mock_webui_user(id="2"):
@@ -234,3 +277,139 @@ class TestChats(AbstractPostgresTest):
 
         chat = self.chats.get_chat_by_id(chat_id)
         assert chat.share_id is None
+
+
+class TestChatSearch(AbstractPostgresTest):
+    BASE_PATH = "/api/v1/chats"
+
+    def setup_method(self):
+        super().setup_method()
+        from backend.models.chat_search import ChatSearchEntry
+        from backend.models.chats import Chats
+
+        self.table = ChatSearchEntry
+        self.chats = Chats
+
+    def teardown_method(self):
+        from backend.internal.db import Session
+
+        Session.query(self.table).delete()
+        Session.commit()
+        super().teardown_method()
+
+    def insert_chat(self, user_id, title, messages):
+        from backend.models.chats import ChatForm
+
+        return self.chats.insert_new_chat(
+            user_id,
+            ChatForm(
+                chat={
+                    "title": title,
+                    "history": {"currentId": None, "messages": messages},
+                }
+            ),
+        )
+
+    def get_entries(self, chat_id):
+        from backend.internal.db import Session
+
+        Session.commit()
+        return {
+            row.message_id: (row.id, row.title, row.content)
+            for row in Session.query(self.table).filter_by(chat_id=chat_id)
+        }
+
+    def search(self, user_id, text):
+        with mock_webui_user(id=user_id):
+            response = self.fast_api_client.get(
+                self.create_url("/search", {"text": text})
+            )
+        assert response.status_code == 200
+        return response.json()
+
+    def test_chat_is_indexed_on_insert(self):
+        chat = self.insert_chat(
+            "2",
+            "Baking",
+            {
+                "1": {"id": "1", "role": "user", "content": "How do I bake bread?"},
+                "2": {"id": "2", "role": "assistant", "content": ""},
+            },
+        )
+
+        entries = self.get_entries(chat.id)
+        assert {key: value[1:] for key, value in entries.items()} == {
+            "": ("Baking", None),
+            "1": (None, "How do I bake bread?"),
+        }
+
+    def test_update_only_rewrites_changed_entries(self):
+        chat = self.insert_chat(
+            "2",
+            "Baking",
+            {
+                "1": {"id": "1", "role": "user", "content": "How do I bake bread?"},
+                "2": {"id": "2", "role": "assistant", "content": "Use flour."},
+            },
+        )
+        before = self.get_entries(chat.id)
+
+        self.chats.update_chat_by_id(
+            chat.id,
+            {
+                "title": "Baking",
+                "history": {
+                    "currentId": "3",
+                    "messages": {
+                        "1": {"id": "1", "content": "How do I bake bread?"},
+                        "3": {"id": "3", "content": "Use a starter."},
+                    },
+                },
+            },
+        )
+        after = self.get_entries(chat.id)
+
+        assert set(after) == {"", "1", "3"}
+        assert after[""] == before[""]
+        assert after["1"] == before["1"]
+        assert after["3"][2] == "Use a starter."
+
+    def test_message_upsert_updates_its_entry(self):
+        chat = self.insert_chat("2", "Baking", {})
+
+        self.chats.upsert_message_to_chat_by_id_and_message_id(
+            chat.id, "1", {"id": "1", "role": "user", "content": "bread"}
+        )
+        row_id = self.get_entries(chat.id)["1"][0]
+        self.chats.upsert_message_to_chat_by_id_and_message_id(
+            chat.id, "1", {"content": "sourdough bread"}
+        )
+        assert self.get_entries(chat.id)["1"] == (row_id, None, "sourdough bread")
+
+        self.chats.upsert_message_to_chat_by_id_and_message_id(
+            chat.id, "1", {"content": ""}
+        )
+        assert set(self.get_entries(chat.id)) == {""}
+
+    def test_deleted_chat_is_removed_from_the_index(self):
+        chat = self.insert_chat("2", "Baking", {"1": {"id": "1", "content": "bread"}})
+
+        assert self.chats.delete_chat_by_id(chat.id)
+        assert self.get_entries(chat.id) == {}
+        assert self.search("2", "bread") == []
+
+    def test_search_matches_titles_and_messages(self):
+        title = self.insert_chat("2", "Bread recipes", {})
+        message = self.insert_chat(
+            "2", "Kitchen", {"1": {"id": "1", "content": "We baked bread today"}}
+        )
+        self.insert_chat("2", "Cakes", {"1": {"id": "1", "content": "chocolate"}})
+        self.insert_chat("3", "Bread", {})
+
+        results = self.search("2", "brea")
+        assert [chat["id"] for chat in results] == [title.id, message.id]
+        assert "<mark>" in results[1]["snippet"]
+
+        results = self.search("2", "baked bread")
+        assert [chat["id"] for chat in results] == [message.id]
+        assert self.search("2", "bread cake") == []
@@ -0,0 +1,96 @@
+from backend.retrieval.embedding_cache import EmbeddingCache
+
+
+class CountingEmbeddingFunction:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, query, prefix=None, user=None):
+        texts = query if isinstance(query, list) else [query]
+        self.texts.extend(texts)
+        embeddings = [[float(len(text)), 0.5] for text in texts]
+        return embeddings if isinstance(query, list) else embeddings[0]
+
+
+class TestEmbeddingCache:
+    def test_only_missing_texts_are_embedded(self, tmp_path):
+        cache = EmbeddingCache(path=str(tmp_path / "embeddings.db"))
+        func = CountingEmbeddingFunction()
+        embed = cache.wrap(func, "openai", "text-embedding-3-small")
+
+        assert embed(["a", "bb"]) == [[1.0, 0.5], [2.0, 0.5]]
+        assert embed(["bb", "ccc", "a"]) == [[2.0, 0.5], [3.0, 0.5], [1.0, 0.5]]
+        assert embed("ccc") == [3.0, 0.5]
+        assert func.texts == ["a", "bb", "ccc"]
+
+        stats = cache.get_stats()
+        assert stats["hits_memory"] == 3
+        assert stats["misses"] == 3
+
+    def test_incomplete_result_only_embeds_the_misses_again(self, tmp_path):
+        cache = EmbeddingCache(path=str(tmp_path / "embeddings.db"))
+        func = CountingEmbeddingFunction()
+        embed = cache.wrap(
+            # Drops the last text of a batch, like an engine dropping a batch
+            lambda query, prefix=None, user=None: func(query)[: max(len(query) - 1, 1)],
+            "openai",
+            "model",
+        )
+
+        assert embed(["bb"]) == [[2.0, 0.5]]
+        assert embed(["a", "bb", "ccc"]) == [[1.0, 0.5], [2.0, 0.5], [3.0, 0.5]]
+        assert func.texts == ["bb", "a", "ccc", "a", "ccc"]
+
+    def test_incomplete_result_without_hits_embeds_each_text_once(self, tmp_path):
+        cache = EmbeddingCache(path=str(tmp_path / "embeddings.db"))
+        func = CountingEmbeddingFunction()
+        embed = cache.wrap(
+            lambda query, prefix=None, user=None: func(query)[: max(len(query) - 1, 1)],
+            "openai",
+            "model",
+        )
+
+        assert embed(["a", "bb", "a", "ccc"]) == [
+            [1.0, 0.5],
+            [2.0, 0.5],
+            [1.0, 0.5],
+            [3.0, 0.5],
+        ]
+        assert func.texts == ["a", "bb", "ccc", "a", "bb", "ccc"]
+
+        # The texts embedded again are cached
+        assert embed(["ccc", "a"]) == [[3.0, 0.5], [1.0, 0.5]]
+        assert len(func.texts) == 6
+
+    def test_vectors_survive_restart(self, tmp_path):
+        path = str(tmp_path / "embeddings.db")
+        EmbeddingCache(path=path).wrap(CountingEmbeddingFunction(), "ollama", "nomic")(
+            ["hello"]
+        )
+
+        func = CountingEmbeddingFunction()
+        cache = EmbeddingCache(path=path)
+        assert cache.wrap(func, "ollama", "nomic")(["hello"]) == [[5.0, 0.5]]
+        assert func.texts == []
+        assert cache.get_stats()["hits_disk"] == 1
+
+        # A different model or prefix is a different key
+        assert cache.wrap(func, "ollama", "other")(["hello"]) == [[5.0, 0.5]]
+        cache.wrap(func, "ollama", "nomic")(["hello"], prefix="query: ")
+        assert func.texts == ["hello", "hello"]
+
+    def test_size_bounded_eviction(self, tmp_path):
+        cache = EmbeddingCache(path=str(tmp_path / "embeddings.db"), memory_entries=0)
+        # 1 MB of float32 vectors is 1024 vectors of 256 dimensions
+        cache.max_size = 1024 * 256 * 4
+
+        embed = cache.wrap(
+            lambda query, prefix=None, user=None: [[0.0] * 256 for _ in query],
+            "openai",
+            "model",
+        )
+        embed([f"text {idx}" for idx in range(1500)])
+
+        stats = cache.get_stats()
+        assert stats["evictions"] > 0
+        assert stats["disk_size_bytes"] <= cache.max_size * 0.9
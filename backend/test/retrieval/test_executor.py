@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from backend.retrieval.executor import (
+    RETRIEVAL_CANCEL_EVENT,
+    RetrievalCancelledError,
+    RetrievalExecutor,
+)
+
+
+class TestRetrievalExecutor:
+    def test_results_keep_submission_order(self):
+        executor = RetrievalExecutor(max_workers=4, max_concurrency_per_request=4)
+
+        def task(idx, delay):
+            time.sleep(delay)
+            return idx
+
+        try:
+            assert executor.map(
+                task, [(idx, 0.01 * (5 - idx)) for idx in range(5)]
+            ) == list(range(5))
+            assert executor.get_stats()["completed"] == 5
+        finally:
+            executor.shutdown()
+
+    def test_per_request_concurrency_limit(self):
+        executor = RetrievalExecutor(max_workers=8, max_concurrency_per_request=2)
+        lock = threading.Lock()
+        running, peak = 0, 0
+
+        def task(idx):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+
+        try:
+            executor.map(task, [(idx,) for idx in range(10)])
+            assert peak == 2
+        finally:
+            executor.shutdown()
+
+    def test_cancel_event_drops_pending_tasks(self):
+        executor = RetrievalExecutor(max_workers=1, max_concurrency_per_request=1)
+        cancel_event = threading.Event()
+        calls = []
+
+        def task(idx):
+            calls.append(idx)
+            cancel_event.set()
+
+        token = RETRIEVAL_CANCEL_EVENT.set(cancel_event)
+        try:
+            with pytest.raises(RetrievalCancelledError):
+                executor.map(task, [(idx,) for idx in range(10)])
+            assert calls == [0]
+        finally:
+            RETRIEVAL_CANCEL_EVENT.reset(token)
+            executor.shutdown()
@@ -0,0 +1,210 @@
+from types import SimpleNamespace
+
+from backend.models.files import FileContentModel
+from backend.retrieval import full_context_cache
+from backend.retrieval.full_context_cache import FullContextCache
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeFiles:
+    def __init__(self, contents):
+        self.contents = contents
+        self.calls = []
+
+    def _get_files(self, ids, with_content):
+        return [
+            FileContentModel(
+                id=id,
+                hash=f"hash-{id}",
+                filename=f"{id}.txt",
+                content=self.contents[id] if with_content else None,
+            )
+            for id in ids
+            if id in self.contents
+        ]
+
+    def get_file_hashes_by_ids(self, ids):
+        self.calls.append(("hashes", list(ids)))
+        return self._get_files(ids, with_content=False)
+
+    def get_file_contents_by_ids(self, ids):
+        self.calls.append(("contents", list(ids)))
+        return self._get_files(ids, with_content=True)
+
+
+class TestFullContextCache:
+    def test_contents_are_found_by_hash(self):
+        cache = FullContextCache(ttl=60, max_size_mb=1)
+        cache.set_many({"h1": "first", "h2": "second", None: "no hash"})
+
+        assert cache.get_many(["h1", "h3", None, "h2"]) == {
+            "h1": "first",
+            "h2": "second",
+        }
+
+    def test_entries_expire(self, monkeypatch):
+        clock = FakeTime()
+        monkeypatch.setattr(full_context_cache, "time", clock)
+        cache = FullContextCache(ttl=10, max_size_mb=1)
+        cache.set_many({"h1": "first"})
+
+        clock.now += 9
+        assert cache.get_many(["h1"]) == {"h1": "first"}
+        clock.now += 1
+        assert cache.get_many(["h1"]) == {}
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = FullContextCache(ttl=60, max_size_mb=1)
+        cache.max_size = 10
+
+        cache.set_many({"h1": "aaaa", "h2": "bbbb"})
+        cache.get_many(["h1"])
+        cache.set_many({"h3": "cccc"})
+
+        assert cache.get_many(["h1", "h2", "h3"]) == {"h1": "aaaa", "h3": "cccc"}
+
+    def test_expired_entries_free_their_size(self, monkeypatch):
+        clock = FakeTime()
+        monkeypatch.setattr(full_context_cache, "time", clock)
+        cache = FullContextCache(ttl=10, max_size_mb=1)
+        cache.max_size = 10
+
+        cache.set_many({"h1": "aaaa"})
+        clock.now += 10
+        cache.get_many(["h1"])
+        cache.set_many({"h2": "bbbb", "h3": "cccc"})
+
+        assert cache.get_many(["h2", "h3"]) == {"h2": "bbbb", "h3": "cccc"}
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = FullContextCache(ttl=0, max_size_mb=1)
+        cache.set_many({"h1": "first"})
+
+        assert not cache.enabled
+        assert cache.get_many(["h1"]) == {}
+
+
+class TestLoadFullContextFiles:
+    def patch(self, monkeypatch, contents):
+        from backend.retrieval import utils
+
+        files = FakeFiles(contents)
+        monkeypatch.setattr(utils, "Files", files)
+        monkeypatch.setattr(utils, "FULL_CONTEXT_CACHE", FullContextCache(60, 1))
+        return utils, files
+
+    def test_missing_files_are_loaded_once(self, monkeypatch):
+        utils, files = self.patch(monkeypatch, {"f1": "one", "f2": "two"})
+        loaded = {"f1": FileContentModel(id="f1", filename="f1.txt", content="one")}
+
+        utils.load_full_context_files(["f1", "f2", "f2", "f3"], loaded)
+
+        assert files.calls == [("hashes", ["f2", "f3"]), ("contents", ["f2"])]
+        assert {id: file.content for id, file in loaded.items()} == {
+            "f1": "one",
+            "f2": "two",
+        }
+
+    def test_cached_contents_are_not_read_again(self, monkeypatch):
+        utils, files = self.patch(monkeypatch, {"f1": "one", "f2": "two"})
+        utils.load_full_context_files(["f1"], {})
+        files.calls.clear()
+
+        loaded = {}
+        utils.load_full_context_files(["f1", "f2"], loaded)
+
+        assert files.calls == [("hashes", ["f1", "f2"]), ("contents", ["f2"])]
+        assert loaded["f1"].content == "one"
+        assert loaded["f1"].hash == "hash-f1"
+
+    def test_disabled_cache_reads_contents_directly(self, monkeypatch):
+        utils, files = self.patch(monkeypatch, {"f1": "one"})
+        monkeypatch.setattr(utils, "FULL_CONTEXT_CACHE", FullContextCache(0, 1))
+
+        loaded = {}
+        utils.load_full_context_files(["f1"], loaded)
+
+        assert files.calls == [("contents", ["f1"])]
+        assert loaded["f1"].content == "one"
+
+
+class TestGetSourcesFromItems:
+    def patch(self, monkeypatch, knowledge_file_ids=()):
+        from backend.retrieval import utils
+
+        self.files = FakeFiles({"f1": "one", "f2": "two"})
+        knowledge = SimpleNamespace(
+            user_id="1", access_control=None, data={"file_ids": knowledge_file_ids}
+        )
+        monkeypatch.setattr(utils, "Files", self.files)
+        monkeypatch.setattr(
+            utils,
+            "Knowledges",
+            SimpleNamespace(get_knowledge_by_id=lambda id: knowledge),
+        )
+        monkeypatch.setattr(utils, "FULL_CONTEXT_CACHE", FullContextCache(60, 1))
+
+    def get_sources(self, items):
+        from backend.retrieval import utils
+
+        config = SimpleNamespace(BYPASS_EMBEDDING_AND_RETRIEVAL=False)
+        request = SimpleNamespace(
+            app=SimpleNamespace(state=SimpleNamespace(config=config))
+        )
+        self.files.calls.clear()
+        sources = utils.get_sources_from_items(
+            request,
+            [{**item, "context": "full"} for item in items],
+            queries=[],
+            embedding_function=None,
+            k=3,
+            reranking_function=None,
+            k_reranker=0,
+            r=0,
+            hybrid_bm25_weight=0,
+            hybrid_search=False,
+            user=SimpleNamespace(id="1", role="user"),
+        )
+        return [
+            (
+                source["source"]["id"],
+                [metadata["file_id"] for metadata in source["metadata"]],
+                source["document"],
+            )
+            for source in sources
+        ]
+
+    def test_file_attached_twice_is_added_once(self, monkeypatch):
+        self.patch(monkeypatch)
+        file = {"type": "file", "id": "f1"}
+
+        assert self.get_sources([file, file]) == [("f1", ["f1"], ["one"])]
+        assert self.files.calls == [("hashes", ["f1"]), ("contents", ["f1"])]
+
+    def test_file_in_an_attached_knowledge_base_is_added_once(self, monkeypatch):
+        self.patch(monkeypatch, knowledge_file_ids=["f1", "f2", "f1"])
+        file = {"type": "file", "id": "f1"}
+        collection = {"type": "collection", "id": "kb"}
+
+        assert self.get_sources([file, collection]) == [
+            ("f1", ["f1"], ["one"]),
+            ("kb", ["f2"], ["two"]),
+        ]
+        assert self.get_sources([collection, file, collection]) == [
+            ("kb", ["f1", "f2"], ["one", "two"]),
+        ]
+
+    def test_cached_files_only_read_their_hashes(self, monkeypatch):
+        self.patch(monkeypatch, knowledge_file_ids=["f1", "f2"])
+        items = [{"type": "file", "id": "f1"}, {"type": "collection", "id": "kb"}]
+        sources = self.get_sources(items)
+
+        assert self.get_sources(items) == sources
+        assert self.files.calls == [("hashes", ["f1"]), ("hashes", ["f2"])]
@@ -0,0 +1,105 @@
+from test.util.abstract_integration_test import AbstractPostgresTest
+
+
+class TestIngestionJobs(AbstractPostgresTest):
+    def setup_method(self):
+        super().setup_method()
+        from backend.models.ingestion_jobs import IngestionJob, IngestionJobs
+
+        self.table = IngestionJob
+        self.jobs = IngestionJobs
+
+    def teardown_method(self):
+        from backend.internal.db import Session
+
+        Session.query(self.table).delete()
+        Session.commit()
+        super().teardown_method()
+
+    def make_stale(self, id):
+        from backend.internal.db import Session
+
+        Session.query(self.table).filter_by(id=id).update({"heartbeat_at": 0})
+        Session.commit()
+
+    def claim(self, worker_id, max_running_per_user=1):
+        return self.jobs.claim_next_job(worker_id, ["file"], 60, max_running_per_user)
+
+    def test_jobs_with_the_same_key_are_enqueued_once(self):
+        first = self.jobs.insert_new_job("1", "file", {"file_id": "a"}, key="file:h")
+        second = self.jobs.insert_new_job("1", "file", {"file_id": "b"}, key="file:h")
+        assert second.id == first.id
+        assert second.data == {"file_id": "a"}
+
+        self.claim("worker-1")
+        self.jobs.finish_job_by_id(first.id, "worker-1", "failed", error="boom")
+        third = self.jobs.insert_new_job("1", "file", {"file_id": "b"}, key="file:h")
+        assert third.id != first.id
+
+    def test_claim_respects_the_running_jobs_of_each_user(self):
+        first = self.jobs.insert_new_job("1", "file", {})
+        self.jobs.insert_new_job("1", "file", {})
+        other = self.jobs.insert_new_job("2", "file", {})
+
+        job = self.claim("worker-1")
+        assert job.id == first.id
+        assert job.status == "running"
+        assert job.attempts == 1
+
+        assert self.claim("worker-2").id == other.id
+        assert self.claim("worker-2") is None
+
+    def test_heartbeat_keeps_the_lease(self):
+        job = self.jobs.insert_new_job("1", "file", {}, max_attempts=2)
+        self.claim("worker-1")
+
+        self.make_stale(job.id)
+        self.jobs.update_job_heartbeat_by_ids([job.id], "worker-1")
+        assert self.claim("worker-2", max_running_per_user=2) is None
+
+        self.make_stale(job.id)
+        reclaimed = self.claim("worker-2", max_running_per_user=2)
+        assert reclaimed.id == job.id
+        assert reclaimed.worker_id == "worker-2"
+        assert reclaimed.attempts == 2
+        assert not self.jobs.update_job_progress_by_id(job.id, "worker-1", {"x": 1})
+
+    def test_stale_job_without_attempts_left_fails(self):
+        job = self.jobs.insert_new_job("1", "file", {}, max_attempts=1)
+        self.claim("worker-1")
+
+        self.make_stale(job.id)
+        assert self.claim("worker-2") is None
+        assert self.jobs.get_job_by_id(job.id).status == "failed"
+
+    def test_failed_job_is_retried_until_its_last_attempt(self):
+        from backend.internal.db import Session
+        from backend.retrieval import ingestion
+
+        attempts = []
+
+        def handler(request, job, user, set_progress):
+            attempts.append(job.attempts)
+            raise ValueError("boom")
+
+        queue = ingestion.IngestionQueue(workers=1, max_attempts=2)
+        queue.register("file", handler)
+        queue._get_request = lambda: None
+        users = ingestion.Users
+        ingestion.Users = type("Users", (), {"get_user_by_id": lambda id: object()})
+        try:
+            job = queue.enqueue("1", "file", {})
+            queue._run(self.claim(queue.worker_id))
+            retried = self.jobs.get_job_by_id(job.id)
+            assert retried.status == "pending"
+            assert retried.error == "boom"
+            assert self.claim(queue.worker_id) is None
+
+            Session.query(self.table).filter_by(id=job.id).update({"run_at": 0})
+            Session.commit()
+            queue._run(self.claim(queue.worker_id))
+        finally:
+            ingestion.Users = users
+
+        assert attempts == [1, 2]
+        assert self.jobs.get_job_by_id(job.id).status == "failed"
@@ -0,0 +1,142 @@
+import hashlib
+import random
+
+from backend.retrieval.utils import merge_and_sort_query_results
+from test.util.benchmark import benchmark, measure
+
+
+def merge_and_sort_query_results_sha256(query_results: list[dict], k: int) -> dict:
+    """The previous implementation: sha256 of every document and a full sort"""
+    combined = dict()
+
+    for data in query_results:
+        for distance, document, metadata in zip(
+            data["distances"][0], data["documents"][0], data["metadatas"][0]
+        ):
+            doc_hash = hashlib.sha256(document.encode()).hexdigest()
+            if doc_hash not in combined or distance > combined[doc_hash][0]:
+                combined[doc_hash] = (distance, document, metadata)
+
+    combined = sorted(combined.values(), key=lambda x: x[0], reverse=True)
+    distances, documents, metadatas = zip(*combined[:k]) if combined else ([], [], [])
+    return {
+        "distances": [list(distances)],
+        "documents": [list(documents)],
+        "metadatas": [list(metadatas)],
+    }
+
+
+def create_query_results(collections=10, queries=5, k=50, chunk_size=1500):
+    rng = random.Random(0)
+    chunks = [
+        (f"chunk-{idx}", f"{idx} " + "lorem ipsum dolor sit amet " * (chunk_size // 27))
+        for idx in range(collections * k)
+    ]
+
+    query_results = []
+    for collection in range(collections):
+        for _ in range(queries):
+            # Every query of a collection returns overlapping chunks
+            hits = rng.sample(chunks[collection * k : (collection + 1) * k], k // 2)
+            hits += rng.sample(chunks, k // 2)
+            query_results.append(
+                {
+                    "ids": [[id for id, _ in hits]],
+                    "distances": [[rng.random() for _ in hits]],
+                    "documents": [[document for _, document in hits]],
+                    "metadatas": [[{"id": id} for id, _ in hits]],
+                }
+            )
+    return query_results
+
+
+class TestMergeAndSortQueryResults:
+    def test_keeps_best_distance_per_chunk(self):
+        query_results = [
+            {
+                "ids": [["a", "b", "c"]],
+                "distances": [[0.2, 0.9, 0.5]],
+                "documents": [["A", "B", "C"]],
+                "metadatas": [[{"n": 1}, {"n": 2}, {"n": 3}]],
+            },
+            {
+                "ids": [["a", "d"]],
+                "distances": [[0.95, 0.1]],
+                "documents": [["A", "D"]],
+                "metadatas": [[{"n": 4}, {"n": 5}]],
+            },
+        ]
+
+        result = merge_and_sort_query_results(query_results, k=3)
+
+        assert result["documents"] == [["A", "B", "C"]]
+        assert result["distances"] == [[0.95, 0.9, 0.5]]
+        assert result["metadatas"] == [[{"n": 4}, {"n": 2}, {"n": 3}]]
+
+    def test_deduplicates_chunks_by_file_hash_and_position(self):
+        chunk = {"hash": "file-hash", "start_index": 0}
+        query_results = [
+            {
+                "ids": [["file-chunk", "other-chunk"]],
+                "distances": [[0.5, 0.4]],
+                "documents": [["Same text", "Same text"]],
+                "metadatas": [[{**chunk, "n": 1}, {"hash": "other", "start_index": 0}]],
+            },
+            # The same chunk in the knowledge base of the file, under another id
+            {
+                "ids": [["knowledge-chunk"]],
+                "distances": [[0.8]],
+                "documents": [["Same text"]],
+                "metadatas": [[{**chunk, "n": 2}]],
+            },
+            # Hybrid search results carry no ids
+            {
+                "distances": [[0.9]],
+                "documents": [["Same text"]],
+                "metadatas": [[{**chunk, "n": 3}]],
+            },
+        ]
+
+        result = merge_and_sort_query_results(query_results, k=3)
+
+        # The same text in another file is another chunk
+        assert result["distances"] == [[0.9, 0.4]]
+        assert result["metadatas"] == [
+            [{**chunk, "n": 3}, {"hash": "other", "start_index": 0}]
+        ]
+
+    def test_results_without_ids_are_deduplicated_by_text(self):
+        query_results = [
+            {
+                "distances": [[0.3, 0.6]],
+                "documents": [["A", "B"]],
+                "metadatas": [[{}, {}]],
+            },
+            {"distances": [[0.7]], "documents": [["A"]], "metadatas": [[{}]]},
+        ]
+
+        result = merge_and_sort_query_results(query_results, k=5)
+
+        assert result["documents"] == [["A", "B"]]
+        assert result["distances"] == [[0.7, 0.6]]
+
+    def test_matches_previous_implementation(self):
+        query_results = create_query_results()
+
+        for k in (1, 5, 50, 1000):
+            assert merge_and_sort_query_results(
+                query_results, k=k
+            ) == merge_and_sort_query_results_sha256(query_results, k=k)
+
+    @benchmark
+    def test_benchmark_10_collections_5_queries(self, record_property):
+        query_results = create_query_results(collections=10, queries=5)
+
+        record_property(
+            "sha256_ms",
+            measure(lambda: merge_and_sort_query_results_sha256(query_results, 10), 50),
+        )
+        record_property(
+            "merge_ms",
+            measure(lambda: merge_and_sort_query_results(query_results, 10), 50),
+        )
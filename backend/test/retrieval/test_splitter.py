@@ -0,0 +1,39 @@
+from langchain_core.documents import Document
+
+from backend.retrieval.splitter import DocumentSplitter, split_documents
+
+
+def get_docs():
+    return [
+        Document(
+            page_content="\n\n".join(
+                f"Paragraph {idx} of document {doc_idx}. " * 5 for idx in range(50)
+            ),
+            metadata={"file_id": f"file-{doc_idx}"},
+        )
+        for doc_idx in range(8)
+    ]
+
+
+class TestDocumentSplitter:
+    def test_small_ingestions_are_split_in_one_batch(self):
+        splitter = DocumentSplitter(max_workers=2, parallel_min_size=10**9)
+        batches = list(
+            splitter.iter_split_documents(get_docs(), "character", 500, 50, "")
+        )
+        assert len(batches) == 1
+        assert batches[0] == split_documents(get_docs(), "character", 500, 50, "")
+
+    def test_parallel_batches_keep_document_order(self):
+        splitter = DocumentSplitter(max_workers=2, parallel_min_size=1000)
+        try:
+            batches = list(
+                splitter.iter_split_documents(get_docs(), "character", 500, 50, "")
+            )
+        finally:
+            splitter.shutdown()
+
+        assert len(batches) > 1
+        assert [chunk for batch in batches for chunk in batch] == split_documents(
+            get_docs(), "character", 500, 50, ""
+        )
@@ -0,0 +1,322 @@
+import asyncio
+import time
+
+from backend.socket.utils import (
+    PRESENCE_REMOVE_SESSION_SCRIPT,
+    MessageWriteBuffer,
+    PresenceStore,
+    apply_message_ops,
+)
+
+
+class FakeRedis:
+    """The Redis commands used by the socket stores, recording key expiries"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.transactions = []
+        self.script_calls = []
+
+    def register_script(self, script):
+        assert script == PRESENCE_REMOVE_SESSION_SCRIPT
+
+        # Runs as a whole, as Redis runs scripts
+        async def remove_session(keys, args):
+            self.script_calls.append(keys)
+            session_key, user_key, users_key = keys
+            sid, now, user_id = args
+
+            await self.delete(session_key)
+            await self.zrem(user_key, sid)
+            if await self.zcount(user_key, now, "+inf") == 0:
+                await self.zrem(users_key, user_id)
+                return 1
+            return 0
+
+        return remove_session
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, transaction)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    async def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+        return len(self.data[key])
+
+    async def lrange(self, key, start, end):
+        return list(self.data.get(key, []))
+
+    async def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    async def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    async def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key, member):
+        return int(self.data.get(key, {}).pop(member, None) is not None)
+
+    async def zremrangebyscore(self, key, min, max):
+        scores = self.data.get(key, {})
+        for member in [m for m, score in scores.items() if score <= max]:
+            del scores[member]
+
+    async def zrange(self, key, start, end):
+        return list(self.data.get(key, {}))
+
+    async def zcount(self, key, min, max):
+        return len(
+            [score for score in self.data.get(key, {}).values() if score >= min]
+        )
+
+    async def zrangebyscore(self, key, min, max):
+        scores = self.data.get(key, {})
+        return [member for member, score in scores.items() if score >= min]
+
+    async def zscore(self, key, member):
+        return self.data.get(key, {}).get(member)
+
+
+class FakePipeline:
+    def __init__(self, redis, transaction):
+        self.redis = redis
+        self.transaction = transaction
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        if self.transaction:
+            self.redis.transactions.append({args[0] for _, args, _ in self.commands})
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class TestApplyMessageOps:
+    """Test coalescing of buffered message operations"""
+
+    def test_append_content(self):
+        ops = [
+            {"type": "append_content", "content": "Hello"},
+            {"type": "append_content", "content": " world"},
+        ]
+        assert apply_message_ops({"content": ">"}, ops) == {"content": ">Hello world"}
+
+    def test_set_then_append(self):
+        ops = [
+            {"type": "append_content", "content": "stale"},
+            {"type": "set", "data": {"content": "fresh"}},
+            {"type": "append_content", "content": "!"},
+        ]
+        assert apply_message_ops({"content": ""}, ops) == {"content": "fresh!"}
+
+    def test_list_fields(self):
+        message = {"embeds": ["a"], "sources": [{"id": 1}]}
+        ops = [
+            {"type": "prepend", "field": "embeds", "items": ["b"]},
+            {"type": "append", "field": "sources", "items": [{"id": 2}]},
+            {"type": "append", "field": "statusHistory", "items": [{"done": True}]},
+        ]
+        assert apply_message_ops(message, ops) == {
+            "embeds": ["b", "a"],
+            "sources": [{"id": 1}, {"id": 2}],
+            "statusHistory": [{"done": True}],
+        }
+
+
+class TestMessageWriteBuffer:
+    """Test write-behind flushing of buffered message operations"""
+
+    def test_coalesces_until_flush(self):
+        writes = []
+        buffer = MessageWriteBuffer(
+            write_message=lambda *args: writes.append(args),
+            flush_interval=60,
+            max_pending=100,
+        )
+
+        async def run():
+            for token in ["a", "b", "c"]:
+                await buffer.push(
+                    "chat", "message", {"type": "append_content", "content": token}
+                )
+            assert writes == []
+            assert buffer.get_stats()["pending_ops"] == 3
+
+            await buffer.flush("chat", "message", done=True)
+
+        asyncio.run(run())
+
+        assert len(writes) == 1
+        assert [op["content"] for op in writes[0][2]] == ["a", "b", "c"]
+        assert buffer.get_stats()["pending_messages"] == 0
+        assert buffer.get_stats()["flush_count"] == 1
+
+    def test_flushes_on_max_pending(self):
+        writes = []
+        buffer = MessageWriteBuffer(
+            write_message=lambda *args: writes.append(args),
+            flush_interval=60,
+            max_pending=2,
+        )
+
+        async def run():
+            for token in ["a", "b", "c"]:
+                await buffer.push(
+                    "chat", "message", {"type": "append_content", "content": token}
+                )
+
+        asyncio.run(run())
+
+        assert len(writes) == 1
+        assert buffer.get_stats()["pending_ops"] == 1
+
+    def test_redis_buffer_is_flushed_by_any_instance(self):
+        redis = FakeRedis()
+        writes = []
+        buffers = [
+            MessageWriteBuffer(
+                write_message=lambda *args: writes.append(args),
+                redis=redis,
+                redis_key_prefix="buffer",
+                flush_interval=60,
+                ttl=30,
+            )
+            for _ in range(2)
+        ]
+
+        async def run():
+            for token in ["a", "b"]:
+                await buffers[0].push(
+                    "chat", "message", {"type": "append_content", "content": token}
+                )
+            await buffers[1].flush_all()
+            await buffers[1].flush_all()
+
+        asyncio.run(run())
+
+        assert [(chat_id, message_id) for chat_id, message_id, _ in writes] == [
+            ("chat", "message")
+        ]
+        assert [op["content"] for op in writes[0][2]] == ["a", "b"]
+        assert redis.ttls == {"buffer:chat:message": 30, "buffer:pending": 30}
+        assert redis.data == {"buffer:pending": {}}
+        # Only single-key transactions, which Redis Cluster accepts
+        assert all(len(keys) == 1 for keys in redis.transactions)
+
+    def test_expired_pending_messages_are_dropped(self):
+        redis = FakeRedis()
+        redis.data["buffer:pending"] = {'["chat", "message"]': time.time() - 60}
+        writes = []
+        buffer = MessageWriteBuffer(
+            write_message=lambda *args: writes.append(args),
+            redis=redis,
+            redis_key_prefix="buffer",
+            ttl=30,
+        )
+
+        asyncio.run(buffer.flush_all())
+
+        assert writes == []
+        assert redis.data == {"buffer:pending": {}}
+
+
+class TestPresenceStore:
+    """Test the in-memory stand-in of the presence store"""
+
+    def test_user_active_until_last_session_leaves(self):
+        store = PresenceStore()
+
+        async def run():
+            await store.add_session("sid-1", {"id": "user", "name": "User"})
+            await store.add_session("sid-2", {"id": "user", "name": "User"})
+            assert await store.get_active_user_ids() == ["user"]
+            assert sorted(await store.get_user_session_ids("user")) == [
+                "sid-1",
+                "sid-2",
+            ]
+
+            assert (await store.remove_session("sid-1"))["id"] == "user"
+            assert await store.is_user_active("user")
+
+            await store.remove_session("sid-2")
+            assert not await store.is_user_active("user")
+            assert await store.remove_session("sid-2") is None
+
+        asyncio.run(run())
+        assert store.get_active_user_count() == 0
+
+    def test_sessions_of_other_instances_are_read_from_redis(self):
+        redis = FakeRedis()
+        stores = [
+            PresenceStore(redis=redis, redis_key_prefix="presence") for _ in range(2)
+        ]
+
+        async def run():
+            await stores[0].add_session("sid-1", {"id": "user-1", "name": "One"})
+            await stores[1].add_session("sid-2", {"id": "user-2", "name": "Two"})
+            return await stores[0].get_sessions(["sid-1", "sid-2", "sid-3"])
+
+        assert asyncio.run(run()) == {
+            "sid-1": {"id": "user-1", "name": "One"},
+            "sid-2": {"id": "user-2", "name": "Two"},
+        }
+        assert redis.ttls["presence:session:sid-2"] == 60
+        # Only single-key transactions, which Redis Cluster accepts
+        assert all(len(keys) == 1 for keys in redis.transactions)
+
+    def test_user_stays_online_while_a_session_is_left_on_any_instance(self):
+        redis = FakeRedis()
+        stores = [
+            PresenceStore(redis=redis, redis_key_prefix="presence") for _ in range(2)
+        ]
+        user = {"id": "user", "name": "User"}
+
+        async def run():
+            await stores[0].add_session("sid-1", user)
+            await stores[1].add_session("sid-2", user)
+
+            await stores[0].remove_session("sid-1")
+            assert await stores[0].is_user_active("user")
+            assert await stores[0].get_user_session_ids("user") == ["sid-2"]
+
+            await stores[1].remove_session("sid-2")
+            assert not await stores[0].is_user_active("user")
+
+        asyncio.run(run())
+        # Each removal is a single script, run atomically by Redis
+        assert redis.script_calls == [
+            ["presence:session:sid-1", "presence:user:user", "presence:users"],
+            ["presence:session:sid-2", "presence:user:user", "presence:users"],
+        ]
+        assert "presence:session:sid-2" not in redis.data
+
+    def test_model_usage_expires(self):
+        store = PresenceStore(usage_ttl=0.05)
+
+        async def run():
+            await store.record_usage("model")
+            assert await store.get_models_in_use() == ["model"]
+
+            await asyncio.sleep(0.1)
+            assert await store.get_models_in_use() == []
+
+        asyncio.run(run())
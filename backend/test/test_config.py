@@ -0,0 +1,118 @@
+from backend.config import AppConfig
+
+
+class FakeRedis:
+    """In-memory stand-in for the sync Redis client counting its round trips"""
+
+    def __init__(self):
+        self.store = {}
+        self.calls = 0
+
+    def _round_trip(self):
+        self.calls += 1
+
+    def get(self, key):
+        self._round_trip()
+        return self.store.get(key)
+
+    def set(self, key, value):
+        self.store[key] = value
+        return True
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+    def publish(self, channel, message):
+        return 0
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.commands.append((name, args))
+
+        return command
+
+    def execute(self):
+        # A pipeline is a single round trip
+        self.redis._round_trip()
+        calls = self.redis.calls
+        try:
+            return [
+                getattr(FakeRedis, name)(self.redis, *args)
+                for name, args in self.commands
+            ]
+        finally:
+            self.redis.calls = calls
+
+
+class ConfigValue:
+    def __init__(self, value):
+        self.value = value
+
+    def save(self):
+        pass
+
+
+def create_config(redis, cache_ttl, keys=40):
+    config = AppConfig(cache_ttl=cache_ttl)
+    object.__setattr__(config, "_redis", redis)
+    object.__setattr__(config, "_redis_key_prefix", "test")
+    for idx in range(keys):
+        config._state[f"KEY_{idx}"] = ConfigValue(idx)
+    return config
+
+
+def read_config_per_request(config, requests=200, keys=40):
+    for _ in range(requests):
+        for idx in range(keys):
+            getattr(config, f"KEY_{idx}")
+
+
+class TestAppConfigCache:
+    def test_reads_use_local_snapshot(self):
+        redis = FakeRedis()
+        config = create_config(redis, cache_ttl=60)
+
+        read_config_per_request(config, requests=10)
+        # One version check and one snapshot load for the first read only
+        assert redis.calls == 2
+
+    def test_updates_from_other_instances_are_applied(self):
+        redis = FakeRedis()
+        reader = create_config(redis, cache_ttl=60)
+        writer = create_config(redis, cache_ttl=60)
+        assert reader.KEY_1 == 1
+
+        writer.KEY_1 = "updated"
+        assert writer.KEY_1 == "updated"
+
+        # Pub/sub invalidation resets the check timestamp
+        object.__setattr__(reader, "_checked_at", 0.0)
+        assert reader.KEY_1 == "updated"
+
+    def test_expired_check_with_unchanged_version_only_reads_it(self):
+        redis = FakeRedis()
+        config = create_config(redis, cache_ttl=60)
+        read_config_per_request(config, requests=1)
+
+        object.__setattr__(config, "_checked_at", 0.0)
+        read_config_per_request(config, requests=10)
+        # The version check, not the snapshot
+        assert redis.calls == 3
+
+    def test_without_cache_every_read_checks_the_version(self):
+        redis = FakeRedis()
+        config = create_config(redis, cache_ttl=0)
+
+        read_config_per_request(config, requests=10, keys=40)
+        # One version check per read, plus the first snapshot load
+        assert redis.calls == 10 * 40 + 1
@@ -0,0 +1,18 @@
+import os
+import time
+
+import pytest
+
+# Benchmarks only run with BENCHMARK=1 and report their timings as test
+# properties (e.g. `pytest --junitxml=report.xml`) rather than asserting them
+benchmark = pytest.mark.skipif(
+    not os.environ.get("BENCHMARK"), reason="set BENCHMARK=1 to run benchmarks"
+)
+
+
+def measure(func, rounds: int = 1) -> float:
+    """Average duration of `func()` over `rounds` calls, in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e3
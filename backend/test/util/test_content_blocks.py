@@ -0,0 +1,150 @@
+import random
+
+from backend.utils import content_blocks as content_blocks_module
+from backend.utils.content_blocks import (
+    ContentBlocksSerializer,
+    serialize_content_blocks,
+    tag_content_handler,
+)
+from test.util.benchmark import benchmark, measure
+
+REASONING_TAGS = [("<think>", "</think>"), ("<reason>", "</reason>")]
+
+
+def create_deltas(tokens=20000, seed=0):
+    """A streamed reasoning response: a <think> block, then the answer"""
+    rng = random.Random(seed)
+    words = ["the", "model", "considers", "whether", "x", "holds", "so", "then"]
+
+    deltas = ["<th", "ink>"]
+    for idx in range(tokens):
+        deltas.append(rng.choice(words) + ("\n" if idx % 12 == 11 else " "))
+    deltas += ["</thi", "nk>\n", "The answer ", "is 42."]
+    return deltas
+
+
+def stream(deltas, incremental=True, keep_serialized=True):
+    """The content handling of stream_body_handler for each delta"""
+    content = ""
+    content_blocks = [{"type": "text", "content": ""}]
+    serializer = ContentBlocksSerializer()
+    serialized = []
+
+    for value in deltas:
+        content += value
+        delta_block = content_blocks[-1]
+        delta_block["content"] += value
+
+        content, content_blocks, _ = tag_content_handler(
+            "reasoning",
+            REASONING_TAGS,
+            content,
+            content_blocks,
+            len(value) if incremental and content_blocks[-1] is delta_block else None,
+        )
+
+        data = (
+            serializer.serialize(content_blocks)
+            if incremental
+            else serialize_content_blocks(content_blocks)
+        )
+        if keep_serialized:
+            serialized.append(data)
+
+    return content_blocks, serialized
+
+
+def strip_timings(content_blocks):
+    return [
+        {k: v for k, v in block.items() if k not in ("started_at", "ended_at")}
+        for block in content_blocks
+    ]
+
+
+class TestContentBlocks:
+    def test_tags_split_into_blocks(self):
+        content_blocks, serialized = stream(
+            ["Hi <thi", 'nk mode="fast">a\nb', "</think> done", " <reason>c</reason>!"]
+        )
+
+        assert strip_timings(content_blocks) == [
+            {"type": "text", "content": "Hi "},
+            {
+                "type": "reasoning",
+                "start_tag": "<think>",
+                "end_tag": "</think>",
+                "attributes": {"mode": "fast"},
+                "content": "a\nb",
+                "duration": 0,
+            },
+            {"type": "text", "content": "done "},
+            {
+                "type": "reasoning",
+                "start_tag": "<reason>",
+                "end_tag": "</reason>",
+                "attributes": {},
+                "content": "c",
+                "duration": 0,
+            },
+            {"type": "text", "content": "!"},
+        ]
+        assert serialized[-1] == serialize_content_blocks(content_blocks)
+
+    def test_incremental_matches_full_serialization(self):
+        deltas = create_deltas(tokens=500)
+
+        blocks, serialized = stream(deltas, incremental=True)
+        full_blocks, full_serialized = stream(deltas, incremental=False)
+
+        assert strip_timings(blocks) == strip_timings(full_blocks)
+        assert serialized == full_serialized
+
+    def test_serializer_reasoning_lines(self):
+        serializer = ContentBlocksSerializer()
+        block = {"type": "reasoning", "content": ""}
+        content_blocks = [{"type": "text", "content": "Q"}, block]
+
+        for value in ["a", "b\n", "> quoted\n\n", "c\r\nd", "\n", "e"]:
+            block["content"] += value
+            assert serializer.serialize(content_blocks) == serialize_content_blocks(
+                content_blocks
+            )
+
+    def test_incremental_serialization_only_quotes_new_lines(self, monkeypatch):
+        quoted = []
+
+        def get_reasoning_display_content(reasoning_content):
+            quoted.append(len(reasoning_content))
+            return original(reasoning_content)
+
+        original = content_blocks_module.get_reasoning_display_content
+        monkeypatch.setattr(
+            content_blocks_module,
+            "get_reasoning_display_content",
+            get_reasoning_display_content,
+        )
+
+        deltas = create_deltas(tokens=2000)
+        content_blocks, _ = stream(deltas, keep_serialized=False)
+        (reasoning,) = [
+            block["content"] for block in content_blocks if block["type"] == "reasoning"
+        ]
+        longest_line = max(len(line) for line in reasoning.split("\n"))
+
+        # Complete lines are quoted once, then only the open line per delta,
+        # where a full serialization quotes the whole reasoning every time
+        assert sum(quoted) <= len(reasoning) + len(deltas) * (longest_line + 1)
+        assert sum(quoted) < len(reasoning) * len(deltas) / 20
+
+    @benchmark
+    def test_benchmark_20k_token_reasoning_stream(self, record_property):
+        deltas = create_deltas()
+
+        record_property(
+            "full_ms",
+            measure(lambda: stream(deltas, incremental=False, keep_serialized=False)),
+        )
+        record_property(
+            "incremental_ms",
+            measure(lambda: stream(deltas, incremental=True, keep_serialized=False)),
+        )
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+from backend.utils.file_status import FileStatusNotifier
+
+
+class TestFileStatusNotifier:
+    def test_publish_from_thread_reaches_subscriber(self):
+        notifier = FileStatusNotifier()
+
+        async def run():
+            with notifier.subscribe("file-1") as queue:
+                thread = threading.Thread(
+                    target=notifier.publish, args=("file-1", "failed", "boom")
+                )
+                thread.start()
+                thread.join()
+                return await asyncio.wait_for(queue.get(), 1)
+
+        assert asyncio.run(run()) == {"status": "failed", "error": "boom"}
+        assert notifier._subscribers == {}
+
+    def test_other_files_are_not_delivered(self):
+        notifier = FileStatusNotifier()
+
+        async def run():
+            with notifier.subscribe("file-1") as queue:
+                notifier.publish("file-2", "completed")
+                await asyncio.sleep(0)
+                return queue.empty()
+
+        assert asyncio.run(run())
@@ -0,0 +1,97 @@
+import asyncio
+
+from backend.utils import model_list_cache
+from backend.utils.model_list_cache import ModelListCache
+
+
+class FakeApp:
+    def __init__(self):
+        config = type("Config", (), {"OPENAI_API_BASE_URLS": ["http://a"]})
+        self.state = type("State", (), {"config": config, "redis": None})
+
+
+class FakeRequest:
+    def __init__(self, app):
+        self.app = app
+
+
+class FakeUser:
+    def __init__(self, id):
+        self.id = id
+
+
+def create_cache(ttl=60, stale_ttl=60):
+    fetches = []
+
+    async def fetch(request, user):
+        fetches.append((request.app, user))
+        return {"data": [{"id": f"model-{len(fetches)}"}]}
+
+    cache = ModelListCache(
+        "test", fetch, ["OPENAI_API_BASE_URLS"], ttl=ttl, stale_ttl=stale_ttl
+    )
+    return cache, fetches
+
+
+class TestModelListCache:
+    def test_fresh_list_is_served_from_the_cache(self):
+        cache, fetches = create_cache()
+        request = FakeRequest(FakeApp())
+
+        async def run():
+            return [await cache.get(request) for _ in range(3)]
+
+        assert asyncio.run(run()) == [{"data": [{"id": "model-1"}]}] * 3
+        assert len(fetches) == 1
+
+    def test_stale_list_is_served_while_refreshed_in_background(self):
+        cache, fetches = create_cache()
+        request = FakeRequest(FakeApp())
+
+        async def run():
+            await cache.get(request)
+            for entry in cache._entries.values():
+                entry["fetched_at"] -= 90
+
+            stale = await cache.get(request)
+            assert len(cache._background_tasks) == 1
+            await asyncio.gather(*cache._background_tasks)
+            return stale, await cache.get(request)
+
+        stale, refreshed = asyncio.run(run())
+        assert stale == {"data": [{"id": "model-1"}]}
+        assert refreshed == {"data": [{"id": "model-2"}]}
+        assert len(fetches) == 2
+        assert not cache._background_tasks
+
+    def test_requested_lists_are_refreshed_without_their_request(self):
+        cache, fetches = create_cache()
+        app = FakeApp()
+
+        async def run():
+            await cache.get(FakeRequest(app))
+            for entry in cache._entries.values():
+                entry["fetched_at"] -= 90
+            await cache.refresh_requested()
+
+        asyncio.run(run())
+
+        assert [requested[0] for requested in cache._requested.values()] == [app]
+        assert [fetched_app for fetched_app, _ in fetches] == [app, app]
+
+    def test_failed_connection_falls_back_to_the_users_last_response(self, monkeypatch):
+        monkeypatch.setattr(model_list_cache, "ENABLE_FORWARD_USER_INFO_HEADERS", True)
+        cache, _ = create_cache()
+
+        async def response(value):
+            return value
+
+        async def run():
+            await cache.track(0, "http://a", response({"data": ["a"]}), FakeUser("1"))
+            return (
+                await cache.track(0, "http://a", response(None), FakeUser("1")),
+                await cache.track(0, "http://a", response(None), FakeUser("2")),
+            )
+
+        assert asyncio.run(run()) == ({"data": ["a"]}, None)
+        assert cache._health["0"]["status"] == "error"
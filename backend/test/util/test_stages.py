@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from backend.utils.stages import StageScheduler
+
+
+def sleep_stage(duration, value=None, order=None, name=None):
+    async def stage():
+        await asyncio.sleep(duration)
+        if order is not None:
+            order.append(name)
+        return value
+
+    return stage
+
+
+class TestStageScheduler:
+    def test_independent_stages_run_concurrently(self):
+        async def run():
+            stages = StageScheduler()
+            stages.add("memory", sleep_stage(0.2, "context"))
+            stages.add("web_search", sleep_stage(0.2, ["file"]))
+            stages.add("image_generation", sleep_stage(0.2, "image"))
+            return await stages.run(), stages.timings
+
+        results, timings = asyncio.run(run())
+
+        assert results == {
+            "memory": "context",
+            "web_search": ["file"],
+            "image_generation": "image",
+        }
+        assert set(timings) == {"memory", "web_search", "image_generation"}
+        assert all(timing["duration"] >= 0.15 for timing in timings.values())
+        # Every stage started before any other one finished
+        assert all(
+            timing["start"] < other["start"] + other["duration"]
+            for timing in timings.values()
+            for other in timings.values()
+        )
+
+    def test_dependent_stage_waits(self):
+        order = []
+
+        async def run():
+            stages = StageScheduler()
+
+            async def files():
+                return [*(await stages.result("web_search")), "knowledge"]
+
+            stages.add("files", files, depends_on=["web_search"])
+            stages.add("web_search", sleep_stage(0.1, ["web"], order, "web_search"))
+            stages.add("memory", sleep_stage(0, None, order, "memory"))
+            return await stages.run(), stages.timings
+
+        results, timings = asyncio.run(run())
+
+        assert results["files"] == ["web", "knowledge"]
+        assert order == ["memory", "web_search"]
+        assert timings["files"]["start"] >= timings["web_search"]["duration"]
+
+    def test_missing_dependency_does_not_wait(self):
+        async def run():
+            stages = StageScheduler()
+            stages.add("files", sleep_stage(0, "sources"), depends_on=["web_search"])
+            return (
+                "web_search" in stages,
+                await stages.result("web_search"),
+                (await stages.run()),
+            )
+
+        assert asyncio.run(run()) == (False, None, {"files": "sources"})
+
+    def test_error_cancels_other_stages(self):
+        cancelled = []
+
+        async def run():
+            stages = StageScheduler()
+
+            async def fail():
+                raise ValueError("boom")
+
+            async def slow():
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append("slow")
+                    raise
+
+            stages.add("slow", slow)
+            stages.add("fail", fail)
+            await stages.run()
+
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+        assert cancelled == ["slow"]
+
+    def test_stage_names_are_unique(self):
+        async def run():
+            stages = StageScheduler()
+            stages.add("memory", sleep_stage(0))
+            with pytest.raises(ValueError):
+                stages.add("memory", sleep_stage(0))
+            await stages.run()
+
+        asyncio.run(run())
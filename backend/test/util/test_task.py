@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+from backend.utils.task import (
+    TaskResultCache,
+    combined_task_generation_template,
+    parse_combined_task_results,
+)
+
+MESSAGES = [
+    {"role": "user", "content": "How do I bake bread?"},
+    {"role": "assistant", "content": "Mix flour, water, salt and yeast."},
+]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+class TestCombinedTaskGeneration:
+    def test_template_lists_only_requested_outputs(self):
+        content = combined_task_generation_template(
+            "{{OUTPUT}}\n{{TASKS}}\n{{MESSAGES:END:6}}", MESSAGES, ["title", "tags"]
+        )
+        output = content.split("\n", 1)[0]
+
+        assert "title:" in content and "tags:" in content
+        assert "follow_ups" not in content
+        assert list(json.loads(output)) == ["title", "tags"]
+        assert "bake bread" in content
+
+    def test_parse_keeps_valid_outputs(self):
+        content = (
+            'Sure! {"title": " 🍞 Baking Bread ", "tags": ["Cooking"], '
+            '"follow_ups": "not a list"}'
+        )
+
+        assert parse_combined_task_results(
+            content, ["title", "tags", "follow_ups"]
+        ) == {"title": "🍞 Baking Bread", "tags": ["Cooking"]}
+
+    def test_parse_ignores_unrequested_and_invalid_json(self):
+        assert parse_combined_task_results('{"tags": ["Cooking"]}', ["title"]) == {}
+        assert parse_combined_task_results("no json here", ["title"]) == {}
+        assert parse_combined_task_results('{"title": ""}', ["title"]) == {}
+
+
+class FakeRequest:
+    def __init__(self, combined=True):
+        config = type("Config", (), {"ENABLE_COMBINED_TASK_GENERATION": combined})
+        self.app = type("App", (), {"state": type("State", (), {"config": config})})
+
+
+class TestTaskResultCache:
+    def test_results_are_shared_through_redis(self):
+        redis = FakeRedis()
+
+        async def run():
+            await TaskResultCache().set(redis, "chat-1", MESSAGES, {"title": "Bread"})
+            return await TaskResultCache().get(redis, "chat-1", MESSAGES)
+
+        assert asyncio.run(run()) == {"title": "Bread"}
+
+    def test_regenerated_reply_reuses_title_and_tags(self):
+        cache = TaskResultCache()
+        regenerated = [MESSAGES[0], {"role": "assistant", "content": "Use a starter."}]
+
+        async def run():
+            await cache.set(
+                None,
+                "chat-1",
+                MESSAGES,
+                {"title": "Bread", "tags": ["Cooking"], "follow_ups": ["How long?"]},
+            )
+            return await cache.get(None, "chat-1", regenerated)
+
+        assert asyncio.run(run()) == {"title": "Bread", "tags": ["Cooking"]}
+
+    def test_changed_history_misses(self):
+        cache = TaskResultCache()
+
+        async def run():
+            await cache.set(None, "chat-1", MESSAGES, {"tags": ["A"]})
+            edited = [{"role": "user", "content": "How do I bake cake?"}, MESSAGES[1]]
+            return (
+                await cache.get(None, "chat-1", edited),
+                await cache.get(None, "chat-2", MESSAGES),
+            )
+
+        assert asyncio.run(run()) == ({}, {})
+
+    def test_oldest_entries_are_evicted(self):
+        cache = TaskResultCache(max_entries=2)
+        histories = [[{"role": "user", "content": str(idx)}] for idx in range(3)]
+
+        async def run():
+            for idx, history in enumerate(histories):
+                await cache.set(None, "chat", history, {"title": str(idx)})
+            return [await cache.get(None, "chat", history) for history in histories]
+
+        assert asyncio.run(run()) == [{}, {"title": "1"}, {"title": "2"}]
+
+
+class TestGetTaskResults:
+    def run(self, monkeypatch, request, content, outputs):
+        from backend.utils import middleware
+
+        calls = []
+
+        async def generate_combined_tasks(request, form_data, user):
+            calls.append(form_data["outputs"])
+            return {"choices": [{"message": {"content": content}}]}
+
+        monkeypatch.setattr(
+            middleware, "generate_combined_tasks", generate_combined_tasks
+        )
+        monkeypatch.setattr(middleware, "TASK_RESULT_CACHE", TaskResultCache())
+
+        async def run():
+            await middleware.TASK_RESULT_CACHE.set(
+                None, "chat-1", MESSAGES, {"title": "Bread"}
+            )
+            return await middleware.get_task_results(
+                request, {"chat_id": "chat-1", "messages": MESSAGES}, outputs, None
+            )
+
+        return asyncio.run(run()), calls
+
+    def test_cached_outputs_are_not_generated_again(self, monkeypatch):
+        results, calls = self.run(
+            monkeypatch,
+            FakeRequest(),
+            '{"tags": ["Cooking"], "follow_ups": ["How long?"]}',
+            ["follow_ups", "title", "tags"],
+        )
+
+        assert calls == [["follow_ups", "tags"]]
+        assert results == {
+            "title": "Bread",
+            "tags": ["Cooking"],
+            "follow_ups": ["How long?"],
+        }
+
+    def test_unparsed_outputs_are_left_to_the_separate_tasks(self, monkeypatch):
+        results, calls = self.run(
+            monkeypatch, FakeRequest(), '{"tags": "not a list"}', ["tags"]
+        )
+
+        assert calls == [["tags"]]
+        assert results == {}
+
+    def test_combined_generation_can_be_disabled(self, monkeypatch):
+        results, calls = self.run(
+            monkeypatch, FakeRequest(combined=False), "{}", ["title", "tags"]
+        )
+
+        assert calls == []
+        assert results == {"title": "Bread"}
@@ -1,6 +1,6 @@
 from typing import Optional, Set, Union, List, Dict, Any
 from backend.models.users import Users, UserModel
-from backend.models.groups import Groups
+from backend.models.groups import Groups, GROUP_MEMBERSHIP_CACHE
 
 
 from backend.config import DEFAULT_USER_PERMISSIONS
@@ -53,19 +53,28 @@ def get_permissions(
                     )  # Use the most permissive value (True > False)
         return permissions
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
+    def resolve_permissions() -> str:
+        user_groups = Groups.get_groups_by_member_id(user_id)
 
-    # Deep copy default permissions to avoid modifying the original dict
-    permissions = json.loads(json.dumps(default_permissions))
+        # Deep copy default permissions to avoid modifying the original dict
+        permissions = json.loads(json.dumps(default_permissions))
 
-    # Combine permissions from all user groups
-    for group in user_groups:
-        permissions = combine_permissions(permissions, group.permissions or {})
+        # Combine permissions from all user groups
+        for group in user_groups:
+            permissions = combine_permissions(permissions, group.permissions or {})
 
-    # Ensure all fields from default_permissions are present and filled in
-    permissions = fill_missing_permissions(permissions, default_permissions)
+        # Ensure all fields from default_permissions are present and filled in
+        permissions = fill_missing_permissions(permissions, default_permissions)
 
-    return permissions
+        return json.dumps(permissions)
+
+    # Cached serialized, so every caller gets its own copy to modify
+    default_permissions_key = json.dumps(default_permissions, sort_keys=True)
+    return json.loads(
+        GROUP_MEMBERSHIP_CACHE.get(
+            ("permissions", user_id, default_permissions_key), resolve_permissions
+        )
+    )
 
 
 def has_permission(
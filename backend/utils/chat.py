@@ -41,6 +41,7 @@ from backend.models.models import Models
 
 
 from backend.utils.plugin import (
+    FUNCTION_MODULE_CACHE,
     load_function_module_by_id,
     get_function_module_from_cache,
 )
@@ -331,12 +332,9 @@ async def chat_completed(request: Request, form_data: dict, user: Any):
     }
 
     try:
-        filter_functions = [
-            Functions.get_function_by_id(filter_id)
-            for filter_id in get_sorted_filter_ids(
-                request, model, metadata.get("filter_ids", [])
-            )
-        ]
+        filter_functions = Functions.get_functions_by_ids(
+            get_sorted_filter_ids(request, model, metadata.get("filter_ids", []))
+        )
 
         result, _ = await process_filter_functions(
             request=request,
@@ -396,9 +394,7 @@ async def chat_action(request: Request, action_id: str, form_data: dict, user: A
 
     function_module, _, _ = get_function_module_from_cache(request, action_id)
 
-    if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-        valves = Functions.get_function_valves_by_id(action_id)
-        function_module.valves = function_module.Valves(**(valves if valves else {}))
+    FUNCTION_MODULE_CACHE.apply_valves(action_id, function_module)
 
     if hasattr(function_module, "action"):
         try:
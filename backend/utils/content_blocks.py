@@ -0,0 +1,434 @@
+import html
+import json
+import re
+import time
+from typing import Optional
+
+
+def split_content_and_whitespace(content):
+    content_stripped = content.rstrip()
+    original_whitespace = (
+        content[len(content_stripped) :] if len(content) > len(content_stripped) else ""
+    )
+    return content_stripped, original_whitespace
+
+
+def is_opening_code_block(content):
+    backtick_segments = content.split("```")
+    # Even number of segments means the last backticks are opening a new block
+    return len(backtick_segments) > 1 and len(backtick_segments) % 2 == 0
+
+
+def get_reasoning_display_content(reasoning_content: str) -> str:
+    return "\n".join(
+        (f"> {line}" if not line.startswith(">") else line)
+        for line in reasoning_content.splitlines()
+    )
+
+
+def serialize_content_block(
+    content: str,
+    block: dict,
+    raw: bool = False,
+    reasoning_display_content: Optional[str] = None,
+) -> str:
+    """
+    Append the serialized `block` to `content`, the unstripped serialization
+    of the blocks before it.
+    """
+    if block["type"] == "text":
+        block_content = block["content"].strip()
+        if block_content:
+            content = f"{content}{block_content}\n"
+    elif block["type"] == "tool_calls":
+        tool_calls = block.get("content", [])
+        results = block.get("results", [])
+
+        if content and not content.endswith("\n"):
+            content += "\n"
+
+        if results:
+
+            tool_calls_display_content = ""
+            for tool_call in tool_calls:
+
+                tool_call_id = tool_call.get("id", "")
+                tool_name = tool_call.get("function", {}).get("name", "")
+                tool_arguments = tool_call.get("function", {}).get("arguments", "")
+
+                tool_result = None
+                tool_result_files = None
+                for result in results:
+                    if tool_call_id == result.get("tool_call_id", ""):
+                        tool_result = result.get("content", None)
+                        tool_result_files = result.get("files", None)
+                        break
+
+                if tool_result is not None:
+                    tool_result_embeds = result.get("embeds", "")
+                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="true" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}" result="{html.escape(json.dumps(tool_result, ensure_ascii=False))}" files="{html.escape(json.dumps(tool_result_files)) if tool_result_files else ""}" embeds="{html.escape(json.dumps(tool_result_embeds))}">\n<summary>Tool Executed</summary>\n</details>\n'
+                else:
+                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
+
+            if not raw:
+                content = f"{content}{tool_calls_display_content}"
+        else:
+            tool_calls_display_content = ""
+
+            for tool_call in tool_calls:
+                tool_call_id = tool_call.get("id", "")
+                tool_name = tool_call.get("function", {}).get("name", "")
+                tool_arguments = tool_call.get("function", {}).get("arguments", "")
+
+                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
+
+            if not raw:
+                content = f"{content}{tool_calls_display_content}"
+
+    elif block["type"] == "reasoning":
+        if reasoning_display_content is None and not raw:
+            reasoning_display_content = get_reasoning_display_content(block["content"])
+
+        reasoning_duration = block.get("duration", None)
+
+        start_tag = block.get("start_tag", "")
+        end_tag = block.get("end_tag", "")
+
+        if content and not content.endswith("\n"):
+            content += "\n"
+
+        if reasoning_duration is not None:
+            if raw:
+                content = f'{content}{start_tag}{block["content"]}{end_tag}\n'
+            else:
+                content = f'{content}<details type="reasoning" done="true" duration="{reasoning_duration}">\n<summary>Thought for {reasoning_duration} seconds</summary>\n{reasoning_display_content}\n</details>\n'
+        else:
+            if raw:
+                content = f'{content}{start_tag}{block["content"]}{end_tag}\n'
+            else:
+                content = f'{content}<details type="reasoning" done="false">\n<summary>Thinking…</summary>\n{reasoning_display_content}\n</details>\n'
+
+    elif block["type"] == "code_interpreter":
+        attributes = block.get("attributes", {})
+        output = block.get("output", None)
+        lang = attributes.get("lang", "")
+
+        content_stripped, original_whitespace = split_content_and_whitespace(content)
+        if is_opening_code_block(content_stripped):
+            # Remove trailing backticks that would open a new block
+            content = content_stripped.rstrip("`").rstrip() + original_whitespace
+        else:
+            # Keep content as is - either closing backticks or no backticks
+            content = content_stripped + original_whitespace
+
+        if content and not content.endswith("\n"):
+            content += "\n"
+
+        if output:
+            output = html.escape(json.dumps(output))
+
+            if raw:
+                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n```output\n{output}\n```\n'
+            else:
+                content = f'{content}<details type="code_interpreter" done="true" output="{output}">\n<summary>Analyzed</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+        else:
+            if raw:
+                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n'
+            else:
+                content = f'{content}<details type="code_interpreter" done="false">\n<summary>Analyzing...</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+
+    else:
+        block_content = str(block["content"]).strip()
+        if block_content:
+            content = f"{content}{block['type']}: {block_content}\n"
+
+    return content
+
+
+def serialize_content_blocks(content_blocks, raw=False):
+    content = ""
+
+    for block in content_blocks:
+        content = serialize_content_block(content, block, raw)
+
+    return content.strip()
+
+
+class ContentBlocksSerializer:
+    """
+    serialize_content_blocks for the content blocks of a streaming response.
+
+    While a response streams, only its last block changes: the blocks before
+    it are closed. Their serialization is kept and extended as blocks close,
+    and the quoted lines of an open reasoning block are only built for the
+    lines added since the previous call, so each delta costs what it added
+    instead of a pass over the whole response.
+    """
+
+    def __init__(self, raw: bool = False):
+        self.raw = raw
+
+        # Closed blocks (held so their ids stay unique) and their serialization
+        self._blocks: list[dict] = []
+        self._content = ""
+
+        # Open reasoning block: source up to its last newline, already quoted
+        self._reasoning_block: Optional[dict] = None
+        self._reasoning_source = ""
+        self._reasoning_display_content = ""
+
+    def _get_closed_content(self, closed_blocks: list[dict]) -> str:
+        count = len(self._blocks)
+        if count > len(closed_blocks) or any(
+            a is not b for a, b in zip(self._blocks, closed_blocks)
+        ):
+            self._blocks, self._content, count = [], "", 0
+
+        for block in closed_blocks[count:]:
+            self._content = serialize_content_block(self._content, block, self.raw)
+            self._blocks.append(block)
+
+        return self._content
+
+    def _get_reasoning_display_content(self, block: dict) -> str:
+        reasoning_content = block["content"]
+        if block is not self._reasoning_block or not reasoning_content.startswith(
+            self._reasoning_source
+        ):
+            self._reasoning_block = block
+            self._reasoning_source = ""
+            self._reasoning_display_content = ""
+
+        # Lines up to the last newline are complete and never change
+        end = reasoning_content.rfind("\n") + 1
+        if end > len(self._reasoning_source):
+            display_content = get_reasoning_display_content(
+                reasoning_content[len(self._reasoning_source) : end]
+            )
+            if display_content:
+                self._reasoning_display_content = (
+                    f"{self._reasoning_display_content}\n{display_content}"
+                    if self._reasoning_display_content
+                    else display_content
+                )
+            self._reasoning_source = reasoning_content[:end]
+
+        rest = get_reasoning_display_content(reasoning_content[end:])
+        if not rest:
+            return self._reasoning_display_content
+        if not self._reasoning_display_content:
+            return rest
+        return f"{self._reasoning_display_content}\n{rest}"
+
+    def serialize(self, content_blocks: list[dict]) -> str:
+        if not content_blocks:
+            return ""
+
+        content = self._get_closed_content(content_blocks[:-1])
+
+        block = content_blocks[-1]
+        content = serialize_content_block(
+            content,
+            block,
+            self.raw,
+            reasoning_display_content=(
+                self._get_reasoning_display_content(block)
+                if block["type"] == "reasoning" and not self.raw
+                else None
+            ),
+        )
+
+        return content.strip()
+
+
+def convert_content_blocks_to_messages(content_blocks, raw=False):
+    messages = []
+
+    temp_blocks = []
+    for idx, block in enumerate(content_blocks):
+        if block["type"] == "tool_calls":
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": serialize_content_blocks(temp_blocks, raw),
+                    "tool_calls": block.get("content"),
+                }
+            )
+
+            results = block.get("results", [])
+
+            for result in results:
+                messages.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": result["tool_call_id"],
+                        "content": result.get("content", "") or "",
+                    }
+                )
+            temp_blocks = []
+        else:
+            temp_blocks.append(block)
+
+    if temp_blocks:
+        content = serialize_content_blocks(temp_blocks, raw)
+        if content:
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": content,
+                }
+            )
+
+    return messages
+
+
+def extract_attributes(tag_content):
+    """Extract attributes from a tag if they exist."""
+    attributes = {}
+    if not tag_content:  # Ensure tag_content is not None
+        return attributes
+    # Match attributes in the format: key="value" (ignores single quotes for simplicity)
+    matches = re.findall(r'(\w+)\s*=\s*"([^"]+)"', tag_content)
+    for key, value in matches:
+        attributes[key] = value
+    return attributes
+
+
+def get_start_tag_pattern(start_tag: str) -> str:
+    if start_tag.startswith("<") and start_tag.endswith(">"):
+        # Match start tag e.g., <tag> or <tag attr="value">
+        return rf"<{re.escape(start_tag[1:-1])}(\s.*?)?>"
+    return rf"{re.escape(start_tag)}"
+
+
+def tag_content_handler(
+    content_type, tags, content, content_blocks, delta_length: Optional[int] = None
+):
+    """
+    Split the tagged blocks (e.g. <think>...</think>) of `content_type` out of
+    the last content block.
+
+    With `delta_length`, only the last `delta_length` characters of the last
+    block are new and earlier text is known not to hold a tag, so only the
+    lines touched by the delta are searched.
+    """
+    end_flag = False
+
+    if content_blocks[-1]["type"] == "text":
+        text = content_blocks[-1]["content"]
+
+        search_start = 0
+        if delta_length is not None:
+            # A start tag never spans lines, search from the line the delta starts on
+            search_start = text.rfind("\n", 0, max(len(text) - delta_length, 0)) + 1
+
+        for start_tag, end_tag in tags:
+            match = re.compile(get_start_tag_pattern(start_tag)).search(
+                text, search_start
+            )
+            if match:
+                try:
+                    attr_content = (
+                        match.group(1) if match.group(1) else ""
+                    )  # Ensure it's not None
+                except:
+                    attr_content = ""
+
+                attributes = extract_attributes(
+                    attr_content
+                )  # Extract attributes safely
+
+                # Capture everything before and after the matched tag
+                before_tag = text[: match.start()]  # Content before opening tag
+                after_tag = text[match.end() :]  # Content after opening tag
+
+                # Keep only the content before the tag in the text block
+                content_blocks[-1]["content"] = before_tag
+                if not before_tag:
+                    content_blocks.pop()
+
+                # Append the new block
+                content_blocks.append(
+                    {
+                        "type": content_type,
+                        "start_tag": start_tag,
+                        "end_tag": end_tag,
+                        "attributes": attributes,
+                        "content": "",
+                        "started_at": time.time(),
+                    }
+                )
+
+                if after_tag:
+                    content_blocks[-1]["content"] = after_tag
+                    content, content_blocks, end_flag = tag_content_handler(
+                        content_type, tags, content, content_blocks
+                    )
+
+                break
+    elif content_blocks[-1]["type"] == content_type:
+        start_tag = content_blocks[-1]["start_tag"]
+        end_tag = content_blocks[-1]["end_tag"]
+        end_tag_pattern = rf"{re.escape(end_tag)}"
+
+        block_content = content_blocks[-1]["content"]
+
+        search_start = 0
+        if delta_length is not None:
+            search_start = max(len(block_content) - delta_length - len(end_tag), 0)
+
+        # Check if the content has the end tag
+        if re.compile(end_tag_pattern).search(block_content, search_start):
+            end_flag = True
+
+            # Strip start and end tags from the content
+            start_tag_pattern = rf"<{re.escape(start_tag)}(.*?)>"
+            block_content = re.sub(start_tag_pattern, "", block_content).strip()
+
+            end_tag_regex = re.compile(end_tag_pattern, re.DOTALL)
+            split_content = end_tag_regex.split(block_content, maxsplit=1)
+
+            # Content inside the tag
+            block_content = split_content[0].strip() if split_content else ""
+
+            # Leftover content (everything after `</tag>`)
+            leftover_content = (
+                split_content[1].strip() if len(split_content) > 1 else ""
+            )
+
+            if block_content:
+                content_blocks[-1]["content"] = block_content
+                content_blocks[-1]["ended_at"] = time.time()
+                content_blocks[-1]["duration"] = int(
+                    content_blocks[-1]["ended_at"] - content_blocks[-1]["started_at"]
+                )
+
+                # Reset the content_blocks by appending a new text block
+                if content_type != "code_interpreter":
+                    content_blocks.append(
+                        {
+                            "type": "text",
+                            "content": leftover_content,
+                        }
+                    )
+
+            else:
+                # Remove the block if content is empty
+                content_blocks.pop()
+
+                content_blocks.append(
+                    {
+                        "type": "text",
+                        "content": leftover_content,
+                    }
+                )
+
+            # Clean processed content
+            content = re.sub(
+                rf"{get_start_tag_pattern(start_tag)}(.|\n)*?{re.escape(end_tag)}",
+                "",
+                content,
+                flags=re.DOTALL,
+            )
+
+    return content, content_blocks, end_flag
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from backend.env import SRC_LOG_LEVELS
+from backend.utils.redis import get_redis_connection
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+class FileStatusNotifier:
+    """
+    Pushes file processing status changes to the streams waiting for them.
+
+    `publish` is called from the (threaded) processing code whenever a file's
+    status changes and wakes the subscribers of that file on this instance.
+    With Redis configured the change is also published to the other
+    instances, so a stream is notified wherever the file was processed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[
+            str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = {}
+
+        self._id = str(uuid.uuid4())
+        self._redis = None
+        self._redis_key_prefix = "open-webui"
+
+    def connect(
+        self,
+        redis_url: Optional[str] = None,
+        redis_sentinels: Optional[list] = [],
+        redis_cluster: Optional[bool] = False,
+        redis_key_prefix: str = "open-webui",
+    ):
+        if not redis_url or self._redis:
+            return
+
+        self._redis_key_prefix = redis_key_prefix
+        self._redis = get_redis_connection(
+            redis_url, redis_sentinels, redis_cluster, decode_responses=True
+        )
+        threading.Thread(target=self._listen_for_updates, daemon=True).start()
+
+    def _get_redis_channel(self) -> str:
+        return f"{self._redis_key_prefix}:file_status"
+
+    def _listen_for_updates(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._get_redis_channel())
+
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+
+                    data = json.loads(message["data"])
+                    # Changes published by this instance were delivered already
+                    if data.pop("origin", None) != self._id:
+                        self._notify(data.pop("id"), data)
+            except Exception as e:
+                log.debug(f"File status listener disconnected: {e}")
+                time.sleep(5)
+
+    def _notify(self, file_id: str, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(file_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's event loop is closed
+                pass
+
+    def publish(self, file_id: str, status: str, error: Optional[str] = None):
+        event = {"status": status}
+        if error is not None:
+            event["error"] = error
+
+        self._notify(file_id, event)
+
+        if self._redis:
+            try:
+                self._redis.publish(
+                    self._get_redis_channel(),
+                    json.dumps({**event, "id": file_id, "origin": self._id}),
+                )
+            except Exception as e:
+                log.error(f"Failed to publish file status: {e}")
+
+    @contextmanager
+    def subscribe(self, file_id: str):
+        """
+        Yields a queue receiving the status events of `file_id`. Must be
+        entered from the event loop that reads the queue.
+        """
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+
+        with self._lock:
+            self._subscribers.setdefault(file_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(file_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[file_id]
+
+
+FILE_STATUS_NOTIFIER = FileStatusNotifier()
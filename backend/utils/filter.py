@@ -2,6 +2,7 @@ import inspect
 import logging
 
 from backend.utils.plugin import (
+    FUNCTION_MODULE_CACHE,
     load_function_module_by_id,
     get_function_module_from_cache,
 )
@@ -23,35 +24,34 @@ def get_function_module(request, function_id, load_from_db=True):
 
 
 def get_sorted_filter_ids(request, model: dict, enabled_filter_ids: list = None):
-    def get_priority(function_id):
-        function = Functions.get_function_by_id(function_id)
-        if function is not None:
-            valves = Functions.get_function_valves_by_id(function_id)
-            return valves.get("priority", 0) if valves else 0
-        return 0
+    active_filters = Functions.get_functions_by_type("filter", active_only=True)
 
-    filter_ids = [function.id for function in Functions.get_global_filter_functions()]
+    filter_ids = [function.id for function in active_filters if function.is_global]
     if "info" in model and "meta" in model["info"]:
         filter_ids.extend(model["info"]["meta"].get("filterIds", []))
         filter_ids = list(set(filter_ids))
-    active_filter_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
-    ]
+
+    active_filter_ids = {function.id for function in active_filters}
+    filter_ids = [fid for fid in filter_ids if fid in active_filter_ids]
+
+    # One version check for all the model's filters instead of a query per filter
+    function_modules = FUNCTION_MODULE_CACHE.get_modules(filter_ids)
 
     def get_active_status(filter_id):
-        function_module = get_function_module(request, filter_id)
+        function_module = function_modules[filter_id]
 
         if getattr(function_module, "toggle", None):
             return filter_id in (enabled_filter_ids or [])
 
         return True
 
-    active_filter_ids = [
-        filter_id for filter_id in active_filter_ids if get_active_status(filter_id)
-    ]
+    def get_priority(function_id):
+        valves = FUNCTION_MODULE_CACHE.get_valves(function_id)
+        return valves.get("priority", 0) if valves else 0
 
-    filter_ids = [fid for fid in filter_ids if fid in active_filter_ids]
+    filter_ids = [
+        fid for fid in filter_ids if fid in function_modules and get_active_status(fid)
+    ]
     filter_ids.sort(key=get_priority)
 
     return filter_ids
@@ -81,11 +81,7 @@ async def process_filter_functions(
             skip_files = function_module.file_handler
 
         # Apply valves to the function
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(filter_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
+        FUNCTION_MODULE_CACHE.apply_valves(filter_id, function_module)
 
         try:
             # Prepare parameters
@@ -10,13 +10,11 @@ from aiocache import cached
 from typing import Any, Optional
 import random
 import json
-import html
 import inspect
 import re
 import ast
 
 from uuid import uuid4
-from concurrent.futures import ThreadPoolExecutor
 
 
 from fastapi import Request, HTTPException
@@ -32,6 +30,8 @@ from backend.socket.main import (
     get_event_call,
     get_event_emitter,
     get_active_status_by_user_id,
+    flush_message_writes,
+    MESSAGE_WRITE_BUFFER,
 )
 from backend.routers.tasks import (
     generate_queries,
@@ -39,6 +39,7 @@ from backend.routers.tasks import (
     generate_follow_ups,
     generate_image_prompt,
     generate_chat_tags,
+    generate_combined_tasks,
 )
 from backend.routers.retrieval import (
     process_web_search,
@@ -69,11 +70,14 @@ from backend.models.functions import Functions
 from backend.models.models import Models
 
 from backend.retrieval.utils import get_sources_from_items
+from backend.retrieval.executor import RetrievalCancelledError, run_retrieval
 
 
 from backend.utils.chat import generate_chat_completion
 from backend.utils.task import (
+    TASK_RESULT_CACHE,
     get_task_model_id,
+    parse_combined_task_results,
     rag_template,
     tools_function_calling_generation_template,
 )
@@ -93,11 +97,18 @@ from backend.utils.misc import (
 )
 from backend.utils.tools import get_tools
 from backend.utils.plugin import load_function_module_by_id
+from backend.utils.stages import StageScheduler
 from backend.utils.filter import (
     get_sorted_filter_ids,
     process_filter_functions,
 )
 from backend.utils.code_interpreter import execute_code_jupyter
+from backend.utils.content_blocks import (
+    ContentBlocksSerializer,
+    convert_content_blocks_to_messages,
+    serialize_content_blocks,
+    tag_content_handler,
+)
 from backend.utils.payload import apply_system_prompt_to_body
 from backend.utils.mcp.client import MCPClient
 
@@ -282,9 +293,16 @@ def process_tool_result(
     return tool_result, tool_result_files, tool_result_embeds
 
 
-async def chat_completion_tools_handler(
+async def get_tool_call_results(
     request: Request, body: dict, extra_params: dict, user: UserModel, models, tools
-) -> tuple[dict, dict]:
+) -> dict:
+    """
+    Let the task model pick the tools to call for the last user message and
+    call them. Returns the tool outputs to add to the user message, their
+    `sources`, and whether the files should be skipped (`skip_files`) because
+    a called tool handles them; `body` is left untouched.
+    """
+
     async def get_content_from_response(response) -> Optional[str]:
         content = None
         if hasattr(response, "body_iterator"):
@@ -333,6 +351,7 @@ async def chat_completion_tools_handler(
 
     skip_files = False
     sources = []
+    outputs = []
 
     specs = [tool["spec"] for tool in tools.values()]
     tools_specs = json.dumps(specs)
@@ -356,7 +375,7 @@ async def chat_completion_tools_handler(
         log.debug(f"{content=}")
 
         if not content:
-            return body, {}
+            return {"outputs": outputs, "sources": sources, "skip_files": skip_files}
 
         try:
             content = content[content.find("{") : content.rfind("}") + 1]
@@ -482,10 +501,7 @@ async def chat_completion_tools_handler(
                     )
 
                     # Citation is not enabled for this tool
-                    body["messages"] = add_or_update_user_message(
-                        f"\nTool `{tool_name}` Output: {tool_result}",
-                        body["messages"],
-                    )
+                    outputs.append(f"\nTool `{tool_name}` Output: {tool_result}")
 
                     if (
                         tools[tool_function_name]
@@ -510,15 +526,29 @@ async def chat_completion_tools_handler(
 
     log.debug(f"tool_contexts: {sources}")
 
-    if skip_files and "files" in body.get("metadata", {}):
+    return {"outputs": outputs, "sources": sources, "skip_files": skip_files}
+
+
+def apply_tool_call_results(body: dict, results: dict) -> dict:
+    for output in results["outputs"]:
+        body["messages"] = add_or_update_user_message(output, body["messages"])
+
+    if results["skip_files"] and "files" in body.get("metadata", {}):
         del body["metadata"]["files"]
 
-    return body, {"sources": sources}
+    return body
 
 
-async def chat_memory_handler(
-    request: Request, form_data: dict, extra_params: dict, user
-):
+async def chat_completion_tools_handler(
+    request: Request, body: dict, extra_params: dict, user: UserModel, models, tools
+) -> tuple[dict, dict]:
+    results = await get_tool_call_results(
+        request, body, extra_params, user, models, tools
+    )
+    return apply_tool_call_results(body, results), {"sources": results["sources"]}
+
+
+async def get_memory_context(request: Request, form_data: dict, user) -> str:
     try:
         results = await query_memory(
             request,
@@ -548,6 +578,13 @@ async def chat_memory_handler(
 
                 user_context += f"{doc_idx + 1}. [{created_at_date}] {doc}\n"
 
+    return user_context
+
+
+async def chat_memory_handler(
+    request: Request, form_data: dict, extra_params: dict, user
+):
+    user_context = await get_memory_context(request, form_data, user)
     form_data["messages"] = add_or_update_system_message(
         f"User Context:\n{user_context}\n", form_data["messages"], append=True
     )
@@ -718,9 +755,13 @@ async def chat_web_search_handler(
     return form_data
 
 
-async def chat_image_generation_handler(
+async def get_image_generation_context(
     request: Request, form_data: dict, extra_params: dict, user
-):
+) -> str:
+    """
+    Generate the image asked for by the last user message and return the
+    system message content telling the model about the outcome.
+    """
     __event_emitter__ = extra_params["__event_emitter__"]
     await __event_emitter__(
         {
@@ -811,6 +852,15 @@ async def chat_image_generation_handler(
 
         system_message_content = "<context>Unable to generate an image, tell the user that an error occurred</context>"
 
+    return system_message_content
+
+
+async def chat_image_generation_handler(
+    request: Request, form_data: dict, extra_params: dict, user
+):
+    system_message_content = await get_image_generation_context(
+        request, form_data, extra_params, user
+    )
     if system_message_content:
         form_data["messages"] = add_or_update_system_message(
             system_message_content, form_data["messages"]
@@ -819,9 +869,49 @@ async def chat_image_generation_handler(
     return form_data
 
 
+async def generate_retrieval_queries(
+    request: Request, body: dict, user: UserModel
+) -> list[str]:
+    try:
+        queries_response = await generate_queries(
+            request,
+            {
+                "model": body["model"],
+                "messages": body["messages"],
+                "type": "retrieval",
+            },
+            user,
+        )
+        queries_response = queries_response["choices"][0]["message"]["content"]
+
+        try:
+            bracket_start = queries_response.find("{")
+            bracket_end = queries_response.rfind("}") + 1
+
+            if bracket_start == -1 or bracket_end == -1:
+                raise Exception("No JSON object found in the response")
+
+            queries_response = queries_response[bracket_start:bracket_end]
+            queries_response = json.loads(queries_response)
+        except Exception as e:
+            queries_response = {"queries": [queries_response]}
+
+        return queries_response.get("queries", [])
+    except:
+        return []
+
+
 async def chat_completion_files_handler(
-    request: Request, body: dict, extra_params: dict, user: UserModel
+    request: Request,
+    body: dict,
+    extra_params: dict,
+    user: UserModel,
+    queries: Optional[list[str]] = None,
 ) -> tuple[dict, dict[str, list]]:
+    """
+    Retrieve the sources of the files of the request. The retrieval
+    `queries` are generated from the messages unless given.
+    """
     __event_emitter__ = extra_params["__event_emitter__"]
     sources = []
 
@@ -829,35 +919,11 @@ async def chat_completion_files_handler(
         # Check if all files are in full context mode
         all_full_context = all(item.get("context") == "full" for item in files)
 
-        queries = []
-        if not all_full_context:
-            try:
-                queries_response = await generate_queries(
-                    request,
-                    {
-                        "model": body["model"],
-                        "messages": body["messages"],
-                        "type": "retrieval",
-                    },
-                    user,
-                )
-                queries_response = queries_response["choices"][0]["message"]["content"]
-
-                try:
-                    bracket_start = queries_response.find("{")
-                    bracket_end = queries_response.rfind("}") + 1
-
-                    if bracket_start == -1 or bracket_end == -1:
-                        raise Exception("No JSON object found in the response")
-
-                    queries_response = queries_response[bracket_start:bracket_end]
-                    queries_response = json.loads(queries_response)
-                except Exception as e:
-                    queries_response = {"queries": [queries_response]}
-
-                queries = queries_response.get("queries", [])
-            except:
-                pass
+        if all_full_context:
+            queries = []
+        else:
+            if queries is None:
+                queries = await generate_retrieval_queries(request, body, user)
 
             await __event_emitter__(
                 {
@@ -873,38 +939,48 @@ async def chat_completion_files_handler(
         if len(queries) == 0:
             queries = [get_last_user_message(body["messages"])]
 
+        metadata = body.get("metadata", {})
         try:
-            # Offload get_sources_from_items to a separate thread
-            loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor() as executor:
-                sources = await loop.run_in_executor(
-                    executor,
-                    lambda: get_sources_from_items(
-                        request=request,
-                        items=files,
-                        queries=queries,
-                        embedding_function=lambda query, prefix: request.app.state.EMBEDDING_FUNCTION(
-                            query, prefix=prefix, user=user
-                        ),
-                        k=request.app.state.config.TOP_K,
-                        reranking_function=(
-                            (
-                                lambda sentences: request.app.state.RERANKING_FUNCTION(
-                                    sentences, user=user
-                                )
+            # Offload get_sources_from_items to a thread, its per-collection
+            # fan-out runs on the shared retrieval executor
+            sources = await run_retrieval(
+                lambda: get_sources_from_items(
+                    request=request,
+                    items=files,
+                    queries=queries,
+                    embedding_function=lambda query, prefix: request.app.state.EMBEDDING_FUNCTION(
+                        query, prefix=prefix, user=user
+                    ),
+                    k=request.app.state.config.TOP_K,
+                    reranking_function=(
+                        (
+                            lambda sentences: request.app.state.RERANKING_FUNCTION(
+                                sentences, user=user
                             )
-                            if request.app.state.RERANKING_FUNCTION
-                            else None
-                        ),
-                        k_reranker=request.app.state.config.TOP_K_RERANKER,
-                        r=request.app.state.config.RELEVANCE_THRESHOLD,
-                        hybrid_bm25_weight=request.app.state.config.HYBRID_BM25_WEIGHT,
-                        hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
-                        full_context=all_full_context
-                        or request.app.state.config.RAG_FULL_CONTEXT,
-                        user=user,
+                        )
+                        if request.app.state.RERANKING_FUNCTION
+                        else None
                     ),
-                )
+                    k_reranker=request.app.state.config.TOP_K_RERANKER,
+                    r=request.app.state.config.RELEVANCE_THRESHOLD,
+                    hybrid_bm25_weight=request.app.state.config.HYBRID_BM25_WEIGHT,
+                    hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
+                    full_context=all_full_context
+                    or request.app.state.config.RAG_FULL_CONTEXT,
+                    user=user,
+                ),
+                # Chats processed as background tasks outlive the HTTP request,
+                # they are cancelled through the task instead
+                request=(
+                    None
+                    if metadata.get("session_id")
+                    and metadata.get("chat_id")
+                    and metadata.get("message_id")
+                    else request
+                ),
+            )
+        except RetrievalCancelledError:
+            log.info("Retrieval cancelled")
         except Exception as e:
             log.exception(e)
 
@@ -994,9 +1070,10 @@ def apply_params_to_form_data(form_data, model):
 
 
 async def process_chat_payload(request, form_data, user, metadata, model):
-    # Pipeline Inlet -> Filter Inlet -> Chat Memory -> Chat Web Search -> Chat Image Generation
-    # -> Chat Code Interpreter (Form Data Update) -> (Default) Chat Tools Function Calling
-    # -> Chat Files
+    # Pipeline Inlet -> Filter Inlet -> Concurrent stages: Chat Memory, Chat Web Search,
+    # Chat Image Generation, Tools (after Web Search), (Default) Chat Tools Function Calling,
+    # Retrieval Queries, Chat Files (after Web Search and Retrieval Queries)
+    # -> Chat Code Interpreter (Form Data Update) -> Stage results applied in this order
 
     form_data = apply_params_to_form_data(form_data, model)
     log.debug(f"form_data: {form_data}")
@@ -1124,12 +1201,9 @@ async def process_chat_payload(request, form_data, user, metadata, model):
         raise e
 
     try:
-        filter_functions = [
-            Functions.get_function_by_id(filter_id)
-            for filter_id in get_sorted_filter_ids(
-                request, model, metadata.get("filter_ids", [])
-            )
-        ]
+        filter_functions = Functions.get_functions_by_ids(
+            get_sorted_filter_ids(request, model, metadata.get("filter_ids", []))
+        )
 
         form_data, flags = await process_filter_functions(
             request=request,
@@ -1141,46 +1215,16 @@ async def process_chat_payload(request, form_data, user, metadata, model):
     except Exception as e:
         raise Exception(f"{e}")
 
-    features = form_data.pop("features", None)
-    if features:
-        if "memory" in features and features["memory"]:
-            form_data = await chat_memory_handler(
-                request, form_data, extra_params, user
-            )
-
-        if "web_search" in features and features["web_search"]:
-            form_data = await chat_web_search_handler(
-                request, form_data, extra_params, user
-            )
-
-        if "image_generation" in features and features["image_generation"]:
-            form_data = await chat_image_generation_handler(
-                request, form_data, extra_params, user
-            )
-
-        if "code_interpreter" in features and features["code_interpreter"]:
-            form_data["messages"] = add_or_update_user_message(
-                (
-                    request.app.state.config.CODE_INTERPRETER_PROMPT_TEMPLATE
-                    if request.app.state.config.CODE_INTERPRETER_PROMPT_TEMPLATE != ""
-                    else DEFAULT_CODE_INTERPRETER_PROMPT
-                ),
-                form_data["messages"],
-            )
-
+    features = form_data.pop("features", None) or {}
     tool_ids = form_data.pop("tool_ids", None)
     files = form_data.pop("files", None)
 
-    prompt = get_last_user_message(form_data["messages"])
     # TODO: re-enable URL extraction from prompt
     # urls = []
     # if prompt and len(prompt or "") < 500 and (not files or len(files) == 0):
     #     urls = extract_urls(prompt)
 
     if files:
-        if not files:
-            files = []
-
         for file_item in files:
             if file_item.get("type", "file") == "folder":
                 # Get folder files
@@ -1195,173 +1239,295 @@ async def process_chat_payload(request, form_data, user, metadata, model):
         # Remove duplicate files based on their content
         files = list({json.dumps(f, sort_keys=True): f for f in files}.values())
 
-    metadata = {
-        **metadata,
-        "tool_ids": tool_ids,
-        "files": files,
-    }
-    form_data["metadata"] = metadata
-
-    # Server side tools
-    tool_ids = metadata.get("tool_ids", None)
-    # Client side tools
+    # Client side tools, server side tools are in tool_ids
     direct_tool_servers = metadata.get("tool_servers", None)
 
     log.debug(f"{tool_ids=}")
     log.debug(f"{direct_tool_servers=}")
 
-    tools_dict = {}
+    # The stages below run concurrently, each one as soon as the stages it
+    # depends on are done. They all read the messages as they are now and
+    # return their changes, which are applied in order once they are all done.
+    stages = StageScheduler()
 
-    mcp_clients = {}
-    mcp_tools_dict = {}
+    async def get_files():
+        web_search_files = await stages.result("web_search")
+        if not web_search_files:
+            return files
 
-    if tool_ids:
-        for tool_id in tool_ids:
-            if tool_id.startswith("server:mcp:"):
-                try:
-                    server_id = tool_id[len("server:mcp:") :]
-
-                    mcp_server_connection = None
-                    for (
-                        server_connection
-                    ) in request.app.state.config.TOOL_SERVER_CONNECTIONS:
-                        if (
-                            server_connection.get("type", "") == "mcp"
-                            and server_connection.get("info", {}).get("id") == server_id
-                        ):
-                            mcp_server_connection = server_connection
-                            break
+        return list(
+            {
+                json.dumps(f, sort_keys=True): f
+                for f in [*(files or []), *web_search_files]
+            }.values()
+        )
 
-                    if not mcp_server_connection:
-                        log.error(f"MCP server with id {server_id} not found")
-                        continue
+    if features.get("memory"):
+        stages.add("memory", lambda: get_memory_context(request, form_data, user))
 
-                    auth_type = mcp_server_connection.get("auth_type", "")
+    if features.get("web_search"):
 
-                    headers = {}
-                    if auth_type == "bearer":
-                        headers["Authorization"] = (
-                            f"Bearer {mcp_server_connection.get('key', '')}"
-                        )
-                    elif auth_type == "none":
-                        # No authentication
-                        pass
-                    elif auth_type == "session":
-                        headers["Authorization"] = (
-                            f"Bearer {request.state.token.credentials}"
-                        )
-                    elif auth_type == "system_oauth":
-                        oauth_token = extra_params.get("__oauth_token__", None)
-                        if oauth_token:
+        async def web_search():
+            result = await chat_web_search_handler(
+                request, {**form_data, "files": []}, extra_params, user
+            )
+            return result.get("files", [])
+
+        stages.add("web_search", web_search)
+
+    if features.get("image_generation"):
+        stages.add(
+            "image_generation",
+            lambda: get_image_generation_context(
+                request, form_data, extra_params, user
+            ),
+        )
+
+    async def load_tools():
+        tools_dict = {}
+
+        mcp_clients = {}
+        mcp_tools_dict = {}
+
+        if tool_ids:
+            for tool_id in tool_ids:
+                if tool_id.startswith("server:mcp:"):
+                    try:
+                        server_id = tool_id[len("server:mcp:") :]
+
+                        mcp_server_connection = None
+                        for (
+                            server_connection
+                        ) in request.app.state.config.TOOL_SERVER_CONNECTIONS:
+                            if (
+                                server_connection.get("type", "") == "mcp"
+                                and server_connection.get("info", {}).get("id")
+                                == server_id
+                            ):
+                                mcp_server_connection = server_connection
+                                break
+
+                        if not mcp_server_connection:
+                            log.error(f"MCP server with id {server_id} not found")
+                            continue
+
+                        auth_type = mcp_server_connection.get("auth_type", "")
+
+                        headers = {}
+                        if auth_type == "bearer":
                             headers["Authorization"] = (
-                                f"Bearer {oauth_token.get('access_token', '')}"
+                                f"Bearer {mcp_server_connection.get('key', '')}"
                             )
-                    elif auth_type == "oauth_2.1":
-                        try:
-                            splits = server_id.split(":")
-                            server_id = splits[-1] if len(splits) > 1 else server_id
-
-                            oauth_token = await request.app.state.oauth_client_manager.get_oauth_token(
-                                user.id, f"mcp:{server_id}"
+                        elif auth_type == "none":
+                            # No authentication
+                            pass
+                        elif auth_type == "session":
+                            headers["Authorization"] = (
+                                f"Bearer {request.state.token.credentials}"
                             )
-
+                        elif auth_type == "system_oauth":
+                            oauth_token = extra_params.get("__oauth_token__", None)
                             if oauth_token:
                                 headers["Authorization"] = (
                                     f"Bearer {oauth_token.get('access_token', '')}"
                                 )
-                        except Exception as e:
-                            log.error(f"Error getting OAuth token: {e}")
-                            oauth_token = None
-
-                    mcp_clients[server_id] = MCPClient()
-                    await mcp_clients[server_id].connect(
-                        url=mcp_server_connection.get("url", ""),
-                        headers=headers if headers else None,
-                    )
-
-                    tool_specs = await mcp_clients[server_id].list_tool_specs()
-                    for tool_spec in tool_specs:
+                        elif auth_type == "oauth_2.1":
+                            try:
+                                splits = server_id.split(":")
+                                server_id = splits[-1] if len(splits) > 1 else server_id
 
-                        def make_tool_function(client, function_name):
-                            async def tool_function(**kwargs):
-                                return await client.call_tool(
-                                    function_name,
-                                    function_args=kwargs,
+                                oauth_token = await request.app.state.oauth_client_manager.get_oauth_token(
+                                    user.id, f"mcp:{server_id}"
                                 )
 
-                            return tool_function
+                                if oauth_token:
+                                    headers["Authorization"] = (
+                                        f"Bearer {oauth_token.get('access_token', '')}"
+                                    )
+                            except Exception as e:
+                                log.error(f"Error getting OAuth token: {e}")
+                                oauth_token = None
 
-                        tool_function = make_tool_function(
-                            mcp_clients[server_id], tool_spec["name"]
+                        mcp_clients[server_id] = MCPClient()
+                        await mcp_clients[server_id].connect(
+                            url=mcp_server_connection.get("url", ""),
+                            headers=headers if headers else None,
                         )
 
-                        mcp_tools_dict[f"{server_id}_{tool_spec['name']}"] = {
-                            "spec": {
-                                **tool_spec,
-                                "name": f"{server_id}_{tool_spec['name']}",
-                            },
-                            "callable": tool_function,
-                            "type": "mcp",
-                            "client": mcp_clients[server_id],
-                            "direct": False,
-                        }
+                        tool_specs = await mcp_clients[server_id].list_tool_specs()
+                        for tool_spec in tool_specs:
+
+                            def make_tool_function(client, function_name):
+                                async def tool_function(**kwargs):
+                                    return await client.call_tool(
+                                        function_name,
+                                        function_args=kwargs,
+                                    )
+
+                                return tool_function
+
+                            tool_function = make_tool_function(
+                                mcp_clients[server_id], tool_spec["name"]
+                            )
+
+                            mcp_tools_dict[f"{server_id}_{tool_spec['name']}"] = {
+                                "spec": {
+                                    **tool_spec,
+                                    "name": f"{server_id}_{tool_spec['name']}",
+                                },
+                                "callable": tool_function,
+                                "type": "mcp",
+                                "client": mcp_clients[server_id],
+                                "direct": False,
+                            }
+                    except Exception as e:
+                        log.debug(e)
+                        continue
+
+            tools_dict = await get_tools(
+                request,
+                tool_ids,
+                user,
+                {
+                    **extra_params,
+                    "__model__": models[task_model_id],
+                    "__messages__": form_data["messages"],
+                    "__files__": (await get_files()) or [],
+                },
+            )
+            if mcp_tools_dict:
+                tools_dict = {**tools_dict, **mcp_tools_dict}
+
+        if direct_tool_servers:
+            for tool_server in direct_tool_servers:
+                tool_specs = tool_server.pop("specs", [])
+
+                for tool in tool_specs:
+                    tools_dict[tool["name"]] = {
+                        "spec": tool,
+                        "direct": True,
+                        "server": tool_server,
+                    }
+
+        return tools_dict, mcp_clients
+
+    native_function_calling = (
+        metadata.get("params", {}).get("function_calling") == "native"
+    )
+
+    if tool_ids or direct_tool_servers:
+        # The tools get the files of the request, web search results included
+        stages.add("tools", load_tools, depends_on=["web_search"])
+
+        if not native_function_calling:
+
+            async def tool_calls():
+                tools_dict, _ = await stages.result("tools")
+                if not tools_dict:
+                    return None
+
+                # If the function calling is not native, then call the tools function calling handler
+                try:
+                    return await get_tool_call_results(
+                        request, form_data, extra_params, user, models, tools_dict
+                    )
                 except Exception as e:
-                    log.debug(e)
-                    continue
+                    log.exception(e)
+                    return None
 
-        tools_dict = await get_tools(
-            request,
-            tool_ids,
-            user,
-            {
-                **extra_params,
-                "__model__": models[task_model_id],
-                "__messages__": form_data["messages"],
-                "__files__": metadata.get("files", []),
-            },
+            stages.add("tool_calls", tool_calls, depends_on=["tools"])
+
+    if files and not all(item.get("context") == "full" for item in files):
+        stages.add(
+            "retrieval_queries",
+            lambda: generate_retrieval_queries(request, form_data, user),
         )
-        if mcp_tools_dict:
-            tools_dict = {**tools_dict, **mcp_tools_dict}
-
-    if direct_tool_servers:
-        for tool_server in direct_tool_servers:
-            tool_specs = tool_server.pop("specs", [])
-
-            for tool in tool_specs:
-                tools_dict[tool["name"]] = {
-                    "spec": tool,
-                    "direct": True,
-                    "server": tool_server,
-                }
+
+    async def retrieve_files():
+        if "tool_calls" in stages:
+            # Tools handling files themselves replace the retrieval when called
+            tools_dict, _ = await stages.result("tools")
+            if any(
+                tool.get("metadata", {}).get("file_handler", False)
+                for tool in tools_dict.values()
+            ):
+                results = await stages.result("tool_calls")
+                if results and results["skip_files"]:
+                    return []
+
+        try:
+            _, flags = await chat_completion_files_handler(
+                request,
+                {
+                    **form_data,
+                    "metadata": {
+                        **metadata,
+                        "tool_ids": tool_ids,
+                        "files": await get_files(),
+                    },
+                },
+                extra_params,
+                user,
+                queries=await stages.result("retrieval_queries"),
+            )
+            return flags.get("sources", [])
+        except Exception as e:
+            log.exception(e)
+            return []
+
+    stages.add("files", retrieve_files, depends_on=["web_search", "retrieval_queries"])
+
+    results = await stages.run()
+
+    if "memory" in results:
+        form_data["messages"] = add_or_update_system_message(
+            f"User Context:\n{results['memory']}\n",
+            form_data["messages"],
+            append=True,
+        )
+
+    if results.get("image_generation"):
+        form_data["messages"] = add_or_update_system_message(
+            results["image_generation"], form_data["messages"]
+        )
+
+    if features.get("code_interpreter"):
+        form_data["messages"] = add_or_update_user_message(
+            (
+                request.app.state.config.CODE_INTERPRETER_PROMPT_TEMPLATE
+                if request.app.state.config.CODE_INTERPRETER_PROMPT_TEMPLATE != ""
+                else DEFAULT_CODE_INTERPRETER_PROMPT
+            ),
+            form_data["messages"],
+        )
+
+    prompt = get_last_user_message(form_data["messages"])
+
+    metadata = {
+        **metadata,
+        "tool_ids": tool_ids,
+        "files": await get_files(),
+    }
+    form_data["metadata"] = metadata
+
+    tools_dict, mcp_clients = results.get("tools") or ({}, {})
 
     if mcp_clients:
         metadata["mcp_clients"] = mcp_clients
 
-    if tools_dict:
-        if metadata.get("params", {}).get("function_calling") == "native":
-            # If the function calling is native, then call the tools function calling handler
-            metadata["tools"] = tools_dict
-            form_data["tools"] = [
-                {"type": "function", "function": tool.get("spec", {})}
-                for tool in tools_dict.values()
-            ]
-        else:
-            # If the function calling is not native, then call the tools function calling handler
-            try:
-                form_data, flags = await chat_completion_tools_handler(
-                    request, form_data, extra_params, user, models, tools_dict
-                )
-                sources.extend(flags.get("sources", []))
-            except Exception as e:
-                log.exception(e)
+    if tools_dict and native_function_calling:
+        # If the function calling is native, then call the tools function calling handler
+        metadata["tools"] = tools_dict
+        form_data["tools"] = [
+            {"type": "function", "function": tool.get("spec", {})}
+            for tool in tools_dict.values()
+        ]
 
-    try:
-        form_data, flags = await chat_completion_files_handler(
-            request, form_data, extra_params, user
-        )
-        sources.extend(flags.get("sources", []))
-    except Exception as e:
-        log.exception(e)
+    if results.get("tool_calls"):
+        form_data = apply_tool_call_results(form_data, results["tool_calls"])
+        sources.extend(results["tool_calls"]["sources"])
+
+    sources.extend(results["files"])
 
     # If context is not empty, insert it into the messages
     if len(sources) > 0:
@@ -1415,6 +1581,9 @@ async def process_chat_payload(request, form_data, user, metadata, model):
     if len(sources) > 0:
         events.append({"sources": sources})
 
+    if stages.timings:
+        events.append({"stage_timings": stages.timings})
+
     if model_knowledge:
         await event_emitter(
             {
@@ -1431,6 +1600,64 @@ async def process_chat_payload(request, form_data, user, metadata, model):
     return form_data, metadata, events
 
 
+async def generate_combined_task_results(
+    request: Request, form_data: dict, outputs: list[str], user
+) -> dict:
+    """
+    Generate the given outputs (title, tags, follow-ups) with one task model
+    completion; the outputs that could not be parsed are left out.
+    """
+    try:
+        res = await generate_combined_tasks(
+            request, {**form_data, "outputs": outputs}, user
+        )
+    except Exception as e:
+        log.debug(f"Error generating {outputs}: {e}")
+        return {}
+
+    if not (res and isinstance(res, dict) and len(res.get("choices", [])) == 1):
+        return {}
+
+    response_message = res["choices"][0].get("message", {})
+    results = parse_combined_task_results(
+        response_message.get("content")
+        or response_message.get("reasoning_content", "")
+        or "",
+        outputs,
+    )
+
+    if len(results) < len(outputs):
+        log.debug(
+            f"Combined task response is missing {set(outputs) - set(results)}, "
+            "generating them separately"
+        )
+    return results
+
+
+async def get_task_results(
+    request: Request, form_data: dict, outputs: list[str], user, redis=None
+) -> dict:
+    """
+    Results of the given outputs: the ones cached for the chat's history,
+    then all the others at once with a combined completion when enabled.
+    """
+    cached_results = await TASK_RESULT_CACHE.get(
+        redis, form_data.get("chat_id"), form_data["messages"]
+    )
+    results = {
+        output: cached_results[output] for output in outputs if output in cached_results
+    }
+
+    missing_outputs = [output for output in outputs if output not in results]
+    if request.app.state.config.ENABLE_COMBINED_TASK_GENERATION and missing_outputs:
+        results.update(
+            await generate_combined_task_results(
+                request, form_data, missing_outputs, user
+            )
+        )
+    return results
+
+
 async def process_chat_response(
     request, response, form_data, user, metadata, model, events, tasks
 ):
@@ -1483,145 +1710,163 @@ async def process_chat_response(
 
         if message and "model" in message:
             if tasks and messages:
-                if (
-                    TASKS.FOLLOW_UP_GENERATION in tasks
-                    and tasks[TASKS.FOLLOW_UP_GENERATION]
-                ):
-                    res = await generate_follow_ups(
-                        request,
-                        {
-                            "model": message["model"],
-                            "messages": messages,
-                            "message_id": metadata["message_id"],
-                            "chat_id": metadata["chat_id"],
-                        },
-                        user,
-                    )
+                chat_id = metadata.get("chat_id", "")
+                message_id = metadata.get("message_id")
+                config = request.app.state.config
+                redis = getattr(request.app.state, "redis", None)
+
+                outputs = []
+                if tasks.get(TASKS.FOLLOW_UP_GENERATION):
+                    outputs.append("follow_ups")
+                if not chat_id.startswith(
+                    "local:"
+                ):  # Only update titles and tags for non-temp chats
+                    if tasks.get(TASKS.TITLE_GENERATION):
+                        outputs.append("title")
+                    if tasks.get(TASKS.TAGS_GENERATION):
+                        outputs.append("tags")
+
+                # Disabled outputs are not generated
+                outputs = [
+                    output
+                    for output in outputs
+                    if {
+                        "follow_ups": config.ENABLE_FOLLOW_UP_GENERATION,
+                        "title": config.ENABLE_TITLE_GENERATION,
+                        "tags": config.ENABLE_TAGS_GENERATION,
+                    }[output]
+                ]
+
+                task_form_data = {
+                    "model": message["model"],
+                    "messages": messages,
+                    "message_id": message_id,
+                    "chat_id": chat_id,
+                }
 
-                    if res and isinstance(res, dict):
-                        if len(res.get("choices", [])) == 1:
-                            response_message = res.get("choices", [])[0].get(
-                                "message", {}
-                            )
+                # The outputs missing from these are generated one by one below
+                results = await get_task_results(
+                    request, task_form_data, outputs, user, redis
+                )
 
-                            follow_ups_string = response_message.get(
-                                "content"
-                            ) or response_message.get("reasoning_content", "")
-                        else:
-                            follow_ups_string = ""
+                if "follow_ups" in outputs:
+                    follow_ups = results.get("follow_ups")
+                    if follow_ups is None:
+                        res = await generate_follow_ups(request, task_form_data, user)
 
-                        follow_ups_string = follow_ups_string[
-                            follow_ups_string.find("{") : follow_ups_string.rfind("}")
-                            + 1
-                        ]
+                        if res and isinstance(res, dict):
+                            if len(res.get("choices", [])) == 1:
+                                response_message = res.get("choices", [])[0].get(
+                                    "message", {}
+                                )
 
-                        try:
-                            follow_ups = json.loads(follow_ups_string).get(
-                                "follow_ups", []
-                            )
-                            await event_emitter(
-                                {
-                                    "type": "chat:message:follow_ups",
-                                    "data": {
-                                        "follow_ups": follow_ups,
-                                    },
-                                }
-                            )
+                                follow_ups_string = response_message.get(
+                                    "content"
+                                ) or response_message.get("reasoning_content", "")
+                            else:
+                                follow_ups_string = ""
 
-                            if not metadata.get("chat_id", "").startswith("local:"):
-                                Chats.upsert_message_to_chat_by_id_and_message_id(
-                                    metadata["chat_id"],
-                                    metadata["message_id"],
-                                    {
-                                        "followUps": follow_ups,
-                                    },
+                            follow_ups_string = follow_ups_string[
+                                follow_ups_string.find("{") : follow_ups_string.rfind(
+                                    "}"
                                 )
+                                + 1
+                            ]
 
-                        except Exception as e:
-                            pass
-
-                if not metadata.get("chat_id", "").startswith(
-                    "local:"
-                ):  # Only update titles and tags for non-temp chats
-                    if (
-                        TASKS.TITLE_GENERATION in tasks
-                        and tasks[TASKS.TITLE_GENERATION]
-                    ):
-                        user_message = get_last_user_message(messages)
-                        if user_message and len(user_message) > 100:
-                            user_message = user_message[:100] + "..."
+                            try:
+                                follow_ups = json.loads(follow_ups_string).get(
+                                    "follow_ups", []
+                                )
+                            except Exception as e:
+                                pass
 
-                        if tasks[TASKS.TITLE_GENERATION]:
+                    if follow_ups is not None:
+                        results["follow_ups"] = follow_ups
+                        await event_emitter(
+                            {
+                                "type": "chat:message:follow_ups",
+                                "data": {
+                                    "follow_ups": follow_ups,
+                                },
+                            }
+                        )
 
-                            res = await generate_title(
-                                request,
+                        if not chat_id.startswith("local:"):
+                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                                chat_id,
+                                message_id,
                                 {
-                                    "model": message["model"],
-                                    "messages": messages,
-                                    "chat_id": metadata["chat_id"],
+                                    "followUps": follow_ups,
                                 },
-                                user,
                             )
 
-                            if res and isinstance(res, dict):
-                                if len(res.get("choices", [])) == 1:
-                                    response_message = res.get("choices", [])[0].get(
-                                        "message", {}
-                                    )
+                if "title" in outputs:
+                    title = results.get("title")
+                    if title is None:
+                        user_message = get_last_user_message(messages)
+                        if user_message and len(user_message) > 100:
+                            user_message = user_message[:100] + "..."
 
-                                    title_string = (
-                                        response_message.get("content")
-                                        or response_message.get(
-                                            "reasoning_content",
-                                        )
-                                        or message.get("content", user_message)
-                                    )
-                                else:
-                                    title_string = ""
+                        res = await generate_title(
+                            request,
+                            {
+                                "model": message["model"],
+                                "messages": messages,
+                                "chat_id": chat_id,
+                            },
+                            user,
+                        )
 
-                                title_string = title_string[
-                                    title_string.find("{") : title_string.rfind("}") + 1
-                                ]
+                        if res and isinstance(res, dict):
+                            if len(res.get("choices", [])) == 1:
+                                response_message = res.get("choices", [])[0].get(
+                                    "message", {}
+                                )
 
-                                try:
-                                    title = json.loads(title_string).get(
-                                        "title", user_message
+                                title_string = (
+                                    response_message.get("content")
+                                    or response_message.get(
+                                        "reasoning_content",
                                     )
-                                except Exception as e:
-                                    title = ""
+                                    or message.get("content", user_message)
+                                )
+                            else:
+                                title_string = ""
 
-                                if not title:
-                                    title = messages[0].get("content", user_message)
+                            title_string = title_string[
+                                title_string.find("{") : title_string.rfind("}") + 1
+                            ]
 
-                                Chats.update_chat_title_by_id(
-                                    metadata["chat_id"], title
+                            try:
+                                title = json.loads(title_string).get(
+                                    "title", user_message
                                 )
+                            except Exception as e:
+                                title = ""
 
-                                await event_emitter(
-                                    {
-                                        "type": "chat:title",
-                                        "data": title,
-                                    }
-                                )
-                        elif len(messages) == 2:
-                            title = messages[0].get("content", user_message)
+                            if not title:
+                                title = messages[0].get("content", user_message)
 
-                            Chats.update_chat_title_by_id(metadata["chat_id"], title)
+                    if title is not None:
+                        results["title"] = title
+                        Chats.update_chat_title_by_id(chat_id, title)
 
-                            await event_emitter(
-                                {
-                                    "type": "chat:title",
-                                    "data": message.get("content", user_message),
-                                }
-                            )
+                        await event_emitter(
+                            {
+                                "type": "chat:title",
+                                "data": title,
+                            }
+                        )
 
-                    if TASKS.TAGS_GENERATION in tasks and tasks[TASKS.TAGS_GENERATION]:
+                if "tags" in outputs:
+                    tags = results.get("tags")
+                    if tags is None:
                         res = await generate_chat_tags(
                             request,
                             {
                                 "model": message["model"],
                                 "messages": messages,
-                                "chat_id": metadata["chat_id"],
+                                "chat_id": chat_id,
                             },
                             user,
                         )
@@ -1644,19 +1889,22 @@ async def process_chat_response(
 
                             try:
                                 tags = json.loads(tags_string).get("tags", [])
-                                Chats.update_chat_tags_by_id(
-                                    metadata["chat_id"], tags, user
-                                )
-
-                                await event_emitter(
-                                    {
-                                        "type": "chat:tags",
-                                        "data": tags,
-                                    }
-                                )
                             except Exception as e:
                                 pass
 
+                    if tags is not None:
+                        results["tags"] = tags
+                        Chats.update_chat_tags_by_id(chat_id, tags, user)
+
+                        await event_emitter(
+                            {
+                                "type": "chat:tags",
+                                "data": tags,
+                            }
+                        )
+
+                await TASK_RESULT_CACHE.set(redis, chat_id, messages, results)
+
     event_emitter = None
     event_caller = None
     if (
@@ -1751,6 +1999,9 @@ async def process_chat_response(
                             )
 
                             # Save message in the database
+                            await flush_message_writes(
+                                metadata["chat_id"], metadata["message_id"]
+                            )
                             Chats.upsert_message_to_chat_by_id_and_message_id(
                                 metadata["chat_id"],
                                 metadata["message_id"],
@@ -1761,7 +2012,7 @@ async def process_chat_response(
                             )
 
                             # Send a webhook notification if the user is not active
-                            if not get_active_status_by_user_id(user.id):
+                            if not await get_active_status_by_user_id(user.id):
                                 webhook_url = Users.get_user_webhook_url_by_id(user.id)
                                 if webhook_url:
                                     await post_webhook(
@@ -1847,383 +2098,18 @@ async def process_chat_response(
         "__request__": request,
         "__model__": model,
     }
-    filter_functions = [
-        Functions.get_function_by_id(filter_id)
-        for filter_id in get_sorted_filter_ids(
-            request, model, metadata.get("filter_ids", [])
-        )
-    ]
+    filter_functions = Functions.get_functions_by_ids(
+        get_sorted_filter_ids(request, model, metadata.get("filter_ids", []))
+    )
 
     # Streaming response
     if event_emitter and event_caller:
         task_id = str(uuid4())  # Create a unique task ID.
         model_id = form_data.get("model", "")
 
-        def split_content_and_whitespace(content):
-            content_stripped = content.rstrip()
-            original_whitespace = (
-                content[len(content_stripped) :]
-                if len(content) > len(content_stripped)
-                else ""
-            )
-            return content_stripped, original_whitespace
-
-        def is_opening_code_block(content):
-            backtick_segments = content.split("```")
-            # Even number of segments means the last backticks are opening a new block
-            return len(backtick_segments) > 1 and len(backtick_segments) % 2 == 0
-
         # Handle as a background task
         async def response_handler(response, events):
-            def serialize_content_blocks(content_blocks, raw=False):
-                content = ""
-
-                for block in content_blocks:
-                    if block["type"] == "text":
-                        block_content = block["content"].strip()
-                        if block_content:
-                            content = f"{content}{block_content}\n"
-                    elif block["type"] == "tool_calls":
-                        attributes = block.get("attributes", {})
-
-                        tool_calls = block.get("content", [])
-                        results = block.get("results", [])
-
-                        if content and not content.endswith("\n"):
-                            content += "\n"
-
-                        if results:
-
-                            tool_calls_display_content = ""
-                            for tool_call in tool_calls:
-
-                                tool_call_id = tool_call.get("id", "")
-                                tool_name = tool_call.get("function", {}).get(
-                                    "name", ""
-                                )
-                                tool_arguments = tool_call.get("function", {}).get(
-                                    "arguments", ""
-                                )
-
-                                tool_result = None
-                                tool_result_files = None
-                                for result in results:
-                                    if tool_call_id == result.get("tool_call_id", ""):
-                                        tool_result = result.get("content", None)
-                                        tool_result_files = result.get("files", None)
-                                        break
-
-                                if tool_result is not None:
-                                    tool_result_embeds = result.get("embeds", "")
-                                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="true" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}" result="{html.escape(json.dumps(tool_result, ensure_ascii=False))}" files="{html.escape(json.dumps(tool_result_files)) if tool_result_files else ""}" embeds="{html.escape(json.dumps(tool_result_embeds))}">\n<summary>Tool Executed</summary>\n</details>\n'
-                                else:
-                                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
-
-                            if not raw:
-                                content = f"{content}{tool_calls_display_content}"
-                        else:
-                            tool_calls_display_content = ""
-
-                            for tool_call in tool_calls:
-                                tool_call_id = tool_call.get("id", "")
-                                tool_name = tool_call.get("function", {}).get(
-                                    "name", ""
-                                )
-                                tool_arguments = tool_call.get("function", {}).get(
-                                    "arguments", ""
-                                )
-
-                                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
-
-                            if not raw:
-                                content = f"{content}{tool_calls_display_content}"
-
-                    elif block["type"] == "reasoning":
-                        reasoning_display_content = "\n".join(
-                            (f"> {line}" if not line.startswith(">") else line)
-                            for line in block["content"].splitlines()
-                        )
-
-                        reasoning_duration = block.get("duration", None)
-
-                        start_tag = block.get("start_tag", "")
-                        end_tag = block.get("end_tag", "")
-
-                        if content and not content.endswith("\n"):
-                            content += "\n"
-
-                        if reasoning_duration is not None:
-                            if raw:
-                                content = (
-                                    f'{content}{start_tag}{block["content"]}{end_tag}\n'
-                                )
-                            else:
-                                content = f'{content}<details type="reasoning" done="true" duration="{reasoning_duration}">\n<summary>Thought for {reasoning_duration} seconds</summary>\n{reasoning_display_content}\n</details>\n'
-                        else:
-                            if raw:
-                                content = (
-                                    f'{content}{start_tag}{block["content"]}{end_tag}\n'
-                                )
-                            else:
-                                content = f'{content}<details type="reasoning" done="false">\n<summary>Thinking…</summary>\n{reasoning_display_content}\n</details>\n'
-
-                    elif block["type"] == "code_interpreter":
-                        attributes = block.get("attributes", {})
-                        output = block.get("output", None)
-                        lang = attributes.get("lang", "")
-
-                        content_stripped, original_whitespace = (
-                            split_content_and_whitespace(content)
-                        )
-                        if is_opening_code_block(content_stripped):
-                            # Remove trailing backticks that would open a new block
-                            content = (
-                                content_stripped.rstrip("`").rstrip()
-                                + original_whitespace
-                            )
-                        else:
-                            # Keep content as is - either closing backticks or no backticks
-                            content = content_stripped + original_whitespace
-
-                        if content and not content.endswith("\n"):
-                            content += "\n"
-
-                        if output:
-                            output = html.escape(json.dumps(output))
-
-                            if raw:
-                                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n```output\n{output}\n```\n'
-                            else:
-                                content = f'{content}<details type="code_interpreter" done="true" output="{output}">\n<summary>Analyzed</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
-                        else:
-                            if raw:
-                                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n'
-                            else:
-                                content = f'{content}<details type="code_interpreter" done="false">\n<summary>Analyzing...</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
-
-                    else:
-                        block_content = str(block["content"]).strip()
-                        if block_content:
-                            content = f"{content}{block['type']}: {block_content}\n"
-
-                return content.strip()
-
-            def convert_content_blocks_to_messages(content_blocks, raw=False):
-                messages = []
-
-                temp_blocks = []
-                for idx, block in enumerate(content_blocks):
-                    if block["type"] == "tool_calls":
-                        messages.append(
-                            {
-                                "role": "assistant",
-                                "content": serialize_content_blocks(temp_blocks, raw),
-                                "tool_calls": block.get("content"),
-                            }
-                        )
-
-                        results = block.get("results", [])
-
-                        for result in results:
-                            messages.append(
-                                {
-                                    "role": "tool",
-                                    "tool_call_id": result["tool_call_id"],
-                                    "content": result.get("content", "") or "",
-                                }
-                            )
-                        temp_blocks = []
-                    else:
-                        temp_blocks.append(block)
-
-                if temp_blocks:
-                    content = serialize_content_blocks(temp_blocks, raw)
-                    if content:
-                        messages.append(
-                            {
-                                "role": "assistant",
-                                "content": content,
-                            }
-                        )
-
-                return messages
-
-            def tag_content_handler(content_type, tags, content, content_blocks):
-                end_flag = False
-
-                def extract_attributes(tag_content):
-                    """Extract attributes from a tag if they exist."""
-                    attributes = {}
-                    if not tag_content:  # Ensure tag_content is not None
-                        return attributes
-                    # Match attributes in the format: key="value" (ignores single quotes for simplicity)
-                    matches = re.findall(r'(\w+)\s*=\s*"([^"]+)"', tag_content)
-                    for key, value in matches:
-                        attributes[key] = value
-                    return attributes
-
-                if content_blocks[-1]["type"] == "text":
-                    for start_tag, end_tag in tags:
-
-                        start_tag_pattern = rf"{re.escape(start_tag)}"
-                        if start_tag.startswith("<") and start_tag.endswith(">"):
-                            # Match start tag e.g., <tag> or <tag attr="value">
-                            # remove both '<' and '>' from start_tag
-                            # Match start tag with attributes
-                            start_tag_pattern = (
-                                rf"<{re.escape(start_tag[1:-1])}(\s.*?)?>"
-                            )
-
-                        match = re.search(start_tag_pattern, content)
-                        if match:
-                            try:
-                                attr_content = (
-                                    match.group(1) if match.group(1) else ""
-                                )  # Ensure it's not None
-                            except:
-                                attr_content = ""
-
-                            attributes = extract_attributes(
-                                attr_content
-                            )  # Extract attributes safely
-
-                            # Capture everything before and after the matched tag
-                            before_tag = content[
-                                : match.start()
-                            ]  # Content before opening tag
-                            after_tag = content[
-                                match.end() :
-                            ]  # Content after opening tag
-
-                            # Remove the start tag and after from the currently handling text block
-                            content_blocks[-1]["content"] = content_blocks[-1][
-                                "content"
-                            ].replace(match.group(0) + after_tag, "")
-
-                            if before_tag:
-                                content_blocks[-1]["content"] = before_tag
-
-                            if not content_blocks[-1]["content"]:
-                                content_blocks.pop()
-
-                            # Append the new block
-                            content_blocks.append(
-                                {
-                                    "type": content_type,
-                                    "start_tag": start_tag,
-                                    "end_tag": end_tag,
-                                    "attributes": attributes,
-                                    "content": "",
-                                    "started_at": time.time(),
-                                }
-                            )
-
-                            if after_tag:
-                                content_blocks[-1]["content"] = after_tag
-                                tag_content_handler(
-                                    content_type, tags, after_tag, content_blocks
-                                )
-
-                            break
-                elif content_blocks[-1]["type"] == content_type:
-                    start_tag = content_blocks[-1]["start_tag"]
-                    end_tag = content_blocks[-1]["end_tag"]
-
-                    if end_tag.startswith("<") and end_tag.endswith(">"):
-                        # Match end tag e.g., </tag>
-                        end_tag_pattern = rf"{re.escape(end_tag)}"
-                    else:
-                        # Handle cases where end_tag is just a tag name
-                        end_tag_pattern = rf"{re.escape(end_tag)}"
-
-                    # Check if the content has the end tag
-                    if re.search(end_tag_pattern, content):
-                        end_flag = True
-
-                        block_content = content_blocks[-1]["content"]
-                        # Strip start and end tags from the content
-                        start_tag_pattern = rf"<{re.escape(start_tag)}(.*?)>"
-                        block_content = re.sub(
-                            start_tag_pattern, "", block_content
-                        ).strip()
-
-                        end_tag_regex = re.compile(end_tag_pattern, re.DOTALL)
-                        split_content = end_tag_regex.split(block_content, maxsplit=1)
-
-                        # Content inside the tag
-                        block_content = (
-                            split_content[0].strip() if split_content else ""
-                        )
-
-                        # Leftover content (everything after `</tag>`)
-                        leftover_content = (
-                            split_content[1].strip() if len(split_content) > 1 else ""
-                        )
-
-                        if block_content:
-                            content_blocks[-1]["content"] = block_content
-                            content_blocks[-1]["ended_at"] = time.time()
-                            content_blocks[-1]["duration"] = int(
-                                content_blocks[-1]["ended_at"]
-                                - content_blocks[-1]["started_at"]
-                            )
-
-                            # Reset the content_blocks by appending a new text block
-                            if content_type != "code_interpreter":
-                                if leftover_content:
-
-                                    content_blocks.append(
-                                        {
-                                            "type": "text",
-                                            "content": leftover_content,
-                                        }
-                                    )
-                                else:
-                                    content_blocks.append(
-                                        {
-                                            "type": "text",
-                                            "content": "",
-                                        }
-                                    )
-
-                        else:
-                            # Remove the block if content is empty
-                            content_blocks.pop()
-
-                            if leftover_content:
-                                content_blocks.append(
-                                    {
-                                        "type": "text",
-                                        "content": leftover_content,
-                                    }
-                                )
-                            else:
-                                content_blocks.append(
-                                    {
-                                        "type": "text",
-                                        "content": "",
-                                    }
-                                )
-
-                        # Clean processed content
-                        start_tag_pattern = rf"{re.escape(start_tag)}"
-                        if start_tag.startswith("<") and start_tag.endswith(">"):
-                            # Match start tag e.g., <tag> or <tag attr="value">
-                            # remove both '<' and '>' from start_tag
-                            # Match start tag with attributes
-                            start_tag_pattern = (
-                                rf"<{re.escape(start_tag[1:-1])}(\s.*?)?>"
-                            )
-
-                        content = re.sub(
-                            rf"{start_tag_pattern}(.|\n)*?{re.escape(end_tag)}",
-                            "",
-                            content,
-                            flags=re.DOTALL,
-                        )
-
-                return content, content_blocks, end_flag
-
+            await flush_message_writes(metadata["chat_id"], metadata["message_id"])
             message = Chats.get_message_by_id_and_message_id(
                 metadata["chat_id"], metadata["message_id"]
             )
@@ -2294,6 +2180,11 @@ async def process_chat_response(
 
                     response_tool_calls = []
 
+                    # Only re-serializes the block the deltas are appended to
+                    content_serializer = ContentBlocksSerializer()
+                    # Stands in for the serialized content until it is emitted
+                    serialized_content = object()
+
                     delta_count = 0
                     delta_chunk_size = max(
                         CHAT_RESPONSE_STREAM_DELTA_CHUNK_SIZE,
@@ -2304,17 +2195,25 @@ async def process_chat_response(
                     )
                     last_delta_data = None
 
+                    async def emit_delta_data(data):
+                        if data is serialized_content:
+                            data = {
+                                "content": content_serializer.serialize(content_blocks)
+                            }
+
+                        await event_emitter(
+                            {
+                                "type": "chat:completion",
+                                "data": data,
+                            }
+                        )
+
                     async def flush_pending_delta_data(threshold: int = 0):
                         nonlocal delta_count
                         nonlocal last_delta_data
 
                         if delta_count >= threshold and last_delta_data:
-                            await event_emitter(
-                                {
-                                    "type": "chat:completion",
-                                    "data": last_delta_data,
-                                }
-                            )
+                            await emit_delta_data(last_delta_data)
                             delta_count = 0
                             last_delta_data = None
 
@@ -2485,11 +2384,7 @@ async def process_chat_response(
 
                                         reasoning_block["content"] += reasoning_content
 
-                                        data = {
-                                            "content": serialize_content_blocks(
-                                                content_blocks
-                                            )
-                                        }
+                                        data = serialized_content
 
                                     if value:
                                         if (
@@ -2515,7 +2410,7 @@ async def process_chat_response(
                                                 }
                                             )
 
-                                        content = f"{content}{value}"
+                                        content += value
                                         if not content_blocks:
                                             content_blocks.append(
                                                 {
@@ -2524,9 +2419,16 @@ async def process_chat_response(
                                                 }
                                             )
 
-                                        content_blocks[-1]["content"] = (
-                                            content_blocks[-1]["content"] + value
-                                        )
+                                        delta_block = content_blocks[-1]
+                                        delta_block["content"] += value
+
+                                        def get_delta_length():
+                                            # Blocks split off by a tag are searched whole
+                                            return (
+                                                len(value)
+                                                if content_blocks[-1] is delta_block
+                                                else None
+                                            )
 
                                         if DETECT_REASONING_TAGS:
                                             content, content_blocks, _ = (
@@ -2535,6 +2437,7 @@ async def process_chat_response(
                                                     reasoning_tags,
                                                     content,
                                                     content_blocks,
+                                                    get_delta_length(),
                                                 )
                                             )
 
@@ -2544,6 +2447,7 @@ async def process_chat_response(
                                                     DEFAULT_SOLUTION_TAGS,
                                                     content,
                                                     content_blocks,
+                                                    get_delta_length(),
                                                 )
                                             )
 
@@ -2554,6 +2458,7 @@ async def process_chat_response(
                                                     DEFAULT_CODE_INTERPRETER_TAGS,
                                                     content,
                                                     content_blocks,
+                                                    get_delta_length(),
                                                 )
                                             )
 
@@ -2561,22 +2466,21 @@ async def process_chat_response(
                                                 break
 
                                         if ENABLE_REALTIME_CHAT_SAVE:
-                                            # Save message in the database
-                                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                                            # Save message in the database, coalesced by the write buffer
+                                            await MESSAGE_WRITE_BUFFER.push(
                                                 metadata["chat_id"],
                                                 metadata["message_id"],
                                                 {
-                                                    "content": serialize_content_blocks(
-                                                        content_blocks
-                                                    ),
+                                                    "type": "set",
+                                                    "data": {
+                                                        "content": content_serializer.serialize(
+                                                            content_blocks
+                                                        ),
+                                                    },
                                                 },
                                             )
                                         else:
-                                            data = {
-                                                "content": serialize_content_blocks(
-                                                    content_blocks
-                                                ),
-                                            }
+                                            data = serialized_content
 
                                 if delta:
                                     delta_count += 1
@@ -2584,12 +2488,7 @@ async def process_chat_response(
                                     if delta_count >= delta_chunk_size:
                                         await flush_pending_delta_data(delta_chunk_size)
                                 else:
-                                    await event_emitter(
-                                        {
-                                            "type": "chat:completion",
-                                            "data": data,
-                                        }
-                                    )
+                                    await emit_delta_data(data)
                         except Exception as e:
                             done = "data: [DONE]" in line
                             if done:
@@ -3007,6 +2906,7 @@ async def process_chat_response(
                     "title": title,
                 }
 
+                await flush_message_writes(metadata["chat_id"], metadata["message_id"])
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
                     Chats.upsert_message_to_chat_by_id_and_message_id(
@@ -3018,7 +2918,7 @@ async def process_chat_response(
                     )
 
                 # Send a webhook notification if the user is not active
-                if not get_active_status_by_user_id(user.id):
+                if not await get_active_status_by_user_id(user.id):
                     webhook_url = Users.get_user_webhook_url_by_id(user.id)
                     if webhook_url:
                         await post_webhook(
@@ -3045,6 +2945,7 @@ async def process_chat_response(
                 log.warning("Task was cancelled!")
                 await event_emitter({"type": "chat:tasks:cancel"})
 
+                await flush_message_writes(metadata["chat_id"], metadata["message_id"])
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
                     Chats.upsert_message_to_chat_by_id_and_message_id(
@@ -0,0 +1,307 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import FastAPI, Request
+
+from backend.models.users import UserModel
+from backend.env import (
+    ENABLE_FORWARD_USER_INFO_HEADERS,
+    MODELS_CACHE_REFRESH_INTERVAL,
+    MODELS_CACHE_STALE_TTL,
+    MODELS_CACHE_TTL,
+    REDIS_KEY_PREFIX,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+# Seconds one instance may hold the refresh of a model list before another
+# instance takes over
+REFRESH_LOCK_TIMEOUT = 30
+
+
+class ModelListCache:
+    """
+    Model lists of the OpenAI or Ollama connections, shared by all workers and
+    replicas through Redis when it is configured.
+
+    A list is fresh for `ttl` seconds. After that it is still served for up to
+    `stale_ttl` seconds while a single refresh runs in the background, so only
+    a cold cache makes a request wait for the upstream connections. Lists are
+    keyed by the connection settings, so a config change is never served from
+    the cache, and by user only when user info headers are forwarded upstream.
+
+    `track` wraps the request to each connection: it records the connection's
+    health and, when the connection fails, falls back to its last successful
+    response (of the same user when user info headers are forwarded) so one
+    unreachable upstream does not drop its models.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[Request, Optional[UserModel]], Awaitable[dict]],
+        config_keys: list[str],
+        ttl: Optional[int] = MODELS_CACHE_TTL,
+        stale_ttl: int = MODELS_CACHE_STALE_TTL,
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.config_keys = config_keys
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._entries: dict[str, dict] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+        # Referenced until done, the event loop only keeps weak references
+        self._background_tasks: set[asyncio.Task] = set()
+        # Lists requested recently, kept warm by the background refresher. Only
+        # the app and the user are kept, not the request they came with
+        self._requested: dict[str, tuple[FastAPI, Optional[UserModel], float]] = {}
+
+        self._health: dict[str, dict] = {}
+        self._last_responses: dict[str, tuple[Any, float]] = {}
+
+    def _get_redis_key(self, suffix: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:model_list:{self.name}:{suffix}"
+
+    @staticmethod
+    def _get_user_id(user: Optional[UserModel]) -> str:
+        # Upstream responses only depend on the user when it is forwarded
+        return user.id if ENABLE_FORWARD_USER_INFO_HEADERS and user else "all"
+
+    @staticmethod
+    def _get_request(app: FastAPI) -> Request:
+        # The model list fetches only read the app state from the request
+        return Request({"type": "http", "app": app, "headers": []})
+
+    def _get_key(self, request: Request, user: Optional[UserModel]) -> str:
+        config = request.app.state.config
+        fingerprint = hashlib.sha256(
+            json.dumps(
+                [getattr(config, key) for key in self.config_keys],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        ).hexdigest()[:16]
+
+        return self._get_redis_key(f"{fingerprint}:{self._get_user_id(user)}")
+
+    def _is_fresh(self, entry: dict) -> bool:
+        return self.ttl is None or time.time() - entry["fetched_at"] < self.ttl
+
+    def _is_usable(self, entry: dict) -> bool:
+        return (
+            self.ttl is None
+            or time.time() - entry["fetched_at"] < self.ttl + self.stale_ttl
+        )
+
+    async def _read(self, request: Request, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+
+        redis = request.app.state.redis
+        if redis is not None and (entry is None or not self._is_fresh(entry)):
+            try:
+                data = await redis.get(key)
+                if data:
+                    remote_entry = json.loads(data)
+                    if (
+                        entry is None
+                        or remote_entry["fetched_at"] > entry["fetched_at"]
+                    ):
+                        entry = remote_entry
+                        self._entries[key] = entry
+            except Exception as e:
+                log.error(f"Error reading the {self.name} model list from Redis: {e}")
+
+        return entry
+
+    async def _fetch_and_store(
+        self, request: Request, user: Optional[UserModel], key: str
+    ) -> dict:
+        value = await self.fetch(request, user)
+
+        entry = {"value": value, "fetched_at": time.time()}
+        self._entries[key] = entry
+
+        redis = request.app.state.redis
+        if redis is not None:
+            try:
+                pipe = redis.pipeline()
+                pipe.set(
+                    key,
+                    json.dumps(entry),
+                    ex=self.ttl + self.stale_ttl if self.ttl is not None else None,
+                )
+                if self._health:
+                    pipe.hset(
+                        self._get_redis_key("health"),
+                        mapping={
+                            idx: json.dumps(state)
+                            for idx, state in self._health.items()
+                        },
+                    )
+                await pipe.execute()
+            except Exception as e:
+                log.error(f"Error writing the {self.name} model list to Redis: {e}")
+
+        return entry
+
+    def _refresh(
+        self, request: Request, user: Optional[UserModel], key: str
+    ) -> asyncio.Task:
+        # Concurrent requests for the same list share one fetch
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(request, user, key))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return task
+
+    async def _refresh_in_background(
+        self, request: Request, user: Optional[UserModel], key: str
+    ):
+        if key in self._refreshing:
+            return
+
+        redis = request.app.state.redis
+        if redis is not None:
+            try:
+                # Only one instance refreshes a stale list
+                if not await redis.set(
+                    f"{key}:lock", "1", nx=True, ex=REFRESH_LOCK_TIMEOUT
+                ):
+                    return
+            except Exception as e:
+                log.error(f"Error locking the {self.name} model list refresh: {e}")
+
+        try:
+            # Another instance may have refreshed it in the meantime
+            entry = await self._read(request, key)
+            if entry is None or not self._is_fresh(entry):
+                await self._refresh(request, user, key)
+        except Exception as e:
+            log.error(f"Error refreshing the {self.name} model list: {e}")
+        finally:
+            if redis is not None:
+                try:
+                    await redis.delete(f"{key}:lock")
+                except Exception:
+                    pass
+
+    async def get(self, request: Request, user: Optional[UserModel] = None) -> dict:
+        key = self._get_key(request, user)
+        self._requested[key] = (request.app, user, time.time())
+
+        entry = await self._read(request, key)
+        if entry is None or not self._is_usable(entry):
+            entry = await asyncio.shield(self._refresh(request, user, key))
+        elif not self._is_fresh(entry):
+            task = asyncio.create_task(self._refresh_in_background(request, user, key))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+        # Callers replace top-level keys of the returned list, e.g. "data"
+        return {**entry["value"]}
+
+    async def refresh_requested(self):
+        """Refresh the lists requested within the stale window"""
+        if self.ttl is None:
+            return
+
+        now = time.time()
+        for key, (app, user, requested_at) in list(self._requested.items()):
+            if now - requested_at > self.ttl + self.stale_ttl:
+                self._requested.pop(key, None)
+                continue
+
+            await self._refresh_in_background(self._get_request(app), user, key)
+
+    async def track(
+        self,
+        idx: int,
+        url: str,
+        request: Awaitable,
+        user: Optional[UserModel] = None,
+    ) -> Any:
+        """
+        Await the model list `request` of `user` to the connection `idx`,
+        recording its health; a failed request returns the last successful
+        response.
+        """
+        start = time.perf_counter()
+        try:
+            response = await request
+            error = None if response is not None else "Connection error"
+        except Exception as e:
+            response, error = None, str(e)
+
+        state = {
+            "url": url,
+            "status": "ok" if error is None else "error",
+            "error": error,
+            "latency_ms": round((time.perf_counter() - start) * 1000),
+            "checked_at": int(time.time()),
+            "last_ok_at": (self._health.get(str(idx)) or {}).get("last_ok_at"),
+        }
+
+        last_response_key = f"{url}:{self._get_user_id(user)}"
+        if error is None:
+            state["last_ok_at"] = state["checked_at"]
+            # Copied, the response is post-processed in place by the caller
+            self._last_responses[last_response_key] = (
+                copy.deepcopy(response),
+                time.time(),
+            )
+        elif last_response_key in self._last_responses:
+            last_response, fetched_at = self._last_responses[last_response_key]
+            if time.time() - fetched_at < self.stale_ttl:
+                log.warning(f"Using the last model list of {url}: {error}")
+                response = copy.deepcopy(last_response)
+                state["status"] = "stale"
+
+        self._health[str(idx)] = state
+        return response
+
+    async def get_health(self, request: Request) -> dict[str, dict]:
+        """Health of each connection by index, as last seen by any instance"""
+        health = dict(self._health)
+
+        redis = request.app.state.redis
+        if redis is not None:
+            try:
+                for idx, data in (
+                    await redis.hgetall(self._get_redis_key("health"))
+                ).items():
+                    state = json.loads(data)
+                    if (
+                        idx not in health
+                        or state["checked_at"] > health[idx]["checked_at"]
+                    ):
+                        health[idx] = state
+            except Exception as e:
+                log.error(f"Error reading the {self.name} connection health: {e}")
+
+        return health
+
+
+async def periodic_model_list_refresh(
+    caches: list[ModelListCache], interval: int = MODELS_CACHE_REFRESH_INTERVAL
+):
+    """Keeps requested model lists warm so requests rarely find them stale"""
+    if not interval or interval <= 0:
+        return
+
+    while True:
+        await asyncio.sleep(interval)
+        for cache in caches:
+            try:
+                await cache.refresh_requested()
+            except Exception as e:
+                log.error(f"Error refreshing the {cache.name} model lists: {e}")
@@ -1,4 +1,6 @@
 import time
+import json
+import hashlib
 import logging
 import asyncio
 import sys
@@ -11,12 +13,12 @@ from backend.functions import get_function_models
 
 
 from backend.models.functions import Functions
-from backend.models.models import Models
+from backend.models.models import ModelModel, Models
 
 
 from backend.utils.plugin import (
+    FUNCTION_MODULE_CACHE,
     load_function_module_by_id,
-    get_function_module_from_cache,
 )
 from backend.utils.access_control import has_access
 
@@ -77,127 +79,191 @@ async def get_all_base_models(request: Request, user: UserModel = None):
     return function_models + openai_models + ollama_models
 
 
-async def get_all_models(request, refresh: bool = False, user: UserModel = None):
-    if (
-        request.app.state.MODELS
-        and request.app.state.BASE_MODELS
-        and (request.app.state.config.ENABLE_BASE_MODELS_CACHE and not refresh)
-    ):
-        base_models = request.app.state.BASE_MODELS
+def get_action_items_from_module(function, module):
+    if hasattr(module, "actions"):
+        return [
+            {
+                "id": f"{function.id}.{action['id']}",
+                "name": action.get("name", f"{function.name} ({action['id']})"),
+                "description": function.meta.description,
+                "icon": action.get(
+                    "icon_url",
+                    function.meta.manifest.get("icon_url", None)
+                    or getattr(module, "icon_url", None)
+                    or getattr(module, "icon", None),
+                ),
+            }
+            for action in module.actions
+        ]
     else:
-        base_models = await get_all_base_models(request, user=user)
-        request.app.state.BASE_MODELS = base_models
+        return [
+            {
+                "id": function.id,
+                "name": function.name,
+                "description": function.meta.description,
+                "icon": function.meta.manifest.get("icon_url", None)
+                or getattr(module, "icon_url", None)
+                or getattr(module, "icon", None),
+            }
+        ]
 
-    # deep copy the base models to avoid modifying the original list
-    models = [model.copy() for model in base_models]
 
-    # If there are no models, return an empty list
-    if len(models) == 0:
-        return []
+def get_filter_items_from_module(function, module):
+    return [
+        {
+            "id": function.id,
+            "name": function.name,
+            "description": function.meta.description,
+            "icon": function.meta.manifest.get("icon_url", None)
+            or getattr(module, "icon_url", None)
+            or getattr(module, "icon", None),
+            "has_user_valves": hasattr(module, "UserValves"),
+        }
+    ]
 
-    # Add arena models
-    if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
-        arena_models = []
-        if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
-            arena_models = [
-                {
-                    "id": model["id"],
-                    "name": model["name"],
-                    "info": {
-                        "meta": model["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-                for model in request.app.state.config.EVALUATION_ARENA_MODELS
-            ]
-        else:
-            # Add default arena model
-            arena_models = [
-                {
-                    "id": DEFAULT_ARENA_MODEL["id"],
-                    "name": DEFAULT_ARENA_MODEL["name"],
-                    "info": {
-                        "meta": DEFAULT_ARENA_MODEL["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-            ]
-        models = models + arena_models
 
-    global_action_ids = [
-        function.id for function in Functions.get_global_action_functions()
-    ]
-    enabled_action_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("action", active_only=True)
-    ]
+def get_arena_models(request) -> list[dict]:
+    if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
+        arena_models = request.app.state.config.EVALUATION_ARENA_MODELS
+    else:
+        # Add default arena model
+        arena_models = [DEFAULT_ARENA_MODEL]
 
-    global_filter_ids = [
-        function.id for function in Functions.get_global_filter_functions()
-    ]
-    enabled_filter_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
+    return [
+        {
+            "id": model["id"],
+            "name": model["name"],
+            "info": {
+                "meta": model["meta"],
+            },
+            "object": "model",
+            "created": int(time.time()),
+            "owned_by": "arena",
+            "arena": True,
+        }
+        for model in arena_models
     ]
 
-    custom_models = Models.get_all_models()
-    for custom_model in custom_models:
-        if custom_model.base_model_id is None:
+
+class ModelCatalog:
+    """
+    The merged list of base models, arena models and custom models with their
+    actions and filters, as returned by get_all_models.
+
+    The catalog is only rebuilt when one of its inputs changed: the base model
+    list, the arena settings, the model table or the action/filter functions.
+    The base models are compared by a digest of their content, the latter two
+    by a count/max(updated_at) fingerprint, so writes from other instances are
+    picked up too. The catalog's model dicts
+    are shared between requests and must not be mutated.
+    """
+
+    def __init__(self):
+        self._key = None
+
+        self.models: list[dict] = []
+        self.models_by_id: dict[str, dict] = {}
+        # Custom models by id, used for access checks
+        self.model_infos: dict[str, ModelModel] = {}
+
+    def invalidate(self):
+        self._key = None
+
+    def _get_key(self, request, base_models: list[dict]) -> tuple:
+        config = request.app.state.config
+        return (
+            hashlib.sha256(
+                json.dumps(base_models, sort_keys=True, default=str).encode()
+            ).hexdigest(),
+            config.ENABLE_EVALUATION_ARENA_MODELS,
+            json.dumps(config.EVALUATION_ARENA_MODELS, sort_keys=True, default=str),
+            Models.get_models_version(),
+            Functions.get_functions_version(["action", "filter"]),
+        )
+
+    def get_models(self, request, base_models: list[dict]) -> list[dict]:
+        key = self._get_key(request, base_models)
+        if key != self._key:
+            models, model_infos = self._build(request, base_models)
+
+            self.models = models
+            self.models_by_id = {model["id"]: model for model in models}
+            self.model_infos = model_infos
+            self._key = key
+
+        return self.models
+
+    def _build(
+        self, request, base_models: list[dict]
+    ) -> tuple[list[dict], dict[str, ModelModel]]:
+        # Shallow copies to avoid modifying the cached base models
+        models = {}
+        for model in base_models:
+            models.setdefault(model["id"], model.copy())
+
+        if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
+            for model in get_arena_models(request):
+                models.setdefault(model["id"], model)
+
+        # Ollama may return model ids in different formats
+        # (e.g., 'llama3' vs. 'llama3:7b'), index them by their base name too
+        models_by_base_id = {}
+        for model in models.values():
+            models_by_base_id.setdefault(model["id"].split(":")[0], []).append(model)
+
+        custom_models = Models.get_all_models()
+
+        for custom_model in custom_models:
+            if custom_model.base_model_id is not None:
+                continue
+
             # Applied directly to a base model
-            for model in models:
-                if custom_model.id == model["id"] or (
-                    model.get("owned_by") == "ollama"
-                    and custom_model.id
-                    == model["id"].split(":")[
-                        0
-                    ]  # Ollama may return model ids in different formats (e.g., 'llama3' vs. 'llama3:7b')
-                ):
-                    if custom_model.is_active:
-                        model["name"] = custom_model.name
-                        model["info"] = custom_model.model_dump()
-
-                        # Set action_ids and filter_ids
-                        action_ids = []
-                        filter_ids = []
-
-                        if "info" in model and "meta" in model["info"]:
-                            action_ids.extend(
-                                model["info"]["meta"].get("actionIds", [])
-                            )
-                            filter_ids.extend(
-                                model["info"]["meta"].get("filterIds", [])
-                            )
-
-                        model["action_ids"] = action_ids
-                        model["filter_ids"] = filter_ids
-                    else:
-                        models.remove(model)
-
-        elif custom_model.is_active and (
-            custom_model.id not in [model["id"] for model in models]
-        ):
+            targets = [models[custom_model.id]] if custom_model.id in models else []
+            targets += [
+                model
+                for model in models_by_base_id.get(custom_model.id, [])
+                if model.get("owned_by") == "ollama" and model["id"] != custom_model.id
+            ]
+
+            for model in targets:
+                if custom_model.is_active:
+                    model["name"] = custom_model.name
+                    model["info"] = custom_model.model_dump()
+
+                    meta = model["info"].get("meta") or {}
+                    model["action_ids"] = list(meta.get("actionIds", []))
+                    model["filter_ids"] = list(meta.get("filterIds", []))
+                else:
+                    models.pop(model["id"], None)
+
+        for custom_model in custom_models:
+            if (
+                custom_model.base_model_id is None
+                or not custom_model.is_active
+                or custom_model.id in models
+            ):
+                continue
+
             owned_by = "openai"
             pipe = None
 
             action_ids = []
             filter_ids = []
 
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model.get("owned_by", "unknown owner")
-                    if "pipe" in model:
-                        pipe = model["pipe"]
-                    break
+            base_model = models.get(custom_model.base_model_id) or next(
+                (
+                    model
+                    for model in models_by_base_id.get(custom_model.base_model_id, [])
+                    if model["id"] in models
+                ),
+                None,
+            )
+            if base_model is not None:
+                owned_by = base_model.get("owned_by", "unknown owner")
+                if "pipe" in base_model:
+                    pipe = base_model["pipe"]
 
+            model = custom_model.model_dump()
             if custom_model.meta:
                 meta = custom_model.meta.model_dump()
 
@@ -207,109 +273,119 @@ async def get_all_models(request, refresh: bool = False, user: UserModel = None)
                 if "filterIds" in meta:
                     filter_ids.extend(meta["filterIds"])
 
-            models.append(
-                {
-                    "id": f"{custom_model.id}",
-                    "name": custom_model.name,
-                    "object": "model",
-                    "created": custom_model.created_at,
-                    "owned_by": owned_by,
-                    "info": custom_model.model_dump(),
-                    "preset": True,
-                    **({"pipe": pipe} if pipe is not None else {}),
-                    "action_ids": action_ids,
-                    "filter_ids": filter_ids,
-                }
+            models[custom_model.id] = {
+                "id": f"{custom_model.id}",
+                "name": custom_model.name,
+                "object": "model",
+                "created": custom_model.created_at,
+                "owned_by": owned_by,
+                "info": model,
+                "preset": True,
+                **({"pipe": pipe} if pipe is not None else {}),
+                "action_ids": action_ids,
+                "filter_ids": filter_ids,
+            }
+            models_by_base_id.setdefault(custom_model.id.split(":")[0], []).append(
+                models[custom_model.id]
             )
 
-    # Process action_ids to get the actions
-    def get_action_items_from_module(function, module):
-        actions = []
-        if hasattr(module, "actions"):
-            actions = module.actions
-            return [
-                {
-                    "id": f"{function.id}.{action['id']}",
-                    "name": action.get("name", f"{function.name} ({action['id']})"),
-                    "description": function.meta.description,
-                    "icon": action.get(
-                        "icon_url",
-                        function.meta.manifest.get("icon_url", None)
-                        or getattr(module, "icon_url", None)
-                        or getattr(module, "icon", None),
-                    ),
-                }
-                for action in actions
-            ]
-        else:
-            return [
-                {
-                    "id": function.id,
-                    "name": function.name,
-                    "description": function.meta.description,
-                    "icon": function.meta.manifest.get("icon_url", None)
-                    or getattr(module, "icon_url", None)
-                    or getattr(module, "icon", None),
-                }
-            ]
+        models = list(models.values())
+        self._add_functions(models)
+        return models, {custom_model.id: custom_model for custom_model in custom_models}
 
-    # Process filter_ids to get the filters
-    def get_filter_items_from_module(function, module):
-        return [
-            {
-                "id": function.id,
-                "name": function.name,
-                "description": function.meta.description,
-                "icon": function.meta.manifest.get("icon_url", None)
-                or getattr(module, "icon_url", None)
-                or getattr(module, "icon", None),
-                "has_user_valves": hasattr(module, "UserValves"),
-            }
+    def _add_functions(self, models: list[dict]):
+        action_functions = {
+            function.id: function
+            for function in Functions.get_functions_by_type("action", active_only=True)
+        }
+        global_action_ids = [
+            id for id, function in action_functions.items() if function.is_global
         ]
 
-    def get_function_module_by_id(function_id):
-        function_module, _, _ = get_function_module_from_cache(request, function_id)
-        return function_module
-
-    for model in models:
-        action_ids = [
-            action_id
-            for action_id in list(set(model.pop("action_ids", []) + global_action_ids))
-            if action_id in enabled_action_ids
-        ]
-        filter_ids = [
-            filter_id
-            for filter_id in list(set(model.pop("filter_ids", []) + global_filter_ids))
-            if filter_id in enabled_filter_ids
+        filter_functions = {
+            function.id: function
+            for function in Functions.get_functions_by_type("filter", active_only=True)
+        }
+        global_filter_ids = [
+            id for id, function in filter_functions.items() if function.is_global
         ]
 
-        model["actions"] = []
-        for action_id in action_ids:
-            action_function = Functions.get_function_by_id(action_id)
-            if action_function is None:
-                raise Exception(f"Action not found: {action_id}")
+        model_function_ids = []
+        for model in models:
+            action_ids = [
+                action_id
+                for action_id in list(
+                    set(model.pop("action_ids", []) + global_action_ids)
+                )
+                if action_id in action_functions
+            ]
+            filter_ids = [
+                filter_id
+                for filter_id in list(
+                    set(model.pop("filter_ids", []) + global_filter_ids)
+                )
+                if filter_id in filter_functions
+            ]
+            model_function_ids.append((action_ids, filter_ids))
+
+        # Load the modules of every model's actions and filters at once
+        function_modules = FUNCTION_MODULE_CACHE.get_modules(
+            [
+                function_id
+                for action_ids, filter_ids in model_function_ids
+                for function_id in action_ids + filter_ids
+            ]
+        )
+
+        def get_function_module_by_id(function_id):
+            if function_id not in function_modules:
+                raise Exception(f"Function not found: {function_id}")
+            return function_modules[function_id]
+
+        for model, (action_ids, filter_ids) in zip(models, model_function_ids):
+            model["actions"] = []
+            for action_id in action_ids:
+                function_module = get_function_module_by_id(action_id)
+                model["actions"].extend(
+                    get_action_items_from_module(
+                        action_functions[action_id], function_module
+                    )
+                )
 
-            function_module = get_function_module_by_id(action_id)
-            model["actions"].extend(
-                get_action_items_from_module(action_function, function_module)
-            )
+            model["filters"] = []
+            for filter_id in filter_ids:
+                function_module = get_function_module_by_id(filter_id)
 
-        model["filters"] = []
-        for filter_id in filter_ids:
-            filter_function = Functions.get_function_by_id(filter_id)
-            if filter_function is None:
-                raise Exception(f"Filter not found: {filter_id}")
+                if getattr(function_module, "toggle", None):
+                    model["filters"].extend(
+                        get_filter_items_from_module(
+                            filter_functions[filter_id], function_module
+                        )
+                    )
 
-            function_module = get_function_module_by_id(filter_id)
 
-            if getattr(function_module, "toggle", None):
-                model["filters"].extend(
-                    get_filter_items_from_module(filter_function, function_module)
-                )
+MODEL_CATALOG = ModelCatalog()
+
 
+async def get_all_models(request, refresh: bool = False, user: UserModel = None):
+    if (
+        request.app.state.MODELS
+        and request.app.state.BASE_MODELS
+        and (request.app.state.config.ENABLE_BASE_MODELS_CACHE and not refresh)
+    ):
+        base_models = request.app.state.BASE_MODELS
+    else:
+        base_models = await get_all_base_models(request, user=user)
+        request.app.state.BASE_MODELS = base_models
+
+    # If there are no models, return an empty list
+    if len(base_models) == 0:
+        return []
+
+    models = MODEL_CATALOG.get_models(request, base_models)
     log.debug(f"get_all_models() returned {len(models)} models")
 
-    request.app.state.MODELS = {model["id"]: model for model in models}
+    request.app.state.MODELS = MODEL_CATALOG.models_by_id
     return models
 
 
@@ -342,6 +418,12 @@ def get_filtered_models(models, user):
         user.role == "user"
         or (user.role == "admin" and not BYPASS_ADMIN_ACCESS_CONTROL)
     ) and not BYPASS_MODEL_ACCESS_CONTROL:
+        # Access control of custom models from the catalog instead of a
+        # query per model
+        model_infos = MODEL_CATALOG.model_infos or {
+            model.id: model for model in Models.get_all_models()
+        }
+
         filtered_models = []
         for model in models:
             if model.get("arena"):
@@ -355,7 +437,7 @@ def get_filtered_models(models, user):
                     filtered_models.append(model)
                 continue
 
-            model_info = Models.get_model_by_id(model["id"])
+            model_info = model_infos.get(model["id"])
             if model_info:
                 if (
                     (user.role == "admin" and BYPASS_ADMIN_ACCESS_CONTROL)
@@ -922,7 +922,10 @@ class OAuthManager:
             else:
                 user_oauth_groups = []
 
-        user_current_groups: list[GroupModel] = Groups.get_groups_by_member_id(user.id)
+        # Uncached, their user_ids are written back below
+        user_current_groups: list[GroupModel] = Groups.get_groups_by_member_id(
+            user.id, cached=False
+        )
         all_available_groups: list[GroupModel] = Groups.get_groups()
 
         # Create groups if they don't exist and creation is enabled
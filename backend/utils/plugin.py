@@ -1,15 +1,25 @@
+import hashlib
 import os
 import re
 import subprocess
 import sys
+import threading
+import time
 from importlib import util
 import types
 import tempfile
 import logging
-
-from backend.env import SRC_LOG_LEVELS, PIP_OPTIONS, PIP_PACKAGE_INDEX_OPTIONS
+from typing import Any, Optional
+
+from backend.env import (
+    FUNCTION_MODULE_CACHE_TTL,
+    SRC_LOG_LEVELS,
+    PIP_OPTIONS,
+    PIP_PACKAGE_INDEX_OPTIONS,
+)
 from backend.models.functions import Functions
 from backend.models.tools import Tools
+from backend.utils.redis import get_redis_connection
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
@@ -208,60 +218,213 @@ def get_tool_module_from_cache(request, tool_id, load_from_db=True):
     return tool_module, frontmatter
 
 
-def get_function_module_from_cache(request, function_id, load_from_db=True):
-    if load_from_db:
-        # Always load from the database by default
-        # This is useful for hooks like "inlet" or "outlet" where the content might change
-        # and we want to ensure the latest content is used.
+class FunctionModuleCache:
+    """
+    Loaded function modules with their parsed valves, stamped with the
+    function's updated_at and content hash.
 
-        function = Functions.get_function_by_id(function_id)
-        if not function:
-            raise Exception(f"Function not found: {function_id}")
-        content = function.content
+    A module is used as is for `cache_ttl` seconds, then the versions of all
+    functions a caller needs are checked with one query and only changed rows
+    are fetched, again in one query. A module is re-executed only when its
+    content changed; a valves-only change just resets the parsed Valves.
 
-        new_content = replace_imports(content)
-        if new_content != content:
-            content = new_content
-            # Update the function content in the database
-            Functions.update_function_by_id(function_id, {"content": content})
+    With Redis configured, `invalidate` publishes the function id so every
+    instance re-checks it on its next use instead of after the TTL.
+    """
 
-        if (
-            hasattr(request.app.state, "FUNCTION_CONTENTS")
-            and function_id in request.app.state.FUNCTION_CONTENTS
-        ) and (
-            hasattr(request.app.state, "FUNCTIONS")
-            and function_id in request.app.state.FUNCTIONS
+    def __init__(self, cache_ttl: float = FUNCTION_MODULE_CACHE_TTL):
+        self.cache_ttl = cache_ttl
+
+        # Shared with app.state.FUNCTIONS
+        self.modules: dict[str, Any] = {}
+        self._entries: dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+        self._redis = None
+        self._redis_key_prefix = "open-webui"
+
+    def connect(
+        self,
+        redis_url: Optional[str] = None,
+        redis_sentinels: Optional[list] = [],
+        redis_cluster: Optional[bool] = False,
+        redis_key_prefix: str = "open-webui",
+    ):
+        if not redis_url or self._redis:
+            return
+
+        self._redis_key_prefix = redis_key_prefix
+        self._redis = get_redis_connection(
+            redis_url, redis_sentinels, redis_cluster, decode_responses=True
+        )
+        threading.Thread(target=self._listen_for_updates, daemon=True).start()
+
+    def _get_redis_channel(self) -> str:
+        return f"{self._redis_key_prefix}:function_updates"
+
+    def _listen_for_updates(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._get_redis_channel())
+
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._expire(message.get("data") or None)
+            except Exception as e:
+                log.debug(f"Function update listener disconnected: {e}")
+                time.sleep(5)
+
+    def _expire(self, function_id: Optional[str] = None):
+        # Forces a reload on the next use, updated_at only has second precision
+        with self._lock:
+            for id, entry in self._entries.items():
+                if function_id is None or id == function_id:
+                    entry["version"] = None
+                    entry["checked_at"] = 0.0
+
+    def invalidate(self, function_id: Optional[str] = None):
+        """Call after changing a function, or all functions if no id is given"""
+        self._expire(function_id)
+
+        if self._redis:
+            try:
+                self._redis.publish(self._get_redis_channel(), function_id or "")
+            except Exception as e:
+                log.error(f"Failed to publish function update: {e}")
+
+    def remove(self, function_id: str):
+        with self._lock:
+            self._entries.pop(function_id, None)
+            self.modules.pop(function_id, None)
+        self.invalidate(function_id)
+
+    def _reload(self, function_ids: list[str]):
+        for function in Functions.get_functions_by_ids(
+            function_ids, include_valves=True
         ):
-            if request.app.state.FUNCTION_CONTENTS[function_id] == content:
-                return request.app.state.FUNCTIONS[function_id], None, None
+            content = replace_imports(function.content)
+            if content != function.content:
+                Functions.update_function_by_id(function.id, {"content": content})
+                function.updated_at = Functions.get_function_versions_by_ids(
+                    [function.id]
+                ).get(function.id, function.updated_at)
+
+            content_hash = hashlib.sha256(content.encode()).hexdigest()
+            entry = self._entries.get(function.id)
+
+            if entry is None or entry["content_hash"] != content_hash:
+                function_module, function_type, frontmatter = (
+                    load_function_module_by_id(function.id, content)
+                )
+                entry = {
+                    "module": function_module,
+                    "type": function_type,
+                    "frontmatter": frontmatter,
+                    "content_hash": content_hash,
+                }
+
+            self._entries[function.id] = {
+                **entry,
+                "version": function.updated_at,
+                "valves": function.valves or {},
+                "valves_object": None,
+                "checked_at": time.monotonic(),
+            }
+            self.modules[function.id] = entry["module"]
+
+    def get_entries(
+        self, function_ids: list[str], load_from_db: bool = True
+    ) -> dict[str, dict]:
+        """
+        The cache entries of the existing functions among `function_ids`,
+        refreshed with at most two queries however many functions are stale.
+        """
+        function_ids = list(dict.fromkeys(function_ids))
+
+        with self._lock:
+            now = time.monotonic()
+            unchecked_ids = [
+                id
+                for id in function_ids
+                if id not in self._entries
+                or (
+                    load_from_db
+                    and now - self._entries[id]["checked_at"] >= self.cache_ttl
+                )
+            ]
+
+            if unchecked_ids:
+                versions = Functions.get_function_versions_by_ids(unchecked_ids)
+
+                stale_ids = []
+                for id in unchecked_ids:
+                    if id not in versions:
+                        self._entries.pop(id, None)
+                        self.modules.pop(id, None)
+                    elif (
+                        id in self._entries
+                        and self._entries[id]["version"] == versions[id]
+                    ):
+                        self._entries[id]["checked_at"] = now
+                    else:
+                        stale_ids.append(id)
+
+                if stale_ids:
+                    self._reload(stale_ids)
+
+            return {id: self._entries[id] for id in function_ids if id in self._entries}
+
+    def get_entry(self, function_id: str, load_from_db: bool = True) -> dict:
+        entry = self.get_entries([function_id], load_from_db).get(function_id)
+        if entry is None:
+            raise Exception(f"Function not found: {function_id}")
+        return entry
+
+    def get_modules(
+        self, function_ids: list[str], load_from_db: bool = True
+    ) -> dict[str, Any]:
+        return {
+            id: entry["module"]
+            for id, entry in self.get_entries(function_ids, load_from_db).items()
+        }
+
+    def get_valves(self, function_id: str) -> dict:
+        return self.get_entry(function_id, load_from_db=False)["valves"]
+
+    def apply_valves(self, function_id: str, function_module):
+        """Set the module's parsed Valves, built once per valves version"""
+        if not (
+            hasattr(function_module, "valves") and hasattr(function_module, "Valves")
+        ):
+            return
 
-        function_module, function_type, frontmatter = load_function_module_by_id(
-            function_id, content
-        )
-    else:
-        # Load from cache (e.g. "stream" hook)
-        # This is useful for performance reasons
+        entry = self.get_entry(function_id, load_from_db=False)
+        if entry["valves_object"] is None:
+            try:
+                entry["valves_object"] = function_module.Valves(
+                    **{k: v for k, v in entry["valves"].items() if v is not None}
+                )
+            except Exception as e:
+                log.exception(f"Error loading valves for function {function_id}: {e}")
+                raise e
 
-        if (
-            hasattr(request.app.state, "FUNCTIONS")
-            and function_id in request.app.state.FUNCTIONS
-        ):
-            return request.app.state.FUNCTIONS[function_id], None, None
+        function_module.valves = entry["valves_object"]
 
-        function_module, function_type, frontmatter = load_function_module_by_id(
-            function_id
-        )
 
-    if not hasattr(request.app.state, "FUNCTIONS"):
-        request.app.state.FUNCTIONS = {}
+FUNCTION_MODULE_CACHE = FunctionModuleCache()
 
-    if not hasattr(request.app.state, "FUNCTION_CONTENTS"):
-        request.app.state.FUNCTION_CONTENTS = {}
 
-    request.app.state.FUNCTIONS[function_id] = function_module
-    request.app.state.FUNCTION_CONTENTS[function_id] = content
+def get_function_module_from_cache(request, function_id, load_from_db=True):
+    """
+    The loaded module of a function, with its type and frontmatter.
 
-    return function_module, function_type, frontmatter
+    With `load_from_db`, the module is checked against the database once the
+    cache TTL has passed; otherwise (e.g. "stream" hook) any loaded module is
+    used as is.
+    """
+    entry = FUNCTION_MODULE_CACHE.get_entry(function_id, load_from_db)
+    return entry["module"], entry["type"], entry["frontmatter"]
 
 
 def install_frontmatter_requirements(requirements: str):
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from backend.env import (
+    AIOHTTP_CLIENT_POOL_LIMIT,
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class ClientSessionPool:
+    """
+    Application-lifetime aiohttp sessions, one per upstream origin.
+
+    Each session owns a keep-alive TCPConnector with DNS caching, so repeated
+    calls to the same provider reuse open connections instead of paying for a
+    new TCP/TLS handshake and DNS lookup per request. Timeouts are passed per
+    request; the pooled sessions never carry cookies between users.
+    """
+
+    def __init__(
+        self,
+        limit: int = AIOHTTP_CLIENT_POOL_LIMIT,
+        limit_per_host: int = AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: Optional[int] = AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+
+        self._sessions: dict[tuple[str, str], aiohttp.ClientSession] = {}
+
+    @staticmethod
+    def get_origin(url: str) -> str:
+        parsed_url = urlparse(url)
+        return f"{parsed_url.scheme}://{parsed_url.netloc}".lower()
+
+    def _create_session(self, proxy=None) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            trust_env=True,
+            # Per-request cookies are still sent, but responses of one user
+            # must never populate the jar shared with every other request
+            cookie_jar=aiohttp.DummyCookieJar(),
+            **({"proxy": proxy} if proxy else {}),
+        )
+
+    def get_session(self, url: str, proxy=None) -> aiohttp.ClientSession:
+        key = (self.get_origin(url), str(proxy) if proxy else "")
+
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._create_session(proxy)
+            self._sessions[key] = session
+            log.debug(f"Created pooled client session for {key[0]}")
+
+        return session
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+
+        await asyncio.gather(
+            *(session.close() for session in sessions if not session.closed),
+            return_exceptions=True,
+        )
+
+
+_SESSION_POOL: Optional[ClientSessionPool] = None
+
+
+def get_session_pool() -> ClientSessionPool:
+    global _SESSION_POOL
+    if _SESSION_POOL is None:
+        _SESSION_POOL = ClientSessionPool()
+    return _SESSION_POOL
+
+
+def get_client_session(url: str, proxy=None) -> aiohttp.ClientSession:
+    return get_session_pool().get_session(url, proxy=proxy)
+
+
+async def close_session_pool():
+    global _SESSION_POOL
+    if _SESSION_POOL is not None:
+        pool, _SESSION_POOL = _SESSION_POOL, None
+        await pool.close()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from backend.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class StageScheduler:
+    """
+    Runs the stages of a request concurrently, each one as soon as the stages
+    it depends on are done.
+
+    Stages start when they are added, so every stage has to be added before
+    awaiting `run`. Depending on a stage that was not added does not wait. A
+    running stage can also wait for another stage with `result`, for
+    dependencies only known once it started.
+
+    Stages should return their changes rather than apply them to shared
+    state: the caller applies them in a fixed order once `run` returns, so
+    the outcome does not depend on which stage finished first.
+    """
+
+    def __init__(self):
+        self._started_at = time.perf_counter()
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._timings: dict[str, dict] = {}
+
+    def add(
+        self,
+        name: str,
+        stage: Callable[[], Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+    ):
+        if name in self._tasks:
+            raise ValueError(f"Stage {name} was already added")
+
+        self._tasks[name] = asyncio.create_task(
+            self._run_stage(name, stage, list(depends_on)), name=f"stage:{name}"
+        )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    async def _run_stage(
+        self, name: str, stage: Callable[[], Awaitable[Any]], depends_on: list[str]
+    ) -> Any:
+        for dependency in depends_on:
+            await self.result(dependency)
+
+        started_at = time.perf_counter()
+        try:
+            return await stage()
+        finally:
+            self._timings[name] = {
+                "start": round(started_at - self._started_at, 3),
+                "duration": round(time.perf_counter() - started_at, 3),
+            }
+
+    async def result(self, name: str) -> Any:
+        """The result of stage `name` once done, None if it was not added."""
+        task = self._tasks.get(name)
+        if task is None:
+            return None
+
+        # A cancelled dependent must not cancel the stage it waits for
+        return await asyncio.shield(task)
+
+    async def run(self) -> dict[str, Any]:
+        """
+        Wait for all stages and return their results by name. If a stage
+        raises, the other stages are cancelled and the error is raised.
+        """
+        try:
+            results = await asyncio.gather(*self._tasks.values())
+        except BaseException:
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            raise
+
+        if self._timings:
+            log.debug(f"Stage timings: {self._timings}")
+        return dict(zip(self._tasks, results))
+
+    @property
+    def timings(self) -> dict[str, dict]:
+        """Start (relative to the scheduler's creation) and duration of each
+        finished stage, in seconds."""
+        return {name: {**timing} for name, timing in self._timings.items()}
@@ -1,6 +1,9 @@
+import hashlib
+import json
 import logging
 import math
 import re
+import time
 from datetime import datetime
 from typing import Optional, Any
 import uuid
@@ -8,7 +11,11 @@ import uuid
 
 from backend.utils.misc import get_last_user_message, get_messages_content
 
-from backend.env import SRC_LOG_LEVELS
+from backend.env import (
+    CHAT_TASK_RESULT_CACHE_TTL,
+    REDIS_KEY_PREFIX,
+    SRC_LOG_LEVELS,
+)
 from backend.config import DEFAULT_RAG_TEMPLATE
 
 
@@ -261,6 +268,79 @@ def tags_generation_template(
     return template
 
 
+# Guidelines and JSON example of each output of the combined task generation
+COMBINED_TASK_OUTPUTS = {
+    "title": (
+        "title: a concise, 3-5 word title with an emoji summarizing the chat "
+        "history, without quotation marks or special formatting.",
+        "your concise title here",
+    ),
+    "tags": (
+        "tags: 1-3 broad tags categorizing the main themes of the chat history "
+        "(e.g. Science, Technology, Health), along with 1-3 more specific "
+        'subtopic tags; only ["General"] if the chat is too short or too diverse.',
+        ["tag1", "tag2", "tag3"],
+    ),
+    "follow_ups": (
+        "follow_ups: 3-5 relevant follow-up questions the user might naturally "
+        "ask next, written from the user's point of view, directed to the "
+        "assistant, and not repeating what was already covered.",
+        ["Question 1?", "Question 2?", "Question 3?"],
+    ),
+}
+
+
+def combined_task_generation_template(
+    template: str,
+    messages: list[dict],
+    outputs: list[str],
+    user: Optional[Any] = None,
+) -> str:
+    template = template.replace(
+        "{{TASKS}}",
+        "\n".join(f"- {COMBINED_TASK_OUTPUTS[output][0]}" for output in outputs),
+    )
+    template = template.replace(
+        "{{OUTPUT}}",
+        json.dumps(
+            {output: COMBINED_TASK_OUTPUTS[output][1] for output in outputs},
+            ensure_ascii=False,
+        ),
+    )
+
+    prompt = get_last_user_message(messages)
+    template = replace_prompt_variable(template, prompt)
+    template = replace_messages_variable(template, messages)
+
+    template = prompt_template(template, user)
+    return template
+
+
+def parse_combined_task_results(content: str, outputs: list[str]) -> dict:
+    """
+    The `outputs` found in the JSON object of a combined task response; the
+    missing or malformed ones are left out.
+    """
+    try:
+        data = json.loads(content[content.find("{") : content.rfind("}") + 1])
+    except Exception:
+        return {}
+
+    if not isinstance(data, dict):
+        return {}
+
+    results = {}
+    for output in outputs:
+        value = data.get(output)
+        if output == "title":
+            if isinstance(value, str) and value.strip():
+                results[output] = value.strip()
+        elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+            results[output] = value
+
+    return results
+
+
 def image_prompt_generation_template(
     template: str, messages: list[dict], user: Optional[Any] = None
 ) -> str:
@@ -347,3 +427,84 @@ def moa_response_generation_template(
 def tools_function_calling_generation_template(template: str, tools_specs: str) -> str:
     template = template.replace("{{TOOLS}}", tools_specs)
     return template
+
+
+class TaskResultCache:
+    """
+    Title and tags generated for a chat, keyed by the chat and a digest of
+    its history before the assistant reply, and shared through Redis when it
+    is configured.
+
+    A regenerated reply has a new message id but the same history, so it
+    reuses the title and tags; a changed history, e.g. an edited prompt,
+    misses the cache. Follow-ups depend on the reply itself and are never
+    cached.
+    """
+
+    OUTPUTS = ("title", "tags")
+
+    def __init__(self, ttl: int = CHAT_TASK_RESULT_CACHE_TTL, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[str, dict] = {}
+
+    @staticmethod
+    def get_digest(messages: list[dict]) -> str:
+        """Digest of the messages up to, not including, the assistant reply"""
+        if messages and messages[-1].get("role") == "assistant":
+            messages = messages[:-1]
+
+        return hashlib.sha256(
+            json.dumps(
+                [(m.get("role"), m.get("content")) for m in messages],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        ).hexdigest()
+
+    def _get_key(self, chat_id: str, messages: list[dict]) -> str:
+        return f"{REDIS_KEY_PREFIX}:task_results:{chat_id}:{self.get_digest(messages)}"
+
+    async def get(self, redis, chat_id: str, messages: list[dict]) -> dict:
+        if not self.ttl or not chat_id:
+            return {}
+
+        key = self._get_key(chat_id, messages)
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry["created_at"] >= self.ttl:
+            entry = None
+            if redis is not None:
+                try:
+                    data = await redis.get(key)
+                    entry = json.loads(data) if data else None
+                except Exception as e:
+                    log.error(f"Error reading the task results from Redis: {e}")
+
+        return {**entry["results"]} if entry else {}
+
+    async def set(self, redis, chat_id: str, messages: list[dict], results: dict):
+        results = {
+            output: result
+            for output, result in results.items()
+            if output in self.OUTPUTS
+        }
+        if not self.ttl or not chat_id or not results:
+            return
+
+        key = self._get_key(chat_id, messages)
+        entry = {"results": results, "created_at": time.time()}
+
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            # Oldest first, entries are re-inserted on update
+            self._entries.pop(next(iter(self._entries)))
+
+        if redis is not None:
+            try:
+                await redis.set(key, json.dumps(entry), ex=self.ttl)
+            except Exception as e:
+                log.error(f"Error writing the task results to Redis: {e}")
+
+
+TASK_RESULT_CACHE = TaskResultCache()
@@ -8,6 +8,12 @@ Metrics collected:
 
 * http.server.requests (counter)
 * http.server.duration (histogram, milliseconds)
+* webui.chat.write_buffer.pending (gauge, buffered message updates)
+* webui.chat.write_buffer.flush_latency (gauge, milliseconds)
+* webui.rag.embedding_cache.lookups (gauge, embedding cache lookups by result)
+* webui.rag.embedding_cache.hit_rate (gauge, ratio)
+* webui.rag.retrieval_executor.tasks (gauge, queued and active retrieval tasks)
+* webui.rag.retrieval_executor.queue_time (gauge, milliseconds)
 
 Attributes used: http.method, http.route, http.status_code
 
@@ -45,8 +51,13 @@ from backend.env import (
     OTEL_METRICS_OTLP_SPAN_EXPORTER,
     OTEL_METRICS_EXPORTER_OTLP_INSECURE,
 )
-from backend.socket.main import get_active_user_ids
+from backend.socket.main import (
+    get_active_user_count,
+    get_message_write_buffer_stats,
+)
 from backend.models.users import Users
+from backend.retrieval.embedding_cache import get_embedding_cache_stats
+from backend.retrieval.executor import get_retrieval_executor_stats
 
 _EXPORT_INTERVAL_MILLIS = 10_000  # 10 seconds
 
@@ -99,6 +110,24 @@ def _build_meter_provider(resource: Resource) -> MeterProvider:
         View(
             instrument_name="webui.users.active",
         ),
+        View(
+            instrument_name="webui.chat.write_buffer.pending",
+        ),
+        View(
+            instrument_name="webui.chat.write_buffer.flush_latency",
+        ),
+        View(
+            instrument_name="webui.rag.embedding_cache.lookups",
+        ),
+        View(
+            instrument_name="webui.rag.embedding_cache.hit_rate",
+        ),
+        View(
+            instrument_name="webui.rag.retrieval_executor.tasks",
+        ),
+        View(
+            instrument_name="webui.rag.retrieval_executor.queue_time",
+        ),
     ]
 
     provider = MeterProvider(
@@ -132,7 +161,7 @@ def setup_metrics(app: FastAPI, resource: Resource) -> None:
     ) -> Sequence[metrics.Observation]:
         return [
             metrics.Observation(
-                value=len(get_active_user_ids()),
+                value=get_active_user_count(),
             )
         ]
 
@@ -159,6 +188,137 @@ def setup_metrics(app: FastAPI, resource: Resource) -> None:
         callbacks=[observe_active_users],
     )
 
+    def observe_write_buffer_pending(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_message_write_buffer_stats()
+        return [
+            metrics.Observation(
+                value=stats["pending_messages"],
+                attributes={"kind": "messages"},
+            ),
+            metrics.Observation(
+                value=stats["pending_ops"],
+                attributes={"kind": "ops"},
+            ),
+        ]
+
+    def observe_write_buffer_flush_latency(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_message_write_buffer_stats()
+        return [
+            metrics.Observation(
+                value=stats["flush_latency_last_ms"],
+                attributes={"stat": "last"},
+            ),
+            metrics.Observation(
+                value=stats["flush_latency_avg_ms"],
+                attributes={"stat": "avg"},
+            ),
+            metrics.Observation(
+                value=stats["flush_latency_max_ms"],
+                attributes={"stat": "max"},
+            ),
+        ]
+
+    meter.create_observable_gauge(
+        name="webui.chat.write_buffer.pending",
+        description="Number of chat message updates waiting in the write buffer",
+        unit="1",
+        callbacks=[observe_write_buffer_pending],
+    )
+
+    meter.create_observable_gauge(
+        name="webui.chat.write_buffer.flush_latency",
+        description="Chat message write buffer flush latency",
+        unit="ms",
+        callbacks=[observe_write_buffer_flush_latency],
+    )
+
+    def observe_embedding_cache_lookups(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_embedding_cache_stats()
+        return [
+            metrics.Observation(
+                value=stats["hits_memory"],
+                attributes={"result": "memory_hit"},
+            ),
+            metrics.Observation(
+                value=stats["hits_disk"],
+                attributes={"result": "disk_hit"},
+            ),
+            metrics.Observation(
+                value=stats["misses"],
+                attributes={"result": "miss"},
+            ),
+        ]
+
+    def observe_embedding_cache_hit_rate(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        return [
+            metrics.Observation(
+                value=get_embedding_cache_stats()["hit_rate"],
+            )
+        ]
+
+    meter.create_observable_gauge(
+        name="webui.rag.embedding_cache.lookups",
+        description="Number of embedding cache lookups since startup",
+        unit="1",
+        callbacks=[observe_embedding_cache_lookups],
+    )
+
+    meter.create_observable_gauge(
+        name="webui.rag.embedding_cache.hit_rate",
+        description="Share of embedding lookups served from the cache",
+        unit="1",
+        callbacks=[observe_embedding_cache_hit_rate],
+    )
+
+    def observe_retrieval_executor_tasks(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_retrieval_executor_stats()
+        return [
+            metrics.Observation(
+                value=stats["queued"],
+                attributes={"state": "queued"},
+            ),
+            metrics.Observation(
+                value=stats["active"],
+                attributes={"state": "active"},
+            ),
+        ]
+
+    def observe_retrieval_executor_queue_time(
+        options: metrics.CallbackOptions,
+    ) -> Sequence[metrics.Observation]:
+        stats = get_retrieval_executor_stats()
+        return [
+            metrics.Observation(
+                value=stats[f"queue_time_{stat}_ms"],
+                attributes={"stat": stat},
+            )
+            for stat in ("last", "avg", "max")
+        ]
+
+    meter.create_observable_gauge(
+        name="webui.rag.retrieval_executor.tasks",
+        description="Retrieval tasks waiting for or running on the shared executor",
+        unit="1",
+        callbacks=[observe_retrieval_executor_tasks],
+    )
+
+    meter.create_observable_gauge(
+        name="webui.rag.retrieval_executor.queue_time",
+        description="Time retrieval tasks wait for an executor thread",
+        unit="ms",
+        callbacks=[observe_retrieval_executor_queue_time],
+    )
+
     # FastAPI middleware
     @app.middleware("http")
     async def _metrics_middleware(request: Request, call_next):